@@ -1,16 +1,22 @@
 """Dash app entry point."""
 from dotenv import load_dotenv
 import os
+import flask
 import math
 import io
 import yaml
 import base64
-from dash import ctx, callback_context, dash_table
-from dash.dependencies import ALL
+import hashlib
+import importlib.util
+import random
+import uuid
+from collections.abc import Iterator
+from dash import ctx, callback_context, dash_table, no_update, Patch
+from dash.dependencies import ALL, MATCH
 import plotly.express as px
 import plotly.graph_objs as go
 import pandas as pd
-import helpsk.pandas as hp
+import pyarrow.parquet as pq
 from helpsk.database import Snowflake
 import dash_bootstrap_components as dbc
 from source.library.dash_ui import (
@@ -26,19 +32,58 @@ from source.library.dash_ui import (
 )
 from source.library.dash_utilities import (
     MISSING,
+    ZOOM_GRAPH_TYPES,
+    FigureTooLargeError,
     InvalidConfigurationError,
+    convert_filters_from_ui_control,
     convert_to_graph_data,
+    page_table_data,
+    table_columns,
     create_title_and_labels,
     filter_data_from_ui_control,
-    generate_graph,
+    generate_graph_with_size_limit,
+    get_category_orders,
     get_graph_config,
+    get_relayout_range,
+    get_zoom_date_floor,
+    get_zoom_date_range,
     get_columns_from_config,
     log,
     log_error,
     log_function,
     log_variable,
+    configure_logging,
+)
+from source.library.utilities import build_tools_from_graph_configs, filter_date_range
+from source.library.column_statistics import (
+    get_cached_column_statistics,
+    get_column_statistics,
+    search_unique_values,
+)
+from source.library.correlations import get_correlation_matrix, top_correlated_pairs
+from source.library.date_index import DateIndex
+from source.library.duckdb_engine import (
+    create_query,
+    create_query_code,
+    read_query,
+    read_query_chunks,
+)
+from source.library.metrics import (
+    get_metrics,
+    get_profile_report,
+    profile_when,
+    record_payload_size,
+    timed,
+)
+from source.library.profiling import (
+    dataset_fingerprint,
+    get_profile,
+    is_profiling,
+    non_numeric_summary,
+    numeric_summary,
+    share_dataset,
+    start_profiling,
 )
-from source.library.utilities import build_tools_from_graph_configs
 from dash_extensions.enrich import (
     DashProxy,
     Output,
@@ -50,6 +95,8 @@ from dash_extensions.enrich import (
     ServersideOutputTransform,
 )
 from llm_workflow.agents import OpenAIFunctions
+from source.library.rasterize import count_color_bar, get_extent, rasterize_image
+from source.library.sampling import iterate_chunks, reservoir_sample
 import source.library.types as t
 
 
@@ -58,6 +105,41 @@ load_dotenv()  # load environment variables from .env file
 HOST = os.getenv('HOST')
 DEBUG = os.getenv('DEBUG').lower() == 'true'
 PORT = os.getenv('PORT')
+# dataset profiles (numeric/non-numeric summaries) are persisted here, keyed by dataset fingerprint
+PROFILE_CACHE_DIR = os.getenv('PROFILE_CACHE_DIR', 'profile_cache')
+# number of processes that columns are profiled/type-checked across for large datasets
+PROFILE_MAX_WORKERS = int(os.getenv('PROFILE_MAX_WORKERS', str(os.cpu_count() or 1)))
+# the default number of rows sampled in fast exploration mode and the number of rows read per
+# chunk when building the sample
+SAMPLE_SIZE = int(os.getenv('SAMPLE_SIZE', '1000000'))
+SAMPLE_CHUNK_SIZE = int(os.getenv('SAMPLE_CHUNK_SIZE', '500000'))
+# the engine used to filter and prepare the data: 'pandas', 'duckdb' (requires `duckdb`; the
+# filters and the aggregation of histograms of non-numeric values are DuckDB queries of the
+# in-memory dataframe, and the generated code contains the SQL), or 'polars' (requires `polars`;
+# the same results as pandas, so the generated code is the pandas code)
+DATA_ENGINE = os.getenv('DATA_ENGINE', 'pandas')
+# the minimum level that is logged (DEBUG logs the variables of each callback; the default in debug
+# mode) and the format of the logs: 'text' or 'json' (one JSON object per record)
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'DEBUG' if DEBUG else 'INFO')
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')
+configure_logging(level=LOG_LEVEL, json_format=LOG_FORMAT == 'json')
+# shows the Performance tab (the timings of the callbacks; also available at /metrics)
+SHOW_PERFORMANCE_TAB = os.getenv('SHOW_PERFORMANCE_TAB', str(DEBUG)).lower() == 'true'
+# the format of the report of "Profile next render": 'html' or 'speedscope' (both require
+# `pyinstrument`; otherwise the report is the `cProfile` stats as text)
+RENDER_PROFILE_FORMAT = os.getenv('RENDER_PROFILE_FORMAT', 'html')
+# the reports of "Profile next render" are written here (one per session), so that any worker
+# process of the server can show and download them
+PROFILE_REPORT_DIR = os.getenv('PROFILE_REPORT_DIR', 'profile_reports')
+# figures larger than this (serialized) aren't sent to the browser; a sample of the rows is graphed
+# (scatter, line, and box plots) or the user is asked to change the graph (see
+# `generate_graph_with_size_limit`)
+MAX_FIGURE_SIZE_MB = float(os.getenv('MAX_FIGURE_SIZE_MB', '25'))
+# scatter and line graphs with more points than this are rendered with WebGL rather than SVG; set
+# to 'none' to always render SVG
+WEBGL_POINT_THRESHOLD = os.getenv('WEBGL_POINT_THRESHOLD', '1000')
+WEBGL_POINT_THRESHOLD = None if WEBGL_POINT_THRESHOLD.lower() == 'none' \
+    else int(WEBGL_POINT_THRESHOLD)
 GOLDEN_RATIO = 1.618
 top_n_categories_lookup = {
     0: 'None',
@@ -85,6 +167,14 @@ min_retention_events_lookup = {
     10: '500',
 
 }
+count_distinct_precision_lookup = {
+    0: 'Exact',
+    1: '8',
+    2: '10',
+    3: '12',
+    4: '14',
+    5: '16',
+}
 bar_mode_options = [
     {'label': 'Stacked', 'value': 'relative'},
     {'label': 'Side-by-Side', 'value': 'group'},
@@ -106,6 +196,9 @@ SNOWFLAKE_DATABASE=os.getenv('SNOWFLAKE_DATABASE')
 ENABLE_SNOWFLAKE = SNOWFLAKE_USER and SNOWFLAKE_ACCOUNT and SNOWFLAKE_AUTHENTICATOR \
     and SNOWFLAKE_WAREHOUSE and SNOWFLAKE_DATABASE
 
+# the data can be loaded with a DuckDB query (e.g. of Parquet files) if `duckdb` is installed
+ENABLE_DUCKDB = importlib.util.find_spec('duckdb') is not None
+
 DEFAULT_QUERIES = ''
 if os.path.isfile('queries.txt'):
     with open('queries.txt') as f:
@@ -124,14 +217,70 @@ app = DashProxy(
 app.layout = dbc.Container(className="app-container", fluid=True, style={"max-width": "99%"}, children=[  # noqa
     dcc.Store(id='original_data'),
     dcc.Store(id='filtered_data'),
+    # the sorted date index (see `DateIndex`) of the original and filtered data
+    dcc.Store(id='date_index'),
+    dcc.Store(id='filtered_date_index'),
+    # the data of the graph (shown in the Data tab of the Visualize tab)
+    dcc.Store(id='graph_data'),
     dcc.Store(id='filter_columns_cache'),
     dcc.Store(id='generated_filter_code'),
     dcc.Store(id='column_types'),
     dcc.Store(id='variables_changed_by_ai'),
-    dbc.Tabs([
-        dbc.Tab(label="Load Data", children=[
+    dcc.Store(id='dataset_fingerprint'),
+    # the source of the data and the size of the sample when in fast exploration mode
+    dcc.Store(id='sample_info'),
+    # polls for the dataset profile while it is being computed in the background
+    dcc.Interval(id='profile_interval', interval=500, disabled=True),
+    # the content of the tabs is rendered the first time the tab is activated for each dataset;
+    # `request_tab_render` records the dataset fingerprint each tab was rendered for and triggers
+    # the tab's callback via its request store
+    dcc.Store(id='rendered_tabs', data={}),
+    dcc.Store(id='data_sample_request'),
+    dcc.Store(id='summary_request'),
+    dcc.Store(id='correlations_request'),
+    dbc.Tabs(id='main_tabs', active_tab='load_data_tab', children=[
+        dbc.Tab(label="Load Data", tab_id='load_data_tab', children=[
             dcc.Loading(type="default", children=[
             html.Br(),
+            # fast exploration mode: the graphs are built from a (stratified) sample of the data
+            # that is built while reading the data (see `reservoir_sample`)
+            dbc.Row(align='center', children=[
+                dbc.Col(width='auto', children=[
+                    dbc.Checklist(
+                        id='sample_mode_checklist',
+                        options=[{'label': 'Fast exploration (sample the data)', 'value': True}],
+                        value=[],
+                        switch=True,
+                    ),
+                ]),
+                dbc.Col(width='auto', children=[
+                    dcc.Input(
+                        id='sample_size',
+                        type='number',
+                        min=1,
+                        step=1,
+                        value=SAMPLE_SIZE,
+                        placeholder='Sample size',
+                    ),
+                ]),
+                dbc.Col(width='auto', children=[
+                    dcc.Input(
+                        id='sample_stratify_by',
+                        type='text',
+                        placeholder='Stratify by column (optional)',
+                    ),
+                ]),
+            ]),
+            html.Br(),
+            # errors loading (or sampling) the data from any of the sources
+            dbc.Alert(
+                "Error.",
+                color="danger",
+                id="load_data_error",
+                dismissable=True,
+                is_open=False,
+                fade=False,
+            ),
             dbc.Row([
                 dbc.Tabs(active_tab='tab-0' if ENABLE_SNOWFLAKE else 'tab-1', children=[
                     dbc.Tab(label="Query Snowflake", disabled=ENABLE_SNOWFLAKE is False, children=[
@@ -148,14 +297,6 @@ app.layout = dbc.Container(className="app-container", fluid=True, style={"max-wi
                             value=DEFAULT_QUERIES,
                             style={'width': '100%', 'height': 400, 'padding': '10px'},
                         ),
-                        dbc.Alert(
-                            "Error.",
-                            color="danger",
-                            id="snowflake_error",
-                            dismissable=True,
-                            is_open=False,
-                            fade=False,
-                        ),
                     ]),
                     dbc.Tab(label="Load .csv from URL", children=[
                         html.Br(),
@@ -201,6 +342,26 @@ app.layout = dbc.Container(className="app-container", fluid=True, style={"max-wi
                             multiple=False,
                         ),
                     ]),
+                    dbc.Tab(
+                        label="Query Parquet with DuckDB",
+                        disabled=not ENABLE_DUCKDB,
+                        children=[
+                            html.Br(),
+                            html.Button(
+                                'Query',
+                                id='query_duckdb_button',
+                                n_clicks=0,
+                                style={'width': '200px', 'margin': '0 8px 0 0'},
+                            ),
+                            html.Br(),html.Br(),
+                            # the paths of the files are relative to the working directory
+                            dcc.Textarea(
+                                id='query_duckdb_text',
+                                placeholder="SELECT *\nFROM 'data/*.parquet'",
+                                style={'width': '100%', 'height': 200, 'padding': '10px'},
+                            ),
+                        ],
+                    ),
                     dbc.Tab(label="Generate Random Dataframe", children=[
                         html.Br(),
                         html.Button(
@@ -215,11 +376,27 @@ app.layout = dbc.Container(className="app-container", fluid=True, style={"max-wi
             html.Br(),
             dbc.Row(children=[
                 html.Hr(),
-                html.Div(id='table_uploaded_data'),
+                html.Div(id='table_uploaded_data', style={'display': 'none'}, children=[
+                    dcc.Markdown("#### Data:"),
+                    # the rows are paged, sorted, and filtered server-side
+                    # (`update_data_sample_table`)
+                    dash_table.DataTable(
+                        id='data_sample_table',
+                        page_current=0,
+                        page_size=20,
+                        page_action='custom',
+                        sort_action='custom',
+                        sort_mode='multi',
+                        filter_action='custom',
+                        style_header={
+                            'fontWeight': 'bold',
+                        },
+                    ),
+                ]),
             ]),
             ]),
         ]),
-        dbc.Tab(label="Visualize", children=[
+        dbc.Tab(label="Visualize", tab_id='visualize_tab', children=[
             dbc.Row([
                 dbc.Col(sm=4, md=4, lg=4, xl=3, xxl=2, children=[
                     dbc.Card(style={'margin': '10px 0 10px 0'}, children=[
@@ -458,6 +635,16 @@ app.layout = dbc.Container(className="app-container", fluid=True, style={"max-wi
                                     step=10,
                                     value=20,
                                 ),
+                                create_slider_control(
+                                    label="Count Distinct Precision (HyperLogLog)",
+                                    id='count_distinct_precision',
+                                    hidden=True,
+                                    value=0,  # exact
+                                    step=1,
+                                    min=0,
+                                    max=5,
+                                    marks=count_distinct_precision_lookup,
+                                ),
                                 create_slider_control(
                                     label="# of Bins",
                                     id='n_bins',
@@ -598,6 +785,29 @@ app.layout = dbc.Container(className="app-container", fluid=True, style={"max-wi
                                     placeholder="Facet label",
                                     hidden=True,
                                 ),
+                                html.Hr(),
+                                # profiles the next render of the graph (see `profile_when`); the
+                                # report can be downloaded once the graph is rendered
+                                dbc.Checklist(
+                                    id='profile_next_render_checklist',
+                                    options=[{'label': 'Profile next render', 'value': True}],
+                                    value=[],
+                                    switch=True,
+                                ),
+                                # the id of the session the reports are stored under and the
+                                # id of the report that is shown
+                                dcc.Store(id='profile_report_id'),
+                                dcc.Store(id='shown_profile_report_id'),
+                                html.Div(id='profile_report_div', style={'display': 'none'}, children=[  # noqa
+                                    html.Span(id='profile_report_text'),
+                                    html.Button(
+                                        'Download Profile',
+                                        id='download_profile_button',
+                                        n_clicks=0,
+                                        style={'margin': '0 0 0 16px'},
+                                    ),
+                                    dcc.Download(id='profile_download'),
+                                ]),
                             ]),
                         ]),
                     ]),
@@ -610,7 +820,33 @@ app.layout = dbc.Container(className="app-container", fluid=True, style={"max-wi
                         dismissable=True,
                         fade=False,
                     ),
+                    dbc.Alert(
+                        color="warning",
+                        id="figure_too_large_alert",
+                        dismissable=True,
+                        is_open=False,
+                        fade=False,
+                    ),
+                    dbc.Alert(
+                        color="warning",
+                        id="sample_banner",
+                        is_open=False,
+                        fade=False,
+                        children=[
+                            html.Span(id='sample_banner_text'),
+                            html.Button(
+                                'Render on Full Data',
+                                id='render_full_data_button',
+                                n_clicks=0,
+                                style={'margin': '0 0 0 16px'},
+                            ),
+                        ],
+                    ),
                     dcc.Loading(type="default", children=[
+                        html.Div(
+                            id='figure_size_text',
+                            style={'text-align': 'right', 'font-size': '12px', 'color': 'gray'},
+                        ),
                         dcc.Graph(
                             id='visualize_graph',
                             config={'staticPlot': False, 'displayModeBar': True},
@@ -631,11 +867,18 @@ app.layout = dbc.Container(className="app-container", fluid=True, style={"max-wi
                             ]),
                             dbc.Tab(label="Data", children=[
                                 html.Br(),
-                                dcc.Markdown("##### Sample of Uploaded Data (first 500 rows):"),
+                                dcc.Markdown("##### Graph Data:"),
                                 dcc.Loading(type="default", children=[
+                                    # the rows are paged, sorted, and filtered server-side
+                                    # (`update_visualize_table`)
                                     dash_table.DataTable(
                                         id='visualize_table',
+                                        page_current=0,
                                         page_size=20,
+                                        page_action='custom',
+                                        sort_action='custom',
+                                        sort_mode='multi',
+                                        filter_action='custom',
                                         style_header={
                                             'fontWeight': 'bold',
                                         },
@@ -647,7 +890,7 @@ app.layout = dbc.Container(className="app-container", fluid=True, style={"max-wi
                 ]),
             ]),
         ]),
-        dbc.Tab(label="Numeric Summary", children=[
+        dbc.Tab(label="Numeric Summary", tab_id='numeric_summary_tab', children=[
             html.Br(),
             dash_table.DataTable(
                 id='numeric_summary_table',
@@ -695,7 +938,7 @@ app.layout = dbc.Container(className="app-container", fluid=True, style={"max-wi
                 ],
             ),
         ]),
-        dbc.Tab(label="Non-Numeric Summary", children=[
+        dbc.Tab(label="Non-Numeric Summary", tab_id='non_numeric_summary_tab', children=[
             html.Br(),
             dash_table.DataTable(
                 id='non_numeric_summary_table',
@@ -727,168 +970,358 @@ app.layout = dbc.Container(className="app-container", fluid=True, style={"max-wi
                 ],
             ),
         ]),
-        dbc.Tab(label="Correlations", children=[
+        dbc.Tab(label="Correlations", tab_id='correlations_tab', children=[
             html.Br(),
+            dbc.Row([
+                dbc.Col(md=2, children=[
+                    create_dropdown_control(
+                        label="Method",
+                        id="correlation_method",
+                        clearable=False,
+                        options=[
+                            {'label': 'Pearson', 'value': 'pearson'},
+                            {'label': 'Spearman', 'value': 'spearman'},
+                        ],
+                        value='pearson',
+                    ),
+                ]),
+                dbc.Col(md=7, children=[
+                    create_dropdown_control(
+                        label="Columns",
+                        id="correlation_columns",
+                        multi=True,
+                        placeholder="All numeric columns",
+                    ),
+                ]),
+                dbc.Col(md=3, children=[
+                    create_dropdown_control(
+                        label="Top Correlated Pairs",
+                        id="correlation_top_k",
+                        options=[{'label': str(x), 'value': x} for x in [5, 10, 20, 50]],
+                        placeholder="All pairs",
+                    ),
+                ]),
+            ]),
             dcc.Graph(
                 id='correlations_graph',
                 config={'staticPlot': False, 'displayModeBar': False},
                 # 3/12 because the sidebar is 3/12 of the width
                 # style={'width': '100%', 'height': f'100vw'},
             ),
+            dash_table.DataTable(
+                id='correlation_pairs_table',
+                page_size=50,
+                style_header={
+                    'fontWeight': 'bold',
+                },
+            ),
         ]),
+        # the timings of the callbacks and of the stages of building a graph (see `get_metrics`);
+        # hidden unless SHOW_PERFORMANCE_TAB is true
+        dbc.Tab(
+            label="Performance",
+            tab_id='performance_tab',
+            tab_style={} if SHOW_PERFORMANCE_TAB else {'display': 'none'},
+            children=[
+                html.Br(),
+                html.Button(
+                    'Refresh',
+                    id='refresh_performance_button',
+                    n_clicks=0,
+                    style={'width': '200px', 'margin': '0 8px 0 0'},
+                ),
+                html.Br(), html.Br(),
+                html.H5("Timings (slowest p90 first)"),
+                dash_table.DataTable(
+                    id='performance_summary_table',
+                    page_size=50,
+                    sort_action='native',
+                    style_header={
+                        'fontWeight': 'bold',
+                    },
+                ),
+                html.Br(),
+                html.H5("Recent calls"),
+                dash_table.DataTable(
+                    id='performance_recent_table',
+                    page_size=50,
+                    style_header={
+                        'fontWeight': 'bold',
+                    },
+                ),
+            ],
+        ),
     ]),
 ])
 
 
+@app.server.route('/metrics')
+def metrics() -> flask.Response:
+    """Return the timings of the callbacks and of the stages of building a graph as JSON."""
+    return flask.jsonify(get_metrics())
+
+
+@app.server.after_request
+def record_callback_payload_size(response: flask.Response) -> flask.Response:
+    """Record the size of the response of each callback (i.e. the serialized outputs)."""
+    if flask.request.path.endswith('_dash-update-component'):
+        record_payload_size(response.content_length)
+    return response
+
+
+def read_data(source: dict, upload_data_contents: str | None = None) -> pd.DataFrame:
+    """
+    Read the data from the source (see `load_data`); `upload_data_contents` is the content of the
+    uploaded file if the source is an upload.
+    """
+    data = None
+    if source['type'] == 'upload':
+        filename = source['filename']
+        _, content_string = upload_data_contents.split(',')
+        decoded = base64.b64decode(content_string)
+        if '.pkl' in filename:
+            log("loading from .pkl")
+            data = pd.read_pickle(io.BytesIO(decoded))
+        elif '.csv' in filename:
+            log("loading from .csv")
+            data = pd.read_csv(io.StringIO(decoded.decode('utf-8')))
+        elif '.parquet' in filename:
+            log("loading from .parquet")
+            data = pd.read_parquet(io.BytesIO(decoded))
+        elif 'xls' in filename:
+            log("loading from .xls")
+            # Assume that the user uploaded an excel file
+            data = pd.read_excel(io.BytesIO(decoded))
+    elif source['type'] == 'snowflake':
+        # with Snowflake.from_config(SNOWFLAKE_CONFIG_PATH, config_key='snowflake') as db:
+        with create_snowflake() as snowflake:
+            data = snowflake.query(source['query'])
+    elif source['type'] == 'duckdb':
+        data = read_query(create_query(source['query']))
+    elif source['type'] == 'url':
+        data = pd.read_csv(source['url'])
+    elif source['type'] == 'random':
+        from source.library.utilities import create_random_dataframe
+        data = create_random_dataframe(
+            num_rows=10_000,
+            sporadic_missing=True,
+            seed=source.get('seed'),
+        )
+    else:
+        raise ValueError(f"Unknown source: {source['type']}")
+    return data
+
+
+def read_data_chunks(
+        source: dict,
+        upload_data_contents: str | None = None) -> Iterator[pd.DataFrame]:
+    """
+    Read the data from the source (see `read_data`) in chunks of up to SAMPLE_CHUNK_SIZE rows, so
+    that the data can be sampled without loading all of it into memory. Sources that can't be
+    read in chunks (.pkl/excel files) are read in a single chunk.
+    """
+    if source['type'] == 'upload':
+        filename = source['filename']
+        _, content_string = upload_data_contents.split(',')
+        decoded = base64.b64decode(content_string)
+        if '.csv' in filename:
+            yield from pd.read_csv(
+                io.StringIO(decoded.decode('utf-8')),
+                chunksize=SAMPLE_CHUNK_SIZE,
+            )
+        elif '.parquet' in filename:
+            parquet_file = pq.ParquetFile(io.BytesIO(decoded))
+            for batch in parquet_file.iter_batches(batch_size=SAMPLE_CHUNK_SIZE):
+                yield batch.to_pandas()
+        else:
+            yield read_data(source, upload_data_contents)
+    elif source['type'] == 'snowflake':
+        with create_snowflake() as snowflake:
+            cursor = snowflake.connection_object.cursor()
+            cursor.execute(source['query'])
+            yield from cursor.fetch_pandas_batches()
+    elif source['type'] == 'duckdb':
+        yield from read_query_chunks(create_query(source['query']), SAMPLE_CHUNK_SIZE)
+    elif source['type'] == 'url':
+        yield from pd.read_csv(source['url'], chunksize=SAMPLE_CHUNK_SIZE)
+    else:
+        yield from iterate_chunks(read_data(source, upload_data_contents), SAMPLE_CHUNK_SIZE)
+
+
+def create_snowflake() -> Snowflake:
+    """Create the Snowflake connection object from the environment variables."""
+    return Snowflake(
+        user=SNOWFLAKE_USER,
+        account=SNOWFLAKE_ACCOUNT,
+        authenticator=SNOWFLAKE_AUTHENTICATOR,
+        warehouse=SNOWFLAKE_WAREHOUSE,
+        database=SNOWFLAKE_DATABASE,
+    )
+
+
+def sample_banner_text(sample_info: dict | None, num_rows: int | None = None) -> str:
+    """
+    Return the text of the banner shown when the graphs are built from a sample of the data. If
+    `num_rows` is provided, the graph has been rendered on the full data.
+    """
+    if sample_info is None:
+        return ""
+    if num_rows is not None:
+        return f"Rendered on the full data ({num_rows:,} rows after filtering). " \
+            "Applying filters returns to the sample."
+    stratified = f", stratified by `{sample_info['stratify_by']}`" \
+        if sample_info['stratify_by'] else ""
+    return f"Results are based on a sample of {sample_info['sample_size']:,} of " \
+        f"{sample_info['num_rows']:,} rows{stratified}."
+
+
 @app.callback(
     Output('x_variable_dropdown', 'options'),
     Output('y_variable_dropdown', 'options'),
     Output('filter_columns_dropdown', 'options'),
     Output('filter_columns_cache', 'data', allow_duplicate=True),
     Output('visualize_graph', 'figure', allow_duplicate=True),
-    Output('visualize_table', 'data', allow_duplicate=True),
-    Output('table_uploaded_data', 'children'),
+    Output('graph_data', 'data', allow_duplicate=True),
+    Output('table_uploaded_data', 'style'),
     Output('numeric_summary_table', 'data'),
     Output('non_numeric_summary_table', 'data'),
     Output('original_data', 'data'),
     Output('filtered_data', 'data', allow_duplicate=True),
+    Output('date_index', 'data'),
+    Output('filtered_date_index', 'data', allow_duplicate=True),
     Output('column_types', 'data'),
-    Output('snowflake_error', 'is_open'),
-    Output('snowflake_error', 'children'),
+    Output('load_data_error', 'is_open'),
+    Output('load_data_error', 'children'),
+    Output('dataset_fingerprint', 'data'),
+    Output('profile_interval', 'disabled'),
+    Output('sample_info', 'data'),
+    Output('sample_banner', 'is_open'),
+    Output('sample_banner_text', 'children'),
+    Output('rendered_tabs', 'data', allow_duplicate=True),
     Input('query_snowflake_button', 'n_clicks'),
     Input('load_random_data_button', 'n_clicks'),
     Input('load_from_url_button', 'n_clicks'),
     Input('upload-data', 'contents'),
+    Input('query_duckdb_button', 'n_clicks'),
     State('query_snowflake_text', 'value'),
     State('upload-data', 'filename'),
     State('load_from_url', 'value'),
+    State('query_duckdb_text', 'value'),
+    State('sample_mode_checklist', 'value'),
+    State('sample_size', 'value'),
+    State('sample_stratify_by', 'value'),
     prevent_initial_call=True,
 )
+@timed
 def load_data(  # noqa
         query_snowflake_button: int,
         load_random_data_button: int,
         load_from_url_button: int,
         upload_data_contents: str,
+        query_duckdb_button: int,
         query_snowflake_text: str,
         upload_data_filename: str,
-        load_from_url: str) -> tuple:
-    """Triggered when the user clicks on the Load button."""
+        load_from_url: str,
+        query_duckdb_text: str,
+        sample_mode: list,
+        sample_size: int | None,
+        sample_stratify_by: str | None) -> tuple:
+    """
+    Triggered when the user clicks on the Load button. In fast exploration mode, the data is
+    sampled while it is read (in chunks) and only the sample is kept (e.g. a sample of Parquet
+    files larger than memory that are queried with DuckDB).
+    """
     log_function('load_data')
     x_variable_dropdown = []
     y_variable_dropdown = []
     filter_columns_dropdown = []
     filter_columns_cache = None
     primary_graph = {}
-    visualize_table = None
-    table_uploaded_data = None
-    numeric_summary = None
-    non_numeric_summary = None
+    graph_data = None
+    numeric_summary_records = None
+    non_numeric_summary_records = None
     original_data = None
     filtered_data = None
+    date_index = None
     column_types = None
-    snowflake_error_message = None
+    load_data_error_message = None
+    fingerprint = None
+    sample_info = None
     log_variable('query_snowflake_button', query_snowflake_button)
     log_variable('load_random_data_button', load_random_data_button)
     log_variable('load_from_url_button', load_from_url_button)
+    log_variable('query_duckdb_button', query_duckdb_button)
 
     if callback_context.triggered:
         triggered = callback_context.triggered[0]['prop_id']
         log_variable('triggered', triggered)
         if triggered == 'upload-data.contents':
             log_variable('upload_data_filename', upload_data_filename)
-            _, content_string = upload_data_contents.split(',')
-            decoded = base64.b64decode(content_string)
-            try:
-                if '.pkl' in upload_data_filename:
-                    log("loading from .pkl")
-                    data = pd.read_pickle(io.BytesIO(decoded))
-                elif '.csv' in upload_data_filename:
-                    log("loading from .csv")
-                    data = pd.read_csv(io.StringIO(decoded.decode('utf-8')))
-                elif '.parquet' in upload_data_filename:
-                    log("loading from .parquet")
-                    data = pd.read_parquet(io.BytesIO(decoded))
-                elif 'xls' in upload_data_filename:
-                    log("loading from .xls")
-                    # Assume that the user uploaded an excel file
-                    data = pd.read_excel(io.BytesIO(decoded))
-            except Exception as e:
-                log(e)
-                return html.Div([
-                    'There was an error processing this file.',
-                ])
+            source = {'type': 'upload', 'filename': upload_data_filename}
         elif triggered == 'query_snowflake_button.n_clicks':
             log("Querying Snowflake")
-            try:
-                # with Snowflake.from_config(SNOWFLAKE_CONFIG_PATH, config_key='snowflake') as db:
-                snowflake = Snowflake(
-                    user=SNOWFLAKE_USER,
-                    account=SNOWFLAKE_ACCOUNT,
-                    authenticator=SNOWFLAKE_AUTHENTICATOR,
-                    warehouse=SNOWFLAKE_WAREHOUSE,
-                    database=SNOWFLAKE_DATABASE,
-                )
-                with snowflake:
-                    data  = snowflake.query(query_snowflake_text)
-            except Exception as e:
-                data = None
-                snowflake_error_message = f"{type(e).__name__}: {e}"
-                log_error(snowflake_error_message)
-
+            source = {'type': 'snowflake', 'query': query_snowflake_text}
         elif triggered == 'load_from_url_button.n_clicks' and load_from_url:
             log("Loading from CSV URL")
             if 'docs.google.com/spreadsheets' in load_from_url:
                 load_from_url = load_from_url.replace('/edit#gid=', '/export?format=csv&gid=')
-            data = pd.read_csv(load_from_url)
+            source = {'type': 'url', 'url': load_from_url}
+        elif triggered == 'query_duckdb_button.n_clicks' and query_duckdb_text:
+            log("Querying DuckDB")
+            source = {'type': 'duckdb', 'query': query_duckdb_text}
         elif triggered == 'load_random_data_button.n_clicks':
             log("Loading DataFrame with random data")
-            from source.library.utilities import create_random_dataframe
-            data = create_random_dataframe(num_rows=10_000, sporadic_missing=True)
-            log(f"Loaded data w/ {data.shape[0]:,} rows and {data.shape[1]:,} columns")
+            # the seed is kept with the source so the same data is generated when the sample is
+            # rendered on the full data (see `render_full_data`)
+            source = {'type': 'random', 'seed': random.getrandbits(32)}
         else:
             raise ValueError(f"Unknown trigger: {triggered}")
 
+        try:
+            if sample_mode:
+                sample_size = int(sample_size or SAMPLE_SIZE)
+                sample_stratify_by = sample_stratify_by or None
+                data, num_rows = reservoir_sample(
+                    read_data_chunks(source, upload_data_contents),
+                    sample_size=sample_size,
+                    stratify_by=sample_stratify_by,
+                )
+                log(f"Sampled {len(data):,} of {num_rows:,} rows")
+                sample_info = {
+                    'source': source,
+                    'num_rows': num_rows,
+                    'sample_size': len(data),
+                    'stratify_by': sample_stratify_by,
+                }
+            else:
+                data = read_data(source, upload_data_contents)
+        except Exception as e:
+            data = None
+            log_error(f"{type(e).__name__}: {e}")
+            load_data_error_message = f"{type(e).__name__}: {e}"
         if data is not None:
-            column_types = t.get_column_types(data)
-            log_variable('column_types', column_types)
+            log(f"Loaded data w/ {data.shape[0]:,} rows and {data.shape[1]:,} columns")
+            # the sample of data, summaries, and correlations are rendered when their tab is
+            # activated (see `request_tab_render`)
+            fingerprint = dataset_fingerprint(data)
+            log_variable('fingerprint', fingerprint)
+            # the data is copied to shared memory once for the worker processes that check the
+            # column types and profile the dataset
+            shared_dataset = share_dataset(data, fingerprint, max_workers=PROFILE_MAX_WORKERS)
+            column_types = t.get_column_types(
+                data,
+                max_workers=PROFILE_MAX_WORKERS,
+                shared_dataset=shared_dataset,
+            )
             log_variable('column_types', column_types)
 
-            log('creating numeric summary')
-            numeric_summary = hp.numeric_summary(data, return_style=False)
-            if numeric_summary is not None and len(numeric_summary) > 0:
-                numeric_summary = numeric_summary.\
-                    reset_index().\
-                    rename(columns={'index': 'Column Name'}).\
-                    to_dict('records')
-            else:
-                numeric_summary = None
-
-            log('creating non-numeric summary')
-            non_numeric_summary = hp.non_numeric_summary(data, return_style=False)
-            if non_numeric_summary is not None and len(non_numeric_summary) > 0:
-                non_numeric_summary = non_numeric_summary.\
-                    reset_index().\
-                    rename(columns={'index': 'Column Name'}).\
-                    to_dict('records')
-            else:
-                non_numeric_summary = None
-
             x_variable_dropdown = data.columns.to_list()
             y_variable_dropdown = x_variable_dropdown
             filter_columns_dropdown = x_variable_dropdown
-            table_uploaded_data = [
-                dcc.Markdown("#### Sample of Data (first 500 rows):"),
-                dash_table.DataTable(
-                    id='data_sample_table',
-                    data=data.iloc[0:500].to_dict('records'),
-                    page_size=20,
-                    style_header={
-                        'fontWeight': 'bold',
-                    },
-                ),
-            ]
             original_data = data
             filtered_data = data
+            # built once per dataset and reused by the date filters and when zooming into dates
+            date_index = DateIndex(data, t.get_date_columns(column_types))
 
     return (
         x_variable_dropdown,
@@ -896,18 +1329,297 @@ def load_data(  # noqa
         filter_columns_dropdown,
         filter_columns_cache,
         primary_graph,
-        visualize_table,
-        table_uploaded_data,
-        numeric_summary,
-        non_numeric_summary,
+        Serverside(graph_data),
+        {'display': 'none'},  # the data is shown when the tab is rendered
+        numeric_summary_records,
+        non_numeric_summary_records,
         Serverside(original_data),
         Serverside(filtered_data),
+        Serverside(date_index),
+        Serverside(date_index),
         column_types,
-        snowflake_error_message is not None,
-        snowflake_error_message,
+        load_data_error_message is not None,
+        load_data_error_message,
+        fingerprint,
+        True,  # the interval is enabled when the summaries are rendered
+        sample_info,
+        sample_info is not None,
+        sample_banner_text(sample_info),
+        {},  # the tabs are rendered again for the new data (even if it's the same dataset)
     )
 
 
+# the tabs whose content is rendered lazily and the store that triggers rendering the content
+LAZY_TABS = {
+    'load_data_tab': 'data_sample_request',
+    'numeric_summary_tab': 'summary_request',
+    'non_numeric_summary_tab': 'summary_request',
+    'correlations_tab': 'correlations_request',
+}
+
+
+@app.callback(
+    Output('data_sample_request', 'data'),
+    Output('summary_request', 'data'),
+    Output('correlations_request', 'data'),
+    Output('rendered_tabs', 'data'),
+    Input('main_tabs', 'active_tab'),
+    Input('dataset_fingerprint', 'data'),
+    State('rendered_tabs', 'data'),
+    prevent_initial_call=True,
+)
+@timed
+def request_tab_render(
+        active_tab: str,
+        fingerprint: str | None,
+        rendered_tabs: dict | None) -> tuple:
+    """
+    Triggered when the user activates a tab or loads a dataset. Requests rendering the content of
+    the active tab if it hasn't been rendered for the dataset yet, so the content of tabs that are
+    never opened isn't computed. This callback doesn't take the data as an input so that
+    switching tabs doesn't load the data unless the content needs to be rendered.
+    """
+    rendered_tabs = rendered_tabs or {}
+    request = LAZY_TABS.get(active_tab)
+    if fingerprint is None or request is None or rendered_tabs.get(request) == fingerprint:
+        return no_update, no_update, no_update, no_update
+    log_function('request_tab_render')
+    log_variable('active_tab', active_tab)
+    requests = dict.fromkeys(
+        ['data_sample_request', 'summary_request', 'correlations_request'],
+        no_update,
+    )
+    requests[request] = fingerprint
+    return *requests.values(), rendered_tabs | {request: fingerprint}
+
+
+@app.callback(
+    Output('data_sample_table', 'data'),
+    Output('data_sample_table', 'columns'),
+    Output('data_sample_table', 'page_count'),
+    Output('data_sample_table', 'page_current'),
+    Output('table_uploaded_data', 'style', allow_duplicate=True),
+    Input('data_sample_request', 'data'),
+    Input('data_sample_table', 'page_current'),
+    Input('data_sample_table', 'page_size'),
+    Input('data_sample_table', 'sort_by'),
+    Input('data_sample_table', 'filter_query'),
+    State('original_data', 'data'),
+    prevent_initial_call=True,
+)
+@timed
+def update_data_sample_table(
+        fingerprint: str | None,
+        page_current: int,
+        page_size: int,
+        sort_by: list[dict],
+        filter_query: str,
+        data: pd.DataFrame | None) -> tuple:
+    """
+    Triggered the first time the Load Data tab is active for the dataset or when the user pages,
+    sorts, or filters the table. Only the rows of the current page are sent to the browser.
+    """
+    log_function('update_data_sample_table')
+    if fingerprint is None or data is None:
+        return [], [], 1, 0, {'display': 'none'}
+    if ctx.triggered_id == 'data_sample_request':
+        page_current = 0
+    records, page_count = page_table_data(data, page_current, page_size, sort_by, filter_query)
+    return records, table_columns(data), page_count, page_current, {}
+
+
+@app.callback(
+    Output('numeric_summary_table', 'data', allow_duplicate=True),
+    Output('non_numeric_summary_table', 'data', allow_duplicate=True),
+    Output('profile_interval', 'disabled', allow_duplicate=True),
+    Input('summary_request', 'data'),
+    State('original_data', 'data'),
+    prevent_initial_call=True,
+)
+@timed
+def render_summary_tables(fingerprint: str | None, data: pd.DataFrame | None) -> tuple:
+    """
+    Triggered the first time one of the summary tabs is active for the dataset.
+
+    The numeric/non-numeric summaries are created from the profile, which is computed in the
+    background (or loaded from PROFILE_CACHE_DIR) and picked up by `update_summary_tables`.
+    """
+    log_function('render_summary_tables')
+    if fingerprint is None or data is None:
+        return None, None, True
+    start_profiling(
+        data,
+        fingerprint=fingerprint,
+        cache_directory=PROFILE_CACHE_DIR,
+        max_workers=PROFILE_MAX_WORKERS,
+    )
+    try:
+        profile = get_profile(fingerprint)
+    except Exception as e:
+        log_error(f"Profiling failed: {type(e).__name__}: {e}")
+        return no_update, no_update, True
+    if profile is None:
+        return no_update, no_update, False
+    return *summary_records(profile), True
+
+
+def summary_records(profile: dict) -> tuple[list[dict] | None, list[dict] | None]:
+    """Convert the profile to the records of the numeric/non-numeric summary tables."""
+    records = []
+    for summary in [numeric_summary(profile), non_numeric_summary(profile)]:
+        if summary is not None and len(summary) > 0:
+            records.append(
+                summary.
+                reset_index().
+                rename(columns={'index': 'Column Name'}).
+                to_dict('records'),
+            )
+        else:
+            records.append(None)
+    return tuple(records)
+
+
+@app.callback(
+    Output('numeric_summary_table', 'data', allow_duplicate=True),
+    Output('non_numeric_summary_table', 'data', allow_duplicate=True),
+    Output('profile_interval', 'disabled', allow_duplicate=True),
+    Input('profile_interval', 'n_intervals'),
+    State('dataset_fingerprint', 'data'),
+    prevent_initial_call=True,
+)
+@timed
+def update_summary_tables(n_intervals: int, fingerprint: str | None) -> tuple:  # noqa: ARG001
+    """
+    Triggered by the interval while the dataset is being profiled in the background. The interval
+    is turned off when the profile is ready or if profiling failed (the error is logged).
+    """
+    # checked before getting the profile, which could finish in between
+    profiling = is_profiling(fingerprint)
+    try:
+        profile = get_profile(fingerprint) if fingerprint else None
+    except Exception as e:
+        log_error(f"Profiling failed: {type(e).__name__}: {e}")
+        return no_update, no_update, True
+    if profile is None:
+        return no_update, no_update, not profiling
+    log_function('update_summary_tables')
+    seconds = {column: stats.get('seconds', 0) for column, stats in profile.items()}
+    slowest_columns = sorted(seconds, key=seconds.get, reverse=True)[:5]
+    log_variable(
+        'slowest columns to profile',
+        ', '.join(f"{x} ({seconds[x]:.3f}s)" for x in slowest_columns),
+    )
+    numeric_summary_records, non_numeric_summary_records = summary_records(profile)
+    return numeric_summary_records, non_numeric_summary_records, True
+
+
+@app.callback(
+    Output('profile_report_id', 'data'),
+    Input('profile_next_render_checklist', 'value'),
+    State('profile_report_id', 'data'),
+    prevent_initial_call=True,
+)
+def create_profile_report_id(profile_next_render: list[bool], profile_report_id: str | None) -> str:  # noqa: E501
+    """
+    Triggered when the user turns "Profile next render" on or off. The first time it's turned on,
+    creates the id of the session that the reports of the profiled renders are stored under.
+    """
+    if not profile_next_render or profile_report_id is not None:
+        return no_update
+    return uuid.uuid4().hex
+
+
+@app.callback(
+    Output('profile_next_render_checklist', 'value'),
+    Output('profile_report_div', 'style'),
+    Output('profile_report_text', 'children'),
+    Output('shown_profile_report_id', 'data'),
+    Input('visualize_graph', 'figure'),
+    State('profile_report_id', 'data'),
+    State('shown_profile_report_id', 'data'),
+    prevent_initial_call=True,
+)
+@timed
+def show_profile_report(
+        figure: dict,  # noqa: ARG001
+        profile_report_id: str | None,
+        shown_profile_report_id: str | None) -> tuple:
+    """
+    Triggered when the graph is rendered. If the render was profiled (i.e. "Profile next render"
+    was on), turns off the switch and shows the button that downloads the report of the session.
+    """
+    report = None
+    if profile_report_id is not None:
+        report = get_profile_report(profile_report_id, PROFILE_REPORT_DIR)
+    if report is None or report['id'] == shown_profile_report_id:
+        return no_update, no_update, no_update, no_update
+    log_function('show_profile_report')
+    text = f"Profiled `{report['name']}` ({report['seconds']:.2f}s) at {report['time']}."
+    return [], {'margin': '10px 0 0 0'}, text, report['id']
+
+
+@app.callback(
+    Output('profile_download', 'data'),
+    Input('download_profile_button', 'n_clicks'),
+    State('profile_report_id', 'data'),
+    prevent_initial_call=True,
+)
+@timed
+def download_profile_report(n_clicks: int, profile_report_id: str | None) -> dict:  # noqa: ARG001
+    """Triggered when the user clicks the Download Profile button."""
+    report = None
+    if profile_report_id is not None:
+        report = get_profile_report(profile_report_id, PROFILE_REPORT_DIR)
+    if report is None:
+        return no_update
+    return dcc.send_string(report['content'], filename=report['filename'])
+
+
+@app.callback(
+    Output('performance_summary_table', 'data'),
+    Output('performance_recent_table', 'data'),
+    Input('main_tabs', 'active_tab'),
+    Input('refresh_performance_button', 'n_clicks'),
+    prevent_initial_call=True,
+)
+@timed
+def update_performance_tables(active_tab: str, n_clicks: int) -> tuple:  # noqa: ARG001
+    """Triggered when the Performance tab is activated or refreshed."""
+    if active_tab != 'performance_tab':
+        return no_update, no_update
+    performance = get_metrics(num_recent=100)
+    timing_records = [
+        {
+            'Name': x['name'],
+            'Calls': x['calls'],
+            'Errors': x['errors'],
+            **{
+                f'{column} (ms)': round(x[f'{column.lower()}_seconds'] * 1000, 1)
+                for column in ['Mean', 'P50', 'P90', 'P99', 'Max']
+            },
+            'Mean Rows In': None if x['mean_rows_in'] is None else round(x['mean_rows_in']),
+            'Mean Rows Out': None if x['mean_rows_out'] is None else round(x['mean_rows_out']),
+            'Mean Payload (KB)': None if x['mean_payload_bytes'] is None
+                else round(x['mean_payload_bytes'] / 1024, 1),
+        }
+        for x in performance['summary']
+    ]
+    recent_call_records = [
+        {
+            'Time': x['time'],
+            'Name': x['name'],
+            'Time (ms)': round(x['seconds'] * 1000, 1),
+            'Rows In': x['rows_in'],
+            'Rows Out': x['rows_out'],
+            'Payload (KB)': None if x['payload_bytes'] is None
+                else round(x['payload_bytes'] / 1024, 1),
+            'Error': x['error'],
+        }
+        for x in performance['recent']
+    ]
+    return timing_records, recent_call_records
+
+
 @app.callback(
     Output('x_variable_dropdown', 'value', allow_duplicate=True),
     Output('y_variable_dropdown', 'value', allow_duplicate=True),
@@ -928,6 +1640,7 @@ def load_data(  # noqa
     State('numeric_aggregation_dropdown', 'value'),
     prevent_initial_call=True,
 )
+@timed
 def set_variables_from_ai(
         n_clicks: int,  # noqa: ARG001
         ai_prompt: str,
@@ -1020,32 +1733,157 @@ def set_variables_from_ai(
 
 @app.callback(
     Output('filtered_data', 'data'),
+    Output('filtered_date_index', 'data'),
     Output('visualize_filter_info', 'children'),
     Output('generated_filter_code', 'data'),
+    Output('sample_banner_text', 'children', allow_duplicate=True),
     Input('filter-apply-button', 'n_clicks'),
     State('filter_columns_cache', 'data'),
     State('original_data', 'data'),
+    State('date_index', 'data'),
     State('column_types', 'data'),
+    State('sample_info', 'data'),
     prevent_initial_call=True,
 )
+@timed
 def filter_data(
         n_clicks: int,  # noqa: ARG001
         filter_columns_cache: dict,
         original_data: pd.DataFrame,
+        date_index: DateIndex | None,
         column_types: dict,
+        sample_info: dict | None,
         ) -> dict:
-    """Filter the data based on the user's selections."""
+    """
+    Filter the data based on the user's selections. The date filters use the date index of the
+    data, and the index of the filtered data (used when zooming into dates) is derived from it.
+    """
     filtered_data, markdown_text, code = filter_data_from_ui_control(
         filters=filter_columns_cache,
         column_types=column_types,
         data=original_data,
+        engine=DATA_ENGINE,
+        date_index=date_index,
+    )
+    if date_index is not None and filtered_data is not original_data:
+        date_index = date_index.subset(filtered_data)
+    return (
+        Serverside(filtered_data),
+        Serverside(date_index),
+        markdown_text,
+        code,
+        sample_banner_text(sample_info),
+    )
+
+
+@app.callback(
+    Output('filtered_data', 'data', allow_duplicate=True),
+    Output('filtered_date_index', 'data', allow_duplicate=True),
+    Output('sample_banner_text', 'children', allow_duplicate=True),
+    Output('generated_filter_code', 'data', allow_duplicate=True),
+    Input('render_full_data_button', 'n_clicks'),
+    State('sample_info', 'data'),
+    State('upload-data', 'contents'),
+    State('filter_columns_cache', 'data'),
+    State('column_types', 'data'),
+    State('original_data', 'data'),
+    prevent_initial_call=True,
+)
+@timed
+def render_full_data(
+        n_clicks: int,  # noqa: ARG001
+        sample_info: dict | None,
+        upload_data_contents: str | None,
+        filter_columns_cache: dict,
+        column_types: dict,
+        original_data: pd.DataFrame | None) -> tuple:
+    """
+    Triggered when the user clicks on the Render on Full Data button in fast exploration mode.
+    Reads the full data from the source of the sample and applies the current filters, so the
+    current graph is rendered on the full data (until filters are applied again).
+
+    If the source is a DuckDB query, the filters are pushed down into the query (see
+    `duckdb_engine.create_query`; the sample is used to infer the format of dates stored as
+    strings), so only the matching rows are read into memory, and the generated code contains
+    the query.
+    """
+    log_function('render_full_data')
+    if sample_info is None:
+        return no_update, no_update, no_update, no_update
+    source = sample_info['source']
+    code = no_update
+    try:
+        if source['type'] == 'duckdb':
+            filters = convert_filters_from_ui_control(filter_columns_cache or {}, column_types)
+            filtered_data = read_query(
+                create_query(source['query'], filters, column_types, original_data),
+            )
+            code = create_query_code(source['query'], filters, column_types, original_data)
+        else:
+            data = read_data(source, upload_data_contents)
+            filtered_data, _, _ = filter_data_from_ui_control(
+                filters=filter_columns_cache,
+                column_types=column_types,
+                data=data,
+                engine=DATA_ENGINE,
+            )
+    except Exception as e:
+        log_error(f"{type(e).__name__}: {e}")
+        return (
+            no_update,
+            no_update,
+            f"{sample_banner_text(sample_info)} Unable to render on the full data: "
+            f"{type(e).__name__}: {e}",
+            no_update,
+        )
+    # the full data isn't indexed (it's read once); zooming into dates compares the dates
+    return (
+        Serverside(filtered_data),
+        Serverside(None),
+        sample_banner_text(sample_info, num_rows=len(filtered_data)),
+        code,
     )
-    return Serverside(filtered_data), markdown_text, code
 
 
 @app.callback(
-    Output('visualize_graph', 'figure'),
     Output('visualize_table', 'data'),
+    Output('visualize_table', 'columns'),
+    Output('visualize_table', 'page_count'),
+    Output('visualize_table', 'page_current'),
+    Input('graph_data', 'data'),
+    Input('visualize_table', 'page_current'),
+    Input('visualize_table', 'page_size'),
+    Input('visualize_table', 'sort_by'),
+    Input('visualize_table', 'filter_query'),
+    prevent_initial_call=True,
+)
+@timed
+def update_visualize_table(
+        graph_data: pd.DataFrame | None,
+        page_current: int,
+        page_size: int,
+        sort_by: list[dict],
+        filter_query: str) -> tuple:
+    """
+    Triggered when the graph is updated or when the user pages, sorts, or filters the table. Only
+    the rows of the current page are sent to the browser.
+    """
+    log_function('update_visualize_table')
+    if ctx.triggered_id == 'graph_data':
+        page_current = 0
+    records, page_count = page_table_data(
+        graph_data,
+        page_current,
+        page_size,
+        sort_by,
+        filter_query,
+    )
+    return records, table_columns(graph_data), page_count, page_current
+
+
+@app.callback(
+    Output('visualize_graph', 'figure'),
+    Output('graph_data', 'data'),
     Output('visualize_numeric_na_removal_markdown', 'children'),
     Output('generated_code', 'children'),
     # color variable
@@ -1064,6 +1902,9 @@ def filter_data(
     Output('graph_type_dropdown', 'value'),
     Output('variables_changed_by_ai', 'data'),
     Output('invalid_configuration_alert', 'is_open'),
+    Output('figure_size_text', 'children'),
+    Output('figure_too_large_alert', 'is_open'),
+    Output('figure_too_large_alert', 'children'),
 
     # INPUTS
     Input('x_variable_dropdown', 'value'),
@@ -1092,6 +1933,7 @@ def filter_data(
     Input('top_n_categories_slider', 'value'),
     Input('min_retention_events_slider', 'value'),
     Input('num_retention_periods_slider', 'value'),
+    Input('count_distinct_precision_slider', 'value'),
     Input('numeric_aggregation_dropdown', 'value'),
     Input('bar_mode_dropdown', 'value'),
     Input('cohort_conversion_rate__input', 'value'),
@@ -1107,6 +1949,7 @@ def filter_data(
     Input('num_facet_columns_slider', 'value'),
     Input('filtered_data', 'data'),
     Input('labels-apply-button', 'n_clicks'),
+    Input('visualize_graph', 'relayoutData'),
     State('generated_filter_code', 'data'),
     State('column_types', 'data'),
     State('title_input', 'value'),
@@ -1117,8 +1960,20 @@ def filter_data(
     State('size_label_input', 'value'),
     State('facet_label_input', 'value'),
     State('variables_changed_by_ai', 'data'),
+    State('profile_next_render_checklist', 'value'),
+    State('profile_report_id', 'data'),
+    State('graph_data', 'data'),
+    State('filtered_date_index', 'data'),
+    State('dataset_fingerprint', 'data'),
     prevent_initial_call=True,
 )
+@timed
+@profile_when(
+    'profile_next_render',
+    profile_format=RENDER_PROFILE_FORMAT,
+    key_argument='profile_report_id',
+    report_directory=PROFILE_REPORT_DIR,
+)
 def update_controls_and_graph(  # noqa
             x_variable: str | None,
             y_variable: str | None,
@@ -1145,6 +2000,7 @@ def update_controls_and_graph(  # noqa
             top_n_categories: float,
             min_retention_events: float,
             num_retention_periods: float,
+            count_distinct_precision: int,
             numeric_aggregation: str,
             bar_mode: str,
             cohort_conversion_rate_input: str,
@@ -1161,6 +2017,7 @@ def update_controls_and_graph(  # noqa
 
             data: pd.DataFrame,
             labels_apply_button: int,  # noqa: ARG001
+            relayout_data: dict | None,
             generated_filter_code: str,
             column_types: dict,
             title_input: str | None,
@@ -1171,14 +2028,41 @@ def update_controls_and_graph(  # noqa
             size_label_input: str | None,
             facet_label_input: str | None,
             variables_changed_by_ai: bool | None,
+            profile_next_render: list[bool] | None,  # noqa: ARG001
+            profile_report_id: str | None,  # noqa: ARG001
+            previous_graph_data: pd.DataFrame | None,
+            filtered_date_index: DateIndex | None,
+            fingerprint: str | None,
         ) -> tuple[go.Figure, dict]:
     """
     Triggered when the user selects columns from the dropdown.
 
+    Also triggered when the user zooms into the graph. Zooming into the dates of a histogram or
+    line graph re-aggregates only the visible dates at a finer date floor (e.g. days rather than
+    months; see `get_zoom_date_floor`); resetting the axes returns to all of the dates.
+
     This function should *not* modify the data. It should only return a figure.
     """
     log_function('update_graph')
     log_variable('triggered_id', ctx.triggered_id)
+    zoom_date_range = None
+    if ctx.triggered_id == 'visualize_graph':
+        x_range_changed, x_range = get_relayout_range(relayout_data, 'xaxis')
+        if x_range_changed and x_range is not None \
+                and graph_type in ZOOM_GRAPH_TYPES and t.is_date(x_variable, column_types) \
+                and previous_graph_data is not None and x_variable in previous_graph_data.columns:
+            zoom_date_range = get_zoom_date_range(
+                graph_type=graph_type,
+                x_range=x_range,
+                x_values=previous_graph_data[x_variable],
+            )
+        # the graph is only updated when zooming into dates or when resetting the axes (i.e.
+        # zooming out); e.g. zooming into other graphs doesn't change the graph
+        is_reset = x_range_changed and x_range is None \
+            and graph_type in ZOOM_GRAPH_TYPES and t.is_date(x_variable, column_types)
+        if zoom_date_range is None and not is_reset:
+            return tuple(no_update for _ in ctx.outputs_list)
+    log_variable('zoom_date_range', zoom_date_range)
     log_variable('x_variable', x_variable)
     log_variable('y_variable', y_variable)
     log_variable('z_variable', z_variable)
@@ -1190,6 +2074,7 @@ def update_controls_and_graph(  # noqa
     log_variable('top_n_categories', top_n_categories)
     log_variable('min_retention_events', min_retention_events)
     log_variable('num_retention_periods', num_retention_periods)
+    log_variable('count_distinct_precision', count_distinct_precision)
     log_variable('numeric_aggregation', numeric_aggregation)
     log_variable('bar_mode', bar_mode)
     log_variable('cohort_conversion_rate_input', cohort_conversion_rate_input)
@@ -1224,6 +2109,28 @@ def update_controls_and_graph(  # noqa
     numeric_na_removal_markdown = ''
     generated_code = generated_filter_code or ''
     invalid_configuration_alert = False
+    figure_size_text = ''
+    figure_too_large_message = None
+
+    if zoom_date_range and data is not None and x_variable in data.columns and date_floor:
+        # re-aggregate the visible dates
+        start, end = zoom_date_range
+        data, code = filter_date_range(
+            data, x_variable, start=start, end=end, date_index=filtered_date_index,
+        )
+        if len(data) == 0:
+            return tuple(no_update for _ in ctx.outputs_list)
+        dates = pd.to_datetime(data[x_variable], errors='coerce')
+        has_times = (dates != dates.dt.normalize()).any()
+        date_floor = get_zoom_date_floor(
+            date_floor=date_floor,
+            start=start,
+            end=end if end is not None else dates.max(),
+            finest_date_floor='second' if has_times else 'day',
+        )
+        log_variable('zoom_date_floor', date_floor)
+        generated_code += f"\n# zoomed into `{x_variable}` (aggregated by {date_floor})\n"
+        generated_code += code
 
     try:
         if (
@@ -1300,7 +2207,11 @@ def update_controls_and_graph(  # noqa
             selected_variables = [col for col in possible_variables if col is not None]
             selected_variables = list(set(selected_variables))  # remove duplicates
 
-            log(f"top_n_categories_lookup[{top_n_categories}]: {top_n_categories_lookup[top_n_categories]}")  # noqa
+            log(
+                "top_n_categories_lookup[%s]: %s",
+                top_n_categories,
+                top_n_categories_lookup[top_n_categories],
+            )
             # TODO: need to convert code to string and execute string
             top_n_categories = top_n_categories_lookup[top_n_categories]
             top_n_categories = None if top_n_categories == 'None' else int(top_n_categories)
@@ -1325,17 +2236,28 @@ def update_controls_and_graph(  # noqa
                 create_cohorts_from=create_cohorts_from,
                 exclude_from_top_n_transformation=exclude_from_top_n_transformation,
                 date_floor=date_floor,
+                engine=DATA_ENGINE,
             )
             if code:
                 generated_code += "\n"
                 generated_code += code
+            # the graph data is the dataset transformed by the code (the number of rows also
+            # distinguishes the full data from the sample in fast exploration mode); used to cache
+            # the conversion lags of the cohorted graphs
+            graph_data_fingerprint = hashlib.blake2b(
+                f"{fingerprint}|{len(graph_data)}|{generated_code}".encode(),
+                digest_size=20,
+            ).hexdigest() if fingerprint else None
 
             if cohort_conversion_rate_input:
                 cohort_conversion_rate_input = [
                     int(x.strip()) for x in cohort_conversion_rate_input.split(',')
                 ]
             min_retention_events = min_retention_events_lookup[min_retention_events]
-            fig, graph_code = generate_graph(
+            count_distinct_precision = count_distinct_precision_lookup[count_distinct_precision]
+            count_distinct_precision = None if count_distinct_precision == 'Exact' else int(count_distinct_precision)  # noqa
+            fig, graph_code, graph_data, figure_size_text = generate_graph_with_size_limit(
+                max_figure_size=int(MAX_FIGURE_SIZE_MB * 1_000_000),
                 data=graph_data,
                 graph_type=graph_type,
                 x_variable=x_variable,
@@ -1368,6 +2290,10 @@ def update_controls_and_graph(  # noqa
                 title=title,
                 graph_labels=graph_labels,
                 column_types=column_types,
+                count_distinct_precision=count_distinct_precision,
+                engine=DATA_ENGINE,
+                webgl_point_threshold=WEBGL_POINT_THRESHOLD,
+                fingerprint=graph_data_fingerprint,
             )
             generated_code += graph_code
 
@@ -1428,11 +2354,15 @@ def update_controls_and_graph(  # noqa
     except InvalidConfigurationError as e:
             log_error(e)
             invalid_configuration_alert = True
+    except FigureTooLargeError as e:
+            log_error(e)
+            fig = {}
+            figure_too_large_message = str(e)
 
     log("returning fig")
     return (
         fig,
-        graph_data.iloc[0:500].to_dict('records'),
+        Serverside(graph_data),
         numeric_na_removal_markdown,
         f"""```python\n{generated_code}\n```""",
         # color variable
@@ -1452,32 +2382,152 @@ def update_controls_and_graph(  # noqa
         graph_type,
         False,  # reset variables_changed_by_ai
         invalid_configuration_alert,
+        figure_size_text,
+        figure_too_large_message is not None,
+        figure_too_large_message,
     )
 
 
+@app.callback(
+    Output('visualize_graph', 'figure', allow_duplicate=True),
+    Input('visualize_graph', 'relayoutData'),
+    State('visualize_graph', 'figure'),
+    State('graph_type_dropdown', 'value'),
+    State('x_variable_dropdown', 'value'),
+    State('y_variable_dropdown', 'value'),
+    State('color_variable_dropdown', 'value'),
+    State('n_bins_slider', 'value'),
+    State('sort_categories_dropdown', 'value'),
+    State('graph_data', 'data'),
+    State('column_types', 'data'),
+    prevent_initial_call=True,
+)
+@timed
+def rerasterize_graph(
+        relayout_data: dict | None,
+        figure: dict | None,
+        graph_type: str,
+        x_variable: str | None,
+        y_variable: str | None,
+        color_variable: str | None,
+        n_bins: int,
+        sort_categories: str,
+        graph_data: pd.DataFrame,
+        column_types: dict) -> dict:
+    """
+    Triggered when the user zooms/pans (or resets the axes of) the graph. Rasterized scatter plots
+    are re-rasterized for the visible range, so zooming in shows more detail; only the image (and
+    the color bar) of the figure is updated.
+    """
+    if (
+        graph_type != 'scatter - rasterized'
+        or not figure or not figure.get('data') or figure['data'][0].get('type') != 'image'
+        or graph_data is None
+        or x_variable not in graph_data.columns or y_variable not in graph_data.columns
+        or (color_variable and color_variable not in graph_data.columns)
+        ):
+        return no_update
+    x_changed, x_range = get_relayout_range(relayout_data, 'xaxis')
+    y_changed, y_range = get_relayout_range(relayout_data, 'yaxis')
+    if not x_changed and not y_changed:
+        return no_update
+    log_function('rerasterize_graph')
+    layout = figure.get('layout', {})
+    # the range of an axis that didn't change is the range of the current image
+    if not x_changed:
+        x_range = layout.get('xaxis', {}).get('range')
+    if not y_changed:
+        y_range = layout.get('yaxis', {}).get('range')
+    x_range = sorted(x_range) if x_range else get_extent(graph_data[x_variable])
+    y_range = sorted(y_range) if y_range else get_extent(graph_data[y_variable])
+    log_variable('x_range', x_range)
+    log_variable('y_range', y_range)
+    category_orders = get_category_orders(
+        data=graph_data,
+        selected_variables=[color_variable],
+        selected_category_order=sort_categories,
+        column_types=column_types,
+    ) if color_variable else None
+    image, max_count = rasterize_image(
+        graph_data, x_variable, y_variable,
+        x_range=x_range,
+        y_range=y_range,
+        color=color_variable,
+        resolution=n_bins or None,
+        category_orders=category_orders,
+    )
+    patched_figure = Patch()
+    for key, value in image.items():
+        patched_figure['data'][0][key] = value
+    if not color_variable:
+        patched_figure['data'][1]['marker'] = count_color_bar(max_count)
+    patched_figure['layout']['xaxis']['range'] = list(x_range)
+    patched_figure['layout']['yaxis']['range'] = list(y_range)
+    return patched_figure
+
+
 @app.callback(
     Output('correlations_graph', 'figure'),
-    Input('original_data', 'data'),
+    Output('correlation_pairs_table', 'data'),
+    Output('correlation_columns_dropdown', 'options'),
+    Input('correlations_request', 'data'),
+    Input('correlation_method_dropdown', 'value'),
+    Input('correlation_columns_dropdown', 'value'),
+    Input('correlation_top_k_dropdown', 'value'),
+    State('original_data', 'data'),
+    prevent_initial_call=True,
 )
-def update_correlations_graph(data: pd.DataFrame) -> go.Figure:
-    """Triggered when the user clicks on the Load button."""
+@timed
+def update_correlations_graph(
+        fingerprint: str | None,
+        method: str,
+        columns: list[str] | None,
+        top_k: int | None,
+        data: pd.DataFrame) -> tuple:
+    """
+    Triggered the first time the Correlations tab is active for the dataset or when the user
+    changes the correlation options.
+
+    The correlation matrix of all numeric columns is calculated once per dataset and method (see
+    `get_correlation_matrix`); selecting columns or the top correlated pairs subsets the matrix.
+    """
     log_function('update_correlations_graph')
+    log_variable('method', method)
+    log_variable('columns', columns)
+    log_variable('top_k', top_k)
     if data is None:
-        return {}
-    # Calculate the correlation matrix
-    correlation_matrix = data.corr(numeric_only=True, min_periods=30).round(2)
-    return px.imshow(
-        correlation_matrix,
-        x=correlation_matrix.columns,
-        y=correlation_matrix.index,
+        return {}, [], []
+    correlations = get_correlation_matrix(data, fingerprint, method=method, min_periods=30)
+    column_options = correlations.columns.tolist()
+    if columns:
+        correlations = get_correlation_matrix(
+            data,
+            fingerprint,
+            columns=columns,
+            method=method,
+            min_periods=30,
+        )
+    pairs_records = []
+    if top_k:
+        pairs = top_correlated_pairs(correlations, top_k=top_k)
+        # only show the columns that are in the top correlated pairs
+        top_columns = pd.unique(pairs[['Column 1', 'Column 2']].to_numpy().ravel()).tolist()
+        correlations = correlations.loc[top_columns, top_columns]
+        pairs['Correlation'] = pairs['Correlation'].round(3)
+        pairs_records = pairs.to_dict('records')
+    figure = px.imshow(
+        correlations.round(2),
+        x=correlations.columns,
+        y=correlations.index,
         text_auto=True,
         color_continuous_scale='RdBu_r',
         zmin=-1,
         zmax=1,
-        title='Correlation Heatmap of Numeric Columns',
+        title=f'Correlation Heatmap of Numeric Columns ({method.capitalize()})',
         width=1_000,
         height=800,
     )
+    return figure, pairs_records, column_options
 
 
 @app.callback(
@@ -1488,6 +2538,7 @@ def update_correlations_graph(data: pd.DataFrame) -> go.Figure:
     Input('clear-settings-button', 'n_clicks'),
     prevent_initial_call=True,
 )
+@timed
 def clear_settings(n_clicks: int) -> str:
     """Triggered when the user clicks on the Clear button."""
     log_function('clear_settings')
@@ -1503,6 +2554,7 @@ def clear_settings(n_clicks: int) -> str:
     State('y_variable_dropdown', 'value'),
     prevent_initial_call=True,
 )
+@timed
 def swap_x_y_variables(n_clicks: int, x_variable: str | None, y_variable: str | None) -> str:
     """Triggered when the user clicks on the Clear button."""
     log_function('Swap X/Y Variables')
@@ -1518,6 +2570,7 @@ def swap_x_y_variables(n_clicks: int, x_variable: str | None, y_variable: str |
     State('facet_variable_dropdown', 'value'),
     prevent_initial_call=True,
 )
+@timed
 def swap_color_facet_variables(
         n_clicks: int,
         color_variable: str | None,
@@ -1535,6 +2588,7 @@ def swap_color_facet_variables(
     Input('facet_variable_dropdown', 'value'),
     prevent_initial_call=True,
 )
+@timed
 def disable_swap_color_facet_button(
         color_variable: str | None,
         facet_variable: str | None) -> bool:
@@ -1560,6 +2614,7 @@ def disable_swap_color_facet_button(
     Input('labels-clear-button', 'n_clicks'),
     prevent_initial_call=True,
 )
+@timed
 def clear_labels(n_clicks: int) -> str:
     """
     Triggered when the user clicks on the Clear button in the "Other Options" section for
@@ -1581,6 +2636,7 @@ def clear_labels(n_clicks: int) -> str:
     State('column_types', 'data'),
     prevent_initial_call=True,
 )
+@timed
 def show_date_floor_div(
         x_variable: str | None,
         y_variable: str | None,
@@ -1604,6 +2660,7 @@ def show_date_floor_div(
     State("collapse-variables", "is_open"),
     prevent_initial_call=True,
 )
+@timed
 def toggle_variables_panel(n: int, is_open: bool) -> bool:
     """Toggle the variables panel."""
     log_function('toggle_variables_panel')
@@ -1618,6 +2675,7 @@ def toggle_variables_panel(n: int, is_open: bool) -> bool:
     State("collapse-filter", "is_open"),
     prevent_initial_call=True,
 )
+@timed
 def toggle_filter_panel(n: int, is_open: bool) -> bool:
     """Toggle the filter panel."""
     log_function('toggle_filter_panel')
@@ -1632,6 +2690,7 @@ def toggle_filter_panel(n: int, is_open: bool) -> bool:
     State("collapse-graph-options", "is_open"),
     prevent_initial_call=True,
 )
+@timed
 def toggle_graph_options_panel(n: int, is_open: bool) -> bool:
     """Toggle the graph-options panel."""
     log_function('toggle_graph_options_panel')
@@ -1645,6 +2704,7 @@ def toggle_graph_options_panel(n: int, is_open: bool) -> bool:
     State("collapse-ai", "is_open"),
     prevent_initial_call=True,
 )
+@timed
 def toggle_ai_panel(n: int, is_open: bool) -> bool:
     """Toggle the ai panel."""
     log_function('toggle_ai_panel')
@@ -1659,6 +2719,7 @@ def toggle_ai_panel(n: int, is_open: bool) -> bool:
     State("collapse-other-options", "is_open"),
     prevent_initial_call=True,
 )
+@timed
 def toggle_other_options_panel(n: int, is_open: bool) -> bool:
     """Toggle the other-options panel."""
     log_function('toggle_other_options_panel')
@@ -1673,20 +2734,25 @@ def toggle_other_options_panel(n: int, is_open: bool) -> bool:
     State('filter_columns_cache', 'data'),
     State('column_types', 'data'),
     State('original_data', 'data'),
-
+    State('dataset_fingerprint', 'data'),
     prevent_initial_call=True,
 )
+@timed
 def update_filter_controls(  # noqa: PLR0912
         selected_filter_columns: list[str],
         filter_columns_cache: dict,
         column_types: list[str],
-        data: dict) -> list[html.Div]:
+        data: dict,
+        fingerprint: str | None) -> list[html.Div]:
     """
     Triggered when the user selects columns from the filter dropdown.
 
     If the user selects a column and adds a value, and then selects another column, the value from
     the original column will be removed. This is because all of the controls are recreated. So we
     need to cache the values of the controls in the filter_columns_cache.
+
+    The min/max/unique values of each column are cached per dataset (see `get_column_statistics`)
+    so only the newly selected column is scanned.
     """
     log_function('update_filter_controls')
     log_variable('selected_filter_columns', selected_filter_columns)
@@ -1700,22 +2766,22 @@ def update_filter_controls(  # noqa: PLR0912
             value = []
             if filter_columns_cache and column in filter_columns_cache:
                 value = filter_columns_cache[column]
-                log(f"found `{column}` in filter_columns_cache with value `{value}`")
+                log("found `%s` in filter_columns_cache with value `%s`", column, value)
+            statistics = get_column_statistics(data, column, column_types, fingerprint)
 
             if t.is_date(column, column_types):
                 log("Creating date range control")
-                _date_series = pd.to_datetime(data[column])
                 components.append(create_date_range_control(
                     label=column,
                     id=f"filter_control_{column}",
-                    min_value=value[0] if value else _date_series.min(),
-                    max_value=value[1] if value else _date_series.max(),
+                    min_value=value[0] if value else statistics['min'],
+                    max_value=value[1] if value else statistics['max'],
                     component_id={"type": "filter-control-date-range", "index": column},
                 ))
             elif t.is_boolean(column, column_types):
                 log("Creating dropdown control")
                 options = ['True', 'False']
-                if data[column].isna().any():
+                if statistics['has_missing']:
                     options.append(MISSING)
                     multi = True
                 else:
@@ -1733,21 +2799,26 @@ def update_filter_controls(  # noqa: PLR0912
                 ))
             elif t.get_type(column, column_types) in {t.STRING, t.CATEGORICAL}:
                 log("Creating dropdown control")
-                options = sorted(data[column].dropna().unique().tolist())
-                # most likely is an id value of some sort and will cause issues and slow down the
-                # app if there are too many options
-                if len(options) > 1000:
-                    log(f"skipping {column}; too many unique values.")
-                    continue
-                log_variable('data[column].unique()', options)
-                if data[column].isna().any():
-                    options.append(MISSING)
+                if 'search_index' in statistics:
+                    # most likely is an id value of some sort; sending all of the options to the
+                    # browser would slow down the app, so the options are searched server-side
+                    # (`search_filter_dropdown_options`) as the user types
+                    log(f"{column} has too many unique values; searching options server-side.")
+                    options = filter_dropdown_options(statistics, search_value=None, value=value)
+                    placeholder = "Type to search..."
+                else:
+                    options = statistics['unique_values']
+                    log_variable('data[column].unique()', options)
+                    if statistics['has_missing']:
+                        options = [*options, MISSING]
+                    placeholder = None
                 components.append(create_dropdown_control(
                     label=column,
                     id=f"filter_control_{column}",
                     value=value,
                     multi=True,
                     options=options,
+                    placeholder=placeholder,
                     # options=values_to_dropdown_options(series.unique()),
                     component_id={"type": "filter-control-dropdown", "index": column},
                 ))
@@ -1756,8 +2827,8 @@ def update_filter_controls(  # noqa: PLR0912
                 components.append(create_min_max_control(
                     label=column,
                     id=f"filter_control_{column}",
-                    min_value=value[0] if value else round(data[column].min()),
-                    max_value=value[1] if value else math.ceil(data[column].max()),
+                    min_value=value[0] if value else round(statistics['min']),
+                    max_value=value[1] if value else math.ceil(statistics['max']),
                     component_id={"type": "filter-control-min-max", "index": column},
                 ))
             else:
@@ -1768,6 +2839,48 @@ def update_filter_controls(  # noqa: PLR0912
     return components
 
 
+def filter_dropdown_options(statistics: dict, search_value: str | None, value: list) -> list:
+    """
+    Return the options of a filter dropdown that is searched server-side; i.e. the selected values
+    followed by the values matching `search_value`.
+    """
+    options = list(value or [])
+    if statistics['has_missing'] and MISSING not in options:
+        options.append(MISSING)
+    selected = set(options)
+    options += [
+        x for x in search_unique_values(statistics['search_index'], search_value)
+        if x not in selected
+    ]
+    return options
+
+
+@app.callback(
+    Output({'type': 'filter-control-dropdown', 'index': MATCH}, 'options'),
+    Input({'type': 'filter-control-dropdown', 'index': MATCH}, 'search_value'),
+    State({'type': 'filter-control-dropdown', 'index': MATCH}, 'id'),
+    State({'type': 'filter-control-dropdown', 'index': MATCH}, 'value'),
+    State('dataset_fingerprint', 'data'),
+    prevent_initial_call=True,
+)
+@timed
+def search_filter_dropdown_options(
+        search_value: str | None,
+        component_id: dict,
+        value: list | None,
+        fingerprint: str | None) -> list:
+    """
+    Triggered when the user types in a filter dropdown. Columns with too many unique values to
+    send to the browser are searched server-side; the other dropdowns are searched client-side.
+    """
+    statistics = get_cached_column_statistics(component_id['index'], fingerprint)
+    if statistics is None or 'search_index' not in statistics:
+        return no_update
+    log_function('search_filter_dropdown_options')
+    log_variable('search_value', search_value)
+    return filter_dropdown_options(statistics, search_value=search_value, value=value)
+
+
 @app.callback(
     Output('filter_columns_cache', 'data'),
     Input({'type': 'filter-control-date-range', 'index': ALL}, 'id'),
@@ -1783,6 +2896,7 @@ def update_filter_controls(  # noqa: PLR0912
     State('filter_columns_cache', 'data'),
     prevent_initial_call=True,
 )
+@timed
 def cache_filter_columns(  # noqa: PLR0912
         date_range_ids: list[dict],
         date_range_start_date: list[list],
@@ -1831,7 +2945,7 @@ def cache_filter_columns(  # noqa: PLR0912
             for id, start_date, end_date in zip(date_range_ids, date_range_start_date, date_range_end_date):  # noqa
                 if id['index'] == column:
                     values = (start_date, end_date)
-                    log(f"caching `{column}` with `{values}`")
+                    log("caching `%s` with `%s`", column, values)
                     filter_columns_cache[column] = values
                     break
         elif column in [item['index'] for item in dropdown_ids]:
@@ -1840,7 +2954,7 @@ def cache_filter_columns(  # noqa: PLR0912
                 if id['index'] == column:
                     if not isinstance(value, list):
                         value = [value]  # noqa
-                    log(f"caching `{column}` with `{value}`")
+                    log("caching `%s` with `%s`", column, value)
                     filter_columns_cache[column] = value
                     break
         elif column in [item['index'] for item in minmax_min_ids]:
@@ -1848,7 +2962,7 @@ def cache_filter_columns(  # noqa: PLR0912
             for id, min_value, max_value in zip(minmax_min_ids, minmax_min_values, minmax_max_values):  # noqa
                 if id['index'] == column:
                     values = (min_value, max_value)
-                    log(f"caching `{column}` with `{values}`")
+                    log("caching `%s` with `%s`", column, values)
                     filter_columns_cache[column] = values
                     break
         else:
@@ -1856,7 +2970,7 @@ def cache_filter_columns(  # noqa: PLR0912
             # column has too many unique values)
             log_error(f"Unknown column type: {column}")
 
-    log(f"filter_columns_cache: {filter_columns_cache}")
+    log("filter_columns_cache: %s", filter_columns_cache)
     return filter_columns_cache
 
 
@@ -1868,6 +2982,7 @@ def cache_filter_columns(  # noqa: PLR0912
     State('column_types', 'data'),
     prevent_initial_call=True,
 )
+@timed
 def update_numeric_aggregation_div_style(
         graph_type: str,
         y_variable: str | None,
@@ -1888,6 +3003,7 @@ def update_numeric_aggregation_div_style(
     Input('color_variable_dropdown', 'value'),
     prevent_initial_call=True,
 )
+@timed
 def update_bar_mode_div_style(graph_type: str, color_variable: str | None) -> dict:
     """Toggle the bar mode div."""
     allowed_graphs = ['histogram', 'bar', 'bar - count distinct']
@@ -1906,6 +3022,7 @@ def update_bar_mode_div_style(graph_type: str, color_variable: str | None) -> di
     State('column_types', 'data'),
     prevent_initial_call=True,
 )
+@timed
 def update_z_variable_dropdown_style(
         x_variable: str | None,
         y_variable: str | None,
@@ -1934,6 +3051,7 @@ def update_z_variable_dropdown_style(
     State('column_types', 'data'),
     prevent_initial_call=True,
 )
+@timed
 def update_categorical_controls_div_style(
         x_variable: str | None,
         y_variable: str | None,
@@ -1966,6 +3084,7 @@ def update_categorical_controls_div_style(
     State('column_types', 'data'),
     prevent_initial_call=True,
 )
+@timed
 def update_n_bins_div_style(
         graph_type: str,
         x_variable: str | None,
@@ -1985,6 +3104,8 @@ def update_n_bins_div_style(
         return turn_on
     if graph_type == 'histogram' and t.is_numeric(x_variable, column_types):
         return turn_on
+    if graph_type == 'scatter - rasterized':
+        return turn_on
     if graph_type == 'P(Y | X)' and t.is_numeric(facet_variable, column_types):
         return turn_on
     return turn_off
@@ -1996,6 +3117,7 @@ def update_n_bins_div_style(
     Input('graph_type_dropdown', 'value'),
     prevent_initial_call=True,
 )
+@timed
 def update_retention_div_style(graph_type: str) -> dict:
     """Toggle the retention div."""
     if graph_type == 'retention':
@@ -2003,11 +3125,25 @@ def update_retention_div_style(graph_type: str) -> dict:
     return {'display': 'none'}, {'display': 'none'}
 
 
+@app.callback(
+    Output('count_distinct_precision_div', 'style'),
+    Input('graph_type_dropdown', 'value'),
+    prevent_initial_call=True,
+)
+@timed
+def update_count_distinct_precision_div_style(graph_type: str) -> dict:
+    """Toggle the count-distinct precision div."""
+    if graph_type in ['bar - count distinct', 'heatmap - count distinct']:
+        return {'display': 'block'}
+    return {'display': 'none'}
+
+
 @app.callback(
     Output('opacity_div', 'style'),
     Input('graph_type_dropdown', 'value'),
     prevent_initial_call=True,
 )
+@timed
 def update_opacity_div_style(graph_type: str) -> dict:
     """Toggle the bar mode div."""
     if graph_type in ['histogram', 'scatter', 'scatter-3d']:
@@ -2024,6 +3160,7 @@ def update_opacity_div_style(graph_type: str) -> dict:
     State('column_types', 'data'),
     prevent_initial_call=True,
 )
+@timed
 def update_log_x_y_axis_div_style(
         x_variable: str | None,
         y_variable: str | None,
@@ -2050,6 +3187,7 @@ def update_log_x_y_axis_div_style(
     Input('graph_type_dropdown', 'value'),
     prevent_initial_call=True,
 )
+@timed
 def update_show_axes_histogram_div_style(
         graph_type: str,
     ) -> dict:
@@ -2064,6 +3202,7 @@ def update_show_axes_histogram_div_style(
     Input('facet_variable_dropdown', 'value'),
     prevent_initial_call=True,
 )
+@timed
 def update_free_x_y_axis_div_style(facet_variable: str | None) -> dict:
     """Toggle the 'free x/y axis' div."""
     if facet_variable:
@@ -2076,6 +3215,7 @@ def update_free_x_y_axis_div_style(facet_variable: str | None) -> dict:
     Input('facet_variable_dropdown', 'value'),
     prevent_initial_call=True,
 )
+@timed
 def update_num_facet_columns_div_style(facet_variable: str | None) -> dict:
     """Toggle the 'log x/y axis' div."""
     if facet_variable:
@@ -2088,6 +3228,7 @@ def update_num_facet_columns_div_style(facet_variable: str | None) -> dict:
     Input('x_variable_dropdown', 'value'),
     prevent_initial_call=True,
 )
+@timed
 def update_x_axis_label_div_style(x_variable: str | None) -> dict:
     """Toggle the 'log x/y axis' div."""
     if x_variable:
@@ -2100,6 +3241,7 @@ def update_x_axis_label_div_style(x_variable: str | None) -> dict:
     Input('y_variable_dropdown', 'value'),
     prevent_initial_call=True,
 )
+@timed
 def update_y_axis_label_div_style(y_variable: str | None) -> dict:
     """Toggle the 'log x/y axis' div."""
     if y_variable:
@@ -2112,6 +3254,7 @@ def update_y_axis_label_div_style(y_variable: str | None) -> dict:
     Input('color_variable_dropdown', 'value'),
     prevent_initial_call=True,
 )
+@timed
 def update_color_label_div_style(color_variable: str | None) -> dict:
     """Toggle the color label div."""
     if color_variable:
@@ -2124,6 +3267,7 @@ def update_color_label_div_style(color_variable: str | None) -> dict:
     Input('facet_variable_dropdown', 'value'),
     prevent_initial_call=True,
 )
+@timed
 def update_facet_label_div_style(facet_variable: str | None) -> dict:
     """Toggle the facet label div."""
     if facet_variable:
@@ -2136,6 +3280,7 @@ def update_facet_label_div_style(facet_variable: str | None) -> dict:
     Input('graph_type_dropdown', 'value'),
     prevent_initial_call=True,
 )
+@timed
 def update_cohort_conversion_rate_div_style(graph_type: str) -> dict:
     """Toggle the cohort conversion rate div."""
     if graph_type == 'cohorted conversion rates':
@@ -2148,6 +3293,7 @@ def update_cohort_conversion_rate_div_style(graph_type: str) -> dict:
     Input('graph_type_dropdown', 'value'),
     prevent_initial_call=True,
 )
+@timed
 def update_show_record_count_div_style(graph_type: str) -> dict:
     """Toggle the show record count div."""
     if graph_type == 'cohorted conversion rates':
@@ -2160,6 +3306,7 @@ def update_show_record_count_div_style(graph_type: str) -> dict:
     Input('graph_type_dropdown', 'value'),
     prevent_initial_call=True,
 )
+@timed
 def update_cohort_adoption_rate_div_style(graph_type: str) -> dict:
     """Toggle the cohort adoption rate div."""
     if graph_type == 'cohorted adoption rates':
@@ -2172,6 +3319,7 @@ def update_cohort_adoption_rate_div_style(graph_type: str) -> dict:
     Input('graph_type_dropdown', 'value'),
     prevent_initial_call=True,
 )
+@timed
 def update_last_n_cohorts_div_style(graph_type: str) -> dict:
     """Toggle the last n cohorts div."""
     if graph_type == 'cohorted adoption rates':
@@ -2184,6 +3332,7 @@ def update_last_n_cohorts_div_style(graph_type: str) -> dict:
     Input('graph_type_dropdown', 'value'),
     prevent_initial_call=True,
 )
+@timed
 def update_show_unfinished_cohorts_div_style(graph_type: str) -> dict:
     """Toggle the show unfinished cohorts div."""
     if graph_type in ['cohorted adoption rates', 'retention']:
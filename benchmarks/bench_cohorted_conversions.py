@@ -0,0 +1,59 @@
+"""
+Benchmark calculating cohorted conversion and adoption rates.
+
+Run from the project directory with:
+
+    python -m benchmarks.bench_cohorted_conversions
+"""
+import time
+import numpy as np
+import pandas as pd
+from source.library.conversions import cohorted_adoption_rates, cohorted_conversion_rates
+
+
+def create_conversions(num_records: int, num_days: int, seed: int = 42) -> pd.DataFrame:
+    """Create `num_records` random base/conversion timestamps (60% convert) with weekly cohorts."""
+    rng = np.random.default_rng(seed)
+    seconds = rng.integers(0, num_days * 86_400, size=num_records).astype('timedelta64[s]')
+    base = np.datetime64('2023-01-01', 'ns') + seconds
+    lags = rng.integers(0, 60 * 86_400, size=num_records).astype('timedelta64[s]')
+    data = pd.DataFrame({
+        'base': base,
+        'conversion': pd.Series(base + lags).where(rng.random(num_records) < 0.6),
+    })
+    data['cohort'] = data['base'].dt.to_period('W').dt.start_time.dt.strftime('%Y-%m-%d')
+    return data
+
+
+def main(num_records: int = 5_000_000, num_days: int = 365) -> None:
+    """Time `cohorted_conversion_rates` and `cohorted_adoption_rates`."""
+    data = create_conversions(num_records=num_records, num_days=num_days)
+    start = time.perf_counter()
+    conversions = cohorted_conversion_rates(
+        df=data,
+        base_timestamp='base',
+        conversion_timestamp='conversion',
+        cohort='cohort',
+        intervals=[(1, 'days'), (7, 'days'), (30, 'days')],
+    )
+    print(
+        f"cohorted_conversion_rates ({num_records:,} records): "
+        f"{time.perf_counter() - start:.2f}s; {len(conversions):,} cohorts",
+    )
+    start = time.perf_counter()
+    adoption = cohorted_adoption_rates(
+        df=data,
+        base_timestamp='base',
+        conversion_timestamp='conversion',
+        cohort='cohort',
+        n_units=30,
+        units='days',
+    )
+    print(
+        f"cohorted_adoption_rates ({num_records:,} records; 30 days): "
+        f"{time.perf_counter() - start:.2f}s; {len(adoption):,} rows",
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+"""
+Benchmark calculating the correlation matrix of many numeric columns.
+
+Run from the project directory with:
+
+    python -m benchmarks.bench_correlations
+"""
+import time
+import numpy as np
+import pandas as pd
+from source.library.correlations import correlation_matrix
+
+
+def main(num_rows: int = 1_000_000, num_columns: int = 200, seed: int = 42) -> None:
+    """Time `correlation_matrix` with and without missing values and for each method."""
+    rng = np.random.default_rng(seed)
+    data = pd.DataFrame(
+        rng.normal(size=(num_rows, num_columns)).astype(np.float32),
+        columns=[f'column_{i}' for i in range(num_columns)],
+    )
+    for has_missing in [False, True]:
+        if has_missing:
+            data.iloc[::7, ::3] = np.nan
+        for method in ['pearson', 'spearman']:
+            start = time.perf_counter()
+            correlation_matrix(data, method=method, min_periods=30)
+            print(
+                f"correlation_matrix ({num_rows:,} rows x {num_columns} columns; {method}; "
+                f"missing values: {has_missing}): {time.perf_counter() - start:.2f}s",
+            )
+
+
+if __name__ == '__main__':
+    main()
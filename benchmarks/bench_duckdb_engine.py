@@ -0,0 +1,70 @@
+"""
+Benchmark filtering and aggregating a large dataset with DuckDB rather than pandas.
+
+Run from the project directory with:
+
+    python -m benchmarks.bench_duckdb_engine
+"""
+import time
+import numpy as np
+import pandas as pd
+from source.library.dash_utilities import generate_graph
+from source.library.utilities import filter_dataframe
+import source.library.types as t
+
+
+def main(num_rows: int = 10_000_000, seed: int = 42) -> None:
+    """Time `filter_dataframe` and a histogram of the mean per category with each engine."""
+    rng = np.random.default_rng(seed)
+    data = pd.DataFrame({
+        'numbers': rng.normal(size=num_rows),
+        'categories': rng.choice([f'category_{i}' for i in range(20)], size=num_rows),
+        'colors': rng.choice(['red', 'green', 'blue'], size=num_rows),
+    })
+    column_types = {
+        'numbers': t.NUMERIC,
+        'categories': t.STRING,
+        'colors': t.STRING,
+    }
+    filters = {
+        'numbers': (-1.0, 2.0),
+        'categories': [f'category_{i}' for i in range(10)],
+    }
+    graph_kwargs = dict.fromkeys([
+        'z_variable', 'size_variable', 'facet_variable', 'selected_category_order', 'bar_mode',
+        'date_floor', 'cohort_conversion_rate_snapshots', 'cohort_conversion_rate_units',
+        'show_record_count', 'cohort_adoption_rate_range', 'cohort_adoption_rate_units',
+        'last_n_cohorts', 'show_unfinished_cohorts', 'opacity', 'n_bins',
+        'min_retention_events', 'num_retention_periods', 'log_x_axis', 'log_y_axis',
+        'free_x_axis', 'free_y_axis', 'show_axes_histogram', 'title', 'graph_labels',
+    ])
+    for engine in ['pandas', 'duckdb']:
+        start = time.perf_counter()
+        filtered_data, _ = filter_dataframe(data, filters, column_types, engine=engine)
+        print(
+            f"filter_dataframe ({num_rows:,} rows; {engine}): "
+            f"{time.perf_counter() - start:.2f}s",
+        )
+        start = time.perf_counter()
+        fig, _ = generate_graph(
+            data=filtered_data,
+            graph_type='histogram',
+            x_variable='categories',
+            y_variable='numbers',
+            color_variable='colors',
+            num_facet_columns=4,
+            numeric_aggregation='avg',
+            column_types=column_types,
+            engine=engine,
+            **graph_kwargs,
+        )
+        # the figure is serialized to send it to the browser
+        num_bytes = len(fig.to_json())
+        print(
+            f"generate_graph (histogram of {len(filtered_data):,} rows; {engine}): "
+            f"{time.perf_counter() - start:.2f}s; {num_bytes / 1e6:,.1f} MB figure",
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,361 @@
+"""
+Benchmark the load → filter → graph pipeline of the app on random data of increasing size.
+
+The benchmarks are the stages that run when the data is loaded and when a graph is rendered:
+
+    - `get_column_types`
+    - `filter_data_from_ui_control` (a numeric, date, categorical, and boolean filter)
+    - `convert_to_graph_data` and `generate_graph`, for every graph type of every configuration in
+      `graphing_configurations.yml` (using one combination of the variable types)
+    - `plot_retention`
+
+The data is created with `create_random_dataframe`, with a `Strings` column (the categories as
+strings) and `Ids`/`Ids2` columns (an id per 10/2 rows) added for the string variables. The
+results (the minimum and all of the timings of each benchmark for each number of rows) are saved
+as JSON so that they can be compared between commits.
+
+Run from the project directory with:
+
+    python -m benchmarks.bench_pipeline
+    python -m benchmarks.bench_pipeline --sizes 10000 1000000 --output before.json
+    python -m benchmarks.bench_pipeline --sizes 10000 1000000 --compare before.json
+
+By default, the results are saved to `benchmarks/results/<commit>.json`.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import time
+from collections.abc import Callable
+from datetime import datetime, UTC
+import numpy as np
+import pandas as pd
+import plotly
+import yaml
+from source.library.dash_utilities import (
+    convert_to_graph_data,
+    filter_data_from_ui_control,
+    generate_graph,
+    plot_retention,
+)
+from source.library.utilities import create_random_dataframe
+import source.library.types as t
+
+
+SIZES = [10_000, 1_000_000, 10_000_000]
+# the columns of the random data used for each type of variable; the x/y/z-variables use the
+# first/second/third column of their type (the y/z-variables use the ids, which are the unique
+# ids of the retention and count-distinct graphs)
+TYPE_TO_COLUMNS = {
+    t.NUMERIC: ['Integers', 'Floats', 'Floats'],
+    t.DATE: ['Dates', 'DateTimes', 'DateTimes'],
+    t.STRING: ['Strings', 'Ids', 'Ids2'],
+    t.CATEGORICAL: ['Categories', 'Categories2', 'Categories2'],
+    t.BOOLEAN: ['Booleans', 'Booleans1', 'Booleans2'],
+}
+# the type used when a variable of a configuration can be one of several types
+TYPE_PRIORITY = [t.STRING, t.CATEGORICAL, t.DATE, t.NUMERIC, t.BOOLEAN]
+# the values of the graph options (the default values in the app)
+GRAPH_OPTIONS = {
+    'color_variable': None,
+    'size_variable': None,
+    'facet_variable': None,
+    'num_facet_columns': 4,
+    'selected_category_order': None,
+    'numeric_aggregation': None,
+    'bar_mode': None,
+    'date_floor': 'month',
+    'cohort_conversion_rate_snapshots': [1, 7, 14],
+    'cohort_conversion_rate_units': 'days',
+    'show_record_count': True,
+    'cohort_adoption_rate_range': 30,
+    'cohort_adoption_rate_units': 'days',
+    'last_n_cohorts': 15,
+    'show_unfinished_cohorts': True,
+    'opacity': 0.6,
+    'n_bins': None,
+    'min_retention_events': 1,
+    'num_retention_periods': 10,
+    'log_x_axis': False,
+    'log_y_axis': False,
+    'free_x_axis': False,
+    'free_y_axis': False,
+    'show_axes_histogram': False,
+    'title': None,
+    'graph_labels': None,
+}
+TOP_N_CATEGORIES = 10
+
+
+def create_data(num_rows: int, seed: int = 42) -> pd.DataFrame:
+    """Create the data (`create_random_dataframe` with missing values and string columns)."""
+    data = create_random_dataframe(num_rows=num_rows, sporadic_missing=True, seed=seed)
+    data['Strings'] = data['Categories2'].astype(object)
+    rng = np.random.default_rng(seed)
+    for name, rows_per_id in [('Ids', 10), ('Ids2', 2)]:
+        ids = rng.integers(0, max(num_rows // rows_per_id, 1), size=num_rows)
+        data[name] = 'id_' + pd.Series(ids).astype(str)
+    return data
+
+
+def time_function(function: Callable, repeat: int, setup: Callable | None = None) -> list[float]:
+    """Return the wall time (in seconds) of each of `repeat` calls to `function`."""
+    timings = []
+    for _ in range(repeat):
+        args = setup() if setup else ()
+        start = time.perf_counter()
+        function(*args)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def graph_benchmarks(configurations: list[dict]) -> list[dict]:
+    """
+    Return the graph type and the variables of each graph type of each configuration (using the
+    first of the variable's types in TYPE_PRIORITY).
+    """
+    benchmarks = []
+    for config in configurations:
+        variables = {}
+        for position, name in enumerate(['x_variable', 'y_variable', 'z_variable']):
+            types = config['selected_variables'].get(name)
+            variable_type = next((x for x in TYPE_PRIORITY if x in (types or [])), None)
+            variables[name] = TYPE_TO_COLUMNS[variable_type][position] if types else None
+        for graph_type in config['graph_types']:
+            benchmarks.append({'graph_type': graph_type['name'], **variables})
+    return benchmarks
+
+
+def prepare_graph_data(
+        data: pd.DataFrame,
+        column_types: dict,
+        graph_type: str,
+        x_variable: str | None,
+        y_variable: str | None,
+        z_variable: str | None) -> tuple[pd.DataFrame, str, str]:
+    """Call `convert_to_graph_data` the same way as the app does for the graph."""
+    selected_variables = list(dict.fromkeys(
+        x for x in [x_variable, y_variable, z_variable] if x is not None
+    ))
+    exclude_from_top_n_transformation = []
+    if graph_type in ['bar - count distinct', 'retention']:
+        exclude_from_top_n_transformation = [y_variable]
+    elif graph_type == 'heatmap - count distinct':
+        exclude_from_top_n_transformation = [z_variable]
+    create_cohorts_from = None
+    if t.is_date(x_variable, column_types) and t.is_date(y_variable, column_types):
+        create_cohorts_from = (x_variable, y_variable)
+    return convert_to_graph_data(
+        data=data,
+        column_types=column_types,
+        selected_variables=selected_variables,
+        top_n_categories=TOP_N_CATEGORIES,
+        exclude_from_top_n_transformation=exclude_from_top_n_transformation,
+        create_cohorts_from=create_cohorts_from,
+        date_floor=GRAPH_OPTIONS['date_floor'],
+    )
+
+
+def record(
+        results: list[dict],
+        name: str,
+        num_rows: int,
+        function: Callable,
+        repeat: int,
+        setup: Callable | None = None,
+        **params: object) -> None:
+    """
+    Time `function` and append the result to `results`. Sizes larger than 1M rows are timed once.
+    Benchmarks that fail (e.g. run out of memory) are recorded with the error.
+    """
+    try:
+        timings = time_function(
+            function,
+            repeat=repeat if num_rows <= 1_000_000 else 1,
+            setup=setup,
+        )
+        result = {'seconds': min(timings), 'timings': timings}
+    except Exception as e:
+        result = {'seconds': None, 'error': f"{type(e).__name__}: {e}"}
+    results.append({'benchmark': name, 'num_rows': num_rows, 'params': params} | result)
+    print(
+        f"{name} {params or ''} ({num_rows:,} rows): "
+        + (f"{result['seconds']:.3f}s" if result['seconds'] is not None else result['error']),
+        flush=True,
+    )
+
+
+def run_size(
+        num_rows: int,
+        configurations: list[dict],
+        repeat: int,
+        graph_types: list[str] | None = None) -> list[dict]:
+    """Run the benchmarks on random data with `num_rows` rows."""
+    results = []
+    data = create_data(num_rows)
+    # the types are determined from the data (not the benchmarks' assumptions)
+    column_types = t.get_column_types(data)
+    record(results, 'get_column_types', num_rows, lambda: t.get_column_types(data), repeat)
+    filters = {
+        'Floats': [10, 90],
+        'Dates': ['2023-02-01', '2023-11-30'],
+        'Categories': ['Category A', 'Category B', '<Missing>'],
+        'Booleans1': ['True', '<Missing>'],
+    }
+    record(
+        results, 'filter_data_from_ui_control', num_rows,
+        lambda: filter_data_from_ui_control(filters, column_types, data),
+        repeat,
+    )
+    for benchmark in graph_benchmarks(configurations):
+        if graph_types and benchmark['graph_type'] not in graph_types:
+            continue
+        record(
+            results, 'convert_to_graph_data', num_rows,
+            lambda b=benchmark: prepare_graph_data(data, column_types, **b),
+            repeat,
+            **benchmark,
+        )
+        try:
+            graph_data, _, _ = prepare_graph_data(data, column_types, **benchmark)
+        except Exception:  # the error is recorded by the convert_to_graph_data benchmark
+            continue
+        record(
+            results, 'generate_graph', num_rows,
+            lambda graph_data, b=benchmark: generate_graph(
+                data=graph_data,
+                column_types=column_types,
+                **b,
+                **GRAPH_OPTIONS,
+            ),
+            repeat,
+            # generate_graph can modify the data
+            setup=lambda graph_data=graph_data: (graph_data.copy(),),
+            **benchmark,
+        )
+    retention_data = data[['DateTimes', 'Ids']].dropna()
+    record(
+        results, 'plot_retention', num_rows,
+        lambda: plot_retention(
+            retention_data,
+            time_series='DateTimes',
+            unique_id='Ids',
+            intervals='week',
+            min_events=1,
+            max_periods_to_display=10,
+            show_unfinished_cohorts=True,
+        ),
+        repeat,
+        intervals='week',
+    )
+    return results
+
+
+def run(sizes: list[int], repeat: int, graph_types: list[str] | None = None) -> list[dict]:
+    """Run the benchmarks for each number of rows."""
+    config_path = os.path.join(
+        os.getenv('PROJECT_PATH', '.'), 'source/config/graphing_configurations.yml',
+    )
+    with open(config_path) as f:
+        configurations = yaml.safe_load(f)['configurations']
+    # the first calls import modules (e.g. plotly express) and fill caches
+    print("warming up (1,000 rows; not saved)")
+    run_size(1_000, configurations, repeat=1, graph_types=graph_types)
+    results = []
+    for num_rows in sizes:
+        results += run_size(num_rows, configurations, repeat, graph_types)
+    return results
+
+
+def git_commit() -> str | None:
+    """Return the current commit (or None if it isn't available)."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: list[dict], previous_results: list[dict], threshold: float = 1.2) -> int:
+    """
+    Print the ratio of the timings to the previous timings. Timings that are more than `threshold`
+    times the previous timings, benchmarks that fail but didn't fail before, and benchmarks that
+    failed before but don't fail now (so the timings can't be compared) are flagged as
+    regressions. Returns the number of regressions.
+    """
+    def key(result: dict) -> str:
+        return json.dumps([result['benchmark'], result['num_rows'], result['params']])
+
+    def describe(result: dict) -> str:
+        return f"{result['benchmark']} {result['params'] or ''} ({result['num_rows']:,} rows)"
+
+    previous = {key(x): x for x in previous_results}
+    num_regressions = 0
+    for result in results:
+        previous_result = previous.get(key(result))
+        if previous_result is None:
+            continue
+        before, after = previous_result['seconds'], result['seconds']
+        if before is not None and after is not None:
+            ratio = after / before if before else float('inf')
+            flag = '  <-- slower' if ratio > threshold else ''
+            print(f"{ratio:6.2f}x  {before:8.3f}s -> {after:8.3f}s  {describe(result)}{flag}")
+        elif before is not None:
+            flag = '  <-- new error'
+            print(f"  error  {before:8.3f}s -> {result['error']}  {describe(result)}{flag}")
+        elif after is not None:
+            flag = '  <-- error before'
+            error = previous_result['error']
+            print(f"  fixed  {error} -> {after:8.3f}s  {describe(result)}{flag}")
+        else:
+            flag = ''
+            print(f"  error  (failed before and now: {result['error']})  {describe(result)}")
+        num_regressions += bool(flag)
+    print(f"{num_regressions} regression(s)")
+    return num_regressions
+
+
+def main() -> None:
+    """Run the benchmarks, save the results as JSON, and compare them to previous results."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--graph-types', nargs='+', default=None)
+    parser.add_argument('--output', default=None)
+    parser.add_argument('--compare', default=None, help="JSON file of previous results")
+    args = parser.parse_args()
+
+    commit = git_commit()
+    results = run(sizes=args.sizes, repeat=args.repeat, graph_types=args.graph_types)
+    output = args.output or os.path.join('benchmarks', 'results', f"{commit or 'results'}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(
+            {
+                'commit': commit,
+                'created': datetime.now(UTC).isoformat(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpu_count': os.cpu_count(),
+                'versions': {
+                    'numpy': np.__version__,
+                    'pandas': pd.__version__,
+                    'plotly': plotly.__version__,
+                },
+                'results': results,
+            },
+            f,
+            indent=2,
+        )
+    print(f"results saved to {output}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f)['results'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""
+Benchmark rendering the retention heatmap.
+
+Run from the project directory with:
+
+    python -m benchmarks.bench_plot_retention
+"""
+import time
+import numpy as np
+import pandas as pd
+from source.library.dash_utilities import plot_retention_matrix
+
+
+def create_retention_matrix(num_cohorts: int, num_periods: int, seed: int = 42) -> pd.DataFrame:
+    """
+    Create a retention matrix (in the format returned by `retention_matrix`) with `num_cohorts`
+    daily cohorts and `num_periods` periods. Later cohorts have fewer finished periods.
+    """
+    rng = np.random.default_rng(seed)
+    rates = rng.uniform(0.05, 0.6, size=(num_cohorts, num_periods))
+    rates[:, 0] = 1
+    # cohort `i` has only observed `num_cohorts - i` periods
+    unfinished = np.arange(num_periods)[None, :] >= (num_cohorts - np.arange(num_cohorts))[:, None]
+    rates[unfinished] = np.nan
+    retention = pd.DataFrame(rates, columns=[str(x) for x in range(num_periods)])
+    retention.insert(0, '# of unique ids', rng.integers(100, 10_000, size=num_cohorts))
+    retention.insert(0, 'cohort', pd.date_range('2023-01-01', periods=num_cohorts, freq='D'))
+    return retention
+
+
+def main(num_cohorts: int = 365, num_periods: int = 365, repeat: int = 5) -> None:
+    """Time `plot_retention_matrix` for a `num_cohorts` x `num_periods` retention matrix."""
+    retention = create_retention_matrix(num_cohorts=num_cohorts, num_periods=num_periods)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        plot_retention_matrix(
+            retention=retention,
+            intervals='day',
+            max_periods_to_display=num_periods,
+            show_unfinished_cohorts=True,
+        )
+        timings.append(time.perf_counter() - start)
+    print(
+        f"plot_retention_matrix ({num_cohorts:,} x {num_periods:,}): "
+        f"min={min(timings):.3f}s; median={np.median(timings):.3f}s",
+    )
+
+
+if __name__ == '__main__':
+    main()
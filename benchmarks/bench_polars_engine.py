@@ -0,0 +1,58 @@
+"""
+Benchmark preparing a large dataset (the housing dataset scaled up to 10M rows) with Polars rather
+than pandas.
+
+Run from the project directory with:
+
+    python -m benchmarks.bench_polars_engine
+"""
+import time
+import numpy as np
+import pandas as pd
+from source.library.dash_utilities import convert_to_graph_data
+from source.library.utilities import filter_dataframe
+import source.library.types as t
+
+
+def main(num_rows: int = 10_000_000, seed: int = 42) -> None:
+    """Time `filter_dataframe` and `convert_to_graph_data` with each engine."""
+    housing = pd.read_csv('data/housing.csv')
+    rng = np.random.default_rng(seed)
+    data = housing.iloc[rng.integers(0, len(housing), size=num_rows)].reset_index(drop=True)
+    # a date per row so that the date floor is included
+    data['date'] = pd.Timestamp('2020-01-01') + pd.to_timedelta(
+        rng.integers(0, 4 * 365 * 24 * 60, size=num_rows), unit='min',
+    )
+    column_types = t.get_column_types(data.head(10_000))
+    filters = {
+        'median_income': (2.0, 10.0),
+        'ocean_proximity': ['<1H OCEAN', 'INLAND', 'NEAR BAY'],
+        'date': ('2020-06-01', '2023-06-30'),
+    }
+    selected_variables = ['ocean_proximity', 'date', 'total_bedrooms', 'median_house_value']
+    for engine in ['pandas', 'polars']:
+        start = time.perf_counter()
+        filtered_data, _ = filter_dataframe(data, filters, column_types, engine=engine)
+        print(
+            f"filter_dataframe ({num_rows:,} rows; {engine}): "
+            f"{time.perf_counter() - start:.2f}s",
+        )
+        start = time.perf_counter()
+        convert_to_graph_data(
+            data=filtered_data,
+            column_types=column_types,
+            selected_variables=selected_variables,
+            top_n_categories=3,
+            exclude_from_top_n_transformation=None,
+            create_cohorts_from=None,
+            date_floor='month',
+            engine=engine,
+        )
+        print(
+            f"convert_to_graph_data ({len(filtered_data):,} rows; {engine}): "
+            f"{time.perf_counter() - start:.2f}s",
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""
+Benchmark profiling a wide dataset and checking its column types across worker processes.
+
+Run from the project directory with:
+
+    python -m benchmarks.bench_profiling
+"""
+import os
+import time
+import warnings
+import pandas as pd
+from source.library.profiling import profile_dataset
+from source.library.types import get_column_types
+from source.library.utilities import create_random_dataframe
+
+
+def main(num_rows: int = 100_000, num_copies: int = 30) -> None:
+    """Time `profile_dataset` and `get_column_types` for different numbers of workers."""
+    # e.g. pd.to_datetime warns when it can't infer the format of the date strings
+    warnings.simplefilter('ignore')
+    data = create_random_dataframe(num_rows=num_rows, sporadic_missing=True)
+    data = pd.concat([data.add_suffix(f'_{i}') for i in range(num_copies)], axis=1)
+    for max_workers in sorted({1, 2, 4, os.cpu_count() or 1}):
+        start = time.perf_counter()
+        profile = profile_dataset(data, max_workers=max_workers)
+        profile_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        get_column_types(data, max_workers=max_workers)
+        types_seconds = time.perf_counter() - start
+        slowest = max(profile, key=lambda x: profile[x]['seconds'])
+        print(
+            f"{data.shape[0]:,} rows x {data.shape[1]:,} columns; {max_workers} workers: "
+            f"profile_dataset {profile_seconds:.2f}s; get_column_types {types_seconds:.2f}s; "
+            f"slowest column `{slowest}` ({profile[slowest]['seconds']:.2f}s)",
+        )
+
+
+if __name__ == '__main__':
+    main()
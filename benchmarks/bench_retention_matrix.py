@@ -0,0 +1,43 @@
+"""
+Benchmark calculating the retention matrix from raw events.
+
+Run from the project directory with:
+
+    python -m benchmarks.bench_retention_matrix
+"""
+import time
+import numpy as np
+import pandas as pd
+from source.library.conversions import retention_matrix
+
+
+def create_events(num_events: int, num_ids: int, num_days: int, seed: int = 42) -> pd.DataFrame:
+    """Create `num_events` random events for `num_ids` integer ids over `num_days` days."""
+    rng = np.random.default_rng(seed)
+    seconds = rng.integers(0, num_days * 86_400, size=num_events).astype('timedelta64[s]')
+    return pd.DataFrame({
+        'timestamp': np.datetime64('2023-01-01', 'ns') + seconds,
+        'id': rng.integers(0, num_ids, size=num_events),
+    })
+
+
+def main(num_events: int = 50_000_000, num_ids: int = 2_000_000, num_days: int = 730) -> None:
+    """Time `retention_matrix` for each interval."""
+    events = create_events(num_events=num_events, num_ids=num_ids, num_days=num_days)
+    for intervals in ['day', 'week', 'month']:
+        start = time.perf_counter()
+        retention = retention_matrix(
+            df=events,
+            timestamp='timestamp',
+            unique_id='id',
+            intervals=intervals,
+            min_events=2,
+        )
+        print(
+            f"retention_matrix ({num_events:,} events; {intervals}): "
+            f"{time.perf_counter() - start:.2f}s; {retention.shape[0]:,} cohorts",
+        )
+
+
+if __name__ == '__main__':
+    main()
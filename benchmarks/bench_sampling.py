@@ -0,0 +1,40 @@
+"""
+Benchmark sampling a large dataset in a single pass over chunks of rows.
+
+Run from the project directory with:
+
+    python -m benchmarks.bench_sampling
+"""
+import time
+import numpy as np
+import pandas as pd
+from source.library.sampling import iterate_chunks, reservoir_sample
+
+
+def main(
+        num_rows: int = 10_000_000,
+        sample_size: int = 1_000_000,
+        chunk_size: int = 500_000,
+        seed: int = 42) -> None:
+    """Time `reservoir_sample` with and without stratification."""
+    rng = np.random.default_rng(seed)
+    data = pd.DataFrame({
+        'id': np.arange(num_rows),
+        'group': rng.choice(['a', 'b', 'c', 'd'], size=num_rows, p=[0.7, 0.2, 0.0999, 0.0001]),
+        'value': rng.normal(size=num_rows),
+    })
+    for stratify_by in [None, 'group']:
+        start = time.perf_counter()
+        sample, _ = reservoir_sample(
+            iterate_chunks(data, chunk_size),
+            sample_size=sample_size,
+            stratify_by=stratify_by,
+        )
+        print(
+            f"reservoir_sample ({num_rows:,} rows -> {len(sample):,} rows; "
+            f"stratify_by: {stratify_by}): {time.perf_counter() - start:.2f}s",
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+"""
+Benchmark generating synthetic data (`create_random_dataframe` and `create_synthetic_dataframe`)
+and writing it to Parquet in chunks.
+
+Run from the project directory with:
+
+    python -m benchmarks.bench_synthetic_data
+
+To write a 100M-row fixture (one 1M-row chunk in memory at a time), run:
+
+    python -c "from source.library.synthetic_data import write_synthetic_parquet; \
+        write_synthetic_parquet('data/synthetic_100m.parquet', num_rows=100_000_000, seed=42)"
+"""
+import os
+import tempfile
+import time
+from source.library.synthetic_data import create_synthetic_dataframe, write_synthetic_parquet
+from source.library.utilities import create_random_dataframe
+
+
+def main(num_rows: int = 10_000_000, seed: int = 42) -> None:
+    """Time generating `num_rows` rows with each function."""
+    start = time.perf_counter()
+    create_random_dataframe(num_rows=num_rows, sporadic_missing=True, seed=seed)
+    print(f"create_random_dataframe ({num_rows:,} rows): {time.perf_counter() - start:.2f}s")
+    start = time.perf_counter()
+    create_synthetic_dataframe(num_rows=num_rows, seed=seed)
+    print(f"create_synthetic_dataframe ({num_rows:,} rows): {time.perf_counter() - start:.2f}s")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'synthetic.parquet')
+        start = time.perf_counter()
+        write_synthetic_parquet(path, num_rows=num_rows, seed=seed)
+        print(
+            f"write_synthetic_parquet ({num_rows:,} rows; {os.path.getsize(path) / 1e6:,.0f}MB): "
+            f"{time.perf_counter() - start:.2f}s",
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+"""
+Column statistics used to build the filter controls (min/max, unique values, missing values).
+
+The statistics of a column are calculated the first time the column is selected as a filter and
+cached per dataset (keyed by the dataset fingerprint), so the controls of the other selected
+columns are rebuilt from the cache rather than rescanning their data. If the dataset has been
+profiled (see `profiling.py`), the missing values and the min/max of float columns are taken from
+the profile; the unique values and the min/max of dates aren't part of the profile, and the
+min/max of integers are calculated so they are exact (the profile's are floats).
+
+Columns with more than MAX_DROPDOWN_OPTIONS unique values (e.g. ids) get a search index instead
+of the list of unique values: the (lower-cased) unique values sorted so that values starting with
+the search text are a contiguous range found with `searchsorted`, followed by values containing
+the search text. Only the top matches are sent to the dropdown.
+"""
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import source.library.types as t
+from source.library.profiling import get_finished_profile
+
+
+# string/categorical columns with more unique values are searched server-side
+MAX_DROPDOWN_OPTIONS = 1_000
+# the maximum number of matches returned when searching the unique values
+MAX_SEARCH_RESULTS = 50
+
+# the number of datasets (fingerprints) whose statistics are cached
+MAX_CACHED_DATASETS = 4
+_column_statistics: OrderedDict[str, dict[str, dict]] = OrderedDict()
+_lock = threading.Lock()
+
+
+def calculate_column_statistics(
+        series: pd.Series,
+        column_type: str,
+        profile: dict | None = None) -> dict:
+    """
+    Calculate the statistics of the column needed to build its filter control.
+
+    Returns a dictionary with `has_missing` and, depending on `column_type`:
+        - date: `min` and `max` (as datetimes)
+        - numeric: `min` and `max`
+        - string/categorical: `unique_values` (sorted; excludes missing values) or, if there are
+          more than MAX_DROPDOWN_OPTIONS unique values, `search_index` (see
+          `create_search_index`)
+
+    Args:
+        series: the column
+        column_type: the type of the column (e.g. t.DATE)
+        profile:
+            the statistics of the column from the dataset profile (see `profiling.profile_column`)
+            or None; if provided, `has_missing` and the min/max of float columns are taken from
+            the profile rather than scanning the column
+    """
+    if profile is not None and profile['is_numeric'] and series.dtype == 'object':
+        # numbers stored as objects are coerced when profiled so the statistics may differ
+        profile = None
+    if profile is None:
+        statistics = {'has_missing': bool(series.isna().any())}
+    else:
+        statistics = {'has_missing': profile['# of Nulls'] > 0}
+    if column_type == t.DATE:
+        series = pd.to_datetime(series)
+        statistics['min'] = series.min()
+        statistics['max'] = series.max()
+    elif column_type == t.NUMERIC:
+        if (
+            profile is not None
+            and profile['is_numeric']
+            and profile['# of Non-Nulls'] > 0
+            and pd.api.types.is_float_dtype(series.dtype)
+        ):
+            # the profile's min/max are floats (integers above 2**53 would lose precision, so the
+            # min/max of integer columns are calculated); convert them to the scalar type
+            statistics['min'] = series.dtype.type(profile['Min'])
+            statistics['max'] = series.dtype.type(profile['Max'])
+        else:
+            statistics['min'] = series.min()
+            statistics['max'] = series.max()
+    elif column_type in {t.STRING, t.CATEGORICAL}:
+        unique_values = np.asarray(series.dropna().unique(), dtype=object)
+        if len(unique_values) > MAX_DROPDOWN_OPTIONS:
+            statistics['search_index'] = create_search_index(unique_values)
+        else:
+            statistics['unique_values'] = sorted(unique_values.tolist())
+    return statistics
+
+
+def create_search_index(unique_values: np.ndarray) -> dict:
+    """
+    Create the index used by `search_unique_values`; `keys` are the lower-cased string
+    representations of the unique values (sorted) and `values` are the corresponding values.
+    The keys are an object array (a fixed-width string array would take the length of the
+    longest value for every value) and an Arrow array (`arrow_keys`), which is searched for the
+    values that contain the search text.
+    """
+    keys = pd.Series(unique_values).astype(str).str.lower().to_numpy(dtype=object)
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+    return {
+        'keys': keys,
+        'arrow_keys': pa.array(keys, type=pa.string()),
+        'values': unique_values[order],
+    }
+
+
+def search_unique_values(
+        search_index: dict,
+        search_value: str | None,
+        limit: int = MAX_SEARCH_RESULTS) -> list:
+    """
+    Return up to `limit` values that start with `search_value` (case-insensitive; in sorted
+    order) followed by values that contain `search_value`. If `search_value` is empty, the first
+    `limit` values are returned.
+    """
+    keys = search_index['keys']
+    values = search_index['values']
+    if not search_value:
+        return values[:limit].tolist()
+    search_value = search_value.lower()
+    # all keys that start with `search_value` sort between `search_value` and `search_value`
+    # followed by the largest code point
+    start, end = np.searchsorted(keys, [search_value, search_value + '\U0010ffff'])
+    matches = values[start:min(end, start + limit)].tolist()
+    if len(matches) < limit:
+        positions = pc.find_substring(search_index['arrow_keys'], search_value).to_numpy()
+        contains = np.flatnonzero(positions > 0)
+        matches += values[contains[:limit - len(matches)]].tolist()
+    return matches
+
+
+def get_column_statistics(
+        data: pd.DataFrame,
+        column: str,
+        column_types: dict,
+        fingerprint: str | None) -> dict:
+    """
+    Return the statistics of the column (see `calculate_column_statistics`), calculating them
+    only if they haven't already been calculated for the dataset with the given fingerprint. The
+    statistics of the MAX_CACHED_DATASETS most recently used datasets are kept. If the dataset
+    has been profiled, the statistics are calculated from its profile where possible. If
+    `fingerprint` is None, the statistics are calculated and not cached.
+    """
+    if fingerprint is None:
+        return calculate_column_statistics(data[column], t.get_type(column, column_types))
+    with _lock:
+        dataset_statistics = _column_statistics.get(fingerprint)
+        if dataset_statistics is not None:
+            _column_statistics.move_to_end(fingerprint)
+            if column in dataset_statistics:
+                return dataset_statistics[column]
+    profile = get_finished_profile(fingerprint)
+    statistics = calculate_column_statistics(
+        data[column],
+        t.get_type(column, column_types),
+        profile=profile.get(column) if profile is not None else None,
+    )
+    with _lock:
+        _column_statistics.setdefault(fingerprint, {})[column] = statistics
+        _column_statistics.move_to_end(fingerprint)
+        while len(_column_statistics) > MAX_CACHED_DATASETS:
+            _column_statistics.popitem(last=False)
+    return statistics
+
+
+def get_cached_column_statistics(column: str, fingerprint: str | None) -> dict | None:
+    """
+    Return the statistics of the column if they have been calculated for the dataset with the
+    given fingerprint (see `get_column_statistics`); otherwise return None.
+    """
+    return _column_statistics.get(fingerprint, {}).get(column)
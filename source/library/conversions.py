@@ -0,0 +1,512 @@
+"""
+Conversion and retention calculations.
+
+These are native replacements for the corresponding functions in `helpsk.conversions`. Timestamps
+are converted to int64 nanoseconds and all of the grouping is done with integer arithmetic,
+sorting, and `np.bincount`, rather than pandas groupby/apply or row-wise Python.
+
+The conversion lags of a dataset (the expensive part of the cohorted conversion/adoption rates) are
+cached per dataset (keyed by the fingerprint of the data passed in; see `get_conversion_lags`), so
+changing the intervals or the number of cohorts doesn't rescan the rows.
+"""
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+
+NANOSECONDS_PER_DAY = 86_400 * 1_000_000_000
+# 1970-01-01 (day 0) was a Thursday; shifting by 3 days makes weeks start on Monday, which matches
+# pandas' 'W' period (i.e. weeks ending on Sunday)
+WEEK_OFFSET_DAYS = 3
+RETENTION_INTERVALS = ('day', 'week', 'month')
+TIME_UNIT_SECONDS = {
+    'seconds': 1,
+    'minutes': 60,
+    'hours': 3_600,
+    'days': 86_400,
+    'weeks': 604_800,
+}
+# the number of (most recently used) datasets/columns whose conversion lags are cached
+MAX_CACHED_LAGS = 4
+_conversion_lags: OrderedDict[tuple, dict] = OrderedDict()
+_lock = threading.Lock()
+
+
+def to_naive_timestamps(series: pd.Series) -> pd.Series:
+    """
+    Convert a series to datetime64 and drop any timezone information (keeping the local time),
+    which is consistent with how `helpsk.conversions` compares timestamps.
+    """
+    series = pd.to_datetime(series)
+    if series.dt.tz is not None:
+        series = series.dt.tz_localize(None)
+    return series
+
+
+def to_int64_nanoseconds(series: pd.Series) -> np.ndarray:
+    """Convert a (naive) datetime series to an array of int64 nanoseconds since the epoch."""
+    return to_naive_timestamps(series).to_numpy(dtype='datetime64[ns]').view(np.int64)
+
+
+def current_timestamp(current_datetime: str | pd.Timestamp | None = None) -> pd.Timestamp:
+    """Return `current_datetime` as a naive timestamp; defaults to the current UTC datetime."""
+    if current_datetime is None:
+        return pd.Timestamp.now(tz='UTC').tz_localize(None)
+    current_datetime = pd.Timestamp(current_datetime)
+    if current_datetime.tzinfo is not None:
+        current_datetime = current_datetime.tz_localize(None)
+    return current_datetime
+
+
+def timestamps_to_periods(nanoseconds: np.ndarray, intervals: str) -> np.ndarray:
+    """
+    Convert int64 nanoseconds since the epoch to the integer index of the day, week (starting on
+    Monday), or month the timestamp falls in.
+    """
+    if intervals == 'day':
+        return nanoseconds // NANOSECONDS_PER_DAY
+    if intervals == 'week':
+        return (nanoseconds // NANOSECONDS_PER_DAY + WEEK_OFFSET_DAYS) // 7
+    if intervals == 'month':
+        # converting every timestamp to datetime64[M] is slow (it is a calendar conversion); so
+        # convert each day in the range once and look up the month of each timestamp's day
+        days = nanoseconds // NANOSECONDS_PER_DAY
+        min_day = days.min()
+        months_by_day = (
+            np.arange(min_day, days.max() + 1)
+            .astype('datetime64[D]')
+            .astype('datetime64[M]')
+            .astype(np.int64)
+        )
+        return months_by_day[days - min_day]
+    raise ValueError(f'interval must be either "month", "week" or "day", not {intervals}')
+
+
+def to_integer_codes(series: pd.Series) -> np.ndarray:
+    """
+    Return non-negative int64 codes that uniquely identify each value of the series. Integer
+    series are offset by their minimum value (which avoids hashing every value); otherwise the
+    values are factorized.
+    """
+    if pd.api.types.is_integer_dtype(series.dtype):
+        values = series.to_numpy(dtype=np.int64)
+        min_value = values.min()
+        # only use the offset values if the range is small enough to not overflow when combined
+        # with the period in a single int64 key
+        if values.max() - min_value < 2**40:
+            return values - min_value
+    codes, _ = pd.factorize(series, sort=False)
+    return codes.astype(np.int64)
+
+
+def periods_to_timestamps(periods: np.ndarray, intervals: str) -> np.ndarray:
+    """Inverse of `timestamps_to_periods`; returns the start of each period as datetime64[ns]."""
+    if intervals == 'day':
+        return (periods * NANOSECONDS_PER_DAY).view('datetime64[ns]')
+    if intervals == 'week':
+        return ((periods * 7 - WEEK_OFFSET_DAYS) * NANOSECONDS_PER_DAY).view('datetime64[ns]')
+    if intervals == 'month':
+        return periods.astype('datetime64[M]').astype('datetime64[ns]')
+    raise ValueError(f'interval must be either "month", "week" or "day", not {intervals}')
+
+
+def retention_matrix(
+        df: pd.DataFrame,
+        timestamp: str,
+        unique_id: str,
+        min_events: int = 1,
+        intervals: str = 'week',
+        current_datetime: str | pd.Timestamp | None = None) -> pd.DataFrame:
+    """
+    Calculate the retention matrix for a given timestamp column and unique ID column.
+
+    The output has the same format as `helpsk.conversions.retention_matrix`: a `cohort` column
+    (the start of the day/week/month of each id's first event), a `# of unique ids` column, and
+    columns `0`, `1`, `2`, etc. containing the percent of ids in the cohort that were active
+    (i.e. had at least `min_events` events) in the Nth period after the cohort. Periods that start
+    after `current_datetime` are `NaN`.
+
+    Each event is assigned an integer period (e.g. days since the epoch) and each id an integer
+    code. The (id, period) pairs are encoded into a single int64 key and sorted once, which groups
+    the events of each id together in chronological order; the first period of each id is its
+    cohort, the run-lengths of each key are the number of events per id/period, and the matrix is
+    counted with `np.bincount`.
+
+    Args:
+        df:
+            The dataframe containing the data to calculate the retention matrix for. The data is
+            expected to be 'events', meaning that each row represents a single event for a single
+            user.
+        timestamp:
+            The column name for the timestamp to use for the calculation. The column must not
+            contain any missing values.
+        unique_id:
+            The column name for the unique ID to use for the calculation. The column must not
+            contain any missing values.
+        min_events:
+            The minimum number of events a user must have in order to be considered retained in
+            subsequent periods.
+        intervals:
+            The intervals to use for the cohort and the event periods; either 'month', 'week', or
+            'day'.
+        current_datetime:
+            The current datetime used to filter out any events that occurred after the current
+            datetime. If None, the current UTC datetime is used.
+    """
+    if intervals not in RETENTION_INTERVALS:
+        raise ValueError(f'interval must be either "month", "week" or "day", not {intervals}')
+    assert not df[timestamp].isna().any()
+    assert not df[unique_id].isna().any()
+    current_datetime = current_timestamp(current_datetime)
+
+    nanoseconds = to_int64_nanoseconds(df[timestamp])
+    id_codes = to_integer_codes(df[unique_id])
+    # remove any events that occurred after the current datetime
+    is_valid = nanoseconds <= current_datetime.value
+    if not is_valid.all():
+        nanoseconds = nanoseconds[is_valid]
+        id_codes = id_codes[is_valid]
+    if len(nanoseconds) == 0:
+        return pd.DataFrame(columns=['cohort', '# of unique ids', '0'])
+
+    periods = timestamps_to_periods(nanoseconds, intervals)
+    min_period = periods.min()
+    num_periods = int(periods.max() - min_period) + 1
+    # encode (id, period) into a single key; sorting the keys groups each id's events together in
+    # chronological order
+    keys = id_codes * num_periods + (periods - min_period)
+    keys.sort()
+    # deduplicate (id, period) pairs; the run length of each key is the number of events
+    is_new_key = np.empty(len(keys), dtype=bool)
+    is_new_key[0] = True
+    np.not_equal(keys[1:], keys[:-1], out=is_new_key[1:])
+    key_starts = np.flatnonzero(is_new_key)
+    event_counts = np.diff(np.append(key_starts, len(keys)))
+    keys = keys[key_starts]
+    key_ids = keys // num_periods
+    key_periods = keys % num_periods
+    # the cohort of each id is the period of its first (i.e. smallest) key
+    is_first_key_of_id = np.empty(len(keys), dtype=bool)
+    is_first_key_of_id[0] = True
+    np.not_equal(key_ids[1:], key_ids[:-1], out=is_first_key_of_id[1:])
+    key_cohorts = key_periods[is_first_key_of_id][np.cumsum(is_first_key_of_id) - 1]
+    key_offsets = key_periods - key_cohorts
+    # the first period is retained by definition, regardless of the number of events
+    is_retained = (event_counts >= min_events) | (key_offsets == 0)
+
+    # cohorts and offsets are both in [0, num_periods), so count directly into a dense matrix and
+    # then drop the cohorts without any ids
+    key_offsets = key_offsets[is_retained]
+    num_offsets = int(key_offsets.max()) + 1
+    counts = np.bincount(
+        key_cohorts[is_retained] * num_offsets + key_offsets,
+        minlength=num_periods * num_offsets,
+    ).reshape(num_periods, num_offsets)
+    cohorts = np.flatnonzero(counts[:, 0])
+    counts = counts[cohorts]
+    cohort_sizes = counts[:, 0]
+    matrix = counts / cohort_sizes[:, None]
+    # periods that haven't started yet are unknown rather than 0% retention
+    period_starts = periods_to_timestamps(
+        (cohorts + min_period)[:, None] + np.arange(num_offsets)[None, :],
+        intervals,
+    )
+    matrix[period_starts > current_datetime.to_datetime64()] = np.nan
+
+    retention = pd.DataFrame(matrix, columns=[str(x) for x in range(num_offsets)])
+    retention.insert(0, '# of unique ids', cohort_sizes.astype(int))
+    retention.insert(0, 'cohort', periods_to_timestamps(cohorts + min_period, intervals))
+    return retention
+
+
+def cohorted_conversion_lags(
+        df: pd.DataFrame,
+        base_timestamp: str,
+        conversion_timestamp: str,
+        cohort: str,
+        groups: str | None = None) -> dict:
+    """
+    Precompute the conversion lag of each row (i.e. the number of seconds, rounded up, between the
+    base timestamp and the conversion timestamp) and sort the lags within each cohort/group. The
+    result is used by `cohorted_conversion_rates` and `cohorted_adoption_rates` to count the
+    number of conversions within any duration using `np.searchsorted`, rather than re-scanning the
+    data for each duration.
+
+    Returns a dictionary with:
+        - `keys`: a dataframe with the cohort (and group) of each cohort/group, sorted
+        - `cohorts`: the (non-missing) cohorts, sorted
+        - `num_records`: the number of rows in each cohort/group
+        - `min_base`/`max_base`: the min/max base timestamp (int64 nanoseconds) of each
+          cohort/group; `has_missing_base`: whether any base timestamp in the cohort/group is
+          missing
+        - `sorted_lags`: int64 keys encoding `cohort/group index * span + lag` in sorted order,
+          where the lags are clipped to `[0, span - 1]`; lags <= 0 (or missing lags) are never
+          counted as conversions
+
+    Args:
+        df:
+            The dataframe containing the data to calculate the conversion lags for.
+        base_timestamp:
+            The column name for the base timestamp. This can be the same column as
+            `conversion_timestamp`.
+        conversion_timestamp:
+            The column name for the conversion timestamp (missing if the row did not convert).
+        cohort:
+            The column name for the cohort (e.g. day, week, month) of each row.
+        groups:
+            The column name for the groups/segments to calculate the conversion lags for.
+    """
+    group_by = [cohort, groups] if groups else [cohort]
+    grouped = df.groupby(group_by, observed=True, sort=True)
+    sizes = grouped.size()
+    codes = grouped.ngroup().to_numpy()
+    is_grouped = ~np.isnan(codes)
+    codes = np.where(is_grouped, codes, -1).astype(np.int64)
+    num_groups = len(sizes)
+
+    base = to_naive_timestamps(df[base_timestamp])
+    conversion = to_naive_timestamps(df[conversion_timestamp])
+    base_stats = base[is_grouped].groupby(codes[is_grouped]).agg(['min', 'max', 'count'])
+    base_stats = base_stats.reindex(range(num_groups))
+    base_nanoseconds = base.to_numpy(dtype='datetime64[ns]').view(np.int64)
+    conversion_nanoseconds = conversion.to_numpy(dtype='datetime64[ns]').view(np.int64)
+
+    # only rows with a positive lag can be counted as conversions
+    has_lag = is_grouped & base.notna().to_numpy() & conversion.notna().to_numpy()
+    lag_nanoseconds = conversion_nanoseconds[has_lag] - base_nanoseconds[has_lag]
+    # round up to whole seconds; durations are whole seconds so `lag <= duration` is unchanged
+    lag_seconds = -(-lag_nanoseconds // 1_000_000_000)
+    max_lag = int(lag_seconds.max()) if len(lag_seconds) > 0 else 0
+    span = max(max_lag, 0) + 1
+    sorted_lags = codes[has_lag] * span + np.clip(lag_seconds, 0, span - 1)
+    sorted_lags.sort()
+    return {
+        'keys': sizes.index.to_frame(index=False),
+        'cohorts': pd.Series(df[cohort].dropna().unique()).sort_values().reset_index(drop=True),
+        'num_records': sizes.to_numpy(),
+        'min_base': base_stats['min'].to_numpy(dtype='datetime64[ns]').view(np.int64),
+        'max_base': base_stats['max'].to_numpy(dtype='datetime64[ns]').view(np.int64),
+        'has_missing_base': (base_stats['count'] < sizes.to_numpy()).to_numpy(),
+        'has_base': base_stats['count'].fillna(0).to_numpy() > 0,
+        'sorted_lags': sorted_lags,
+        'span': span,
+    }
+
+
+def get_conversion_lags(
+        df: pd.DataFrame,
+        base_timestamp: str,
+        conversion_timestamp: str,
+        cohort: str,
+        groups: str | None = None,
+        fingerprint: str | None = None) -> dict:
+    """
+    Return the conversion lags (see `cohorted_conversion_lags`), calculating them only if they
+    haven't already been calculated for the data with the given fingerprint and the same columns.
+    The lags of the MAX_CACHED_LAGS most recently used datasets/columns are kept. If `fingerprint`
+    is None, the lags are calculated and not cached.
+    """
+    key = (fingerprint, base_timestamp, conversion_timestamp, cohort, groups)
+    if fingerprint is not None:
+        with _lock:
+            if key in _conversion_lags:
+                _conversion_lags.move_to_end(key)
+                return _conversion_lags[key]
+    lags = cohorted_conversion_lags(
+        df=df,
+        base_timestamp=base_timestamp,
+        conversion_timestamp=conversion_timestamp,
+        cohort=cohort,
+        groups=groups,
+    )
+    if fingerprint is not None:
+        with _lock:
+            _conversion_lags[key] = lags
+            while len(_conversion_lags) > MAX_CACHED_LAGS:
+                _conversion_lags.popitem(last=False)
+    return lags
+
+
+def select_last_cohorts(lags: dict, cohort: str, last_x_cohorts: int) -> dict:
+    """
+    Return the conversion lags (see `cohorted_conversion_lags`) of the cohorts/groups in the last
+    (most recent) `last_x_cohorts` cohorts. The cohorts/groups are sorted by cohort, so these are
+    the last cohorts/groups, and their lags are the end of `sorted_lags` (which is sliced rather
+    than recalculated).
+    """
+    last_cohorts = lags['cohorts'].iloc[-last_x_cohorts:]
+    is_selected = lags['keys'][cohort].isin(last_cohorts).to_numpy()
+    first = int(np.argmax(is_selected)) if is_selected.any() else len(is_selected)
+    start = np.searchsorted(lags['sorted_lags'], first * lags['span'])
+    selected = {
+        name: lags[name][first:]
+        for name in ['num_records', 'min_base', 'max_base', 'has_missing_base', 'has_base']
+    }
+    return lags | selected | {
+        'keys': lags['keys'].iloc[first:].reset_index(drop=True),
+        'sorted_lags': lags['sorted_lags'][start:] - first * lags['span'],
+    }
+
+
+def count_conversions(lags: dict, durations_in_seconds: np.ndarray) -> np.ndarray:
+    """
+    Return the number of rows in each cohort/group (rows) that converted within (i.e. `0 < lag <=
+    duration`) each duration (columns), using the output of `cohorted_conversion_lags`.
+    """
+    span = lags['span']
+    starts = np.arange(len(lags['num_records']), dtype=np.int64)[:, None] * span
+    durations = np.clip(np.asarray(durations_in_seconds, dtype=np.int64), 0, span - 1)
+    return (
+        np.searchsorted(lags['sorted_lags'], starts + durations[None, :], side='right')
+        - np.searchsorted(lags['sorted_lags'], starts, side='right')
+    )
+
+
+def _to_seconds(value: int, unit: str) -> int:
+    if unit not in TIME_UNIT_SECONDS:
+        raise ValueError(f'Invalid units: {unit}')
+    return value * TIME_UNIT_SECONDS[unit]
+
+
+def cohorted_conversion_rates(
+        df: pd.DataFrame,
+        base_timestamp: str,
+        conversion_timestamp: str,
+        cohort: str,
+        intervals: list[tuple[int, str]],
+        groups: str | None = None,
+        current_datetime: str | pd.Timestamp | None = None,
+        fingerprint: str | None = None) -> pd.DataFrame:
+    """
+    Calculate the cohorted conversion rate for a given base timestamp and conversion timestamp.
+
+    The output has the same format as `helpsk.conversions.cohorted_conversion_rates`: the cohort
+    (and group) columns, a `# of records` column, and a `{value} {unit}` column for each interval
+    containing the percent of records that converted within the interval. The rate is missing if
+    not enough time has passed since the most recent base timestamp of the cohort.
+
+    Args:
+        df:
+            The dataframe containing the data to calculate the conversion rate for.
+        base_timestamp:
+            The column name for the base timestamp to use for the calculation.
+        conversion_timestamp:
+            The column name for the conversion timestamp to use for the calculation.
+        cohort:
+            The column name for the cohort (e.g. day, week, month) to use for the calculation.
+        intervals:
+            A list of intervals to calculate the conversion rate for in the form of (value, unit).
+            For example, [(1, 'days'), (7, 'days')] would calculate the conversion rate at 1 day
+            and 7 days for each cohort. Valid units are 'seconds', 'minutes', 'hours', 'days', and
+            'weeks'.
+        groups:
+            The column name for the groups/segments to calculate the conversion rate for.
+        current_datetime:
+            The current datetime to use for calculating whether an interval is valid. If None, the
+            current UTC datetime is used.
+        fingerprint:
+            The fingerprint of `df`; if given, the conversion lags are cached (see
+            `get_conversion_lags`).
+    """
+    current_datetime = current_timestamp(current_datetime)
+    lags = get_conversion_lags(
+        df=df,
+        base_timestamp=base_timestamp,
+        conversion_timestamp=conversion_timestamp,
+        cohort=cohort,
+        groups=groups,
+        fingerprint=fingerprint,
+    )
+    durations = np.array([_to_seconds(value, unit) for value, unit in intervals], dtype=np.int64)
+    rates = count_conversions(lags, durations) / lags['num_records'][:, None]
+    # the interval must have passed for every record in the cohort
+    elapsed_nanoseconds = current_datetime.value - lags['max_base']
+    is_elapsed = lags['has_base'][:, None] & (
+        elapsed_nanoseconds[:, None] >= durations[None, :] * 1_000_000_000
+    )
+    rates[~is_elapsed] = np.nan
+
+    conversions = lags['keys'].copy()
+    conversions['# of records'] = lags['num_records']
+    for index, (value, unit) in enumerate(intervals):
+        conversions[f'{value} {unit}'] = rates[:, index]
+    return conversions
+
+
+def cohorted_adoption_rates(
+        df: pd.DataFrame,
+        base_timestamp: str,
+        conversion_timestamp: str,
+        cohort: str,
+        n_units: int,
+        units: str,
+        last_x_cohorts: int = 15,
+        groups: str | None = None,
+        current_datetime: str | pd.Timestamp | None = None,
+        fingerprint: str | None = None) -> pd.DataFrame:
+    """
+    Calculate the cohorted adoption rate (i.e. the cumulative percent of records that converted
+    within 0, 1, ..., `n_units` units of the base timestamp) for the most recent cohorts.
+
+    The output has the same format as `helpsk.conversions.cohorted_adoption_rates`: the cohort
+    column, an `index` column (the number of units), the group column, `# of records`, `Is
+    Finished` (whether the units have passed for every record), `Converted`, and `Conversion Rate`.
+    Rows where the units haven't passed for any of the records are removed.
+
+    Args:
+        df:
+            The dataframe containing the data to calculate the adoption rate for.
+        base_timestamp:
+            The column name for the base timestamp to use for the calculation.
+        conversion_timestamp:
+            The column name for the conversion timestamp to use for the calculation.
+        cohort:
+            The column name for the cohort (e.g. day, week, month) to use for the calculation.
+        n_units:
+            The first n units (e.g. 30 days) to calculate the adoption rate for.
+        units:
+            The units to use for the calculation. Valid options are 'seconds', 'minutes', 'hours',
+            'days', 'weeks'.
+        last_x_cohorts:
+            The last x cohorts to calculate the adoption rate for.
+        groups:
+            The column name for the groups/segments to calculate the adoption rate for.
+        current_datetime:
+            The current datetime to use for calculating whether the units have passed. If None,
+            the current UTC datetime is used.
+        fingerprint:
+            The fingerprint of `df`; if given, the conversion lags of all of the cohorts are
+            cached (see `get_conversion_lags`) and the last cohorts are selected from them.
+    """
+    current_datetime = current_timestamp(current_datetime)
+    unit_seconds = _to_seconds(1, units)
+    lags = get_conversion_lags(
+        df=df,
+        base_timestamp=base_timestamp,
+        conversion_timestamp=conversion_timestamp,
+        cohort=cohort,
+        groups=groups,
+        fingerprint=fingerprint,
+    )
+    lags = select_last_cohorts(lags, cohort=cohort, last_x_cohorts=last_x_cohorts)
+    num_groups = len(lags['num_records'])
+    indexes = np.arange(n_units + 1, dtype=np.int64)
+    converted = count_conversions(lags, indexes * unit_seconds)
+    # a record is finished if `base + index units < current_datetime`
+    cutoffs = current_datetime.value - indexes * unit_seconds * 1_000_000_000
+    any_finished = lags['has_base'][:, None] & (lags['min_base'][:, None] < cutoffs[None, :])
+    all_finished = (
+        lags['has_base'][:, None]
+        & ~lags['has_missing_base'][:, None]
+        & (lags['max_base'][:, None] < cutoffs[None, :])
+    )
+
+    adoption = lags['keys'].loc[np.repeat(np.arange(num_groups), len(indexes))]
+    adoption = adoption.reset_index(drop=True)
+    adoption.insert(1, 'index', np.tile(indexes, num_groups))
+    adoption['# of records'] = np.repeat(lags['num_records'], len(indexes))
+    adoption['Is Finished'] = all_finished.ravel()
+    adoption['Converted'] = converted.ravel()
+    adoption['Conversion Rate'] = adoption['Converted'] / adoption['# of records']
+    return adoption[any_finished.ravel()].reset_index(drop=True)
@@ -0,0 +1,172 @@
+"""
+Correlation matrix calculations.
+
+`correlation_matrix` standardizes the numeric columns (in float64, so columns with a large mean
+relative to their spread keep their variance) and calculates all correlations with matrix
+multiplications (BLAS) on the float32 standardized data rather than pairwise loops:
+
+    - without missing values, the correlations are a single matmul (`Z.T @ Z / (n - 1)`)
+    - with missing values, the correlations are pairwise-complete (i.e. calculated from the rows
+      where both columns are non-missing, like `pd.DataFrame.corr`); the pairwise counts, sums,
+      and sums of squares are calculated with matmuls against the matrix of non-missing
+      indicators.
+
+Spearman correlations are the Pearson correlations of the ranks. The matrix is cached per dataset
+(keyed by the dataset fingerprint) so selecting a subset of columns or the top correlated pairs
+doesn't recalculate it.
+"""
+import threading
+import warnings
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+
+CORRELATION_METHODS = ('pearson', 'spearman')
+
+# the number of correlation matrices (datasets/methods/min_periods) that are cached
+MAX_CACHED_MATRICES = 4
+_correlation_matrices: OrderedDict[tuple, pd.DataFrame] = OrderedDict()
+_lock = threading.Lock()
+
+
+def _to_float64(data: pd.DataFrame) -> np.ndarray:
+    """Convert the columns to a float64 array (missing values are NaN)."""
+    values = np.empty(data.shape, dtype=np.float64, order='F')
+    for index, column in enumerate(data.columns):
+        series = data[column]
+        if series.dtype == 'object':
+            series = pd.to_numeric(series, errors='coerce')
+        values[:, index] = series.to_numpy(dtype=np.float64, na_value=np.nan)
+    return values
+
+
+def _standardize(values: np.ndarray, is_valid: np.ndarray | None) -> np.ndarray:
+    """
+    Center and scale each column (in place, in float64) using the non-missing values and return
+    the standardized values as float32, so that the sums in the matmuls are well conditioned in
+    float32; missing values are set to 0. Columns whose spread is only rounding error relative to
+    their mean are constant (all 0).
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # columns without non-missing values
+        means = np.nan_to_num(np.nanmean(values, axis=0))
+        values -= means
+        stds = np.sqrt(np.nanmean(np.square(values), axis=0))
+    is_constant = ~(stds > np.abs(means) * 1e-12)
+    values /= np.where(is_constant, 1, stds)
+    values[:, is_constant] = 0
+    if is_valid is not None:
+        values[~is_valid] = 0
+    return values.astype(np.float32)
+
+
+def correlation_matrix(
+        data: pd.DataFrame,
+        columns: list[str] | None = None,
+        method: str = 'pearson',
+        min_periods: int = 1) -> pd.DataFrame:
+    """
+    Calculate the correlation matrix of the numeric columns; the same as
+    `data[columns].corr(method=method, min_periods=min_periods)` (to float32 precision).
+
+    Args:
+        data:
+            The data.
+        columns:
+            The columns to correlate. If None, the numeric (and boolean) columns are used.
+        method:
+            'pearson' or 'spearman'. For Spearman, each column is ranked using its non-missing
+            values (pandas ranks each pair of columns using the rows where both are non-missing,
+            so the correlations differ slightly when there are missing values).
+        min_periods:
+            The minimum number of rows where both columns are non-missing; otherwise the
+            correlation is NaN.
+    """
+    if method not in CORRELATION_METHODS:
+        raise ValueError(f"method must be one of {CORRELATION_METHODS}, not `{method}`")
+    if columns is None:
+        columns = data.select_dtypes(include=['number', 'bool']).columns.tolist()
+    data = data[columns]
+    if method == 'spearman':
+        data = data.rank(method='average')
+    values = _to_float64(data)
+    is_valid = ~np.isnan(values)
+    has_missing = not is_valid.all()
+    values = _standardize(values, is_valid if has_missing else None)
+
+    if not has_missing:
+        counts = np.full((len(columns), len(columns)), len(values), dtype=np.float64)
+        covariances = (values.T @ values).astype(np.float64)
+        # the columns are centered using all of the rows, so the variances are the diagonal
+        variances = np.broadcast_to(np.diag(covariances)[:, np.newaxis], covariances.shape)
+    else:
+        valid = is_valid.astype(np.float32)
+        counts = (valid.T @ valid).astype(np.float64)
+        # sums[i, j] is the sum of column i over the rows where column j is non-missing
+        sums = (values.T @ valid).astype(np.float64)
+        sums_of_squares = (np.square(values).T @ valid).astype(np.float64)
+        products = (values.T @ values).astype(np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            covariances = products - sums * sums.T / counts
+            # variances[i, j] is the variance of column i over the rows where column j is
+            # non-missing
+            variances = sums_of_squares - sums**2 / counts
+    with np.errstate(invalid='ignore', divide='ignore'):
+        correlations = np.clip(covariances / np.sqrt(variances * variances.T), -1, 1)
+    # the (standardized) columns have a variance of ~1 per row unless the column is constant
+    # (over the rows where both columns are non-missing); the tolerance is for float32 rounding
+    is_constant = np.minimum(variances, variances.T) <= counts * 1e-5
+    correlations[is_constant | (counts < max(min_periods, 2))] = np.nan
+    np.fill_diagonal(correlations, np.where(np.isnan(np.diag(correlations)), np.nan, 1))
+    return pd.DataFrame(correlations, index=columns, columns=columns)
+
+
+def get_correlation_matrix(
+        data: pd.DataFrame,
+        fingerprint: str | None,
+        columns: list[str] | None = None,
+        method: str = 'pearson',
+        min_periods: int = 1) -> pd.DataFrame:
+    """
+    Return the correlation matrix (see `correlation_matrix`) of the numeric columns of the dataset,
+    calculating it only if it hasn't been calculated for the dataset with the given fingerprint
+    (and method/min_periods). The MAX_CACHED_MATRICES most recently used matrices are kept. If
+    `columns` is provided, the matrix is subset to those columns.
+    """
+    if fingerprint is None:
+        return correlation_matrix(data, columns=columns, method=method, min_periods=min_periods)
+    key = (fingerprint, method, min_periods)
+    with _lock:
+        matrix = _correlation_matrices.get(key)
+        if matrix is not None:
+            _correlation_matrices.move_to_end(key)
+    if matrix is None:
+        matrix = correlation_matrix(data, method=method, min_periods=min_periods)
+        with _lock:
+            _correlation_matrices[key] = matrix
+            while len(_correlation_matrices) > MAX_CACHED_MATRICES:
+                _correlation_matrices.popitem(last=False)
+    if columns:
+        columns = [x for x in columns if x in matrix.columns]
+        matrix = matrix.loc[columns, columns]
+    return matrix
+
+
+def top_correlated_pairs(matrix: pd.DataFrame, top_k: int) -> pd.DataFrame:
+    """
+    Return the `top_k` pairs of (different) columns with the largest absolute correlation, sorted
+    by absolute correlation. Returns a dataframe with the columns `Column 1`, `Column 2`, and
+    `Correlation`.
+    """
+    values = matrix.to_numpy()
+    rows, columns = np.triu_indices(len(values), k=1)
+    correlations = values[rows, columns]
+    is_valid = ~np.isnan(correlations)
+    rows, columns, correlations = rows[is_valid], columns[is_valid], correlations[is_valid]
+    top = np.argsort(-np.abs(correlations), kind='stable')[:top_k]
+    return pd.DataFrame({
+        'Column 1': matrix.index[rows[top]],
+        'Column 2': matrix.columns[columns[top]],
+        'Correlation': correlations[top],
+    })
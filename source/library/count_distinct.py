@@ -0,0 +1,132 @@
+"""
+Count-distinct calculations.
+
+`count_distinct` counts the number of distinct values of a column for each group, either exactly
+(by sorting and deduplicating integer codes) or approximately with HyperLogLog sketches, which use
+a fixed amount of memory per group (2**precision registers) regardless of the number of distinct
+values.
+"""
+import math
+import numpy as np
+import pandas as pd
+
+
+HLL_MIN_PRECISION = 4
+HLL_MAX_PRECISION = 16
+
+
+def hyperloglog_error(precision: int) -> float:
+    """Return the relative standard error of a HyperLogLog sketch with 2**precision registers."""
+    return 1.04 / math.sqrt(2**precision)
+
+
+def _hyperloglog_alpha(num_registers: int) -> float:
+    """Bias correction constant for the HyperLogLog estimate."""
+    if num_registers == 16:
+        return 0.673
+    if num_registers == 32:
+        return 0.697
+    if num_registers == 64:
+        return 0.709
+    return 0.7213 / (1 + 1.079 / num_registers)
+
+
+def _exact_count_distinct(
+        group_codes: np.ndarray,
+        num_groups: int,
+        series: pd.Series) -> np.ndarray:
+    """
+    Count the distinct values of `series` in each group by encoding (group, value) into a single
+    int64 key, sorting the keys, and counting the unique keys per group.
+    """
+    value_codes, uniques = pd.factorize(series, sort=False)
+    num_values = max(len(uniques), 1)
+    is_valid = (group_codes >= 0) & (value_codes >= 0)
+    keys = group_codes[is_valid] * num_values + value_codes[is_valid]
+    keys.sort()
+    is_new_key = np.empty(len(keys), dtype=bool)
+    is_new_key[:1] = True
+    np.not_equal(keys[1:], keys[:-1], out=is_new_key[1:])
+    return np.bincount(keys[is_new_key] // num_values, minlength=num_groups)
+
+
+def _approximate_count_distinct(
+        group_codes: np.ndarray,
+        num_groups: int,
+        series: pd.Series,
+        precision: int) -> np.ndarray:
+    """
+    Estimate the distinct values of `series` in each group with a HyperLogLog sketch per group.
+
+    The first `precision` bits of the 64-bit hash of each value select the register and the
+    position of the first 1-bit in the remaining bits is the value stored (the max per register).
+    """
+    if not HLL_MIN_PRECISION <= precision <= HLL_MAX_PRECISION:
+        raise ValueError(
+            f"precision must be between {HLL_MIN_PRECISION} and {HLL_MAX_PRECISION}, "
+            f"not {precision}",
+        )
+    num_registers = 2**precision
+    is_valid = (group_codes >= 0) & series.notna().to_numpy()
+    hashes = pd.util.hash_pandas_object(series[is_valid], index=False).to_numpy()
+    registers = (hashes >> np.uint64(64 - precision)).astype(np.int64)
+    remaining_bits = hashes << np.uint64(precision)
+    # the exponent returned by frexp is the bit length of the value (0 for 0)
+    _, bit_lengths = np.frexp(remaining_bits.astype(np.float64))
+    ranks = np.minimum(64 - bit_lengths + 1, 64 - precision + 1).astype(np.uint8)
+
+    sketches = np.zeros(num_groups * num_registers, dtype=np.uint8)
+    np.maximum.at(sketches, group_codes[is_valid] * num_registers + registers, ranks)
+    sketches = sketches.reshape(num_groups, num_registers)
+
+    estimates = (
+        _hyperloglog_alpha(num_registers) * num_registers**2
+        / np.exp2(-sketches.astype(np.float64)).sum(axis=1)
+    )
+    # small range correction (linear counting) when there are empty registers
+    num_empty = (sketches == 0).sum(axis=1)
+    use_linear_counting = (estimates <= 2.5 * num_registers) & (num_empty > 0)
+    estimates[use_linear_counting] = num_registers * np.log(
+        num_registers / num_empty[use_linear_counting],
+    )
+    return np.round(estimates).astype(np.int64)
+
+
+def count_distinct(
+        data: pd.DataFrame,
+        group_by: list[str],
+        column: str,
+        precision: int | None = None) -> pd.DataFrame:
+    """
+    Count the number of distinct (non-missing) values of `column` for each combination of the
+    `group_by` values (rows with missing `group_by` values are ignored). Returns a dataframe with
+    the `group_by` columns (sorted) and `column` containing the counts; i.e. the same as
+    `data.groupby(group_by, observed=True).agg({column: 'nunique'}).reset_index()`.
+
+    Args:
+        data:
+            The data to count the distinct values of.
+        group_by:
+            The columns to group by.
+        column:
+            The column to count the distinct values of.
+        precision:
+            If None, the counts are exact. Otherwise, the counts are estimated with HyperLogLog
+            sketches that have 2**precision registers (between 4 and 16); the relative standard
+            error is `hyperloglog_error(precision)` (e.g. ~1.6% for a precision of 12).
+    """
+    grouped = data.groupby(group_by, observed=True, sort=True)
+    group_values = grouped.size().index.to_frame(index=False)
+    group_codes = grouped.ngroup().to_numpy()
+    group_codes = np.where(np.isnan(group_codes), -1, group_codes).astype(np.int64)
+    if precision is None:
+        counts = _exact_count_distinct(group_codes, len(group_values), data[column])
+    else:
+        counts = _approximate_count_distinct(
+            group_codes,
+            len(group_values),
+            data[column],
+            precision,
+        )
+    group_values[column] = counts
+    return group_values
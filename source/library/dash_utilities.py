@@ -1,16 +1,70 @@
 """Utility functions for dash app."""
+import importlib.util
+import json
+import logging
+import math
+import sys
 import textwrap
+import time
+from functools import lru_cache
+from itertools import islice
 import numpy as np
 import pandas as pd
 from pandas.api.types import is_bool_dtype
 from source.library.utilities import filter_dataframe, to_date
+from source.library.conversions import (
+    TIME_UNIT_SECONDS,
+    cohorted_adoption_rates,
+    cohorted_conversion_rates,
+    retention_matrix,
+)
+from source.library.count_distinct import hyperloglog_error
+from source.library.data_prep import (
+    DATE_FLOOR_FORMATS,
+    DATE_FLOOR_LENGTHS,
+    DATE_FLOOR_PERIODS,
+    PandasDataPrep,
+)
+from source.library.date_index import DateIndex
+from source.library.duckdb_engine import create_aggregation_code
+from source.library.metrics import timed
 import source.library.types as t
-import helpsk.pandas as hp
 import plotly.graph_objs as go
+import plotly.io as pio
 
 
 MISSING = '<Missing>'
 OTHER = '<Other>'
+# zooming into the dates of these graph types re-aggregates the visible dates at the coarsest
+# date floor that has at least MIN_ZOOM_PERIODS periods in the visible range (see
+# `get_zoom_date_floor`)
+ZOOM_GRAPH_TYPES = ['histogram', 'line']
+MIN_ZOOM_PERIODS = 20
+# the graph types whose figures contain a point per row, so a sample of the rows is graphed when
+# the figure is too large (the other graphs aggregate the rows; e.g. the counts of a histogram
+# would be wrong)
+SAMPLED_GRAPH_TYPES = ['scatter', 'scatter-3d', 'line', 'box']
+# the size of the figures of these graph types (which contain a value per row; histograms are
+# binned in the browser) is estimated from the figures of samples of SIZE_ESTIMATE_ROWS and
+# 2 * SIZE_ESTIMATE_ROWS rows if there are at least 10 * SIZE_ESTIMATE_ROWS rows, so that the
+# figure of all of the rows isn't built (and serialized) if it is too large
+SIZE_ESTIMATE_GRAPH_TYPES = [*SAMPLED_GRAPH_TYPES, 'histogram']
+SIZE_ESTIMATE_ROWS = 10_000
+# the pandas aggregations of the histogram aggregations (`histfunc`) that are used when the rows of
+# a histogram are binned on the server (see `create_histogram_bins_code`)
+PANDAS_AGGREGATIONS = {
+    'count': 'count',
+    'sum': 'sum',
+    'avg': 'mean',
+    'min': 'min',
+    'max': 'max',
+}
+# the number of bins of the histograms that are binned on the server if the number of bins isn't
+# selected (see `numpy.histogram_bin_edges`)
+DEFAULT_HISTOGRAM_BINS = 'sturges'
+# scatter and line graphs with more points (rows) than this are rendered with WebGL (Scattergl)
+# rather than SVG, which is slow to render, pan, and zoom with many points
+WEBGL_POINT_THRESHOLD = 1_000
 
 
 # New Error type for invalid configuration selected
@@ -18,24 +72,149 @@ class InvalidConfigurationError(Exception):
     """Invalid configuration selected."""
 
 
-def log(value: str) -> None:
-    """Log value."""
-    print(value, flush=True)
+class FigureTooLargeError(Exception):
+    """The serialized figure is larger than the maximum size that is sent to the browser."""
+
+
+logger = logging.getLogger('explore_data')
+# values are truncated to this many characters in the logs and only the first items of large
+# collections (e.g. the unique values of a column) are converted to a string
+MAX_LOG_VALUE_LENGTH = 500
+MAX_LOG_ITEMS = 20
+
+
+def truncate_log_value(
+        value: object,
+        max_length: int = MAX_LOG_VALUE_LENGTH,
+        max_items: int = MAX_LOG_ITEMS) -> str:
+    """
+    Convert the value to a string of at most `max_length` characters (plus the number of characters
+    removed). Only the first `max_items` items of large collections are converted.
+    """
+    collection_types = (list, tuple, set, frozenset, dict, np.ndarray, pd.Series, pd.Index)
+    if isinstance(value, collection_types) and len(value) > max_items:
+        if isinstance(value, dict):
+            head = dict(islice(value.items(), max_items))
+        elif isinstance(value, set | frozenset):
+            head = list(islice(value, max_items))
+        elif isinstance(value, pd.Series):
+            head = value.iloc[:max_items].tolist()
+        elif isinstance(value, np.ndarray | pd.Index):
+            head = value[:max_items].tolist()
+        else:
+            head = value[:max_items]
+        string = f"{head} ... ({len(value) - max_items:,} more items)"
+    else:
+        string = str(value)
+    if len(string) > max_length:
+        string = f"{string[:max_length]} ... ({len(string) - max_length:,} more characters)"
+    return string
+
+
+class _LogValue:
+    """Truncates the value (`truncate_log_value`) only if the record is formatted."""
+
+    __slots__ = ('value',)
+
+    def __init__(self, value: object):
+        self.value = value
+
+    def __str__(self) -> str:
+        return truncate_log_value(self.value)
+
+
+class JsonLogFormatter(logging.Formatter):
+    """Format the records as JSON objects (one per line), including the `extra` fields."""
+
+    extra_fields = ('function', 'variable')
+
+    def format(self, record: logging.LogRecord) -> str:
+        """Format the record."""
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for field in self.extra_fields:
+            if hasattr(record, field):
+                entry[field] = getattr(record, field)
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class LogStreamHandler(logging.StreamHandler):
+    """
+    Writes the records to the stream but, rather than flushing after every record, flushes at most
+    every `flush_interval` seconds and after warnings/errors (and when logging shuts down).
+    """
+
+    def __init__(self, stream: object | None = None, flush_interval: float = 1.0):
+        super().__init__(stream)
+        self.flush_interval = flush_interval
+        self._last_flush = time.monotonic()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        """Write the record."""
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+            now = time.monotonic()
+            if record.levelno >= logging.WARNING or now - self._last_flush >= self.flush_interval:
+                self.flush()
+                self._last_flush = now
+        except Exception:
+            self.handleError(record)
+
+
+def configure_logging(
+        level: str | int = logging.INFO,
+        json_format: bool = False,
+        stream: object | None = None) -> None:
+    """
+    Configure the app's logger (replacing any previous configuration).
+
+    Args:
+        level: the minimum level logged (e.g. 'DEBUG' logs variables and function calls, 'INFO'
+            logs messages, and 'ERROR' only logs errors); nothing is formatted for lower levels
+        json_format: if True, each record is a JSON object; otherwise, only the message is logged
+        stream: the stream the records are written to (stdout by default)
+    """
+    handler = LogStreamHandler(stream or sys.stdout)
+    handler.setFormatter(JsonLogFormatter() if json_format else logging.Formatter('%(message)s'))
+    for previous_handler in logger.handlers:
+        previous_handler.flush()
+    logger.handlers = [handler]
+    logger.setLevel(level.upper() if isinstance(level, str) else level)
+    logger.propagate = False
+
+
+def log(message: str, *args: object) -> None:
+    """
+    Log the message (level INFO). `args` are formatted into the message (`%s`) and truncated only
+    if the message is logged.
+    """
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(message, *(_LogValue(arg) for arg in args), stacklevel=2)
 
 
 def log_function(name: str) -> None:
-    """Log function calls."""
-    log(f"\nFUNCTION: `{name}`")
+    """Log function calls (level DEBUG)."""
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("\nFUNCTION: `%s`", name, extra={'function': name}, stacklevel=2)
 
 
-def log_variable(var: str, value: str) -> None:
-    """Log variable value."""
-    log(f"VARIABLE: `{var}` = `{value}`")
+def log_variable(var: str, value: object) -> None:
+    """Log variable value (level DEBUG). The value is truncated only if it is logged."""
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "VARIABLE: `%s` = `%s`", var, _LogValue(value), extra={'variable': var}, stacklevel=2,
+        )
 
 
 def log_error(message: str) -> None:
-    """Log variable value."""
-    log(f">>>>>>>>>ERROR: `{message}`")
+    """Log error (level ERROR)."""
+    logger.error(">>>>>>>>>ERROR: `%s`", message, stacklevel=2)
 
 
 def values_to_dropdown_options(values: list[str]) -> list[dict]:
@@ -44,14 +223,62 @@ def values_to_dropdown_options(values: list[str]) -> list[dict]:
     return [{'label': str(value), 'value': str(value)} for value in values]
 
 
-def filter_data_from_ui_control(  # noqa: PLR0915
+@timed
+def convert_filters_from_ui_control(filters: dict, column_types: dict) -> dict:
+    """
+    Convert the values of the filter controls (as saved in the cache) to the filters of
+    `filter_dataframe`: the (start, end) dates and (min, max) values are converted from lists
+    to tuples, and the missing values are `np.nan` and `None` rather than MISSING.
+    """
+    converted_filters = {}
+    for column, value in filters.items():
+        log("filtering on `%s` (%s) with `%s`", column, t.get_type(column, column_types), value)
+        if t.is_date(column, column_types):
+            assert isinstance(value, list)
+            assert len(value) == 2
+            converted_filters[column] = (to_date(value[0]), to_date(value[1]))
+        elif t.is_boolean(column, column_types):
+            # e.g. [True, False, MISSING]
+            assert isinstance(value, list)
+            filters_list = [
+                x.lower() == 'true'
+                for x in value
+                if x != MISSING and x is not None
+            ]
+            if MISSING in value:
+                filters_list.extend([np.nan, None])
+            log_variable('filters_list', filters_list)
+            converted_filters[column] = filters_list
+        elif t.get_type(column, column_types) in {t.STRING, t.CATEGORICAL}:
+            assert isinstance(value, list)
+            filters_list = [x for x in value if x != MISSING and x is not None]
+            if MISSING in value:
+                filters_list.extend([np.nan, None])
+            log_variable('filters_list', filters_list)
+            converted_filters[column] = filters_list
+        elif t.is_numeric(column, column_types):
+            assert isinstance(value, list)
+            assert len(value) == 2
+            converted_filters[column] = (value[0], value[1])
+        else:
+            raise ValueError(f"Unknown type for column `{column}`: {t.get_type(column, column_types)}")  # noqa
+    return converted_filters
+
+
+def filter_data_from_ui_control(
         filters: dict,
         column_types: dict,
-        data: pd.DataFrame) -> tuple[pd.DataFrame, str, str]:
+        data: pd.DataFrame,
+        engine: str = 'pandas',
+        date_index: DateIndex | None = None) -> tuple[pd.DataFrame, str, str]:
     """
     Filters data based on the selected columns and values. Returns the filtered data, markdown
     text, and code. The code is a string that can be used to reproduce the filtering.
 
+    `engine` is the engine used to filter the data ('pandas', 'duckdb', or 'polars'; see
+    `filter_dataframe`). `date_index` is the `DateIndex` of `data`, which finds the rows in the
+    date ranges (and counts the missing dates) without comparing the date of every row.
+
     When I save tuples in the cache, they are converted to lists. This is because tuples are not
     JSON serializable. So when I read the values from the cache, I need to convert them back to
     tuples.
@@ -75,63 +302,37 @@ def filter_data_from_ui_control(  # noqa: PLR0915
         log("No filters applied.")
         return data, "No filters applied.", ""
 
-    converted_filters = {}
+    converted_filters = convert_filters_from_ui_control(filters, column_types)
     markdown_text = "##### Manual filters applied:  \n"
 
-    # this for loop builds the filters dictionary and the markdown text
-    for column, value in filters.items():
-        log(f"filtering on `{column}` ({t.get_type(column, column_types)}) with `{value}`")
+    # this for loop builds the markdown text
+    for column, value in converted_filters.items():
         if t.is_date(column, column_types):
-            series = pd.to_datetime(data[column]).dt.date
-            assert isinstance(value, list)
-            assert len(value) == 2
-            start_date = to_date(value[0])
-            end_date = to_date(value[1])
-            converted_filters[column] = (start_date, end_date)
+            start_date, end_date = value
             markdown_text += f"  - `{column}` between `{start_date}` and `{end_date}`"
-            num_missing = series.isna().sum()
+            if date_index is not None and column in date_index.columns:
+                num_missing = date_index.num_missing(column)
+            else:
+                num_missing = pd.to_datetime(data[column]).isna().sum()
             if num_missing > 0:
                 markdown_text += f"; `{num_missing:,}` missing values removed"
             markdown_text += "  \n"
-        elif t.is_boolean(column, column_types):
-            # e.g. [True, False, MISSING]
-            assert isinstance(value, list)
-            filters_list = [
-                x.lower() == 'true'
-                for x in value
-                if x != MISSING and x is not None
-            ]
-            if MISSING in value:
-                filters_list.extend([np.nan, None])
-            log_variable('filters_list', filters_list)
-            converted_filters[column] = filters_list
-            markdown_text += f"  - `{column}` in `{filters_list}`  \n"
-        elif t.get_type(column, column_types) in {t.STRING, t.CATEGORICAL}:
-            assert isinstance(value, list)
-            filters_list = [x for x in value if x != MISSING and x is not None]
-            if MISSING in value:
-                filters_list.extend([np.nan, None])
-            log_variable('filters_list', filters_list)
-            converted_filters[column] = filters_list
-            markdown_text += f"  - `{column}` in `{filters_list}`  \n"
         elif t.is_numeric(column, column_types):
-            assert isinstance(value, list)
-            assert len(value) == 2
-            min_value = value[0]
-            max_value = value[1]
-            converted_filters[column] = (min_value, max_value)
+            min_value, max_value = value
             markdown_text += f"  - `{column}` between `{min_value}` and `{max_value}`"
             num_missing = data[column].isna().sum()
             if num_missing > 0:
                 markdown_text += f"; `{num_missing:,}` missing values removed"
             markdown_text += "  \n"
         else:
-            raise ValueError(f"Unknown dtype for column `{column}` ({t.get_type(column, column_types)}): {data[column].dtype}")  # noqa
+            markdown_text += f"  - `{column}` in `{value}`  \n"
 
     filtered_data, code = filter_dataframe(
         data=data,
         filters=converted_filters,
         column_types=column_types,
+        engine=engine,
+        date_index=date_index,
     )
     rows_removed = len(data) - len(filtered_data)
     markdown_text += f"  \n`{len(filtered_data):,}` rows remaining after manual filtering; `{rows_removed:,}` (`{rows_removed / len(data):.1%}`) rows removed  \n"  # noqa
@@ -141,6 +342,113 @@ def filter_data_from_ui_control(  # noqa: PLR0915
     return filtered_data, markdown_text, code
 
 
+# the operators of the DataTable filter query syntax and the corresponding pandas comparisons
+TABLE_FILTER_OPERATORS = {
+    's>=': 'ge', '>=': 'ge', 'ge': 'ge',
+    's<=': 'le', '<=': 'le', 'le': 'le',
+    's<': 'lt', '<': 'lt', 'lt': 'lt',
+    's>': 'gt', '>': 'gt', 'gt': 'gt',
+    's!=': 'ne', '!=': 'ne', 'ne': 'ne',
+    's=': 'eq', '=': 'eq', 'eq': 'eq',
+    'contains': 'contains',
+    'datestartswith': 'datestartswith',
+}
+
+
+def _unquote_table_filter_value(value: str) -> str:
+    """Remove the quotes around the value of a DataTable filter expression."""
+    value = value.strip()
+    if len(value) > 1 and value[0] == value[-1] and value[0] in ('"', "'", '`'):
+        return value[1:-1].replace('\\' + value[0], value[0])
+    return value
+
+
+def table_filter_mask(data: pd.DataFrame, filter_query: str | None) -> np.ndarray | None:
+    """
+    Convert the `filter_query` of a DataTable with `filter_action='custom'` (e.g.
+    `{column} s> 5 && {other} contains abc`) to a boolean mask of the rows of `data`. Returns None
+    if there is no filter. Expressions on unknown columns or with unknown operators are ignored.
+    """
+    if not filter_query:
+        return None
+    mask = np.ones(len(data), dtype=bool)
+    for expression in filter_query.split(' && '):
+        expression = expression.strip()  # noqa: PLW2901
+        if not expression.startswith('{') or '}' not in expression:
+            continue
+        column, _, rest = expression[1:].partition('}')
+        operator, _, value = rest.strip().partition(' ')
+        operator = TABLE_FILTER_OPERATORS.get(operator)
+        if column not in data.columns or operator is None:
+            continue
+        series = data[column]
+        value = _unquote_table_filter_value(value)
+        if operator == 'contains':
+            mask &= series.astype(str).str.contains(value, regex=False).to_numpy()
+        elif operator == 'datestartswith':
+            mask &= series.astype(str).str.startswith(value).to_numpy()
+        else:
+            if is_bool_dtype(series):
+                value = value.lower() == 'true'
+            elif pd.api.types.is_numeric_dtype(series):
+                try:
+                    value = float(value)
+                except ValueError:  # e.g. a string compared to a numeric column matches nothing
+                    mask &= False
+                    continue
+            try:
+                mask &= getattr(series, operator)(value).fillna(False).to_numpy(dtype=bool)
+            except TypeError:  # e.g. comparing strings to numbers
+                mask &= getattr(series.astype(str), operator)(value).to_numpy()
+    return mask
+
+
+def table_columns(data: pd.DataFrame | None) -> list[dict]:
+    """
+    Return the `columns` property of a DataTable that shows `data`. The columns are set
+    explicitly because the DataTable otherwise infers them from the first record, so a filter
+    that matches no rows would remove the header (and the filter row used to clear the filter).
+    """
+    if data is None:
+        return []
+    return [{'name': str(column), 'id': str(column)} for column in data.columns]
+
+
+def page_table_data(
+        data: pd.DataFrame | None,
+        page_current: int | None,
+        page_size: int,
+        sort_by: list[dict] | None = None,
+        filter_query: str | None = None) -> tuple[list[dict], int]:
+    """
+    Return the records of a single page of a DataTable with `page_action='custom'` (and custom
+    sorting/filtering) and the number of pages; only the rows of the page are converted to
+    records.
+
+    Args:
+        data: The (server-side) data shown in the table.
+        page_current: The index of the page.
+        page_size: The number of rows per page.
+        sort_by: The `sort_by` property of the DataTable (`column_id` and `direction`).
+        filter_query: The `filter_query` property of the DataTable.
+    """
+    if data is None or len(data) == 0:
+        return [], 1
+    mask = table_filter_mask(data, filter_query)
+    if mask is not None:
+        data = data[mask]
+    sort_by = [x for x in (sort_by or []) if x['column_id'] in data.columns]
+    start = (page_current or 0) * page_size
+    if sort_by:
+        data = data.sort_values(
+            [x['column_id'] for x in sort_by],
+            ascending=[x['direction'] == 'asc' for x in sort_by],
+            kind='stable',
+        )
+    page = data.iloc[start:start + page_size]
+    return page.to_dict('records'), max(math.ceil(len(data) / page_size), 1)
+
+
 def get_graph_config(
           configurations: list[dict],
           x_variable: str | None,
@@ -257,6 +565,20 @@ def create_title_and_labels(  # noqa
     return title, graph_labels
 
 
+def create_data_prep(data: pd.DataFrame, engine: str = 'pandas') -> PandasDataPrep:
+    """
+    Create the object that prepares the graph data (see `convert_to_graph_data`) with the engine
+    ('pandas', 'duckdb', or 'polars'; 'duckdb' only changes how the data is filtered and
+    aggregated, so the data is prepared with pandas).
+    """
+    if engine == 'polars':
+        # polars is an optional dependency
+        from source.library.polars_engine import PolarsDataPrep
+        return PolarsDataPrep(data)
+    return PandasDataPrep(data)
+
+
+@timed
 def convert_to_graph_data(  # noqa: PLR0912, PLR0915
         data: pd.DataFrame,
         column_types: dict,
@@ -265,6 +587,7 @@ def convert_to_graph_data(  # noqa: PLR0912, PLR0915
         exclude_from_top_n_transformation: list[str],
         create_cohorts_from: tuple[str, str] | None,
         date_floor: str | None,
+        engine: str = 'pandas',
     ) -> tuple[pd.DataFrame, str, str]:
     """
     Numeric columns are filtered by removing missing values.
@@ -275,6 +598,10 @@ def convert_to_graph_data(  # noqa: PLR0912, PLR0915
     For `create_cohorts_from`, the first value is the x-variable, which we will create a cohorted
     column from, and the second value is the y-variable, which we will not filter on because we
     expect missing values.
+
+    The data is prepared with `create_data_prep(engine)` (see `data_prep.PandasDataPrep`); e.g.
+    if `engine` is 'polars', the top n categories and date floors are calculated with Polars (see
+    `polars_engine.PolarsDataPrep`). The results and the code are the same for every engine.
     """
     top_n_categories_code = textwrap.dedent(f"""
     def top_n_categories(series: pd.Series, n: int):
@@ -287,7 +614,7 @@ def convert_to_graph_data(  # noqa: PLR0912, PLR0915
     original_num_rows = len(data)
 
     code = ""
-    data = data[selected_variables].copy()
+    prep = create_data_prep(data[selected_variables].copy(), engine)
     # TODO: need to convert code to string and execute string
     if any(t.is_numeric(x, column_types) for x in selected_variables):
         markdown = "##### Automatic filters applied:  \n"
@@ -298,14 +625,15 @@ def convert_to_graph_data(  # noqa: PLR0912, PLR0915
         # fill missing values for string, categorical, and boolean columns with MISSING
         if t.is_discrete(variable, column_types):
             log(f"filling na for {variable}")
+            data = prep.data
             if data[variable].dtype.name == 'category':
-                if data[variable].isna().any():
+                if prep.remaining_values(variable).isna().any():
                     data[variable] = data[variable].cat.add_categories(MISSING).fillna(MISSING)
                     code += f"graph_data['{variable}'] = graph_data['{variable}'].cat.add_categories('{MISSING}').fillna(MISSING)\n"  # noqa
             elif is_bool_dtype(data[variable]):
                 data[variable] = data[variable].astype(str)
             else:
-                data[variable] = data[variable].fillna(MISSING)
+                prep.fill_missing(variable, MISSING)
                 code += f"graph_data['{variable}'] = graph_data['{variable}'].fillna('{MISSING}')\n"  # noqa
 
             exclude_from_top_n_transformation = exclude_from_top_n_transformation or []
@@ -313,11 +641,7 @@ def convert_to_graph_data(  # noqa: PLR0912, PLR0915
                 if 'top_n_categories' not in code:
                     code += top_n_categories_code
                 code += f"graph_data['{variable}'] = top_n_categories(graph_data['{variable}'], n={top_n_categories})\n"  # noqa
-                data[variable] = hp.top_n_categories(
-                    categorical=data[variable],
-                    top_n=top_n_categories,
-                    other_category=OTHER,
-                )
+                prep.top_n_categories(variable, top_n=top_n_categories, other_category=OTHER)
 
         if date_floor and t.is_date(variable, column_types):
             # convert the date to the specified date_floor
@@ -326,7 +650,8 @@ def convert_to_graph_data(  # noqa: PLR0912, PLR0915
                 # since we need to use that to calculate the conversion rates
                 continue
 
-            series = pd.to_datetime(data[variable], errors='coerce')
+            # the format of dates stored as strings is inferred from the first remaining value
+            series = pd.to_datetime(prep.remaining_values(variable), errors='coerce')
             code += f"series = pd.to_datetime(graph_data['{variable}'], errors='coerce')\n"
 
             temp_variable = None
@@ -334,44 +659,26 @@ def convert_to_graph_data(  # noqa: PLR0912, PLR0915
                 temp_variable = variable
                 variable = f"{variable} (Cohorts)"  # noqa: PLW2901
 
-            if date_floor == 'year':
-                data[variable] = series.dt.to_period('Y').dt.start_time.dt.strftime('%Y-%m-%d')
-                code += f"graph_data['{variable}'] = series.dt.to_period('Y').dt.start_time.dt.strftime('%Y-%m-%d')\n"  # noqa            
-            elif date_floor == 'quarter':
-                data[variable] = series.dt.to_period('Q').dt.start_time.dt.strftime('%Y-%m-%d')
-                code += f"graph_data['{variable}'] = series.dt.to_period('Q').dt.start_time.dt.strftime('%Y-%m-%d')\n"  # noqa
-            elif date_floor == 'month':
-                data[variable] = series.dt.to_period('M').dt.start_time.dt.strftime('%Y-%m-%d')
-                code += f"graph_data['{variable}'] = series.dt.to_period('M').dt.start_time.dt.strftime('%Y-%m-%d')\n"  # noqa
-            elif date_floor == 'week':
-                data[variable] = series.dt.to_period('W').dt.start_time.dt.strftime('%Y-%m-%d')
-                code += f"graph_data['{variable}'] = series.dt.to_period('W').dt.start_time.dt.strftime('%Y-%m-%d')\n"  # noqa
-            elif date_floor == 'day':
-                data[variable] = series.dt.strftime('%Y-%m-%d')
-                code += f"graph_data['{variable}'] = series.dt.strftime('%Y-%m-%d')\n"
-            elif date_floor == 'hour':
-                data[variable] = series.dt.strftime('%Y-%m-%d %H:00:00')
-                code += f"graph_data['{variable}'] = series.dt.strftime('%Y-%m-%d %H:00:00')\n"
-            elif date_floor == 'minute':
-                data[variable] = series.dt.strftime('%Y-%m-%d %H:%M:00')
-                code += f"graph_data['{variable}'] = series.dt.strftime('%Y-%m-%d %H:%M:00')\n"
-            elif date_floor == 'second':
-                data[variable] = series.dt.strftime('%Y-%m-%d %H:%M:%S')
-                code += f"graph_data['{variable}'] = series.dt.strftime('%Y-%m-%d %H:%M:%S')\n"
+            if date_floor in DATE_FLOOR_PERIODS:
+                floor_code = f"series.dt.to_period('{DATE_FLOOR_PERIODS[date_floor]}').dt.start_time.dt.strftime('%Y-%m-%d')"  # noqa
+            elif date_floor in DATE_FLOOR_FORMATS:
+                floor_code = f"series.dt.strftime('{DATE_FLOOR_FORMATS[date_floor]}')"
             else:
                 raise ValueError(f"Unknown date_floor: {date_floor}")
+            code += f"graph_data['{variable}'] = {floor_code}\n"
+            prep.floor_dates(variable, series, date_floor)
 
             if temp_variable:
                 variable = temp_variable  # noqa
 
         if t.is_continuous(variable, column_types):
             log(f"removing missing values for - {variable}")
-            num_values_removed = data[variable].isna().sum()
+            num_values_removed = prep.remove_missing(variable)
             if num_values_removed > 0:
                 markdown += f"- `{num_values_removed:,}` missing values have been removed from `{variable}`  \n"  # noqa
                 code += f"graph_data = graph_data[graph_data['{variable}'].notna()]\n"
-                data = data[data[variable].notna()]
 
+    data = prep.result()
     if any(t.is_numeric(x, column_types) for x in selected_variables):
         rows_remaining = len(data)
         rows_removed = original_num_rows - rows_remaining
@@ -381,6 +688,7 @@ def convert_to_graph_data(  # noqa: PLR0912, PLR0915
     return data, markdown, code
 
 
+@timed
 def get_category_orders(
         data: pd.DataFrame,
         selected_variables: list[str],
@@ -435,10 +743,6 @@ def plot_retention(
     if intervals not in ['day', 'week', 'month']:
         raise InvalidConfigurationError(f"Invalid interval selected for retention heatmap ({intervals}).")  # noqa
 
-    from helpsk.conversions import retention_matrix
-    import pandas as pd
-
-    graph_data[time_series] = pd.to_datetime(graph_data[time_series])
     retention = retention_matrix(
         df=graph_data,
         timestamp=time_series,
@@ -446,6 +750,30 @@ def plot_retention(
         intervals=intervals,
         min_events=min_events,
     )
+    return plot_retention_matrix(
+        retention=retention,
+        intervals=intervals,
+        max_periods_to_display=max_periods_to_display,
+        show_unfinished_cohorts=show_unfinished_cohorts,
+    )
+
+
+def plot_retention_matrix(
+        retention: pd.DataFrame,
+        intervals: str,
+        max_periods_to_display: int,
+        show_unfinished_cohorts: bool) -> go.Figure:
+    """
+    Plot the retention heatmap from a retention matrix (i.e. the output of `retention_matrix`, with
+    `cohort`, `# of unique ids`, and `0`, `1`, `2`, etc. columns).
+
+    The hover text, annotation text, and text colors are built with vectorized operations over the
+    whole matrix; the hover text is rendered client-side from `customdata` via `hovertemplate`
+    rather than building a string for every cell.
+    """
+    if '1' not in retention.columns:
+        # no cohort has any activity after its first period so there is nothing to plot
+        return go.Figure()
     retention = retention[retention['1'].notna()]
 
     if not show_unfinished_cohorts:
@@ -454,64 +782,75 @@ def plot_retention(
         # for columns "2" and above, remove the last non-na value
         for column in range(2, retention.shape[1] - 2):
             column = str(column)  # noqa: PLW2901
-            retention[column].last_valid_index()
             retention.loc[retention[column].last_valid_index(), column] = np.nan
 
     columns = [str(x) for x in range(1, max_periods_to_display) if str(x) in retention.columns]
-    retention_data = retention[columns]
+    retention_data = retention[columns].to_numpy(dtype=float)
     if 0 in retention_data.shape:
         return go.Figure()
+    num_rows, num_columns = retention_data.shape
+    cohorts = pd.to_datetime(retention['cohort']).dt.strftime('%Y-%m-%d').to_numpy()
+    unique_ids = retention['# of unique ids'].to_numpy(dtype=float)
     # Calculate the number of retained IDs for each cell
-    retained_ids_matrix = retention_data.to_numpy() * retention['# of unique ids'].to_numpy()[:, None]  # noqa
-    # Build the hover text
-    hover_text = []
-    for row_index in range(len(retention_data)):
-        row_hover_text = []
-        for column_index in range(len(retention_data.columns)):
-            cohort = retention['cohort'][row_index].strftime('%Y-%m-%d')
-            unique_ids = retention['# of unique ids'][row_index]
-            retained_ids = retained_ids_matrix[row_index, column_index]
-            retention_rate = retention_data.iloc[row_index, column_index]
-            text = (
-                f'Cohort: {cohort} - {intervals.capitalize()} {column_index + 1}<br>'
-                f'# of unique ids: {unique_ids:,.0f}<br>'
-                f'# of retained ids: {retained_ids:,.0f}<br>'
-                f'Retention Rate: {retention_rate:.2%}'
-            )
-            row_hover_text.append(text)
-        hover_text.append(row_hover_text)
-
-    max_retention = retention_data.max().max()
+    retained_ids = retention_data * unique_ids[:, None]
+    # customdata has a (row, column, field) shape for the heatmap and (cell, field) for the
+    # annotations; the fields are referenced in the hovertemplate by index
+    customdata = np.dstack([
+        np.broadcast_to(unique_ids[:, None], retention_data.shape),
+        retained_ids,
+    ])
+    hovertemplate = (
+        f'Cohort: %{{y}} - {intervals.capitalize()} %{{x}}<br>'
+        '# of unique ids: %{customdata[0]:,.0f}<br>'
+        '# of retained ids: %{customdata[1]:,.0f}<br>'
+        'Retention Rate: %{z:.2%}'
+        '<extra></extra>'
+    )
+    max_retention = np.nanmax(retention_data)
     fig = go.Figure(
         data=go.Heatmap(
-            z=retention_data.values,
-            x=retention_data.columns,
-            y=retention['cohort'].astype(str).tolist(),
+            z=retention_data,
+            x=columns,
+            y=cohorts,
             colorscale='Greens',
             zmin=0,
             zmax=max_retention,
-            hovertext=hover_text,
-            hoverinfo='text',
+            customdata=customdata,
+            hovertemplate=hovertemplate,
         ),
     )
     # Generate coordinates for text annotations
-    x_coords = np.tile(retention_data.columns, (len(retention_data), 1))
-    y_coords = np.tile(retention['cohort'].astype(str), (len(retention_data.columns), 1)).T
-
-    def get_text_color(value):  # noqa
-        return 'black' if value < max_retention * 0.5 else 'white'
-
-    text_color = np.vectorize(get_text_color)(retention_data.values)
-    annotations = go.Scatter(
-        x=x_coords.ravel(),
-        y=y_coords.ravel(),
-        text=np.char.mod('%.1f%%', 100 * retention_data.to_numpy()).ravel(),
-        mode='text',
-        hovertext=np.array(hover_text).ravel(),  # set hovertext to hover_text variable
-        hoverinfo='text',  # set hoverinfo to 'text' to display hover text
-        textfont={'color': text_color.ravel()},
+    x_coords = np.tile(np.array(columns), num_rows)
+    y_coords = np.repeat(cohorts, num_columns)
+    values = retention_data.ravel()
+    # format each rate as e.g. '12.3%' using integer arithmetic and vectorized string
+    # concatenation
+    tenths_of_percent = np.round(np.nan_to_num(values) * 1_000).astype(np.int64)
+    text = np.char.add(
+        np.char.add(
+            np.char.add((tenths_of_percent // 10).astype(str), '.'),
+            (tenths_of_percent % 10).astype(str),
+        ),
+        '%',
     )
-    fig.add_trace(annotations)
+    annotation_customdata = np.column_stack([customdata.reshape(-1, 2), values])
+    # one trace per text color; plotly validates per-point colors one at a time, which dominates
+    # the run time for large matrices, whereas a single color per trace is validated once;
+    # missing values (unfinished cohorts) have no annotation
+    is_dark_text = values < max_retention * 0.5
+    for text_color, mask in [
+            ('black', is_dark_text),
+            ('white', ~is_dark_text & ~np.isnan(values))]:
+        fig.add_trace(go.Scatter(
+            x=x_coords[mask],
+            y=y_coords[mask],
+            text=text[mask],
+            mode='text',
+            customdata=annotation_customdata[mask],
+            hovertemplate=hovertemplate.replace('%{z', '%{customdata[2]'),
+            textfont={'color': text_color},
+            showlegend=False,
+        ))
     fig.update_layout(
         xaxis_title=intervals.capitalize(),
         yaxis_title="Cohort",
@@ -523,6 +862,317 @@ def plot_retention(
     return fig
 
 
+def plot_cohorted_conversion_rates(
+        df: pd.DataFrame,
+        base_timestamp: str,
+        conversion_timestamp: str,
+        cohort: str,
+        intervals: list[tuple[int, str]],
+        groups: str | None = None,
+        current_datetime: str | None = None,
+        graph_type: str = 'bar',
+        show_num_records: bool = True,
+        title: str | None = None,
+        facet_col_wrap: int = 2,
+        category_orders: dict | None = None,
+        bar_mode: str = 'overlay',
+        opacity: float = 0.9,
+        height: int | None = None,
+        width: int | None = None,
+        free_y_axis: bool = True,
+        fingerprint: str | None = None) -> go.Figure:
+    """
+    Plot the cohorted conversion rates (see `cohorted_conversion_rates`) at each of the intervals.
+    Same arguments/graph as `helpsk.conversions.plot_cohorted_conversion_rates`; if `fingerprint`
+    (of `df`) is given, the conversion lags are cached.
+    """
+    import plotly.express as px
+    conversions = cohorted_conversion_rates(
+        df=df,
+        base_timestamp=base_timestamp,
+        conversion_timestamp=conversion_timestamp,
+        cohort=cohort,
+        intervals=intervals,
+        groups=groups,
+        current_datetime=current_datetime,
+        fingerprint=fingerprint,
+    )
+    if not title:
+        title = '<br><sub>This graph shows the cohorted conversion rates over time at various durations relative to the base timestamp.</sub>'  # noqa
+    # display the intervals from longest to shortest
+    intervals = sorted(intervals, key=lambda x: TIME_UNIT_SECONDS[x[1]] * x[0], reverse=True)
+    columns = [f'{value} {unit}' for value, unit in intervals]
+    labels = {
+        'value': 'Conversion Rate',
+        'variable': 'Allowed Duration',
+        cohort: 'Cohort',
+    }
+    category_orders = {**(category_orders or {}), 'variable': columns}
+    hover_data = {
+        'value': ':.2%',
+        '# of records': ':,',
+    }
+    if bar_mode is None or bar_mode == 'relative':
+        bar_mode = 'overlay'
+
+    if graph_type == 'bar':
+        fig = px.bar(
+            conversions,
+            x=cohort,
+            y=columns,
+            title=title,
+            labels=labels,
+            category_orders=category_orders,
+            facet_col=groups,
+            facet_col_wrap=facet_col_wrap,
+            hover_data=hover_data,
+            barmode=bar_mode,
+            opacity=opacity,
+            height=height,
+            width=width,
+        )
+    elif graph_type == 'line':
+        fig = px.line(
+            conversions,
+            x=cohort,
+            y=columns,
+            title=title,
+            labels=labels,
+            category_orders=category_orders,
+            facet_col=groups,
+            facet_col_wrap=facet_col_wrap,
+            hover_data=hover_data,
+            height=height,
+            width=width,
+        )
+        scatter_traces = px.scatter(
+            conversions,
+            x=cohort,
+            y=columns,
+            size='# of records' if show_num_records else None,
+            facet_col=groups,
+            facet_col_wrap=facet_col_wrap,
+            hover_data=hover_data,
+        )
+        scatter_traces.update_traces(showlegend=False)
+        for trace in scatter_traces.data:
+            fig.add_trace(trace)
+    else:
+        raise ValueError(f"Invalid graph_type: {graph_type}")
+
+    if groups and free_y_axis:
+        fig.update_yaxes(matches=None)
+        fig.for_each_yaxis(lambda yaxis: yaxis.update(showticklabels=True))
+    fig.update_yaxes(tickformat=',.1%')
+    return fig
+
+
+def plot_cohorted_adoption_rates(
+        df: pd.DataFrame,
+        base_timestamp: str,
+        conversion_timestamp: str,
+        cohort: str,
+        n_units: int,
+        units: str,
+        last_x_cohorts: int = 15,
+        groups: str | None = None,
+        current_datetime: str | None = None,
+        show_unfinished_cohorts: bool = True,
+        title: str | None = None,
+        facet_col_wrap: int = 2,
+        category_orders: dict | None = None,
+        height: int | None = None,
+        width: int | None = None,
+        free_y_axis: bool = True,
+        fingerprint: str | None = None) -> go.Figure:
+    """
+    Plot the cohorted adoption rates (see `cohorted_adoption_rates`) of the most recent cohorts.
+    Same arguments/graph as `helpsk.conversions.plot_cohorted_adoption_rates`; if `fingerprint`
+    (of `df`) is given, the conversion lags are cached.
+    """
+    import plotly.express as px
+    adoption = cohorted_adoption_rates(
+        df=df,
+        base_timestamp=base_timestamp,
+        conversion_timestamp=conversion_timestamp,
+        cohort=cohort,
+        n_units=n_units,
+        units=units,
+        last_x_cohorts=last_x_cohorts,
+        groups=groups,
+        current_datetime=current_datetime,
+        fingerprint=fingerprint,
+    )
+    if not title:
+        title = '<br><sub>This graph shows the cohorted adoption rates over time.</sub>'
+    labels = {
+        'index': f'# of {units} since `{base_timestamp}`',
+        'Conversion Rate': 'Cumulative Conversion Rate',
+    }
+    hover_data = {
+        '# of records': ':,',
+        'Converted': ':,',
+        'Conversion Rate': ':.2%',
+    }
+    fig = px.line(
+        adoption,
+        x='index',
+        y='Conversion Rate',
+        color=cohort,
+        symbol='Is Finished' if show_unfinished_cohorts else None,
+        symbol_map={True: 'hash', False: 'diamond'} if show_unfinished_cohorts else None,
+        title=title,
+        labels=labels,
+        category_orders=category_orders,
+        facet_col=groups,
+        facet_col_wrap=facet_col_wrap,
+        hover_data=hover_data,
+        height=height,
+        width=width,
+    )
+    if groups and free_y_axis:
+        fig.update_yaxes(matches=None)
+        fig.for_each_yaxis(lambda yaxis: yaxis.update(showticklabels=True))
+    fig.update_yaxes(tickformat=',.1%')
+    return fig
+
+
+@lru_cache(maxsize=256)
+def _cut_bins(min_value: float, max_value: float, n_bins: int) -> tuple[np.ndarray, pd.Index]:
+    """
+    Return the bin edges and the interval categories that `pd.cut(series, bins=n_bins)` creates;
+    these only depend on the min/max of the series.
+    """
+    binned, bins = pd.cut(np.array([min_value, max_value]), bins=n_bins, retbins=True)
+    return bins, binned.categories
+
+
+def cut_numeric(series: pd.Series, n_bins: int) -> pd.Series:
+    """
+    Equivalent to `pd.cut(series, bins=n_bins)`. The bin edges/categories are cached per
+    (min, max, n_bins) and the values are assigned to the bins with `np.searchsorted`.
+    """
+    values = series.to_numpy(dtype=float, na_value=np.nan)
+    if np.isnan(values).all():
+        return pd.cut(series, bins=n_bins)
+    bins, categories = _cut_bins(float(np.nanmin(values)), float(np.nanmax(values)), n_bins)
+    # intervals are closed on the right, so a value equal to an edge belongs to the lower bin
+    codes = bins.searchsorted(values, side='left') - 1
+    codes[(codes < 0) | (codes >= n_bins)] = -1  # missing values are sorted to the end
+    return pd.Series(
+        pd.Categorical.from_codes(codes, dtype=pd.CategoricalDtype(categories, ordered=True)),
+        index=series.index,
+        name=series.name,
+    )
+
+
+def conditional_probabilities(
+        data: pd.DataFrame,
+        groupby_variables: list[str],
+        y_variable: str,
+        y_graph_name: str) -> pd.DataFrame:
+    """
+    Calculate P(y_variable | groupby_variables) and the number of records for each combination of
+    values. Returns a dataframe with the `groupby_variables`, `y_variable`, `y_graph_name` (the
+    probability) and `# Records` columns; rows with missing values are ignored.
+
+    Each column is converted to integer codes (categories are kept in order) and the combinations
+    of codes are counted once (with `np.bincount`); both the probabilities and the record counts
+    are derived from those counts.
+    """
+    columns = [*groupby_variables, y_variable]
+    all_codes = []
+    all_uniques = []
+    for column in columns:
+        codes, uniques = pd.factorize(data[column], sort=True)
+        all_codes.append(codes.astype(np.int64))
+        all_uniques.append(uniques)
+    sizes = [max(len(x), 1) for x in all_uniques]
+    is_valid = np.logical_and.reduce([codes >= 0 for codes in all_codes])
+    combined_codes = np.zeros(is_valid.sum(), dtype=np.int64)
+    for codes, size in zip(all_codes, sizes):
+        combined_codes = combined_codes * size + codes[is_valid]
+    num_combinations = math.prod(sizes)
+    if num_combinations <= max(len(combined_codes), 1_000_000):
+        counts = np.bincount(combined_codes, minlength=num_combinations)
+        combinations = np.flatnonzero(counts)
+        num_records = counts[combinations]
+    else:
+        # too many possible combinations (high-cardinality columns) to count into a dense array
+        combinations, num_records = np.unique(combined_codes, return_counts=True)
+    group_indexes, y_indexes = np.divmod(combinations, sizes[-1])
+    # combinations are sorted, so the rows of each group are contiguous
+    group_starts = np.flatnonzero(np.diff(group_indexes, prepend=-1))
+    group_totals = np.repeat(
+        np.add.reduceat(num_records, group_starts) if len(group_starts) > 0 else num_records,
+        np.diff(np.append(group_starts, len(group_indexes))),
+    )
+    # within each group, order the values of y by count (descending), like `value_counts`
+    order = np.lexsort((y_indexes, -num_records, group_indexes))
+    group_indexes = group_indexes[order]
+    y_indexes = y_indexes[order]
+    num_records = num_records[order]
+    group_totals = group_totals[order]
+
+    probabilities = pd.DataFrame({
+        column: uniques.take(codes)
+        for column, uniques, codes in zip(
+            columns,
+            all_uniques,
+            [*np.unravel_index(group_indexes, sizes[:-1]), y_indexes],
+        )
+    })
+    probabilities[y_graph_name] = num_records / group_totals
+    probabilities['# Records'] = num_records
+    return probabilities
+
+
+@timed
+def create_histogram_bins_code(
+        x_variable: str,
+        group_by: list[str],
+        y_variable: str | None,
+        aggregation: str | None,
+        n_bins: int | None) -> tuple[str, str]:
+    """
+    Create the code that bins the numeric `x_variable` of `graph_data` into `n_bins` bins of equal
+    width (the bins of `np.histogram`) and aggregates the rows (one row per bin and combination of
+    the `group_by` values); `x_variable` is set to the midpoints of the bins and the code defines
+    `bin_edges`. Returns the code and the name of the aggregated column; it is `y_variable`
+    aggregated with `aggregation` (one of PANDAS_AGGREGATIONS; defaults to 'sum' like plotly), or
+    `count` (the number of rows) if `y_variable` is None.
+    """
+    group_by = list(dict.fromkeys([x_variable, *group_by]))
+    if y_variable is None:
+        column = 'count'
+        while column in group_by:
+            column = f'_{column}'
+        aggregated = (x_variable, 'size')
+    else:
+        column = y_variable
+        aggregated = (y_variable, PANDAS_AGGREGATIONS[aggregation or 'sum'])
+    bins = n_bins or DEFAULT_HISTOGRAM_BINS
+    code = textwrap.dedent(f"""
+    import numpy as np
+    # bin the rows (the bins of np.histogram) so that one row per bin is sent to the browser
+    graph_data = graph_data[graph_data[{x_variable!r}].notna()]
+    bin_edges = np.histogram_bin_edges(graph_data[{x_variable!r}], bins={bins!r})
+    bin_index = np.clip(
+        np.searchsorted(bin_edges, graph_data[{x_variable!r}], side='right') - 1,
+        0,
+        len(bin_edges) - 2,
+    )
+    graph_data = (
+        graph_data
+        .assign(**{{{x_variable!r}: (bin_edges[:-1] + np.diff(bin_edges) / 2)[bin_index]}})
+        .groupby({group_by!r}, observed=True, dropna=False)
+        .agg(**{{{column!r}: {aggregated!r}}})
+        .reset_index()
+    )
+    """)
+    return code, column
+
+
 def generate_graph(  # noqa: PLR0912, PLR0915
         data: pd.DataFrame,
         graph_type: str,
@@ -556,10 +1206,34 @@ def generate_graph(  # noqa: PLR0912, PLR0915
         title: str | None,
         graph_labels: dict | None,
         column_types: dict,
+        count_distinct_precision: int | None = None,
+        engine: str = 'pandas',
+        webgl_point_threshold: int | None = WEBGL_POINT_THRESHOLD,
+        fingerprint: str | None = None,
+        bin_histogram: bool = False,
     ) -> tuple[go.Figure, str]:
     """
     Generate a graph based on the selected variables. Returns the graph and the code.
     The code is a string that can be used to recreate the graph.
+
+    `count_distinct_precision` is only used by the count-distinct graphs; if None the distinct
+    counts are exact, otherwise they are approximated with HyperLogLog sketches with
+    2**count_distinct_precision registers per group.
+
+    If `engine` is 'duckdb', the aggregation of histograms with a non-numeric x-variable is
+    pushed down to a DuckDB GROUP BY query (see `duckdb_engine.create_aggregation_code`) and
+    plotly only sums the aggregated rows. If `bin_histogram` is True, the rows of histograms with a
+    numeric x-variable are binned (and aggregated) on the server (see
+    `create_histogram_bins_code`) rather than in the browser.
+
+    Scatter and line graphs with more than `webgl_point_threshold` rows (across all colors and
+    facets, so that every trace uses the same mode) are rendered with WebGL rather than SVG; None
+    always renders SVG.
+
+    `fingerprint` is the fingerprint of `data`; if given, the cohorted conversion/adoption rate
+    graphs cache the conversion lags of the data (see `conversions.get_conversion_lags`), so
+    changing the intervals or the number of cohorts doesn't rescan the rows. The fingerprint is
+    only passed to the graph that is returned, not to the generated code.
     """
     fig = None
     graph_data = data
@@ -587,6 +1261,10 @@ def generate_graph(  # noqa: PLR0912, PLR0915
             return code
         return ""
 
+    if count_distinct_precision and graph_type in ['bar - count distinct', 'heatmap - count distinct']:  # noqa
+        error = hyperloglog_error(count_distinct_precision)
+        title = (title or '') + f"<br><sub>Approximate distinct counts (HyperLogLog, precision {count_distinct_precision}); standard error of ±{error:.1%}</sub>"  # noqa
+
     for variable in list({color_variable, size_variable, facet_variable}):
         # plotly express complains if you try to use a categorical series where the categories are
         # not in the data.
@@ -596,6 +1274,10 @@ def generate_graph(  # noqa: PLR0912, PLR0915
         if variable and data[variable].dtype.name == 'category':
             graph_code += remove_unused_categories(variable)
 
+    render_mode = 'svg'
+    if webgl_point_threshold is not None and len(data) > webgl_point_threshold:
+        render_mode = 'webgl'
+
     if graph_type == 'scatter':
         graph_code += textwrap.dedent(f"""
         import plotly.express as px
@@ -613,6 +1295,7 @@ def generate_graph(  # noqa: PLR0912, PLR0915
             log_y={log_y_axis},
             marginal_x={"'histogram'" if show_axes_histogram else None},
             marginal_y={"'histogram'" if show_axes_histogram else None},
+            render_mode='{render_mode}',
             title={f'"{title}"' if title else None},
             labels={graph_labels},
         )
@@ -669,6 +1352,7 @@ def generate_graph(  # noqa: PLR0912, PLR0915
             category_orders={category_orders},
             log_x={log_x_axis},
             log_y={log_y_axis},
+            render_mode='{render_mode}',
             title={f'"{title}"' if title else None},
             labels={graph_labels},
         )
@@ -678,7 +1362,44 @@ def generate_graph(  # noqa: PLR0912, PLR0915
         if not color_variable:
             bar_mode = 'relative'
 
-        if t.is_numeric(y_variable, column_types):
+        histogram_y_variable = y_variable
+        yaxis_title = None
+        is_binned = (
+            bin_histogram
+            and t.is_numeric(x_variable, column_types)
+            and (not y_variable or t.is_numeric(y_variable, column_types))
+        )
+        if is_binned or (
+            engine == 'duckdb'
+            and x_variable
+            and not t.is_numeric(x_variable, column_types)
+            and (not y_variable or t.is_numeric(y_variable, column_types))
+        ):
+            # aggregate with DuckDB or bin on the server (one row per x/color/facet value) and sum
+            # the aggregated values in plotly
+            if is_binned:
+                aggregation_code, histogram_y_variable = create_histogram_bins_code(
+                    x_variable=x_variable,
+                    group_by=[x for x in [color_variable, facet_variable] if x],
+                    y_variable=y_variable,
+                    aggregation=numeric_aggregation,
+                    n_bins=n_bins,
+                )
+            else:
+                aggregation_code, histogram_y_variable = create_aggregation_code(
+                    group_by=[x for x in [x_variable, color_variable, facet_variable] if x],
+                    y_variable=y_variable,
+                    aggregation=numeric_aggregation,
+                )
+            graph_code += aggregation_code
+            # the axis title plotly uses for the aggregation (rather than `sum of ...`)
+            if y_variable:
+                y_label = (graph_labels or {}).get(y_variable, y_variable)
+                yaxis_title = f"{numeric_aggregation or 'sum'} of {y_label}"
+            else:
+                yaxis_title = 'count'
+            numeric_aggregation = "'sum'"
+        elif t.is_numeric(y_variable, column_types):
             numeric_aggregation = f"'{numeric_aggregation}'" if numeric_aggregation else None
         else:
             numeric_aggregation = None
@@ -700,7 +1421,7 @@ def generate_graph(  # noqa: PLR0912, PLR0915
         fig = px.histogram(
             graph_data,
             x={f"'{x_variable}'" if x_variable else None},
-            y={f"'{y_variable}'" if y_variable else None},
+            y={f"'{histogram_y_variable}'" if histogram_y_variable else None},
             color={f"'{color_variable}'" if color_variable else None},
             opacity={opacity},
             nbins={n_bins},
@@ -725,6 +1446,11 @@ def generate_graph(  # noqa: PLR0912, PLR0915
 
         if t.is_date(x_variable, column_types):
             graph_code += "fig.update_xaxes(type='category')\n"
+        if is_binned:
+            # the bins of the binned rows (one row per bin, so the values aren't binned again)
+            graph_code += "fig.update_traces(xbins={'start': bin_edges[0], 'end': bin_edges[-1], 'size': bin_edges[1] - bin_edges[0]})\n"  # noqa: E501
+        if yaxis_title:
+            graph_code += f"fig.for_each_yaxis(lambda yaxis: yaxis.update(title_text={yaxis_title!r}) if yaxis.title.text else None)\n"  # noqa
 
         graph_code += "fig\n"
     elif graph_type in ['bar', 'bar - count distinct']:
@@ -740,11 +1466,12 @@ def generate_graph(  # noqa: PLR0912, PLR0915
             ]
             selected_variables = list(set(selected_variables))
             graph_code += textwrap.dedent(f"""
-            graph_data = (
-                graph_data
-                .groupby({selected_variables})
-                .agg({{'{y_variable}': 'nunique'}})
-                .reset_index()
+            from source.library.count_distinct import count_distinct
+            graph_data = count_distinct(
+                graph_data,
+                group_by={selected_variables},
+                column='{y_variable}',
+                precision={count_distinct_precision or None},
             )
             """)
         graph_code += textwrap.dedent(f"""
@@ -793,9 +1520,24 @@ def generate_graph(  # noqa: PLR0912, PLR0915
             labels={graph_labels},
         )
         """)
+    elif graph_type == 'scatter - rasterized':
+        graph_code += textwrap.dedent(f"""
+        from source.library.rasterize import plot_rasterized_scatter
+        fig = plot_rasterized_scatter(
+            graph_data,
+            x='{x_variable}',
+            y='{y_variable}',
+            color={f"'{color_variable}'" if color_variable else None},
+            resolution={n_bins or None},
+            category_orders={category_orders},
+            title={f'"{title}"' if title else None},
+            labels={graph_labels},
+        )
+        fig
+        """)
     elif graph_type == 'retention':
         graph_code += textwrap.dedent(f"""
-        from helpsk.conversions import retention_matrix
+        from source.library.dash_utilities import plot_retention
         import pandas as pd
         graph_data['{x_variable}'] = pd.to_datetime(graph_data['{x_variable}'])
         fig = plot_retention(
@@ -811,7 +1553,7 @@ def generate_graph(  # noqa: PLR0912, PLR0915
     elif graph_type == 'P(Y | X)':
         graph_code += textwrap.dedent(f"""
         import plotly.express as px
-        import pandas as pd
+        from source.library.dash_utilities import conditional_probabilities, cut_numeric
 
         groupby_variables = {f"['{facet_variable}', '{x_variable}']" if facet_variable else f"['{x_variable}']"}
         """)  # noqa: E501
@@ -819,29 +1561,17 @@ def generate_graph(  # noqa: PLR0912, PLR0915
         if not n_bins:
             n_bins = 5
         if t.is_numeric(x_variable, column_types):
-            graph_code += f"graph_data['{x_variable}'] = pd.cut(graph_data['{x_variable}'], bins={n_bins})\n"  # noqa
+            graph_code += f"graph_data['{x_variable}'] = cut_numeric(graph_data['{x_variable}'], n_bins={n_bins})\n"  # noqa
         if t.is_numeric(facet_variable, column_types):
-            graph_code += f"graph_data['{facet_variable}'] = pd.cut(graph_data['{facet_variable}'], bins={n_bins})\n"  # noqa
+            graph_code += f"graph_data['{facet_variable}'] = cut_numeric(graph_data['{facet_variable}'], n_bins={n_bins})\n"  # noqa
 
         graph_code += textwrap.dedent(f"""
         y_graph_name = 'P({y_variable} | {x_variable})'
-        df = (
-            graph_data
-            .groupby(groupby_variables, observed=False)['{y_variable}']
-            .value_counts(normalize=True)
-            .reset_index(name=y_graph_name)
-        )
-        record_counts = (
-            graph_data
-            .groupby(groupby_variables + ['{y_variable}'], observed=False)
-            .size()
-            .reset_index(name='# Records')
-        )
-        df = pd.merge(
-            df,
-            record_counts,
-            on=groupby_variables + ['{y_variable}'],
-            how='inner',
+        df = conditional_probabilities(
+            graph_data,
+            groupby_variables=groupby_variables,
+            y_variable='{y_variable}',
+            y_graph_name=y_graph_name,
         )
         """)
 
@@ -909,8 +1639,23 @@ def generate_graph(  # noqa: PLR0912, PLR0915
             x for x in [x_variable, y_variable, z_variable, facet_variable]
             if x is not None
         ]
-        selected_variables = list(set(selected_variables))
-        graph_code += f"graph_data = graph_data[{selected_variables}].drop_duplicates()\n"
+        group_by = list(dict.fromkeys(x for x in selected_variables if x != z_variable))
+        if z_variable in [x_variable, y_variable, facet_variable]:
+            # each combination of the other variables has exactly one distinct value of z
+            histfunc = 'count'
+            selected_variables = list(dict.fromkeys(selected_variables))
+            graph_code += f"graph_data = graph_data[{selected_variables}].drop_duplicates()\n"
+        else:
+            histfunc = 'sum'
+            graph_code += textwrap.dedent(f"""
+            from source.library.count_distinct import count_distinct
+            graph_data = count_distinct(
+                graph_data,
+                group_by={group_by},
+                column='{z_variable}',
+                precision={count_distinct_precision or None},
+            )
+            """)
         graph_code += textwrap.dedent(f"""
         import plotly.express as px
         fig = px.density_heatmap(
@@ -918,7 +1663,7 @@ def generate_graph(  # noqa: PLR0912, PLR0915
             x={f"'{x_variable}'"},
             y={f"'{y_variable}'"},
             z={f"'{z_variable}'"},
-            histfunc='count',
+            histfunc='{histfunc}',
             facet_col={f"'{facet_variable}'" if facet_variable else None},
             facet_col_wrap={num_facet_columns},
             category_orders={category_orders},
@@ -939,7 +1684,8 @@ def generate_graph(  # noqa: PLR0912, PLR0915
         ]
         cohorted_graph_type = 'line' if bar_mode == 'relative' else 'bar'
         graph_code += textwrap.dedent(f"""
-        from helpsk.conversions import plot_cohorted_conversion_rates
+        from source.library.dash_utilities import plot_cohorted_conversion_rates
+        import pandas as pd
         graph_data['{x_variable}'] = pd.to_datetime(graph_data['{x_variable}'])
         graph_data['{y_variable}'] = pd.to_datetime(graph_data['{y_variable}'])
         fig = plot_cohorted_conversion_rates(
@@ -970,7 +1716,8 @@ def generate_graph(  # noqa: PLR0912, PLR0915
         log(f"{x_variable} (Cohorts)" in graph_data.columns)
 
         graph_code += textwrap.dedent(f"""
-        from helpsk.conversions import plot_cohorted_adoption_rates
+        from source.library.dash_utilities import plot_cohorted_adoption_rates
+        import pandas as pd
         graph_data['{x_variable}'] = pd.to_datetime(graph_data['{x_variable}'])
         graph_data['{y_variable}'] = pd.to_datetime(graph_data['{y_variable}'])
         fig = plot_cohorted_adoption_rates(
@@ -1009,8 +1756,226 @@ def generate_graph(  # noqa: PLR0912, PLR0915
     if 'Timestamp' in graph_code:
         log("Timestamp found in graph_code")
         raise ValueError(f"Timestamp found in graph_code {graph_code}")
+    live_code = graph_code
+    if fingerprint and graph_type in ['cohorted conversion rates', 'cohorted adoption rates']:
+        # the conversion lags are cached by the fingerprint of `data`; it's only passed to the live
+        # call (the generated code can be run on other data)
+        live_code = graph_code.replace(
+            "    free_y_axis=False,\n)\n",
+            f"    free_y_axis=False,\n    fingerprint={fingerprint!r},\n)\n",
+        )
     local_vars = locals()
     global_vars = globals()
-    exec(graph_code, global_vars, local_vars)
+    exec(live_code, global_vars, local_vars)
     fig = local_vars['fig']
     return fig, graph_code
+
+
+def get_relayout_range(
+        relayout_data: dict | None,
+        axis: str = 'xaxis') -> tuple[bool, list | None]:
+    """
+    Return whether the range of the axis (e.g. 'xaxis') changed in a relayout event of a graph
+    (`relayoutData`; e.g. zooming, panning, or resetting the axes) and the new range, which is
+    None if the axis was reset (autorange).
+    """
+    relayout_data = relayout_data or {}
+    if relayout_data.get(f'{axis}.autorange'):
+        return True, None
+    if f'{axis}.range' in relayout_data:
+        return True, list(relayout_data[f'{axis}.range'])
+    if f'{axis}.range[0]' in relayout_data and f'{axis}.range[1]' in relayout_data:
+        return True, [relayout_data[f'{axis}.range[0]'], relayout_data[f'{axis}.range[1]']]
+    return False, None
+
+
+def get_zoom_date_range(
+        graph_type: str,
+        x_range: list,
+        x_values: pd.Series) -> tuple[pd.Timestamp, pd.Timestamp | None] | None:
+    """
+    Return the [start, end) range of the dates that are visible after zooming into the x-axis
+    (`x_range`; see `get_relayout_range`) of a histogram or line graph of dates, or None if no
+    dates are visible. `end` is None if the last date is visible.
+
+    `x_values` are the (floored) dates of the graph. The x-axis of histograms is categorical (the
+    sorted floored dates), so the range is the positions of the categories, and the visible dates
+    are the dates from the first visible category up to (excluding) the first category after the
+    range. The x-axis of line graphs is dates.
+    """
+    if graph_type == 'line':
+        return pd.Timestamp(x_range[0]), pd.Timestamp(x_range[1])
+    categories = np.sort(pd.to_datetime(x_values, errors='coerce').dropna().unique())
+    first = max(math.ceil(min(x_range)), 0)
+    last = min(math.floor(max(x_range)), len(categories) - 1)
+    if first > last:
+        return None
+    end = pd.Timestamp(categories[last + 1]) if last + 1 < len(categories) else None
+    return pd.Timestamp(categories[first]), end
+
+
+def get_zoom_date_floor(
+        date_floor: str,
+        start: pd.Timestamp,
+        end: pd.Timestamp,
+        finest_date_floor: str = 'second',
+        min_periods: int = MIN_ZOOM_PERIODS) -> str:
+    """
+    Return the date floor to re-aggregate the dates in the range [`start`, `end`) with after
+    zooming: the coarsest date floor (no coarser than `date_floor` and no finer than
+    `finest_date_floor`) with at least `min_periods` periods in the range.
+    """
+    date_floors = list(DATE_FLOOR_LENGTHS)
+    date_floors = date_floors[
+        date_floors.index(date_floor):date_floors.index(finest_date_floor) + 1
+    ] or [date_floor]
+    for floor in date_floors:
+        if (end - start) / DATE_FLOOR_LENGTHS[floor] >= min_periods:
+            return floor
+    return date_floors[-1]
+
+
+def get_figure_size(fig: go.Figure | dict) -> int:
+    """Return the size (bytes) of the figure serialized to JSON, as it is sent to the browser."""
+    return len(pio.to_json(fig, validate=False).encode())
+
+
+def format_bytes(num_bytes: float) -> str:
+    """Format the number of bytes (e.g. `1.5 MB`)."""
+    for unit in ['B', 'KB', 'MB']:
+        if num_bytes < 1_000:
+            return f"{num_bytes:,.0f} {unit}" if unit == 'B' else f"{num_bytes:,.1f} {unit}"
+        num_bytes /= 1_000
+    return f"{num_bytes:,.1f} GB"
+
+
+def estimate_figure_size(data: pd.DataFrame, **kwargs: object) -> float:
+    """
+    Estimate the size (bytes) of the serialized figure of all of the rows (`kwargs` are passed to
+    `generate_graph`) from the figures of random samples of SIZE_ESTIMATE_ROWS and
+    2 * SIZE_ESTIMATE_ROWS rows, assuming the size is linear in the number of rows. If the rows
+    are aggregated (e.g. a line graph of the totals per date), the size of the samples is about
+    the same and so is the estimate.
+    """
+    sample = data.sample(n=2 * SIZE_ESTIMATE_ROWS, random_state=42)
+    sizes = []
+    for num_rows in [SIZE_ESTIMATE_ROWS, 2 * SIZE_ESTIMATE_ROWS]:
+        fig, _ = generate_graph(
+            data=sample.iloc[:num_rows].sort_index(),
+            **(kwargs | {'fingerprint': None}),
+        )
+        sizes.append(get_figure_size(fig))
+    bytes_per_row = max((sizes[1] - sizes[0]) / SIZE_ESTIMATE_ROWS, 0)
+    return sizes[1] + bytes_per_row * (len(data) - 2 * SIZE_ESTIMATE_ROWS)
+
+
+def generate_graph_with_size_limit(  # noqa: PLR0912
+        max_figure_size: int | None,
+        **kwargs: object) -> tuple[go.Figure, str, pd.DataFrame, str]:
+    """
+    Generate the graph (`kwargs` are passed to `generate_graph`) and measure the size of the
+    serialized figure. If the figure is larger than `max_figure_size` (bytes; None for no limit),
+    a random sample of the rows is graphed if the graph has a point per row
+    (`SAMPLED_GRAPH_TYPES`), histograms of numeric values are binned on the server, or histograms
+    of non-numeric values are aggregated with DuckDB (if it's installed) rather than in the
+    browser; otherwise (or if the figure is still too large),
+    FigureTooLargeError is raised with the options that make the figure smaller.
+
+    For large datasets (see `SIZE_ESTIMATE_GRAPH_TYPES`), the size of the figure is estimated
+    first (see `estimate_figure_size`) and the figure of all of the rows is only built if the
+    estimate is within the limit.
+
+    Returns the figure, the code (including the sampling), the data that was graphed, and a
+    description of the size of the figure.
+    """
+    data = kwargs.pop('data')
+    graph_type = kwargs['graph_type']
+    figure_size = None
+    if (
+        max_figure_size is not None
+        and graph_type in SIZE_ESTIMATE_GRAPH_TYPES
+        and len(data) >= 10 * SIZE_ESTIMATE_ROWS
+    ):
+        figure_size = estimate_figure_size(data, **kwargs)
+        log(f"Estimated figure size: {format_bytes(figure_size)}")
+    is_estimate = figure_size is not None and figure_size > max_figure_size
+    if not is_estimate:
+        fig, graph_code = generate_graph(data=data, **kwargs)
+        figure_size = get_figure_size(fig)
+        if max_figure_size is None or figure_size <= max_figure_size:
+            return fig, graph_code, data, f"Figure size: {format_bytes(figure_size)}"
+    # e.g. "about 50.0 MB" if the figure of all of the rows wasn't built
+    full_figure_size = f"{'about ' if is_estimate else ''}{format_bytes(figure_size)}"
+
+    description = (
+        f"The graph is {full_figure_size}, which is larger than the maximum of "
+        f"{format_bytes(max_figure_size)} (MAX_FIGURE_SIZE_MB) that is sent to the browser."
+    )
+    x_variable = kwargs.get('x_variable')
+    column_types = kwargs['column_types']
+    if (
+        graph_type == 'histogram'
+        and t.is_numeric(x_variable, column_types)
+        and not kwargs.get('bin_histogram')
+    ):
+        # plotly bins the rows in the browser; bin the rows on the server instead (i.e. one row
+        # per bin/color/facet value is sent)
+        fig, graph_code = generate_graph(data=data, **(kwargs | {'bin_histogram': True}))
+        binned_figure_size = get_figure_size(fig)
+        if binned_figure_size <= max_figure_size:
+            return fig, graph_code, data, (
+                f"Figure size: {format_bytes(binned_figure_size)} (binned on the server; the "
+                f"graph of all rows is {full_figure_size})"
+            )
+    if (
+        graph_type == 'histogram'
+        and kwargs.get('engine', 'pandas') != 'duckdb'
+        and x_variable
+        and not t.is_numeric(x_variable, column_types)
+        and importlib.util.find_spec('duckdb') is not None
+    ):
+        # plotly bins the rows in the browser; aggregate the rows with DuckDB instead (i.e. one row
+        # per x/color/facet value is sent)
+        fig, graph_code = generate_graph(data=data, **(kwargs | {'engine': 'duckdb'}))
+        aggregated_figure_size = get_figure_size(fig)
+        if aggregated_figure_size <= max_figure_size:
+            return fig, graph_code, data, (
+                f"Figure size: {format_bytes(aggregated_figure_size)} (aggregated with DuckDB; "
+                f"the graph of all rows is {full_figure_size})"
+            )
+    if graph_type in SAMPLED_GRAPH_TYPES and len(data) > 1:
+        # the size of the figure is ~linear in the number of rows; the first sample assumes the
+        # size is proportional to the number of rows and the second sample accounts for the size
+        # that doesn't depend on the rows (e.g. the layout), which is estimated from the first
+        target_size = max_figure_size * 0.9
+        num_rows = max(int(len(data) * target_size / figure_size), 1)
+        # the fingerprint is the fingerprint of all of the rows
+        kwargs['fingerprint'] = None
+        for _ in range(2):
+            sample_code = f"graph_data = graph_data.sample(n={num_rows}, random_state=42).sort_index()\n"  # noqa: E501
+            sample = data.sample(n=num_rows, random_state=42).sort_index()
+            fig, graph_code = generate_graph(data=sample, **kwargs)
+            sampled_figure_size = get_figure_size(fig)
+            if sampled_figure_size <= max_figure_size:
+                return fig, sample_code + graph_code, sample, (
+                    f"Figure size: {format_bytes(sampled_figure_size)} (a random sample of "
+                    f"{num_rows:,} of {len(data):,} rows; the graph of all rows is "
+                    f"{full_figure_size})"
+                )
+            bytes_per_row = (figure_size - sampled_figure_size) / (len(data) - num_rows)
+            fixed_size = sampled_figure_size - bytes_per_row * num_rows
+            if bytes_per_row <= 0 or fixed_size >= target_size:
+                break
+            num_rows = max(min(int((target_size - fixed_size) / bytes_per_row), num_rows - 1), 1)
+    suggestions = []
+    if kwargs.get('facet_variable'):
+        suggestions.append(f"remove the facet variable (`{kwargs['facet_variable']}`)")
+    if graph_type not in SAMPLED_GRAPH_TYPES and any(
+        t.is_discrete(kwargs.get(variable), column_types)
+        for variable in ['x_variable', 'y_variable']
+    ):
+        # Top N Categories only applies to the non-numeric (categorical) axes
+        suggestions.append("select fewer categories (Top N Categories)")
+    suggestions.append("filter the data")
+    suggestions.append("increase MAX_FIGURE_SIZE_MB")
+    raise FigureTooLargeError(f"{description} To graph the data, {', '.join(suggestions[:-1])}, or {suggestions[-1]}.")  # noqa: E501
@@ -0,0 +1,102 @@
+"""
+The date floors and the operations used by `dash_utilities.convert_to_graph_data` to prepare the
+graph data (filling missing values, the top n categories, the date floors, and removing the rows
+with missing values).
+
+`PandasDataPrep` prepares the data with pandas. The optional engines (e.g.
+`polars_engine.PolarsDataPrep`) subclass it and override the operations they calculate
+differently; the results and the generated code are the same for every engine.
+"""
+import pandas as pd
+import helpsk.pandas as hp
+
+
+# the pandas periods of the date floors that are the start of the period (e.g. the start of the
+# month) and the formats of the date floors that truncate the date (e.g. to the hour)
+DATE_FLOOR_PERIODS = {
+    'year': 'Y',
+    'quarter': 'Q',
+    'month': 'M',
+    'week': 'W',
+}
+DATE_FLOOR_FORMATS = {
+    'day': '%Y-%m-%d',
+    'hour': '%Y-%m-%d %H:00:00',
+    'minute': '%Y-%m-%d %H:%M:00',
+    'second': '%Y-%m-%d %H:%M:%S',
+}
+# the date floors from the coarsest to the finest and the (approximate) length of their periods
+DATE_FLOOR_LENGTHS = {
+    'year': pd.Timedelta(days=365),
+    'quarter': pd.Timedelta(days=91),
+    'month': pd.Timedelta(days=30),
+    'week': pd.Timedelta(days=7),
+    'day': pd.Timedelta(days=1),
+    'hour': pd.Timedelta(hours=1),
+    'minute': pd.Timedelta(minutes=1),
+    'second': pd.Timedelta(seconds=1),
+}
+
+
+def floor_dates(series: pd.Series, date_floor: str) -> pd.Series:
+    """
+    Return the dates (datetimes) floored to the start of the year/quarter/month/week or truncated
+    to the day/hour/minute/second, formatted as strings (missing values are NaN).
+    """
+    if date_floor in DATE_FLOOR_PERIODS:
+        return series.dt.to_period(DATE_FLOOR_PERIODS[date_floor]).dt.start_time.dt.strftime('%Y-%m-%d')  # noqa
+    if date_floor in DATE_FLOOR_FORMATS:
+        return series.dt.strftime(DATE_FLOOR_FORMATS[date_floor])
+    raise ValueError(f"Unknown date_floor: {date_floor}")
+
+
+class PandasDataPrep:
+    """
+    Prepares the graph data with pandas; the rows with missing values are removed from `data` as
+    each variable is processed.
+    """
+
+    def __init__(self, data: pd.DataFrame):
+        """
+        Args:
+            data: the (copy of the) data that is prepared; the columns are updated in place.
+        """
+        self.data = data
+
+    def remaining_values(self, variable: str) -> pd.Series:
+        """Return the values of the variable in the rows that haven't been removed."""
+        return self.data[variable]
+
+    def fill_missing(self, variable: str, value: str) -> None:
+        """Replace the missing values of the (non-categorical) variable with `value`."""
+        self.data[variable] = self.data[variable].fillna(value)
+
+    def top_n_categories(self, variable: str, top_n: int, other_category: str) -> None:
+        """
+        Replace the values of the variable that aren't in the `top_n` most frequent values with
+        `other_category` (see `helpsk.pandas.top_n_categories`).
+        """
+        self.data[variable] = hp.top_n_categories(
+            categorical=self.data[variable],
+            top_n=top_n,
+            other_category=other_category,
+        )
+
+    def floor_dates(self, variable: str, series: pd.Series, date_floor: str) -> None:
+        """
+        Set the variable to the date floors (see `floor_dates`) of `series`, the dates of the rows
+        that haven't been removed.
+        """
+        self.data[variable] = floor_dates(series, date_floor)
+
+    def remove_missing(self, variable: str) -> int:
+        """Remove the rows where the variable is missing; returns the number of rows removed."""
+        is_missing = self.data[variable].isna()
+        num_removed = int(is_missing.sum())
+        if num_removed > 0:
+            self.data = self.data[~is_missing.to_numpy()]
+        return num_removed
+
+    def result(self) -> pd.DataFrame:
+        """Return the prepared data."""
+        return self.data
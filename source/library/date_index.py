@@ -0,0 +1,107 @@
+"""
+Sorted index of the date columns of a dataset for fast date range queries.
+
+`DateIndex` stores, for each date column, the order of the rows by date (an argsort of the int64
+timestamps) and the sorted timestamps. The rows in a date range are then found with two binary
+searches (`np.searchsorted`) and a slice of the order, rather than by converting and comparing the
+dates of every row. The index is built once per dataset (when the data is loaded) and reused by
+every date filter (see `utilities.filter_dataframe`); `subset` derives the index of the filtered
+rows without sorting again, which is used when zooming into dates (see
+`utilities.filter_date_range`).
+"""
+import numpy as np
+import pandas as pd
+
+
+class DateIndex:
+    """Sorted index of the date columns of a dataframe (see module docstring)."""
+
+    def __init__(self, data: pd.DataFrame, columns: list[str]):
+        """
+        Build the index of the date columns of the dataframe.
+
+        Args:
+            data: the dataframe
+            columns: the date columns (datetimes or strings that can be converted to datetimes);
+                values that can't be converted are missing
+        """
+        self.num_rows = len(data)
+        self._labels = data.index
+        # the positions of the rows sorted by date (without missing values) and the sorted dates
+        self._orders: dict[str, np.ndarray] = {}
+        self._sorted_values: dict[str, np.ndarray] = {}
+        for column in columns:
+            dates = pd.to_datetime(data[column], errors='coerce')
+            if dates.dt.tz is not None:
+                # compare the local dates/times (like `.dt.date`)
+                dates = dates.dt.tz_localize(None)
+            values = dates.to_numpy(dtype='datetime64[ns]').view(np.int64)
+            # missing values (NaT) are the smallest int64 so they are sorted first and removed
+            order = np.argsort(values, kind='stable')
+            order = order[int(dates.isna().sum()):]
+            self._orders[column] = order
+            self._sorted_values[column] = values[order]
+
+    @property
+    def columns(self) -> list[str]:
+        """The indexed columns."""
+        return list(self._orders)
+
+    def num_missing(self, column: str) -> int:
+        """Return the number of missing values of the column."""
+        return self.num_rows - len(self._orders[column])
+
+    def _slice(
+            self,
+            column: str,
+            start: str | pd.Timestamp | None,
+            end: str | pd.Timestamp | None) -> np.ndarray:
+        """Return the positions (in date order) of the rows in [start, end)."""
+        values = self._sorted_values[column]
+        first = 0 if start is None else np.searchsorted(values, pd.Timestamp(start).value)
+        last = len(values) if end is None else np.searchsorted(values, pd.Timestamp(end).value)
+        return self._orders[column][first:last]
+
+    def get_positions(
+            self,
+            column: str,
+            start: str | pd.Timestamp | None = None,
+            end: str | pd.Timestamp | None = None) -> np.ndarray:
+        """
+        Return the positions (sorted; e.g. for `data.iloc`) of the rows where the date is in
+        [`start`, `end`). None is no bound; missing dates are excluded.
+        """
+        return np.sort(self._slice(column, start, end))
+
+    def get_mask(
+            self,
+            column: str,
+            start: str | pd.Timestamp | None = None,
+            end: str | pd.Timestamp | None = None) -> np.ndarray:
+        """Return a boolean mask of the rows where the date is in [`start`, `end`)."""
+        mask = np.zeros(self.num_rows, dtype=bool)
+        mask[self._slice(column, start, end)] = True
+        return mask
+
+    def subset(self, data: pd.DataFrame) -> 'DateIndex':
+        """
+        Return the index of `data`, a subset of the rows of the dataset (e.g. the filtered rows,
+        in the same order), by removing the other rows from the sorted orders (rather than sorting
+        again). The rows are matched by their index labels; if they can't be matched (e.g. the
+        labels aren't unique), the index of `data` is built from scratch.
+        """
+        if not self._labels.is_unique:
+            return DateIndex(data, self.columns)
+        positions = self._labels.get_indexer(data.index)
+        if (positions < 0).any() or (np.diff(positions) <= 0).any():
+            return DateIndex(data, self.columns)
+        # the position of each row of the dataset in `data` (-1 if the row was removed)
+        new_positions = np.full(self.num_rows, -1, dtype=np.int64)
+        new_positions[positions] = np.arange(len(positions))
+        index = DateIndex(data, columns=[])
+        for column in self.columns:
+            order = new_positions[self._orders[column]]
+            is_kept = order >= 0
+            index._orders[column] = order[is_kept]
+            index._sorted_values[column] = self._sorted_values[column][is_kept]
+        return index
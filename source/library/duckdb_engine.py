@@ -0,0 +1,255 @@
+"""
+Optional DuckDB execution engine (enabled with `DATA_ENGINE=duckdb`; requires `duckdb`).
+
+The functions in this module generate the code (containing the SQL) that filters and aggregates
+the data with DuckDB rather than pandas. Like the pandas code, the code is executed to create the
+graph data and is shown in the generated code so the graph can be reproduced:
+
+    - the filters (see `filter_dataframe`) are translated to a SQL WHERE clause
+    - the aggregations of histograms of non-numeric x-variables (the count, or the numeric
+      aggregation of the y-variable, per x/color/facet value) are pushed down as a GROUP BY
+      query, so only the aggregated rows are passed to plotly
+
+DuckDB queries the dataframes in place (a dataframe referenced by its variable name in the query
+is scanned without being copied) and runs the queries in parallel. Only these two steps use
+DuckDB: the data is kept in memory as a pandas dataframe, and the other graphs (e.g. bar, line,
+and heatmap graphs) are prepared with pandas and aggregated by plotly.
+
+Datasets larger than memory can be kept in Parquet files (or a DuckDB database) and loaded with a
+DuckDB query (e.g. `SELECT * FROM 'data/*.parquet'`; see `read_query` and `read_query_chunks`).
+In fast exploration mode, the rows of the query are streamed into the sample; when the graph is
+rendered on the full data, the filters are pushed down into the query (see `create_query`) so
+that only the matching rows are read into memory.
+"""
+from collections.abc import Iterator
+from datetime import date, datetime
+import math
+import numpy as np
+import pandas as pd
+from pandas.tseries.api import guess_datetime_format
+import source.library.types as t
+
+
+# the numeric aggregations (plotly's histfunc) and the corresponding SQL aggregate functions
+SQL_AGGREGATIONS = {
+    'count': 'COUNT',
+    'sum': 'SUM',
+    'avg': 'AVG',
+    'min': 'MIN',
+    'max': 'MAX',
+}
+
+
+def quote_identifier(name: str) -> str:
+    """Quote a column/table name for SQL."""
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def sql_literal(value: object) -> str:
+    """Convert a python value to a SQL literal."""
+    if isinstance(value, bool | np.bool_):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, int | float | np.integer | np.floating):
+        value = value.item() if isinstance(value, np.generic) else value
+        if isinstance(value, float) and not np.isfinite(value):
+            # e.g. `inf` would be a column name
+            return f"CAST('{value}' AS DOUBLE)"
+        return repr(value)
+    if isinstance(value, datetime | pd.Timestamp):
+        return f"TIMESTAMP '{value.isoformat(sep=' ')}'"
+    if isinstance(value, date):
+        return f"DATE '{value.isoformat()}'"
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def sql_to_python(sql: str) -> str:
+    """
+    Return the SQL query as the (indented) lines of python string literals that are passed to
+    `duckdb.sql(...)` in the generated code; the literals are created with `repr` so that quotes
+    in the values and column names (which come from the data) can't end the strings.
+    """
+    return ''.join(f"    {line!r}\n" for line in sql.splitlines(keepends=True))
+
+
+def _is_missing(value: object) -> bool:
+    return value is None or (isinstance(value, float) and np.isnan(value))
+
+
+def _date_expression(identifier: str, series: pd.Series | None) -> str:
+    """
+    Return the SQL expression that converts the column to a date. Strings are parsed with the
+    format pandas infers from the first non-missing value (e.g. `%d/%m/%Y`); values that can't be
+    parsed are NULL.
+    """
+    if series is not None and series.dtype == 'object':
+        first_valid_index = series.first_valid_index()
+        date_format = None
+        if first_valid_index is not None:
+            date_format = guess_datetime_format(str(series[first_valid_index]))
+        if date_format:
+            return f"CAST(TRY_STRPTIME({identifier}, {sql_literal(date_format)}) AS DATE)"
+    return f"CAST(TRY_CAST({identifier} AS TIMESTAMP) AS DATE)"
+
+
+def filters_to_sql(
+        filters: dict | None,
+        column_types: dict,
+        data: pd.DataFrame | None = None) -> str:
+    """
+    Translate the filters (in the format of `filter_dataframe`) to the conditions of a SQL WHERE
+    clause (joined with AND). Returns an empty string if there are no filters.
+
+    If `data` is provided, it is used to infer the format of dates stored as strings (see
+    `_date_expression`).
+    """
+    conditions = []
+    for column, values in (filters or {}).items():
+        identifier = quote_identifier(column)
+        if column_types[column] == t.DATE:
+            assert isinstance(values, tuple)
+            expression = _date_expression(
+                identifier,
+                data[column] if data is not None else None,
+            )
+            conditions.append(
+                f"{expression} "
+                f"BETWEEN {sql_literal(pd.to_datetime(values[0]).date())} "
+                f"AND {sql_literal(pd.to_datetime(values[1]).date())}",
+            )
+        elif column_types[column] in t.DISCRETE_TYPES:
+            assert isinstance(values, list), f"Values for column `{column}` must be a list not `{type(values)}`"  # noqa
+            non_missing = [x for x in values if not _is_missing(x)]
+            if column_types[column] != t.BOOLEAN:
+                # categorical columns are ENUMs in DuckDB
+                identifier = f"CAST({identifier} AS VARCHAR)"
+            condition = []
+            if non_missing:
+                condition.append(
+                    f"{identifier} IN ({', '.join(sql_literal(x) for x in non_missing)})",
+                )
+            if len(non_missing) < len(values):
+                condition.append(f"{identifier} IS NULL")
+            if not condition:
+                condition.append('FALSE')
+            conditions.append(
+                f"({' OR '.join(condition)})" if len(condition) > 1 else condition[0],
+            )
+        elif column_types[column] == t.NUMERIC:
+            assert isinstance(values, tuple)
+            if any(_is_missing(x) for x in values):
+                # no values are between a missing bound (like `pd.Series.between`)
+                conditions.append('FALSE')
+            else:
+                conditions.append(
+                    f"{identifier} BETWEEN {sql_literal(values[0])} AND {sql_literal(values[1])}",
+                )
+        else:
+            raise ValueError(f"Unknown type for column `{column}`: {column_types[column]}")
+    return '\n    AND '.join(conditions)
+
+
+def create_filter_code(
+        filters: dict | None,
+        column_types: dict,
+        data: pd.DataFrame | None = None) -> str:
+    """
+    Create the code that filters `data` (in the format of `filter_dataframe`) with DuckDB and
+    assigns the result to `graph_data`.
+
+    DuckDB evaluates the conditions of the WHERE clause for each row (in parallel) and the
+    matching rows are selected from the dataframe, so the filtered data has the same dtypes and
+    index as when filtering with pandas (converting the rows returned by DuckDB back to a
+    dataframe can change dtypes, e.g. object columns of booleans).
+    """
+    where = filters_to_sql(filters, column_types, data)
+    sql = f"SELECT COALESCE(\n    {where},\n    FALSE\n) AS is_match\nFROM data\n"
+    return (
+        "import duckdb\n"
+        "# True for the rows that match the WHERE clause\n"
+        f"is_match = duckdb.sql(\n{sql_to_python(sql)}).fetchnumpy()['is_match']\n"
+        "graph_data = data[is_match]\n"
+    )
+
+
+def create_aggregation_code(
+        group_by: list[str],
+        y_variable: str | None,
+        aggregation: str | None) -> tuple[str, str]:
+    """
+    Create the code that aggregates `graph_data` with a DuckDB GROUP BY query (one row per
+    combination of the `group_by` values). Returns the code and the name of the aggregated
+    column; it is `y_variable` aggregated with `aggregation` (one of SQL_AGGREGATIONS; defaults
+    to 'sum' like plotly), or `count` (the number of rows) if `y_variable` is None.
+    """
+    group_by = list(dict.fromkeys(group_by))
+    if y_variable is None:
+        column = 'count'
+        while column in group_by:
+            column = f'_{column}'
+        expression = 'COUNT(*)'
+    else:
+        column = y_variable
+        expression = f"{SQL_AGGREGATIONS[aggregation or 'sum']}({quote_identifier(y_variable)})"
+    columns = ', '.join(quote_identifier(x) for x in group_by)
+    sql = (
+        f"SELECT {columns}, {expression} AS {quote_identifier(column)}\n"
+        f"FROM graph_data\n"
+        f"GROUP BY {columns}\n"
+    )
+    code = f"import duckdb\ngraph_data = duckdb.sql(\n{sql_to_python(sql)}).df()\n"
+    return code, column
+
+
+def create_query(
+        query: str,
+        filters: dict | None = None,
+        column_types: dict | None = None,
+        data: pd.DataFrame | None = None) -> str:
+    """
+    Return the query that selects the rows of `query` (e.g. `SELECT * FROM 'data/*.parquet'`)
+    that match the filters (in the format of `filter_dataframe`; see `filters_to_sql` for
+    `data`). The filters are evaluated by DuckDB, which skips the row groups of Parquet files
+    whose statistics don't match, so only the matching rows are read into memory.
+    """
+    query = query.strip().rstrip(';').rstrip()
+    where = filters_to_sql(filters, column_types, data) if filters else ''
+    if not where:
+        return f"{query}\n"
+    subquery = ''.join(f"    {line}" for line in query.splitlines(keepends=True))
+    return f"SELECT *\nFROM (\n{subquery}\n) AS data\nWHERE {where}\n"
+
+
+def create_query_code(
+        query: str,
+        filters: dict | None = None,
+        column_types: dict | None = None,
+        data: pd.DataFrame | None = None) -> str:
+    """
+    Create the code that reads the rows of `query` that match the filters (see `create_query`)
+    with DuckDB and assigns the result to `graph_data`.
+    """
+    sql = create_query(query, filters, column_types, data)
+    return f"import duckdb\ngraph_data = duckdb.sql(\n{sql_to_python(sql)}).df()\n"
+
+
+def read_query(query: str) -> pd.DataFrame:
+    """Read the rows of the query (see `create_query`) into a dataframe."""
+    import duckdb
+    # a connection per query, since the threads of the server can query at the same time
+    with duckdb.connect() as connection:
+        return connection.sql(query).df()
+
+
+def read_query_chunks(query: str, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """
+    Read the rows of the query in chunks of about `chunk_size` rows (a multiple of DuckDB's
+    vector size), so the rows can be sampled without reading all of them into memory. The first
+    chunk is returned even if it's empty, so the columns are known.
+    """
+    import duckdb
+    vectors_per_chunk = max(1, math.ceil(chunk_size / duckdb.__standard_vector_size__))
+    with duckdb.connect() as connection:
+        connection.execute(query)
+        yield connection.fetch_df_chunk(vectors_per_chunk)
+        while len(chunk := connection.fetch_df_chunk(vectors_per_chunk)) > 0:
+            yield chunk
@@ -0,0 +1,329 @@
+"""
+Timing instrumentation of the app's callbacks and of the stages of building a graph.
+
+`timed` records the wall time of each call of the decorated function, the number of rows of the
+data passed in and returned, and (for callbacks; see `record_payload_size`) the size of the
+response sent to the browser. The most recent `MAX_RECORDS` calls of each function are kept in
+memory and summarized (e.g. percentiles) by `get_metrics`.
+
+`profile_when` profiles individual calls (e.g. the next render of the graph) on request; the
+report (call tree) of the last profiled call of each key (e.g. the user's session) is returned by
+`get_profile_report`.
+"""
+import contextlib
+import cProfile
+import inspect
+import io
+import itertools
+import os
+import pstats
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from collections.abc import Callable
+from datetime import datetime
+from functools import wraps
+import numpy as np
+import pandas as pd
+
+
+# the number of (most recent) calls of each function that are kept
+MAX_RECORDS = 1_000
+_records: dict[str, deque] = {}
+_record_ids = itertools.count()
+_lock = threading.Lock()
+# the report of the last profiled call (see `profile_call`) of the MAX_PROFILE_REPORTS most
+# recently used keys (e.g. the id of the user's session)
+MAX_PROFILE_REPORTS = 16
+_profile_reports: OrderedDict[str | None, dict] = OrderedDict()
+# the nesting depth of timed calls and the record of the outermost call (i.e. the callback) of
+# the current thread, which the size of the response is added to
+_local = threading.local()
+
+
+def _num_rows(value: object) -> int | None:
+    """Return the number of rows if the value is a dataframe (or a Serverside dataframe)."""
+    if not isinstance(value, pd.DataFrame):
+        value = getattr(value, 'value', None)  # Serverside outputs wrap the value
+    if isinstance(value, pd.DataFrame):
+        return len(value)
+    return None
+
+
+def _first_num_rows(values: object) -> int | None:
+    """Return the number of rows of the first dataframe in the values."""
+    for value in values:
+        num_rows = _num_rows(value)
+        if num_rows is not None:
+            return num_rows
+    return None
+
+
+def record_timing(
+        name: str,
+        seconds: float,
+        rows_in: int | None = None,
+        rows_out: int | None = None,
+        error: str | None = None) -> dict:
+    """Record a call of the function `name` and return the record."""
+    record = {
+        'name': name,
+        'time': datetime.now().isoformat(timespec='milliseconds'),
+        'seconds': seconds,
+        'rows_in': rows_in,
+        'rows_out': rows_out,
+        'payload_bytes': None,
+        'error': error,
+    }
+    with _lock:
+        record['id'] = next(_record_ids)
+        if name not in _records:
+            _records[name] = deque(maxlen=MAX_RECORDS)
+        _records[name].append(record)
+    return record
+
+
+def timed(function: Callable) -> Callable:
+    """Record the wall time and the rows in/out of each call of the function."""
+    @wraps(function)
+    def wrapper(*args: object, **kwargs: object) -> object:
+        depth = getattr(_local, 'depth', 0)
+        _local.depth = depth + 1
+        error = None
+        result = None
+        start = time.perf_counter()
+        try:
+            result = function(*args, **kwargs)
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            _local.depth = depth
+            rows_out = _first_num_rows(result) if isinstance(result, tuple | list) \
+                else _num_rows(result)
+            record = record_timing(
+                name=function.__name__,
+                seconds=seconds,
+                rows_in=_first_num_rows([*args, *kwargs.values()]),
+                rows_out=rows_out,
+                error=error,
+            )
+            if depth == 0:
+                _local.last_record = record
+        return result
+    # e.g. `dash_extensions` inspects the arguments of callbacks with `getfullargspec`, which
+    # doesn't follow `__wrapped__`
+    wrapper.__signature__ = inspect.signature(function)
+    return wrapper
+
+
+def record_payload_size(payload_bytes: int | None) -> None:
+    """
+    Add the size of the response (e.g. the serialized outputs of the callback) to the record of
+    the last outermost timed call of the current thread.
+    """
+    record = getattr(_local, 'last_record', None)
+    if record is not None:
+        record['payload_bytes'] = payload_bytes
+        _local.last_record = None
+
+
+def get_records(name: str | None = None) -> list[dict]:
+    """Return the records of the function `name` (or of all functions), oldest first."""
+    with _lock:
+        if name is not None:
+            return list(_records.get(name, []))
+        return sorted(
+            (record for records in _records.values() for record in records),
+            key=lambda record: record['id'],
+        )
+
+
+def _mean(records: list[dict], field: str) -> float | None:
+    """Return the mean of the field over the records where it isn't missing."""
+    values = [record[field] for record in records if record[field] is not None]
+    return float(np.mean(values)) if values else None
+
+
+def get_metrics(num_recent: int = 50) -> dict:
+    """
+    Return the summary (number of calls, mean and percentiles of the wall time, and the mean rows
+    in/out and response size) of each function, slowest (p90) first, and the most recent records.
+    """
+    with _lock:
+        records = {name: list(values) for name, values in _records.items()}
+    summary = []
+    for name, values in records.items():
+        seconds = np.array([record['seconds'] for record in values])
+        p50, p90, p99 = np.percentile(seconds, [50, 90, 99])
+        summary.append({
+            'name': name,
+            'calls': len(values),
+            'errors': sum(record['error'] is not None for record in values),
+            'mean_seconds': float(seconds.mean()),
+            'p50_seconds': float(p50),
+            'p90_seconds': float(p90),
+            'p99_seconds': float(p99),
+            'max_seconds': float(seconds.max()),
+            'mean_rows_in': _mean(values, 'rows_in'),
+            'mean_rows_out': _mean(values, 'rows_out'),
+            'mean_payload_bytes': _mean(values, 'payload_bytes'),
+        })
+    summary = sorted(summary, key=lambda x: x['p90_seconds'], reverse=True)
+    recent = get_records()[-num_recent:][::-1] if num_recent else []
+    return {'summary': summary, 'recent': recent}
+
+
+def reset_metrics() -> None:
+    """Remove all of the records."""
+    with _lock:
+        _records.clear()
+
+
+def _profile_report_path(key: str | None, directory: str | None) -> str | None:
+    """
+    Return the path of the file of the report of the key, or None if the report isn't written to
+    a file; the key (e.g. from the browser) is only used as a file name if it's alphanumeric.
+    """
+    if not directory or key is None or not str(key).isalnum():
+        return None
+    return os.path.join(directory, f'{key}.pkl')
+
+
+def _store_profile_report(
+        name: str,
+        content: str,
+        extension: str,
+        seconds: float,
+        key: str | None = None,
+        directory: str | None = None) -> None:
+    """
+    Store the report of a profiled call (replacing the previous report of the key). If `directory`
+    is given, the report is also written to a file (the MAX_PROFILE_REPORTS most recent files are
+    kept), so that the other processes (e.g. the workers of the server) can read it.
+    """
+    timestamp = datetime.now()
+    report = {
+        'id': uuid.uuid4().hex,
+        'name': name,
+        'time': timestamp.isoformat(timespec='seconds'),
+        'seconds': seconds,
+        'filename': f"{name}_{timestamp:%Y%m%d_%H%M%S}.{extension}",
+        'content': content,
+    }
+    with _lock:
+        _profile_reports[key] = report
+        _profile_reports.move_to_end(key)
+        while len(_profile_reports) > MAX_PROFILE_REPORTS:
+            _profile_reports.popitem(last=False)
+    path = _profile_report_path(key, directory)
+    if path is not None:
+        os.makedirs(directory, exist_ok=True)
+        pd.to_pickle(report, path)
+        with contextlib.suppress(FileNotFoundError):  # e.g. removed by another process
+            paths = sorted(
+                (os.path.join(directory, x) for x in os.listdir(directory) if x.endswith('.pkl')),
+                key=os.path.getmtime,
+            )
+            for old_path in paths[:-MAX_PROFILE_REPORTS]:
+                os.remove(old_path)
+
+
+def profile_call(
+        function: Callable,
+        *args: object,
+        profile_format: str = 'html',
+        report_key: str | None = None,
+        report_directory: str | None = None,
+        **kwargs: object) -> object:
+    """
+    Call the function with a profiler and store the report under `report_key` (e.g. the id of the
+    user's session) and in `report_directory` (if given; see `get_profile_report`).
+
+    The function is profiled with `pyinstrument` (a sampling profiler) if it's installed, and the
+    report is an HTML call tree (`profile_format='html'`) or a speedscope JSON file
+    (`profile_format='speedscope'`; e.g. for https://www.speedscope.app). Otherwise, the function
+    is profiled with `cProfile` and the report is the slowest functions (cumulative time) as text.
+    """
+    start = time.perf_counter()
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(function, *args, **kwargs)
+        finally:
+            stream = io.StringIO()
+            pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(100)
+            seconds = time.perf_counter() - start
+            _store_profile_report(
+                function.__name__, stream.getvalue(), 'txt', seconds, report_key, report_directory,
+            )
+
+    profiler = Profiler()
+    profiler.start()
+    try:
+        return function(*args, **kwargs)
+    finally:
+        profiler.stop()
+        if profile_format == 'speedscope':
+            from pyinstrument.renderers import SpeedscopeRenderer
+            content = profiler.output(SpeedscopeRenderer())
+            extension = 'speedscope.json'
+        else:
+            content = profiler.output_html()
+            extension = 'html'
+        _store_profile_report(
+            function.__name__, content, extension, time.perf_counter() - start,
+            report_key, report_directory,
+        )
+
+
+def profile_when(
+        argument: str,
+        profile_format: str = 'html',
+        key_argument: str | None = None,
+        report_directory: str | None = None) -> Callable:
+    """
+    Profile the calls of the decorated function where the value of `argument` is truthy (e.g. a
+    "profile next render" switch); see `profile_call`. The report is stored under the value of
+    `key_argument` (e.g. the id of the user's session; None if not given).
+    """
+    def decorator(function: Callable) -> Callable:
+        signature = inspect.signature(function)
+
+        @wraps(function)
+        def wrapper(*args: object, **kwargs: object) -> object:
+            arguments = signature.bind(*args, **kwargs).arguments
+            if arguments.get(argument):
+                return profile_call(
+                    function,
+                    *args,
+                    profile_format=profile_format,
+                    report_key=arguments.get(key_argument) if key_argument else None,
+                    report_directory=report_directory,
+                    **kwargs,
+                )
+            return function(*args, **kwargs)
+        wrapper.__signature__ = signature
+        return wrapper
+    return decorator
+
+
+def get_profile_report(key: str | None = None, directory: str | None = None) -> dict | None:
+    """
+    Return the report of the last profiled call of the key (the `id`, `name`, `time`, and
+    `seconds` of the call and the `filename` and `content` of the report) or None if no call has
+    been profiled. If the report isn't in memory (e.g. the call was profiled by another process),
+    it's read from `directory`.
+    """
+    with _lock:
+        if key in _profile_reports:
+            _profile_reports.move_to_end(key)
+            return _profile_reports[key]
+    path = _profile_report_path(key, directory)
+    if path is None or not os.path.exists(path):
+        return None
+    return pd.read_pickle(path)
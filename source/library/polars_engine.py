@@ -0,0 +1,236 @@
+"""
+Optional Polars backend for the data-prep stage (enabled with `DATA_ENGINE=polars`; requires
+`polars`).
+
+The functions in this module compute the same results as the pandas operations used by
+`filter_dataframe` and `convert_to_graph_data`, but with Polars lazy queries that run in
+parallel across columns and rows:
+
+    - `create_filter_mask`: the rows that match the filters (all filters in a single query)
+    - `top_n_categories`: the same as `helpsk.pandas.top_n_categories` (which checks each value
+      in python)
+    - `floor_dates`: the date floors (e.g. the start of the month) formatted as strings
+
+`PolarsDataPrep` uses these to prepare the graph data (see `data_prep.PandasDataPrep`). The data
+stays a pandas dataframe; only the columns needed are converted to Polars (numeric columns
+without copying) and the results are applied to the pandas dataframe, so the outputs (including
+dtypes and the index) are identical to the pandas outputs and the generated code is the pandas
+code.
+"""
+import numpy as np
+import pandas as pd
+import polars as pl
+from source.library.data_prep import DATE_FLOOR_FORMATS, PandasDataPrep
+import source.library.types as t
+
+
+# the Polars intervals that the dates are truncated to for each date floor (the date floors in
+# `data_prep.DATE_FLOOR_PERIODS` are formatted as dates)
+DATE_FLOOR_INTERVALS = {
+    'year': '1y',
+    'quarter': '1q',
+    'month': '1mo',
+    'week': '1w',
+    'day': '1d',
+    'hour': '1h',
+    'minute': '1m',
+    'second': '1s',
+}
+
+
+def _to_polars(data: pd.DataFrame) -> pl.LazyFrame:
+    """Convert the columns to a Polars lazy frame (missing values are nulls)."""
+    return pl.from_pandas(data, nan_to_null=True).lazy()
+
+
+def _date_filter_expression(column: str, values: tuple) -> pl.Expr:
+    start_date = pd.to_datetime(values[0]).date()
+    end_date = pd.to_datetime(values[1]).date()
+    return pl.col(column).dt.date().is_between(start_date, end_date)
+
+
+def create_filter_mask(data: pd.DataFrame, filters: dict, column_types: dict) -> np.ndarray:
+    """
+    Return a boolean array that is True for the rows that match the filters (in the format of
+    `filter_dataframe`); i.e. `data[mask]` is the same as the data filtered with pandas.
+    """
+    columns = {}
+    conditions = []
+    for column, values in filters.items():
+        assert column in data.columns, f"Column `{column}` not found in `data`"
+        series = data[column]
+        if column_types[column] == t.DATE:
+            assert isinstance(values, tuple)
+            # strings are parsed by pandas so the dates are the same as filtering with pandas
+            columns[column] = pd.to_datetime(series)
+            conditions.append(_date_filter_expression(column, values))
+        elif column_types[column] in t.DISCRETE_TYPES:
+            assert isinstance(values, list), f"Values for column `{column}` must be a list not `{type(values)}`"  # noqa
+            non_missing = [x for x in values if not pd.isna(x)]
+            if series.dtype.name == 'category':
+                series = series.astype(object)
+            columns[column] = series
+            expression = pl.col(column)
+            if column_types[column] != t.BOOLEAN:
+                expression = expression.cast(pl.String)
+            condition = expression.is_in(non_missing)
+            if len(non_missing) < len(values):
+                condition = condition | pl.col(column).is_null()
+            conditions.append(condition)
+        elif column_types[column] == t.NUMERIC:
+            assert isinstance(values, tuple)
+            columns[column] = series
+            conditions.append(pl.col(column).is_between(values[0], values[1]))
+        else:
+            raise ValueError(f"Unknown dtype for column `{column}`: {series.dtype}")
+    return (
+        _to_polars(pd.DataFrame(columns))
+        .select(pl.all_horizontal(conditions).fill_null(False).alias('is_match'))
+        .collect()
+        .get_column('is_match')
+        .to_numpy()
+    )
+
+
+def top_n_categories(
+        series: pd.Series,
+        top_n: int,
+        other_category: str,
+        rows: np.ndarray | None = None) -> pd.Series:
+    """
+    Return the same as `helpsk.pandas.top_n_categories(series, top_n, other_category)` (as a
+    series with the same index): a categorical where the values that aren't in the `top_n` most
+    frequent values are `other_category`, with the top values (most frequent first) and
+    `other_category` as the categories. If there are no more than `top_n` unique values, the
+    series is returned unchanged.
+
+    If `rows` (a boolean array) is provided, the top values are the most frequent values in those
+    rows (i.e. the same as `helpsk.pandas.top_n_categories(series[rows], ...)` for those rows).
+    """
+    if series.dtype.name == 'category':
+        codes = series.cat.codes.to_numpy()
+        uniques = series.cat.categories
+        counted = series if rows is None else series[rows]
+        # the counts of all of the categories (including unused categories), like pandas
+        counts = counted.value_counts(ascending=False, dropna=True)
+        num_unique = counted.nunique(dropna=False)
+        counts = pd.Series(uniques.get_indexer(counts.index), index=counts.index)
+    else:
+        # the values are converted to integer codes (missing values are -1) so that any values
+        # (e.g. mixed types) are supported
+        codes, uniques = pd.factorize(series)
+        # the counts of the values in the order of their first appearance; sorting them the same
+        # way as `value_counts` breaks ties in the same order
+        first_appearance = (
+            pl.LazyFrame({'code': codes if rows is None else codes[rows]})
+            .group_by('code', maintain_order=True)
+            .len()
+            .collect()
+        )
+        num_unique = len(first_appearance)
+        first_appearance = first_appearance.filter(pl.col('code') >= 0)
+        counts = pd.Series(
+            first_appearance.get_column('len').to_numpy(),
+            index=first_appearance.get_column('code').to_numpy(),
+        ).sort_values(ascending=False)
+        counts = pd.Series(counts.index, index=uniques[counts.index])
+    if num_unique <= top_n:
+        return series.copy()
+    top_categories = counts.head(top_n).index.tolist()
+    categories = top_categories if other_category in top_categories \
+        else [*top_categories, other_category]
+    # the position of each value (by code; the last item is for missing values) in `categories`
+    lookup = np.full(len(uniques) + 1, categories.index(other_category))
+    lookup[counts.head(top_n).to_numpy()] = np.arange(len(top_categories))
+    return pd.Series(
+        pd.Categorical.from_codes(lookup[codes], categories=categories),
+        index=series.index,
+        name=series.name,
+    )
+
+
+def floor_dates(series: pd.Series, date_floor: str) -> pd.Series:
+    """
+    Return the dates floored to the start of the year/quarter/month/week (weeks start on Monday)
+    or truncated to the day/hour/minute/second, formatted as strings; the same as the pandas
+    code in `convert_to_graph_data` (missing values are NaN).
+
+    The dates are truncated with Polars and only the unique truncated dates are formatted.
+    """
+    series = pd.to_datetime(series, errors='coerce')
+    if getattr(series.dt, 'tz', None) is not None:
+        raise ValueError("Timezone-aware dates are not supported")
+    if date_floor not in DATE_FLOOR_INTERVALS:
+        raise ValueError(f"Unknown date_floor: {date_floor}")
+    truncated = (
+        _to_polars(pd.DataFrame({'date': series}))
+        .select(pl.col('date').dt.truncate(DATE_FLOOR_INTERVALS[date_floor]))
+        .collect()
+        .get_column('date')
+        .to_numpy()
+    )
+    # missing values are -1, which is the last (NaN) label
+    codes, unique_dates = pd.factorize(truncated)
+    labels = np.append(
+        pd.DatetimeIndex(unique_dates).strftime(DATE_FLOOR_FORMATS.get(date_floor, '%Y-%m-%d'))
+        .to_numpy(dtype=object),
+        np.nan,
+    )
+    return pd.Series(labels[codes], index=series.index, name=series.name)
+
+
+class PolarsDataPrep(PandasDataPrep):
+    """
+    Prepares the graph data with Polars (see `top_n_categories` and `floor_dates`). The rows with
+    missing values are tracked in `is_remaining` and removed at the end (rather than copying the
+    data for each variable).
+    """
+
+    def __init__(self, data: pd.DataFrame):
+        super().__init__(data)
+        self.is_remaining = np.ones(len(data), dtype=bool)
+        # object columns without missing values in the remaining rows; pandas converts their
+        # values (e.g. booleans) to their dtype when the rows are removed
+        self._infer_dtype_variables = []
+
+    def remaining_values(self, variable: str) -> pd.Series:
+        """Return the values of the variable in the rows that haven't been removed."""
+        return self.data[variable][self.is_remaining]
+
+    def fill_missing(self, variable: str, value: str) -> None:
+        """Replace the missing values of the (non-categorical) variable with `value`."""
+        if self.data[variable].dtype == 'object' and \
+                not self.remaining_values(variable).isna().any():
+            self._infer_dtype_variables.append(variable)
+        super().fill_missing(variable, value)
+
+    def top_n_categories(self, variable: str, top_n: int, other_category: str) -> None:
+        """The top categories are the most frequent values in the rows that weren't removed."""
+        self.data[variable] = top_n_categories(
+            self.data[variable],
+            top_n=top_n,
+            other_category=other_category,
+            rows=self.is_remaining,
+        )
+
+    def floor_dates(self, variable: str, series: pd.Series, date_floor: str) -> None:
+        """
+        Set the variable to the date floors of `series`, the dates of the rows that haven't been
+        removed (the removed rows are NaN).
+        """
+        floored = np.full(len(self.data), np.nan, dtype=object)
+        floored[self.is_remaining] = floor_dates(series, date_floor).to_numpy()
+        self.data[variable] = floored
+
+    def remove_missing(self, variable: str) -> int:
+        """Mark the rows where the variable is missing as removed; returns the number of rows."""
+        is_missing = self.remaining_values(variable).isna().to_numpy()
+        self.is_remaining[np.flatnonzero(self.is_remaining)[is_missing]] = False
+        return int(is_missing.sum())
+
+    def result(self) -> pd.DataFrame:
+        """Return the prepared data (without the removed rows)."""
+        data = self.data[self.is_remaining]
+        return data.assign(**{
+            variable: data[variable].infer_objects() for variable in self._infer_dtype_variables
+        })
@@ -0,0 +1,577 @@
+"""
+Dataset profiling (i.e. the column statistics shown in the Numeric/Non-Numeric Summary tabs).
+
+Each column is profiled once: numeric columns are converted to a float array from which the
+counts, moments (mean, standard deviation, skewness, kurtosis), min/max, and quantiles (a single
+`np.partition`) are computed; non-numeric columns are factorized once and the null count, number
+of unique values, and most frequent value are derived from the counts of the codes.
+
+Columns can be profiled in parallel (`map_columns`): the columns are sharded across a process pool
+and the data is shared with the worker processes through an Arrow IPC file in shared memory
+(rather than pickling each column), which the workers read without copying. The worker processes
+are started by a fork server (or spawned) rather than forked from the app's (multithreaded)
+process. The shared copy of the loaded dataset (`share_dataset`) is created once and reused when
+the column types are checked and when the dataset is profiled.
+
+Profiles are computed in a background thread (`start_profiling`) and persisted to disk keyed by a
+fingerprint of the dataset (`dataset_fingerprint`), so loading the same dataset again doesn't
+recompute the profile. The futures of the MAX_PROFILES most recently profiled datasets are kept in
+memory; a failed future is removed when its error is returned, so profiling the dataset again
+retries.
+"""
+import atexit
+import hashlib
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from helpsk.pandas import is_series_numeric
+
+
+QUANTILES = (0.10, 0.25, 0.50, 0.75, 0.90)
+MOST_FREQUENT_VALUE_MAX_CHARS = 30
+# datasets with fewer cells (rows * columns) are processed in-process; starting the worker
+# processes and copying the data to shared memory costs more than it saves
+PARALLEL_MIN_CELLS = 1_000_000
+# the number of tasks per worker; smaller tasks balance the load across workers better (e.g. when
+# a few string columns take much longer than the numeric columns)
+TASKS_PER_WORKER = 4
+# metadata stored in each column's profile that isn't a statistic
+PROFILE_METADATA = ('is_numeric', 'seconds')
+
+# the number of (most recently profiled) datasets whose profiles are kept in memory
+MAX_PROFILES = 16
+
+_profile_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='profiling')
+_profiles: OrderedDict[str, Future] = OrderedDict()
+_lock = threading.Lock()
+# forking a multithreaded process (e.g. the web server or the profiling thread) is unsafe; the fork
+# server imports the main module (e.g. app.py; which must be guarded by `if __name__ ==
+# '__main__'`) and the modules used by the workers once and forks the workers from its own process
+if 'forkserver' in multiprocessing.get_all_start_methods():
+    _mp_context = multiprocessing.get_context('forkserver')
+    _mp_context.set_forkserver_preload(['__main__', 'source.library.types'])
+else:
+    _mp_context = multiprocessing.get_context('spawn')
+# the fingerprint and the shared copy of the most recently shared dataset (see `share_dataset`)
+_shared_dataset: tuple[str, 'SharedDataset'] | None = None
+
+
+def dataset_fingerprint(data: pd.DataFrame) -> str:
+    """
+    Return a fingerprint of the dataset (column names, dtypes, and the hash of every value) that
+    is used as the key of the persisted profile.
+    """
+    fingerprint = hashlib.blake2b(digest_size=20)
+    fingerprint.update(repr(list(zip(data.columns, data.dtypes.astype(str)))).encode())
+    for column in data.columns:
+        try:
+            hashes = pd.util.hash_pandas_object(data[column], index=False)
+        except TypeError:  # e.g. unhashable values like lists
+            hashes = pd.util.hash_pandas_object(data[column].astype(str), index=False)
+        fingerprint.update(hashes.to_numpy().tobytes())
+    return fingerprint.hexdigest()
+
+
+def _numeric_values(series: pd.Series) -> np.ndarray:
+    """Return the values of a numeric series as a float64 array (missing values are NaN)."""
+    if series.dtype == 'object':
+        # e.g. Decimal objects or numbers stored as strings
+        series = pd.to_numeric(series, errors='coerce')
+    return series.to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def profile_numeric_column(series: pd.Series) -> dict:
+    """
+    Calculate the statistics of a numeric column; the same statistics as
+    `helpsk.pandas.numeric_summary` (before rounding).
+    """
+    values = _numeric_values(series)
+    num_rows = len(values)
+    values = values[~np.isnan(values)]
+    count = len(values)
+    stats = {
+        '# of Non-Nulls': count,
+        '# of Nulls': num_rows - count,
+        '% Nulls': (num_rows - count) / num_rows if num_rows else np.nan,
+        '# of Zeros': int(np.count_nonzero(values == 0)),
+    }
+    stats['% Zeros'] = stats['# of Zeros'] / num_rows if num_rows else np.nan
+    if count == 0:
+        return stats | {
+            'Mean': np.nan, 'St Dev.': np.nan, 'Coef of Var': np.nan, 'Skewness': np.nan,
+            'Kurtosis': np.nan, 'Min': np.nan,
+            **{f'{quantile:.0%}': np.nan for quantile in QUANTILES},
+            'Max': np.nan,
+        }
+
+    mean = values.mean()
+    deviations = values - mean
+    squared_deviations = deviations * deviations
+    m2 = squared_deviations.sum()
+    m3 = (squared_deviations * deviations).sum()
+    m4 = (squared_deviations * squared_deviations).sum()
+    std = np.sqrt(m2 / (count - 1)) if count > 1 else np.nan
+    # unbiased skewness and (Fisher's) kurtosis; same formulas as pandas
+    if count < 3:
+        skewness = np.nan
+    else:
+        skewness = 0 if m2 == 0 else (count * (count - 1) ** 0.5 / (count - 2)) * (m3 / m2**1.5)
+    if count < 4:
+        kurtosis = np.nan
+    else:
+        denominator = (count - 2) * (count - 3) * m2**2
+        adjustment = 3 * (count - 1) ** 2 / ((count - 2) * (count - 3))
+        kurtosis = (
+            0 if denominator == 0
+            else count * (count + 1) * (count - 1) * m4 / denominator - adjustment
+        )
+    # min, quantiles (linear interpolation, like pandas), and max from a single partition
+    positions = np.array(QUANTILES) * (count - 1)
+    lower = np.floor(positions).astype(int)
+    upper = np.minimum(lower + 1, count - 1)
+    partitioned = np.partition(values, np.unique(np.concatenate([[0, count - 1], lower, upper])))
+    fractions = positions - lower
+    quantiles = partitioned[lower] + (partitioned[upper] - partitioned[lower]) * fractions
+    return stats | {
+        'Mean': mean,
+        'St Dev.': std,
+        'Coef of Var': std / mean if mean != 0 else np.nan,
+        'Skewness': skewness,
+        'Kurtosis': kurtosis,
+        'Min': partitioned[0],
+        **{f'{quantile:.0%}': value for quantile, value in zip(QUANTILES, quantiles)},
+        'Max': partitioned[count - 1],
+    }
+
+
+def profile_non_numeric_column(series: pd.Series) -> dict:
+    """
+    Calculate the statistics of a non-numeric column; the same statistics as
+    `helpsk.pandas.non_numeric_summary`.
+    """
+    try:
+        codes, uniques = pd.factorize(series, sort=False)
+    except TypeError:  # e.g. unhashable values like lists
+        codes, uniques = pd.factorize(series.map(str, na_action='ignore'), sort=False)
+    num_rows = len(series)
+    counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    count = int(counts.sum())
+    most_frequent_value = None
+    if len(uniques) > 0:
+        most_frequent_index = counts.argmax()
+        if np.count_nonzero(counts == counts[most_frequent_index]) == 1:
+            most_frequent_value = uniques[most_frequent_index]
+        else:
+            # ties are broken by the (unstable) sort of `value_counts`; match helpsk exactly
+            try:
+                most_frequent_value = series.value_counts().index[0]
+            except TypeError:  # e.g. unhashable values like lists
+                most_frequent_value = uniques[most_frequent_index]
+    most_frequent_value = str(most_frequent_value)
+    if len(most_frequent_value) > MOST_FREQUENT_VALUE_MAX_CHARS:
+        most_frequent_value = most_frequent_value[0:MOST_FREQUENT_VALUE_MAX_CHARS] + '[...]'
+    return {
+        '# of Non-Nulls': count,
+        '# of Nulls': num_rows - count,
+        '% Nulls': (num_rows - count) / num_rows if num_rows else np.nan,
+        'Most Freq. Value': most_frequent_value,
+        '# of Unique': len(uniques),
+        '% Unique': len(uniques) / count if count else np.nan,
+    }
+
+
+def profile_column(series: pd.Series) -> dict:
+    """Profile a single column; `is_numeric` indicates which statistics were calculated."""
+    if is_series_numeric(series):
+        return {'is_numeric': True, **profile_numeric_column(series)}
+    return {'is_numeric': False, **profile_non_numeric_column(series)}
+
+
+def _is_shareable(series: pd.Series) -> bool:
+    """Return True if the series roundtrips through Arrow without changing its dtype."""
+    dtype = series.dtype
+    return (
+        isinstance(dtype, pd.CategoricalDtype | pd.DatetimeTZDtype)
+        or (isinstance(dtype, np.dtype) and dtype.kind in 'biufcMO')
+    )
+
+
+def _to_shared_memory(data: pd.DataFrame) -> tuple[SharedMemory | None, list[int]]:
+    """
+    Write the columns that can be converted to Arrow to an Arrow IPC file in shared memory.
+    Returns the shared memory (None if no columns could be converted) and the positions of the
+    columns in `data` that were written (in the order of the columns in the file).
+    """
+    arrays = []
+    positions = []
+    for position in range(data.shape[1]):
+        series = data.iloc[:, position]
+        if not _is_shareable(series):
+            continue
+        try:
+            arrays.append(pa.array(series, from_pandas=True))
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError, ValueError):
+            continue  # e.g. object columns with mixed types
+        positions.append(position)
+    if not arrays:
+        return None, positions
+    table = pa.table(arrays, names=[str(x) for x in positions])
+    size_stream = pa.MockOutputStream()
+    with pa.ipc.new_file(size_stream, table.schema) as writer:
+        writer.write_table(table)
+    shared_memory = SharedMemory(create=True, size=size_stream.size())
+    sink = pa.FixedSizeBufferWriter(pa.py_buffer(shared_memory.buf))
+    with pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return shared_memory, positions
+
+
+class SharedDataset:
+    """
+    The columns of a dataset that can be converted to Arrow, written once to an Arrow IPC file in
+    shared memory (see `_to_shared_memory`) and read by the worker processes of `map_columns`.
+
+    The shared memory is used by `map_columns` calls between `acquire` and `release`, and is
+    released by `close` once it isn't used.
+    """
+
+    def __init__(self, data: pd.DataFrame):
+        """
+        Write the dataset to shared memory.
+
+        Args:
+            data: the dataset
+        """
+        self.shared_memory, self.positions = _to_shared_memory(data)
+        self._num_users = 0
+        self._is_closed = False
+        self._lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        """Register a user of the shared memory; returns False if the dataset has been closed."""
+        with self._lock:
+            if self._is_closed:
+                return False
+            self._num_users += 1
+            return True
+
+    def release(self) -> None:
+        """Unregister a user of the shared memory (see `acquire`)."""
+        with self._lock:
+            self._num_users -= 1
+            self._release_if_unused()
+
+    def close(self) -> None:
+        """Release the shared memory once it isn't used."""
+        with self._lock:
+            self._is_closed = True
+            self._release_if_unused()
+
+    def _release_if_unused(self) -> None:
+        if self._is_closed and self._num_users == 0 and self.shared_memory is not None:
+            self.shared_memory.close()
+            self.shared_memory.unlink()
+            self.shared_memory = None
+
+
+def is_parallel(data: pd.DataFrame, max_workers: int | None) -> bool:
+    """Return whether `map_columns` processes the columns of the dataset in worker processes."""
+    return bool(
+        max_workers and max_workers > 1
+        and data.shape[1] > 1
+        and data.size >= PARALLEL_MIN_CELLS,
+    )
+
+
+def share_dataset(
+        data: pd.DataFrame,
+        fingerprint: str,
+        max_workers: int | None) -> SharedDataset | None:
+    """
+    Return the shared copy of the dataset (creating it if the dataset is processed in parallel; see
+    `is_parallel`), which is passed to `map_columns` and used by `start_profiling`. Only the copy
+    of the most recently shared dataset is kept; the copy of the previous dataset is closed.
+    """
+    global _shared_dataset  # noqa: PLW0603
+    if not is_parallel(data, max_workers):
+        return None
+    with _lock:
+        if _shared_dataset is not None and _shared_dataset[0] == fingerprint:
+            return _shared_dataset[1]
+        if _shared_dataset is not None:
+            _shared_dataset[1].close()
+        _shared_dataset = (fingerprint, SharedDataset(data))
+        return _shared_dataset[1]
+
+
+def get_shared_dataset(fingerprint: str) -> SharedDataset | None:
+    """Return the shared copy of the dataset (see `share_dataset`) if it hasn't been replaced."""
+    shared_dataset = _shared_dataset
+    if shared_dataset is not None and shared_dataset[0] == fingerprint:
+        return shared_dataset[1]
+    return None
+
+
+@atexit.register
+def _close_shared_dataset() -> None:
+    if _shared_dataset is not None:
+        _shared_dataset[1].close()
+
+
+def _map_shared_columns(
+        func: Callable[[pd.Series], Any],
+        shared_memory_name: str,
+        indexes: list[int]) -> list[tuple[int, Any, float]]:
+    """
+    Apply `func` to the columns (by index in the Arrow file) in shared memory. Runs in the worker
+    processes. Returns a list of (index, result, seconds).
+    """
+    shared_memory = SharedMemory(name=shared_memory_name)
+    results = []
+    try:
+        table = pa.ipc.open_file(pa.py_buffer(shared_memory.buf)).read_all()
+        for index in indexes:
+            start = time.perf_counter()
+            result = func(table.column(index).to_pandas())
+            results.append((index, result, time.perf_counter() - start))
+    finally:
+        # the Arrow buffers reference the shared memory and have to be released before closing
+        table = None
+        shared_memory.close()
+    return results
+
+
+def map_columns(  # noqa: PLR0912
+        func: Callable[[pd.Series], Any],
+        data: pd.DataFrame,
+        max_workers: int | None = None,
+        shared_dataset: SharedDataset | None = None) -> tuple[dict[str, Any], dict[str, float]]:
+    """
+    Apply `func` to each column of the dataset and return a dictionary of column name -> result
+    and a dictionary of column name -> seconds it took to process the column.
+
+    Args:
+        func:
+            A (picklable) function that takes a column and returns a (picklable) result.
+        data:
+            The dataset.
+        max_workers:
+            The number of worker processes the columns are sharded across. If None or 1 (or if
+            the dataset has fewer than PARALLEL_MIN_CELLS cells), the columns are processed
+            in-process. The data is shared with the workers via Arrow shared memory; columns that
+            can't be converted to Arrow without changing their dtype are processed in-process.
+        shared_dataset:
+            The shared copy of `data` (see `share_dataset`); if None (or if it has been closed),
+            the data is copied to shared memory for this call.
+    """
+    results = {}
+    seconds = {}
+    positions = []
+    shared_memory = None
+    is_temporary = False
+    if is_parallel(data, max_workers):
+        if shared_dataset is None or not shared_dataset.acquire():
+            shared_dataset = SharedDataset(data)
+            shared_dataset.acquire()
+            is_temporary = True
+        shared_memory, positions = shared_dataset.shared_memory, shared_dataset.positions
+    else:
+        shared_dataset = None
+    try:
+        if shared_memory is not None:
+            num_tasks = min(len(positions), max_workers * TASKS_PER_WORKER)
+            tasks = [
+                list(range(len(positions)))[task::num_tasks] for task in range(num_tasks)
+            ]
+            with ProcessPoolExecutor(max_workers=max_workers, mp_context=_mp_context) as executor:
+                futures = [
+                    executor.submit(_map_shared_columns, func, shared_memory.name, indexes)
+                    for indexes in tasks
+                ]
+                # columns that can't be shared are processed while the workers are running
+                shared_positions = set(positions)
+                for position in range(data.shape[1]):
+                    if position not in shared_positions:
+                        start = time.perf_counter()
+                        results[position] = func(data.iloc[:, position])
+                        seconds[position] = time.perf_counter() - start
+                for future in futures:
+                    for index, result, elapsed in future.result():
+                        results[positions[index]] = result
+                        seconds[positions[index]] = elapsed
+        else:
+            for position in range(data.shape[1]):
+                start = time.perf_counter()
+                results[position] = func(data.iloc[:, position])
+                seconds[position] = time.perf_counter() - start
+    finally:
+        if shared_dataset is not None:
+            shared_dataset.release()
+            if is_temporary:
+                shared_dataset.close()
+    columns = data.columns.tolist()
+    return (
+        {columns[position]: results[position] for position in range(len(columns))},
+        {columns[position]: seconds[position] for position in range(len(columns))},
+    )
+
+
+def profile_dataset(
+        data: pd.DataFrame,
+        max_workers: int | None = None,
+        shared_dataset: SharedDataset | None = None) -> dict[str, dict]:
+    """
+    Profile each column of the dataset (see `map_columns` for `max_workers` and `shared_dataset`).
+    Returns a dictionary of column name -> statistics; `seconds` is the time it took to profile
+    the column.
+    """
+    profile, seconds = map_columns(
+        profile_column,
+        data,
+        max_workers=max_workers,
+        shared_dataset=shared_dataset,
+    )
+    return {column: stats | {'seconds': seconds[column]} for column, stats in profile.items()}
+
+
+def numeric_summary(profile: dict[str, dict], round_by: int = 2) -> pd.DataFrame | None:
+    """
+    Create the same dataframe as `helpsk.pandas.numeric_summary(..., return_style=False)` from
+    the profile.
+    """
+    results = {
+        column: {
+            key: round(value, round_by)
+            for key, value in stats.items() if key not in PROFILE_METADATA
+        }
+        for column, stats in profile.items() if stats['is_numeric']
+    }
+    if not results:
+        return None
+    return pd.DataFrame(results).T
+
+
+def non_numeric_summary(profile: dict[str, dict]) -> pd.DataFrame | None:
+    """
+    Create the same dataframe as `helpsk.pandas.non_numeric_summary(..., return_style=False)`
+    from the profile.
+    """
+    results = {
+        column: {
+            key: round(value, 3) if key in ['% Nulls', '% Unique'] else value
+            for key, value in stats.items() if key not in PROFILE_METADATA
+        }
+        for column, stats in profile.items() if not stats['is_numeric']
+    }
+    if not results:
+        return None
+    return pd.DataFrame.from_dict(results, orient='index')
+
+
+def load_profile(fingerprint: str, cache_directory: str) -> dict[str, dict] | None:
+    """Load the persisted profile of the dataset, or return None if it hasn't been persisted."""
+    path = os.path.join(cache_directory, f'{fingerprint}.pkl')
+    if not os.path.isfile(path):
+        return None
+    return pd.read_pickle(path)
+
+
+def save_profile(profile: dict[str, dict], fingerprint: str, cache_directory: str) -> None:
+    """Persist the profile of the dataset."""
+    os.makedirs(cache_directory, exist_ok=True)
+    pd.to_pickle(profile, os.path.join(cache_directory, f'{fingerprint}.pkl'))
+
+
+def _load_or_create_profile(
+        data: pd.DataFrame,
+        fingerprint: str,
+        cache_directory: str | None,
+        max_workers: int | None) -> dict[str, dict]:
+    if cache_directory:
+        profile = load_profile(fingerprint, cache_directory)
+        if profile is not None:
+            return profile
+    profile = profile_dataset(
+        data,
+        max_workers=max_workers,
+        shared_dataset=get_shared_dataset(fingerprint),
+    )
+    if cache_directory:
+        save_profile(profile, fingerprint, cache_directory)
+    return profile
+
+
+def start_profiling(
+        data: pd.DataFrame,
+        fingerprint: str,
+        cache_directory: str | None = None,
+        max_workers: int | None = None) -> Future:
+    """
+    Start profiling the dataset in a background thread (or load the persisted profile from
+    `cache_directory`) and return the future. Calling this again with the same fingerprint
+    returns the existing future. `max_workers` is the number of processes the columns are
+    profiled across (see `map_columns`); the shared copy of the dataset is reused if it has been
+    shared (see `share_dataset`).
+    """
+    with _lock:
+        if fingerprint not in _profiles:
+            _profiles[fingerprint] = _profile_executor.submit(
+                _load_or_create_profile,
+                data,
+                fingerprint,
+                cache_directory,
+                max_workers,
+            )
+            while len(_profiles) > MAX_PROFILES:
+                _profiles.popitem(last=False)
+        _profiles.move_to_end(fingerprint)
+        return _profiles[fingerprint]
+
+
+def is_profiling(fingerprint: str | None) -> bool:
+    """Return whether the dataset is being profiled (profiling has started and not finished)."""
+    future = _profiles.get(fingerprint)
+    return future is not None and not future.done()
+
+
+def get_finished_profile(fingerprint: str | None) -> dict[str, dict] | None:
+    """
+    Return the profile of the dataset if profiling has finished successfully; otherwise return
+    None. Unlike `get_profile`, a failed future is neither raised nor removed.
+    """
+    future = _profiles.get(fingerprint)
+    if future is None or not future.done() or future.exception() is not None:
+        return None
+    return future.result()
+
+
+def get_profile(fingerprint: str, timeout: float | None = 0) -> dict[str, dict] | None:
+    """
+    Return the profile of the dataset if profiling has finished (waiting up to `timeout` seconds;
+    None waits until finished); otherwise return None.
+
+    If profiling failed, the error is raised and the future is removed (so the error is only
+    raised once and `start_profiling` profiles the dataset again).
+    """
+    future = _profiles.get(fingerprint)
+    if future is None:
+        return None
+    try:
+        error = future.exception(timeout=timeout)
+    except TimeoutError:
+        return None
+    if error is not None:
+        with _lock:
+            if _profiles.get(fingerprint) is future:
+                del _profiles[fingerprint]
+        raise error
+    return future.result()
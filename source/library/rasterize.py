@@ -0,0 +1,260 @@
+"""
+Server-side rasterization of dense scatter plots (like Datashader).
+
+Rather than sending every point to the browser, `rasterize` bins the points into a fixed-resolution
+grid with `np.histogram2d` (one grid per category of the color variable, if any), `shade` maps the
+counts of each cell to a color (cells with more points are more opaque; with a color variable, the
+color is the mix of the colors of the categories in the cell), and the grid is sent as a PNG image
+trace. The size of the figure depends on the resolution, not on the number of points, and the
+visible range can be re-rasterized when the user zooms (see `rasterize_image`).
+"""
+import base64
+import struct
+import zlib
+import numpy as np
+import pandas as pd
+import plotly.colors
+import plotly.express as px
+import plotly.graph_objs as go
+
+
+# the number of bins (pixels) along each axis if the resolution isn't given
+RASTER_RESOLUTION = 400
+# the opacity of the cells with the fewest points (the cells with the most points are opaque)
+MIN_ALPHA = 0.3
+COLOR_SCALE = 'Viridis'
+
+
+def get_extent(values: pd.Series | np.ndarray) -> tuple[float, float]:
+    """Return the (min, max) of the finite values (widened if all of the values are the same)."""
+    values = np.asarray(values, dtype=float)
+    values = values[np.isfinite(values)]
+    if len(values) == 0:
+        return (0.0, 1.0)
+    minimum, maximum = float(values.min()), float(values.max())
+    if minimum == maximum:
+        return (minimum - 0.5, maximum + 0.5)
+    return (minimum, maximum)
+
+
+def get_categories(series: pd.Series, category_orders: dict | None = None) -> list:
+    """Return the categories of the color variable in the order of `category_orders` (if any)."""
+    values = series.dropna().unique().tolist()
+    if category_orders and series.name in category_orders:
+        order = [x for x in category_orders[series.name] if x in values]
+        return order + sorted((x for x in values if x not in order), key=str)
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return [x for x in series.cat.categories if x in values]
+    return sorted(values, key=str)
+
+
+def rasterize(
+        x: pd.Series | np.ndarray,
+        y: pd.Series | np.ndarray,
+        x_range: tuple[float, float],
+        y_range: tuple[float, float],
+        resolution: int,
+        category_codes: np.ndarray | None = None,
+        num_categories: int = 1) -> np.ndarray:
+    """
+    Count the points in each cell of a `resolution` x `resolution` grid spanning the ranges. Points
+    outside of the ranges are ignored.
+
+    Returns an array of shape (num_categories, resolution, resolution) indexed by [category code,
+    y bin, x bin] (the first y bin is the bottom of the grid). `category_codes` are the codes (0
+    to `num_categories` - 1; negative codes are ignored) of the category of each point.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if category_codes is None:
+        counts, _, _ = np.histogram2d(y, x, bins=resolution, range=[y_range, x_range])
+        return counts[np.newaxis]
+    # the category is a third dimension (one bin per code) so the points are binned in one pass
+    counts, _ = np.histogramdd(
+        (category_codes, y, x),
+        bins=(num_categories, resolution, resolution),
+        range=[(-0.5, num_categories - 0.5), y_range, x_range],
+    )
+    return counts
+
+
+def _to_rgb(colors: list[str]) -> np.ndarray:
+    """Convert plotly colors (e.g. '#636efa' or 'rgb(99, 110, 250)') to an (n, 3) array."""
+    colors = plotly.colors.convert_colors_to_same_type(colors, colortype='rgb')[0]
+    return np.array([plotly.colors.unlabel_rgb(x) for x in colors], dtype=float)
+
+
+def _category_colors(num_categories: int) -> list[str]:
+    """Return the colors of the categories (the default colors of plotly express)."""
+    colors = px.colors.qualitative.Plotly
+    return [colors[i % len(colors)] for i in range(num_categories)]
+
+
+def shade(
+        counts: np.ndarray,
+        colors: list[str] | None = None,
+        color_scale: str = COLOR_SCALE) -> np.ndarray:
+    """
+    Map the counts (the output of `rasterize`) to an RGBA image (uint8; same orientation as the
+    counts). Empty cells are transparent and the opacity increases with the log of the count.
+
+    Without `colors` (one color per category), the color of each cell is its log count on the
+    color scale; otherwise, the color is the mix of the colors of the categories in the cell
+    (weighted by their counts).
+    """
+    total = counts.sum(axis=0)
+    is_empty = total == 0
+    max_total = total.max()
+    scaled = np.log1p(total) / np.log1p(max_total) if max_total > 0 else np.zeros_like(total)
+    if colors is None:
+        lookup = _to_rgb(plotly.colors.sample_colorscale(color_scale, 256))
+        rgb = lookup[np.round(scaled * 255).astype(int)]
+    else:
+        rgb = np.tensordot(counts, _to_rgb(colors), axes=(0, 0))
+        rgb /= np.where(is_empty, 1, total)[:, :, np.newaxis]
+    alpha = (MIN_ALPHA + (1 - MIN_ALPHA) * scaled) * 255
+    alpha[is_empty] = 0
+    return np.dstack([rgb, alpha]).round().astype(np.uint8)
+
+
+def encode_png(rgba: np.ndarray) -> bytes:
+    """Encode an RGBA image (a (height, width, 4) uint8 array; first row at the top) as a PNG."""
+    height, width, _ = rgba.shape
+    # each row (scanline) starts with its filter type (0; none)
+    scanlines = np.insert(rgba.reshape(height, width * 4), 0, 0, axis=1)
+
+    def chunk(chunk_type: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + chunk_type + data \
+            + struct.pack('>I', zlib.crc32(chunk_type + data))
+
+    return b'\x89PNG\r\n\x1a\n' \
+        + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)) \
+        + chunk(b'IDAT', zlib.compress(scanlines.tobytes(), level=6)) \
+        + chunk(b'IEND', b'')
+
+
+def rasterize_image(
+        data: pd.DataFrame,
+        x: str,
+        y: str,
+        x_range: tuple[float, float],
+        y_range: tuple[float, float],
+        color: str | None = None,
+        resolution: int | None = None,
+        category_orders: dict | None = None) -> tuple[dict, int]:
+    """
+    Rasterize the points within the ranges (see `rasterize` and `shade`). Returns the properties
+    of the image trace (`source`, a base64 PNG, and the position of the image: `x0`, `y0`, `dx`,
+    and `dy`) and the maximum number of points in a cell.
+    """
+    resolution = resolution or RASTER_RESOLUTION
+    colors = None
+    category_codes = None
+    num_categories = 1
+    if color:
+        categories = get_categories(data[color], category_orders)
+        category_codes = pd.Categorical(data[color], categories=categories).codes
+        num_categories = len(categories)
+        colors = _category_colors(num_categories)
+    counts = rasterize(
+        data[x], data[y],
+        x_range=x_range,
+        y_range=y_range,
+        resolution=resolution,
+        category_codes=category_codes,
+        num_categories=num_categories,
+    )
+    png = encode_png(shade(counts, colors=colors))
+    dx = (x_range[1] - x_range[0]) / resolution
+    dy = (y_range[1] - y_range[0]) / resolution
+    # the first row of the image (the bottom of the grid) is drawn at y0; x0/y0 are the centers of
+    # the first pixel
+    image = {
+        'source': f"data:image/png;base64,{base64.b64encode(png).decode()}",
+        'x0': x_range[0] + dx / 2,
+        'y0': y_range[0] + dy / 2,
+        'dx': dx,
+        'dy': dy,
+    }
+    return image, int(counts.sum(axis=0).max())
+
+
+def count_color_bar(max_count: int) -> dict:
+    """
+    Return the marker of the (empty) trace that shows the color bar of the number of points per
+    cell (the colors are on a log scale; see `shade`).
+    """
+    max_count = max(max_count, 1)
+    tick_values = [int(x) for x in 10 ** np.arange(int(np.log10(max_count)) + 1)]
+    return {
+        'color': [0, float(np.log1p(max_count))],
+        'colorscale': COLOR_SCALE,
+        'showscale': True,
+        'colorbar': {
+            'title': {'text': '# of points'},
+            'tickvals': np.log1p(tick_values).tolist(),
+            'ticktext': [f"{x:,}" for x in tick_values],
+        },
+    }
+
+
+def plot_rasterized_scatter(
+        data: pd.DataFrame,
+        x: str,
+        y: str,
+        color: str | None = None,
+        resolution: int | None = None,
+        x_range: tuple[float, float] | None = None,
+        y_range: tuple[float, float] | None = None,
+        category_orders: dict | None = None,
+        title: str | None = None,
+        labels: dict | None = None) -> go.Figure:
+    """
+    Plot a scatter plot of `x` and `y` as an image rasterized on the server (see
+    `rasterize_image`), which is the same size regardless of the number of points. The ranges
+    default to the extent of the points.
+
+    The first trace is the image. The legend shows the colors of the categories of `color`;
+    without a color variable, the color bar (the second trace) shows the number of points per cell.
+    """
+    labels = labels or {}
+    x_range = tuple(x_range) if x_range else get_extent(data[x])
+    y_range = tuple(y_range) if y_range else get_extent(data[y])
+    image, max_count = rasterize_image(
+        data, x, y,
+        x_range=x_range,
+        y_range=y_range,
+        color=color,
+        resolution=resolution,
+        category_orders=category_orders,
+    )
+    fig = go.Figure(go.Image(
+        **image,
+        name='',
+        hovertemplate=f"{labels.get(x, x)}=%{{x}}<br>{labels.get(y, y)}=%{{y}}<extra></extra>",
+    ))
+    if color:
+        # image traces aren't shown in the legend; add an empty trace per category
+        categories = get_categories(data[color], category_orders)
+        for category, category_color in zip(categories, _category_colors(len(categories))):
+            fig.add_trace(go.Scatter(
+                x=[None], y=[None],
+                mode='markers',
+                marker={'color': category_color},
+                name=str(category),
+                showlegend=True,
+            ))
+        fig.update_layout(legend_title_text=labels.get(color, color))
+    else:
+        fig.add_trace(go.Scatter(
+            x=[None], y=[None],
+            mode='markers',
+            marker=count_color_bar(max_count),
+            showlegend=False,
+            hoverinfo='skip',
+        ))
+    fig.update_layout(title=title)
+    fig.update_xaxes(title_text=labels.get(x, x), range=list(x_range))
+    # image traces reverse the y-axis and fix the aspect ratio (square pixels) by default
+    fig.update_yaxes(title_text=labels.get(y, y), range=list(y_range), scaleanchor=False)
+    return fig
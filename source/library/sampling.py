@@ -0,0 +1,181 @@
+"""
+Sampling of large datasets for interactive exploration.
+
+`reservoir_sample` builds a uniform or stratified sample in a single pass over chunks of rows (e.g.
+the chunks of a csv file or the batches of a Snowflake query), so the full dataset never has to be
+in memory. Each row gets a random key and the sample is the rows with the smallest keys (overall,
+or per stratum), which is a uniform sample without replacement. Only the rows with the smallest
+keys seen so far are kept (the reservoir), and rows of later chunks with larger keys than the
+reservoir's are discarded as they are read.
+"""
+from collections.abc import Iterable
+import numpy as np
+import pandas as pd
+
+
+def _smallest_keys_per_group(
+        keys: np.ndarray,
+        group_codes: np.ndarray | None,
+        k: int | np.ndarray) -> np.ndarray:
+    """
+    Return a boolean mask of the rows that have one of the `k` smallest keys of their group (or
+    overall if `group_codes` is None). `k` can be an array with the number of rows per group code.
+    """
+    if group_codes is None:
+        mask = np.zeros(len(keys), dtype=bool)
+        if len(keys) <= k:
+            mask[:] = True
+        else:
+            mask[np.argpartition(keys, k - 1)[:k]] = True
+        return mask
+    order = np.lexsort((keys, group_codes))
+    sorted_codes = group_codes[order]
+    is_group_start = np.empty(len(order), dtype=bool)
+    is_group_start[:1] = True
+    np.not_equal(sorted_codes[1:], sorted_codes[:-1], out=is_group_start[1:])
+    group_starts = np.flatnonzero(is_group_start)
+    # the rank of each row within its group (by key)
+    group_lengths = np.diff(np.append(group_starts, len(order)))
+    ranks = np.arange(len(order)) - np.repeat(group_starts, group_lengths)
+    limits = k[sorted_codes] if isinstance(k, np.ndarray) else k
+    mask = np.empty(len(keys), dtype=bool)
+    mask[order] = ranks < limits
+    return mask
+
+
+def stratum_sample_sizes(
+        stratum_sizes: np.ndarray,
+        sample_size: int,
+        min_rows_per_stratum: int) -> np.ndarray:
+    """
+    Allocate the sample to the strata in proportion to their sizes, but with at least
+    `min_rows_per_stratum` rows per stratum (or all of the rows of smaller strata) so that rare
+    strata are represented. The total can slightly exceed `sample_size` because of the minimum.
+    """
+    total = stratum_sizes.sum()
+    proportional = np.floor(sample_size * stratum_sizes / total).astype(np.int64) if total else 0
+    return np.minimum(
+        np.maximum(proportional, min_rows_per_stratum),
+        stratum_sizes,
+    ).astype(np.int64)
+
+
+def _trim_reservoir(
+        reservoir: pd.DataFrame,
+        keys: np.ndarray,
+        rows: np.ndarray,
+        stratify_by: str | None,
+        sample_size: int | np.ndarray) -> tuple[pd.DataFrame, np.ndarray, np.ndarray]:
+    """Keep the rows of the reservoir with the `sample_size` smallest keys (per stratum)."""
+    group_codes = None
+    if stratify_by is not None:
+        group_codes, _ = pd.factorize(reservoir[stratify_by], use_na_sentinel=False)
+    keep = _smallest_keys_per_group(keys, group_codes, sample_size)
+    return reservoir[keep].reset_index(drop=True), keys[keep], rows[keep]
+
+
+def reservoir_sample(
+        chunks: Iterable[pd.DataFrame],
+        sample_size: int,
+        stratify_by: str | None = None,
+        min_rows_per_stratum: int = 100,
+        seed: int = 42) -> tuple[pd.DataFrame, int]:
+    """
+    Sample the rows of a dataset in a single pass over chunks of its rows. Returns the sample (in
+    the original order of the rows) and the total number of rows in the dataset.
+
+    Args:
+        chunks:
+            The chunks of rows of the dataset (e.g. `pd.read_csv(..., chunksize=...)`).
+        sample_size:
+            The number of rows to sample.
+        stratify_by:
+            If None, the rows are sampled uniformly. Otherwise, the rows are sampled per value of
+            the column (missing values are a stratum); see `stratum_sample_sizes` for the number
+            of rows sampled per stratum. Up to `sample_size` rows per stratum are kept while
+            streaming, so this is meant for columns with a modest number of unique values.
+        min_rows_per_stratum:
+            The minimum number of rows sampled per stratum.
+        seed:
+            The seed of the random keys.
+    """
+    rng = np.random.default_rng(seed)
+    # the rows that can still be sampled; the reservoir is trimmed to the rows with the smallest
+    # keys when the rows added since the last trim are as many as the rows kept (so each row is
+    # sorted a constant number of times on average)
+    reservoir, reservoir_keys, reservoir_rows = [], [], []
+    num_kept = 0
+    num_added = 0
+    stratum_sizes = pd.Series(dtype=np.int64)
+    # the largest key kept (per stratum) when `sample_size` rows are kept; only rows with smaller
+    # keys can be sampled
+    max_keys = None
+    num_rows = 0
+    for chunk in chunks:
+        candidates = chunk
+        keys = rng.random(len(chunk))
+        rows = np.arange(num_rows, num_rows + len(chunk))
+        num_rows += len(chunk)
+        if stratify_by is not None:
+            if stratify_by not in chunk.columns:
+                raise ValueError(f"The column to stratify by (`{stratify_by}`) doesn't exist.")
+            stratum_sizes = stratum_sizes.add(
+                chunk[stratify_by].value_counts(dropna=False),
+                fill_value=0,
+            )
+        if max_keys is not None:
+            if stratify_by is None:
+                thresholds = max_keys
+            else:
+                thresholds = chunk[stratify_by].map(max_keys).fillna(np.inf).to_numpy()
+            is_candidate = keys < thresholds
+            candidates, keys, rows = chunk[is_candidate], keys[is_candidate], rows[is_candidate]
+        reservoir.append(candidates)
+        reservoir_keys.append(keys)
+        reservoir_rows.append(rows)
+        num_added += len(candidates)
+        if num_added < max(num_kept, sample_size):
+            continue
+        kept, kept_keys, kept_rows = _trim_reservoir(
+            pd.concat(reservoir, ignore_index=True),
+            np.concatenate(reservoir_keys),
+            np.concatenate(reservoir_rows),
+            stratify_by,
+            sample_size,
+        )
+        reservoir, reservoir_keys, reservoir_rows = [kept], [kept_keys], [kept_rows]
+        num_kept, num_added = len(kept), 0
+        if stratify_by is None:
+            max_keys = kept_keys.max() if num_kept >= sample_size else None
+        else:
+            stratum_keys = pd.Series(kept_keys).groupby(kept[stratify_by].to_numpy())
+            max_keys = stratum_keys.max()[stratum_keys.size() >= sample_size]
+
+    if not reservoir:
+        return pd.DataFrame(), 0
+    reservoir, reservoir_keys, reservoir_rows = _trim_reservoir(
+        pd.concat(reservoir, ignore_index=True),
+        np.concatenate(reservoir_keys),
+        np.concatenate(reservoir_rows),
+        stratify_by,
+        sample_size,
+    )
+    if stratify_by is not None and len(reservoir) > 0:
+        _, strata = pd.factorize(reservoir[stratify_by], use_na_sentinel=False)
+        sizes = stratum_sizes.reindex(strata).to_numpy(dtype=np.float64)
+        # missing values don't match when reindexing
+        sizes[pd.isna(strata)] = stratum_sizes[stratum_sizes.index.isna()].sum()
+        reservoir, reservoir_keys, reservoir_rows = _trim_reservoir(
+            reservoir,
+            reservoir_keys,
+            reservoir_rows,
+            stratify_by,
+            stratum_sample_sizes(sizes.astype(np.int64), sample_size, min_rows_per_stratum),
+        )
+    return reservoir.iloc[np.argsort(reservoir_rows)].reset_index(drop=True), num_rows
+
+
+def iterate_chunks(data: pd.DataFrame, chunk_size: int) -> Iterable[pd.DataFrame]:
+    """Iterate over chunks of `chunk_size` rows of the data."""
+    for start in range(0, len(data), chunk_size):
+        yield data.iloc[start:start + chunk_size]
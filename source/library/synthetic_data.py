@@ -0,0 +1,201 @@
+"""
+Vectorized generation of synthetic data (e.g. large datasets for load testing and benchmarks).
+
+`create_synthetic_dataframe` creates a dataframe with a configurable number of rows and columns
+(cycling through the column types in `COLUMN_KINDS`), cardinality of the string/categorical
+columns, rate of missing values, and seed. All of the values are generated with a NumPy
+`Generator` and array operations (e.g. dates are datetime64 arithmetic, and strings are taken from
+a vocabulary of the unique values, which are formatted once), so millions of rows take seconds.
+
+`write_synthetic_parquet` writes a dataset of any size to a Parquet file in chunks (each chunk is
+generated from its own seed, derived from the seed of the dataset), so only one chunk is in memory
+at a time. The schema of the file is built from the column types (see `synthetic_arrow_schema`)
+rather than inferred from the first chunk, where e.g. a string column can be all missing.
+"""
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+# the types of the columns; the columns cycle through the types in this order
+COLUMN_KINDS = [
+    'integer',
+    'float',
+    'date',
+    'datetime',
+    'date_string',
+    'string',
+    'categorical',
+    'boolean',
+]
+START_DATE = np.datetime64('2020-01-01')
+
+
+def format_dates(days: np.ndarray, date_format: str, start_date: np.datetime64 = START_DATE,
+                 ) -> np.ndarray:
+    """
+    Format the dates (`start_date` plus `days`; integers) as strings. Only the unique dates are
+    formatted and the strings are taken from those (an object array).
+    """
+    unique_days, codes = np.unique(days, return_inverse=True)
+    labels = pd.DatetimeIndex(start_date + unique_days.astype('timedelta64[D]'))
+    return labels.strftime(date_format).to_numpy(dtype=object)[codes]
+
+
+def _zipf_codes(rng: np.random.Generator, num_rows: int, cardinality: int) -> np.ndarray:
+    """
+    Return random codes between 0 and `cardinality - 1` where code `i` is ~1/(i + 1) as frequent
+    as code 0 (i.e. a few values are common and most values are rare, like real data).
+    """
+    weights = 1 / np.arange(1, cardinality + 1)
+    cumulative = np.cumsum(weights / weights.sum())
+    return np.minimum(np.searchsorted(cumulative, rng.random(num_rows)), cardinality - 1)
+
+
+def _create_column(  # noqa: PLR0912
+        kind: str,
+        rng: np.random.Generator,
+        num_rows: int,
+        cardinality: int,
+        missing_rate: float,
+        num_days: int) -> pd.Series | pd.Categorical | np.ndarray:
+    """
+    Create the values of a column of the given kind. The dtype only depends on the arguments (not
+    on the random values; e.g. integer columns are floats whenever `missing_rate` > 0) so that
+    the chunks of a dataset have the same dtypes.
+    """
+    is_missing = rng.random(num_rows) < missing_rate if missing_rate > 0 else None
+    if kind == 'integer':
+        values = rng.integers(0, 1_000, size=num_rows)
+        if is_missing is not None:
+            values = values.astype(float)
+            values[is_missing] = np.nan
+    elif kind == 'float':
+        values = rng.normal(loc=100, scale=25, size=num_rows)
+        if is_missing is not None:
+            values[is_missing] = np.nan
+    elif kind in {'date', 'datetime'}:
+        values = START_DATE + rng.integers(0, num_days, size=num_rows).astype('timedelta64[D]')
+        values = values.astype('datetime64[ns]')
+        if kind == 'datetime':
+            values += rng.integers(0, 24 * 60 * 60, size=num_rows).astype('timedelta64[s]')
+        if is_missing is not None:
+            values[is_missing] = np.datetime64('NaT')
+    elif kind == 'date_string':
+        values = format_dates(rng.integers(0, num_days, size=num_rows), '%Y-%m-%d')
+        if is_missing is not None:
+            values[is_missing] = np.nan
+    elif kind in {'string', 'categorical'}:
+        vocabulary = np.char.add('value_', np.arange(cardinality).astype(str)).astype(object)
+        codes = _zipf_codes(rng, num_rows, cardinality)
+        if kind == 'categorical':
+            if is_missing is not None:
+                codes[is_missing] = -1
+            return pd.Categorical.from_codes(codes, categories=vocabulary)
+        values = vocabulary[codes]
+        if is_missing is not None:
+            values[is_missing] = None
+    elif kind == 'boolean':
+        values = rng.random(num_rows) < 0.5
+        if is_missing is not None:
+            # booleans with missing values are objects (like pandas)
+            values = values.astype(object)
+            values[is_missing] = np.nan
+    else:
+        raise ValueError(f"Unknown column kind: {kind}")
+    return values
+
+
+def _column_kinds(num_columns: int) -> dict[str, str]:
+    """Return the names of the columns and their types (see `create_synthetic_dataframe`)."""
+    return {
+        f'{kind}_{index // len(COLUMN_KINDS) + 1}': kind
+        for index in range(num_columns)
+        for kind in [COLUMN_KINDS[index % len(COLUMN_KINDS)]]
+    }
+
+
+def synthetic_arrow_schema(
+        num_columns: int = len(COLUMN_KINDS),
+        cardinality: int = 1_000,
+        missing_rate: float = 0.05,
+        **kwargs: object) -> pa.Schema:  # noqa: ARG001
+    """
+    Return the Arrow schema of the dataframes created by `create_synthetic_dataframe` with the
+    same arguments; the types only depend on the arguments (e.g. integer columns are floats if
+    `missing_rate` > 0), not on the random values.
+    """
+    # the codes of the categorical columns are the smallest integers that fit the categories
+    codes = pd.Categorical.from_codes([], categories=np.arange(cardinality)).codes
+    types = {
+        'integer': pa.float64() if missing_rate > 0 else pa.int64(),
+        'float': pa.float64(),
+        'date': pa.timestamp('ns'),
+        'datetime': pa.timestamp('ns'),
+        'date_string': pa.string(),
+        'string': pa.string(),
+        'categorical': pa.dictionary(pa.from_numpy_dtype(codes.dtype), pa.string()),
+        'boolean': pa.bool_(),
+    }
+    return pa.schema([
+        pa.field(name, types[kind]) for name, kind in _column_kinds(num_columns).items()
+    ])
+
+
+def create_synthetic_dataframe(
+        num_rows: int,
+        num_columns: int = len(COLUMN_KINDS),
+        cardinality: int = 1_000,
+        missing_rate: float = 0.05,
+        num_days: int = 4 * 365,
+        seed: int | np.random.SeedSequence | None = None) -> pd.DataFrame:
+    """
+    Create a dataframe of random data.
+
+    Args:
+        num_rows: the number of rows
+        num_columns: the number of columns; the columns cycle through the types in `COLUMN_KINDS`
+            and are named after their type (e.g. `integer_1`, `float_1`, ..., `integer_2`)
+        cardinality: the number of unique values of the string and categorical columns (the
+            values have Zipf-like frequencies)
+        missing_rate: the probability that each value is missing
+        num_days: the number of days (starting from 2020-01-01) of the date columns
+        seed: the seed of the random values (the same seed creates the same data)
+    """
+    assert 0 <= missing_rate < 1
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for name, kind in _column_kinds(num_columns).items():
+        columns[name] = _create_column(
+            kind=kind,
+            rng=rng,
+            num_rows=num_rows,
+            cardinality=cardinality,
+            missing_rate=missing_rate,
+            num_days=num_days,
+        )
+    return pd.DataFrame(columns)
+
+
+def write_synthetic_parquet(
+        path: str,
+        num_rows: int,
+        chunk_size: int = 1_000_000,
+        seed: int | None = None,
+        **kwargs: object) -> None:
+    """
+    Write a dataframe of random data (see `create_synthetic_dataframe`; `kwargs` are passed to it)
+    to a Parquet file, one chunk (row group) of `chunk_size` rows at a time. The data only depends
+    on the seed and the chunk size.
+    """
+    num_chunks = max(-(-num_rows // chunk_size), 1)
+    schema = synthetic_arrow_schema(**kwargs)
+    with pq.ParquetWriter(path, schema) as writer:
+        for index, chunk_seed in enumerate(np.random.SeedSequence(seed).spawn(num_chunks)):
+            chunk = create_synthetic_dataframe(
+                num_rows=min(chunk_size, num_rows - index * chunk_size),
+                seed=chunk_seed,
+                **kwargs,
+            )
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
@@ -1,6 +1,7 @@
 """Defines the types of data that can be used in the library."""
 import pandas as pd
 import helpsk.pandas as hp
+from source.library.profiling import SharedDataset, map_columns
 
 
 NUMERIC = 'numeric'
@@ -24,41 +25,48 @@ def is_series_datetime(series: pd.Series) -> bool:
         return False
 
 
-def get_column_types(data: pd.DataFrame) -> dict:
+def get_column_type(series: pd.Series) -> str:
+    """Return the type of the column ('numeric', 'date', 'string', 'categorical', 'boolean')."""
+    is_date = is_series_datetime(series)
+    types = [
+        x for x, is_x in [
+            (NUMERIC, hp.is_series_numeric(series)),
+            (DATE, is_date),
+            (STRING, not is_date and hp.is_series_string(series)),
+            (CATEGORICAL, hp.is_series_categorical(series)),
+            (BOOLEAN, hp.is_series_bool(series)),
+        ]
+        if is_x
+    ]
+    # ensure the types are mutually exclusive
+    assert len(types) <= 1
+    if not types:
+        raise ValueError(f"Unknown type for {series.name}")
+    return types[0]
+
+
+def get_column_types(
+        data: pd.DataFrame,
+        max_workers: int | None = None,
+        shared_dataset: SharedDataset | None = None) -> dict:
     """
     Create a dictionary with column names as keys and values of either 'numeric', 'date', 'string',
     'categorical', 'boolean'.
+
+    The columns are checked in parallel across `max_workers` processes for large datasets (see
+    `source.library.profiling.map_columns`, which also describes `shared_dataset`).
     """
     # i can't convert columns to datetime here because the dataframe gets converted to a dict
     # and loses the converted datetime dtypes
     # but i need to still get the columns that should be treated as dates
-    date_columns = [x for x in data.columns.tolist() if is_series_datetime(data[x])]
-    all_columns = data.columns.tolist()
-    numeric_columns = hp.get_numeric_columns(data)
-    categorical_columns = hp.get_categorical_columns(data)
-    string_columns = [x for x in hp.get_string_columns(data) if x not in date_columns]
-    boolean_columns = [x for x in all_columns if hp.is_series_bool(data[x])]
-    # ensure all columns lists are mutually exclusive
-    sets = [set(lst) for lst in [numeric_columns, date_columns, categorical_columns, string_columns, boolean_columns]]  # noqa
-    assert sum(len(s) for s in sets) == len(set.union(*sets))
-
-    def _get_type(var: str) -> str:
-        if var in numeric_columns:
-            return 'numeric'
-        if var in date_columns:
-            return 'date'
-        if var in string_columns:
-            return 'string'
-        if var in categorical_columns:
-            return 'categorical'
-        if var in boolean_columns:
-            return 'boolean'
-        raise ValueError(f"Unknown type for {var}")
-
-    # for each column create a dictionary with column name as key and
-    # values of either 'numeric', 'date', 'string', 'categorical', 'boolean'
     # this is used to determine which controls to show for each column
-    return {x:_get_type(x) for x in all_columns}
+    column_types, _ = map_columns(
+        get_column_type,
+        data,
+        max_workers=max_workers,
+        shared_dataset=shared_dataset,
+    )
+    return column_types
 
 
 def get_all_columns(column_types: dict) -> list[str]:
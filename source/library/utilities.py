@@ -1,9 +1,12 @@
 """Misc utilities."""
 import uuid
-from datetime import datetime, date, timedelta
+from datetime import datetime, date
 import numpy as np
 import pandas as pd
 import source.library.types as t
+from source.library.date_index import DateIndex
+from source.library.duckdb_engine import create_filter_code
+from source.library.synthetic_data import format_dates
 from llm_workflow.agents import Tool
 
 
@@ -84,16 +87,29 @@ def to_date_string(value: str | datetime | date, str_format: str = '%Y-%m-%d') -
     return to_date(value).strftime(str_format)
 
 
-def create_random_dataframe(num_rows: int, sporadic_missing: bool = False) -> pd.DataFrame:
-    """Generate random data for the columns."""
-    integers = np.random.randint(1, 100, size=num_rows)  # noqa
-    floats = np.random.rand(num_rows) * 100  # noqa
-    dates = [datetime(2023, 1, 1) + timedelta(days=np.random.randint(0, 365)) for _ in range(num_rows)]  # noqa
-    date_times = [datetime(2023, 1, 1) + timedelta(days=np.random.randint(0, 365), hours=np.random.randint(0, 24)) for _ in range(num_rows)]  # noqa
-    date_strings = [date.strftime('%Y-%m-%d') for date in dates]
-    date_home_strings = [date.strftime('%d/%m/%Y') for date in dates]
-    categories = np.random.choice(['Category A', 'Category B', 'Category C'], num_rows)  # noqa
-    booleans = np.random.choice([True, False], num_rows)  # noqa
+def create_random_dataframe(
+        num_rows: int,
+        sporadic_missing: bool = False,
+        seed: int | None = None) -> pd.DataFrame:
+    """
+    Generate random data for the columns. If `sporadic_missing` is True, 10% of the values of each
+    column (except `Booleans`) are missing. The same `seed` generates the same data.
+    """
+    rng = np.random.default_rng(seed)
+    integers = rng.integers(1, 100, size=num_rows)
+    floats = rng.random(num_rows) * 100
+    days = rng.integers(0, 365, size=num_rows)
+    dates = np.datetime64('2023-01-01', 'ns') + days.astype('timedelta64[D]')
+    date_times = (
+        np.datetime64('2023-01-01', 'ns')
+        + rng.integers(0, 365, size=num_rows).astype('timedelta64[D]')
+        + rng.integers(0, 24, size=num_rows).astype('timedelta64[h]')
+    )
+    date_strings = format_dates(days, '%Y-%m-%d', start_date=np.datetime64('2023-01-01'))
+    date_home_strings = format_dates(days, '%d/%m/%Y', start_date=np.datetime64('2023-01-01'))
+    category_names = ['Category A', 'Category B', 'Category C']
+    category_codes = rng.integers(0, len(category_names), size=num_rows)
+    booleans = rng.random(num_rows) < 0.5
 
     fake_df = pd.DataFrame({
         'Integers': integers,
@@ -102,8 +118,8 @@ def create_random_dataframe(num_rows: int, sporadic_missing: bool = False) -> pd
         'DateTimes': date_times,
         'DateStrings': date_strings,
         'DateHomeStrings': date_home_strings,
-        'Categories': pd.Categorical(categories, categories=['Category A', 'Category B', 'Category C']),  # noqa
-        'Categories2': categories.copy(),
+        'Categories': pd.Categorical.from_codes(category_codes, categories=category_names),
+        'Categories2': np.array(category_names, dtype=object)[category_codes],
         'Booleans': booleans,
         'Booleans1': booleans.copy(),
         'Booleans2': booleans.copy(),
@@ -112,34 +128,27 @@ def create_random_dataframe(num_rows: int, sporadic_missing: bool = False) -> pd
     if sporadic_missing:
         num_missing = int(num_rows * 0.1)  # 10% missing values
 
-        missing_indices = np.random.choice(num_rows, num_missing, replace=False)  # noqa
-        fake_df.loc[missing_indices, 'Integers'] = np.nan
-
-        missing_indices = np.random.choice(num_rows, num_missing, replace=False)  # noqa
-        fake_df.loc[missing_indices, 'Floats'] = np.nan
-
-        missing_indices = np.random.choice(num_rows, num_missing, replace=False)  # noqa
-        fake_df.loc[missing_indices, 'Dates'] = np.nan
-
-        missing_indices = np.random.choice(num_rows, num_missing, replace=False)  # noqa
-        fake_df.loc[missing_indices, 'DateTimes'] = np.nan
-
-        missing_indices = np.random.choice(num_rows, num_missing, replace=False)  # noqa
-        fake_df.loc[missing_indices, 'DateStrings'] = np.nan
-
-        missing_indices = np.random.choice(num_rows, num_missing, replace=False)  # noqa
-        fake_df.loc[missing_indices, 'DateHomeStrings'] = np.nan
-
-        missing_indices = np.random.choice(num_rows, num_missing, replace=False)  # noqa
-        fake_df.loc[missing_indices, 'Categories'] = np.nan
-        fake_df['Categories'] = pd.Categorical(fake_df['Categories'], categories=['Category A', 'Category B', 'Category C'])  # noqa
-        fake_df.loc[missing_indices, 'Categories2'] = None
-        fake_df['Categories2'] = pd.Categorical(fake_df['Categories2'], categories=['Category A', 'Category B', 'Category C'])  # noqa
-
-        missing_indices = np.random.choice(num_rows, num_missing, replace=False)  # noqa
-        fake_df.loc[missing_indices, 'Booleans1'] = np.nan
-        missing_indices = np.random.choice(num_rows, num_missing, replace=False)  # noqa
-        fake_df.loc[missing_indices, 'Booleans2'] = None
+        def missing_indices() -> np.ndarray:
+            return rng.permutation(num_rows)[:num_missing]
+
+        for column in ['Integers', 'Floats', 'DateStrings', 'DateHomeStrings']:
+            values = fake_df[column].to_numpy(dtype=float if column == 'Integers' else None)
+            values[missing_indices()] = np.nan
+            fake_df[column] = values
+        for column in ['Dates', 'DateTimes']:
+            values = fake_df[column].to_numpy(copy=True)
+            values[missing_indices()] = np.datetime64('NaT')
+            fake_df[column] = values
+        # `Categories2` has missing values in the same rows as `Categories`
+        codes = category_codes.copy()
+        codes[missing_indices()] = -1
+        fake_df['Categories'] = pd.Categorical.from_codes(codes, categories=category_names)
+        fake_df['Categories2'] = pd.Categorical.from_codes(codes, categories=category_names)
+        # the missing values of `Booleans1` are NaN and the missing values of `Booleans2` are None
+        for column, missing_value in [('Booleans1', np.nan), ('Booleans2', None)]:
+            values = booleans.astype(object)
+            values[missing_indices()] = missing_value
+            fake_df[column] = values
 
     return fake_df
 
@@ -148,6 +157,8 @@ def filter_dataframe(
         data: pd.DataFrame,
         filters: dict | None,
         column_types: dict,
+        engine: str = 'pandas',
+        date_index: DateIndex | None = None,
         ) -> tuple[pd.DataFrame, str]:
     """
     Filter a dataframe based on a dictionary. Each key is a column name and the value is the
@@ -171,24 +182,56 @@ def filter_dataframe(
 
     For categories, the value must be a list of strings, and the data will return values in the
     list. `np.nan` values can be included in the list to return missing values.
+
+    If `engine` is 'duckdb', the filters are applied with a DuckDB query (see
+    `duckdb_engine.create_filter_code`) and the code contains the SQL. If `engine` is 'polars', the
+    filters are applied with a single Polars query (see `polars_engine.create_filter_mask`) and
+    the code is the pandas code (the results are the same).
+
+    The date filters are applied before the other filters and the dates of all of the rows are
+    converted at once, so the format of string dates is inferred from the whole column (rather
+    than from the first row that matches the other filters).
+
+    If `date_index` (the `DateIndex` of `data`) is given, the rows in the ranges of the date
+    filters are found with the index (two binary searches per filter rather than comparing the
+    date of every row) and the other filters are applied to those rows; the code and the results
+    are the same. The index isn't used with the 'duckdb' engine.
     """
     if not filters:
         return data, ''
 
+    if engine == 'duckdb':
+        code = create_filter_code(filters, column_types, data)
+        local_vars = {'data': data}
+        exec(code, globals(), local_vars)
+        return local_vars['graph_data'], code
+
     code = 'def filter_data(data: pd.DataFrame) -> pd.DataFrame:\n'
     code += '    graph_data = data.copy()\n'
 
+    # the date filters are applied first and the dates of all of the rows are converted (rather
+    # than the dates of the rows that match the other filters), so that the format of string dates
+    # is inferred from the whole column (as when the column type was detected and the date index
+    # was built)
+    date_columns = [column for column in filters if column_types.get(column) == t.DATE]
+    for column in date_columns:
+        values = filters[column]
+        assert column in data.columns, f"Column `{column}` not found in `data`"
+        assert isinstance(values, tuple)
+        code += f"    # Filter on `{column}`\n"
+        code += f"    series = pd.to_datetime(data['{column}']).dt.date\n"
+        code += f"    start_date = pd.to_datetime('{values[0]}').date()\n"
+        code += f"    end_date = pd.to_datetime('{values[1]}').date() + pd.Timedelta(days=1)\n"
+        code += f"    is_match {'&=' if column != date_columns[0] else '='} (series >= start_date) & (series < end_date)\n"  # noqa: E501
+    if date_columns:
+        code += "    graph_data = graph_data[is_match]\n"
+
     for column, values in filters.items():
+        if column in date_columns:
+            continue
         assert column in data.columns, f"Column `{column}` not found in `data`"
         code += f"    # Filter on `{column}`\n"
-        # convert the series to a datetime if possible
-        if column_types[column] == t.DATE:
-            assert isinstance(values, tuple)
-            code += f"    series = pd.to_datetime(graph_data['{column}']).dt.date\n"
-            code += f"    start_date = pd.to_datetime('{values[0]}').date()\n"
-            code += f"    end_date = pd.to_datetime('{values[1]}').date() + pd.Timedelta(days=1)\n"
-            code += "    graph_data = graph_data[(series >= start_date) & (series < end_date)]\n"
-        elif column_types[column] in t.DISCRETE_TYPES:
+        if column_types[column] in t.DISCRETE_TYPES:
             assert isinstance(values, list), f"Values for column `{column}` must be a list not `{type(values)}`"  # noqa
             # np.nan values are converted to 'nan' strings, but we need 'np.nan' string for the
             # code to work
@@ -203,11 +246,63 @@ def filter_dataframe(
     code += '    return graph_data\n\n'
     code += "graph_data = filter_data(data)"
 
+    date_filters = {
+        column: values for column, values in filters.items()
+        if date_index is not None and column in date_index.columns
+    }
+    if date_filters and len(data) == date_index.num_rows:
+        mask = np.ones(len(data), dtype=bool)
+        for column, values in date_filters.items():
+            start_date = pd.Timestamp(pd.to_datetime(values[0]).date())
+            end_date = pd.Timestamp(pd.to_datetime(values[1]).date()) + pd.Timedelta(days=1)
+            mask &= date_index.get_mask(column, start=start_date, end=end_date)
+        other_filters = {
+            column: values for column, values in filters.items() if column not in date_filters
+        }
+        filtered_data, _ = filter_dataframe(data[mask], other_filters, column_types, engine=engine)
+        return filtered_data, code
+
+    if engine == 'polars':
+        # the same rows as the (pandas) code, so the code is unchanged
+        from source.library.polars_engine import create_filter_mask
+        return data[create_filter_mask(data, filters, column_types)], code
+
     local_vars = locals()
     exec(code, globals(), local_vars)
     return local_vars['graph_data'], code
 
 
+def filter_date_range(
+        data: pd.DataFrame,
+        column: str,
+        start: str | datetime,
+        end: str | datetime | None = None,
+        date_index: DateIndex | None = None,
+        ) -> tuple[pd.DataFrame, str]:
+    """
+    Return the rows where the date column is in the range [`start`, `end`) (no upper bound if `end`
+    is None; missing dates are excluded) and the code to recreate the filter.
+
+    If `date_index` (the `DateIndex` of `data`) is given, the rows are found with the index rather
+    than by comparing the date of every row.
+    """
+    start = pd.Timestamp(start)
+    end = pd.Timestamp(end) if end is not None else None
+    code = f"series = pd.to_datetime(graph_data['{column}'], errors='coerce')\n"
+    if end is None:
+        code += f"graph_data = graph_data[series >= '{start}']\n"
+    else:
+        code += f"graph_data = graph_data[(series >= '{start}') & (series < '{end}')]\n"
+    if date_index is not None and column in date_index.columns \
+            and len(data) == date_index.num_rows:
+        return data.iloc[date_index.get_positions(column, start=start, end=end)], code
+    series = pd.to_datetime(data[column], errors='coerce')
+    mask = series >= start
+    if end is not None:
+        mask &= series < end
+    return data[mask], code
+
+
 def build_tools_from_graph_configs(configs: dict, column_types: dict) -> list[Tool]:  # noqa
     """TODO."""
     # TODO: `Aggregation:` (sum, avg, etc.)
@@ -1,4 +1,5 @@
 """Test fixtures for the project."""
+import logging
 import os
 from itertools import product
 from dotenv import load_dotenv
@@ -9,6 +10,7 @@ from datetime import datetime
 import helpsk.pandas as hp
 
 import yaml
+from source.library.dash_utilities import logger
 
 load_dotenv()
 
@@ -20,6 +22,14 @@ def generate_combinations(lists: list[list[str]]) -> list[tuple]:
     return list(product(*lists))
 
 
+@pytest.fixture
+def reset_logger():
+    """Remove the logging configuration (`configure_logging`) of the test."""
+    yield
+    logger.handlers = []
+    logger.setLevel(logging.NOTSET)
+
+
 @pytest.fixture
 def mock_data1() -> pd.DataFrame:
     """Create a dataframe with various data types."""
@@ -0,0 +1,287 @@
+"""Tests for the callbacks in app.py (called through the Dash test client)."""
+import base64
+import importlib
+import pandas as pd
+import pytest
+from source.library.metrics import profile_call
+
+
+@pytest.fixture(scope='module')
+def dash_app(tmp_path_factory):  # noqa
+    """Import the app; the server-side stores are written to a temporary directory."""
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.chdir(tmp_path_factory.mktemp('app'))
+        monkeypatch.setenv('DEBUG', 'false')
+        monkeypatch.setenv('LOG_LEVEL', 'WARNING')
+        app = importlib.import_module('app')
+        client = app.app.server.test_client()
+        client.get('/')
+        yield app, client
+
+
+def call_callback(dash_app, name: str, values: dict, changed: list[str]) -> dict:  # noqa
+    """
+    Call the callback with the given function name, where `values` are the values of its inputs
+    and states (e.g. {'main_tabs.active_tab': 'load_data_tab'}; defaults to None) and `changed`
+    are the inputs that triggered the callback. Returns the updated outputs ({} if there are no
+    updates).
+    """
+    app, client = dash_app
+    key, callback = next(
+        (key, callback) for key, callback in app.app.callback_map.items()
+        if callback['callback'].__name__ == name
+    )
+
+    def to_payload(dependencies: list[dict]) -> list[dict]:
+        return [
+            {
+                'id': dependency['id'],
+                'property': dependency['property'],
+                'value': values.get(f"{dependency['id']}.{dependency['property']}"),
+            }
+            for dependency in dependencies
+        ]
+
+    outputs = [
+        {'id': output.split('.')[0], 'property': output.split('.')[1].split('@')[0]}
+        for output in key.strip('.').split('...')
+    ]
+    response = client.post('/_dash-update-component', json={
+        'output': key,
+        'outputs': outputs if len(outputs) > 1 else outputs[0],
+        'inputs': to_payload(callback['inputs']),
+        'state': to_payload(callback['state']),
+        'changedPropIds': changed,
+    })
+    if response.status_code == 204:  # i.e. no_update
+        return {}
+    assert response.status_code == 200
+    return response.get_json()['response']
+
+
+def test_load_data__same_data_renders_tabs(dash_app):  # noqa
+    contents = base64.b64encode(b'a,b\n1,x\n2,y\n3,z\n').decode()
+    rendered_tabs = {}
+    for _ in range(2):
+        loaded = call_callback(
+            dash_app,
+            'load_data',
+            {
+                'upload-data.contents': f'data:text/csv;base64,{contents}',
+                'upload-data.filename': 'data.csv',
+                'sample_mode_checklist.value': [],
+            },
+            changed=['upload-data.contents'],
+        )
+        fingerprint = loaded['dataset_fingerprint']['data']
+        assert fingerprint is not None
+        # loading the data (even the same data) resets which tabs have been rendered
+        assert loaded['rendered_tabs']['data'] == {}
+        rendered_tabs = loaded['rendered_tabs']['data']
+        requested = call_callback(
+            dash_app,
+            'request_tab_render',
+            {
+                'main_tabs.active_tab': 'load_data_tab',
+                'dataset_fingerprint.data': fingerprint,
+                'rendered_tabs.data': rendered_tabs,
+            },
+            changed=['dataset_fingerprint.data'],
+        )
+        assert requested['data_sample_request']['data'] == fingerprint
+        rendered_tabs = requested['rendered_tabs']['data']
+        assert rendered_tabs == {'data_sample_request': fingerprint}
+    # switching back to the tab doesn't render it again
+    requested = call_callback(
+        dash_app,
+        'request_tab_render',
+        {
+            'main_tabs.active_tab': 'load_data_tab',
+            'dataset_fingerprint.data': fingerprint,
+            'rendered_tabs.data': rendered_tabs,
+        },
+        changed=['main_tabs.active_tab'],
+    )
+    assert requested == {}
+
+
+def test_load_data__sampling_error(dash_app):  # noqa
+    loaded = call_callback(
+        dash_app,
+        'load_data',
+        {
+            'load_random_data_button.n_clicks': 1,
+            'sample_mode_checklist.value': [True],
+            'sample_size.value': 100,
+            'sample_stratify_by.value': 'unknown',
+        },
+        changed=['load_random_data_button.n_clicks'],
+    )
+    assert loaded['load_data_error']['is_open']
+    assert '`unknown`' in loaded['load_data_error']['children']
+    assert loaded['dataset_fingerprint']['data'] is None
+
+    loaded = call_callback(
+        dash_app,
+        'load_data',
+        {
+            'load_random_data_button.n_clicks': 2,
+            'sample_mode_checklist.value': [True],
+            'sample_size.value': 100,
+            'sample_stratify_by.value': 'Categories',
+        },
+        changed=['load_random_data_button.n_clicks'],
+    )
+    assert not loaded['load_data_error']['is_open']
+    sample_info = loaded['sample_info']['data']
+    assert sample_info['num_rows'] == 10_000
+    assert sample_info['stratify_by'] == 'Categories'
+    # the full data (see `render_full_data`) is generated from the same seed as the sample
+    app, _ = dash_app
+    pd.testing.assert_frame_equal(
+        app.read_data(sample_info['source']),
+        app.read_data(sample_info['source']),
+    )
+
+
+def test_data_sample_table__filter_without_matches(dash_app):  # noqa
+    contents = base64.b64encode(b'a,b\n1,x\n2,y\n3,z\n').decode()
+    loaded = call_callback(
+        dash_app,
+        'load_data',
+        {
+            'upload-data.contents': f'data:text/csv;base64,{contents}',
+            'upload-data.filename': 'data.csv',
+            'sample_mode_checklist.value': [],
+        },
+        changed=['upload-data.contents'],
+    )
+    values = {
+        'data_sample_request.data': loaded['dataset_fingerprint']['data'],
+        'data_sample_table.page_current': 0,
+        'data_sample_table.page_size': 20,
+        'original_data.data': loaded['original_data']['data'],
+    }
+    updated = call_callback(
+        dash_app,
+        'update_data_sample_table',
+        values | {'data_sample_table.filter_query': '{b} = w'},
+        changed=['data_sample_table.filter_query'],
+    )
+    # the header (and the filter row) is shown even though no rows match the filter
+    assert updated['data_sample_table']['data'] == []
+    assert updated['data_sample_table']['columns'] == [
+        {'name': 'a', 'id': 'a'},
+        {'name': 'b', 'id': 'b'},
+    ]
+    updated = call_callback(
+        dash_app,
+        'update_data_sample_table',
+        values | {'data_sample_table.filter_query': ''},
+        changed=['data_sample_table.filter_query'],
+    )
+    assert len(updated['data_sample_table']['data']) == 3
+
+
+def test_profile_report__per_session(dash_app):  # noqa
+    app, _ = dash_app
+    created = call_callback(
+        dash_app,
+        'create_profile_report_id',
+        {'profile_next_render_checklist.value': [True]},
+        changed=['profile_next_render_checklist.value'],
+    )
+    session_id = created['profile_report_id']['data']
+    assert session_id.isalnum()
+    assert call_callback(
+        dash_app,
+        'create_profile_report_id',
+        {'profile_next_render_checklist.value': [True], 'profile_report_id.data': session_id},
+        changed=['profile_next_render_checklist.value'],
+    ) == {}
+    # the render of another session is profiled
+    profile_call(
+        sum,
+        range(10),
+        report_key='other',
+        report_directory=app.PROFILE_REPORT_DIR,
+    )
+    values = {
+        'visualize_graph.figure': {},
+        'profile_report_id.data': session_id,
+        'download_profile_button.n_clicks': 1,
+    }
+    assert call_callback(
+        dash_app, 'show_profile_report', values, changed=['visualize_graph.figure'],
+    ) == {}
+    assert call_callback(
+        dash_app, 'download_profile_report', values, changed=['download_profile_button.n_clicks'],
+    ) == {}
+    # the render of the session is profiled
+    profile_call(
+        sum,
+        range(10),
+        report_key=session_id,
+        report_directory=app.PROFILE_REPORT_DIR,
+    )
+    shown = call_callback(
+        dash_app, 'show_profile_report', values, changed=['visualize_graph.figure'],
+    )
+    assert shown['profile_next_render_checklist']['value'] == []
+    report_id = shown['shown_profile_report_id']['data']
+    assert report_id == app.get_profile_report(session_id)['id']
+    assert call_callback(
+        dash_app,
+        'show_profile_report',
+        values | {'shown_profile_report_id.data': report_id},
+        changed=['visualize_graph.figure'],
+    ) == {}
+    downloaded = call_callback(
+        dash_app, 'download_profile_report', values, changed=['download_profile_button.n_clicks'],
+    )
+    assert downloaded['profile_download']['data']['filename'].startswith('sum_')
+
+
+def test_load_data__duckdb_query(dash_app, tmp_path):  # noqa
+    pytest.importorskip('duckdb')
+    data = pd.DataFrame({'a': range(50), 'b': ['x', 'y'] * 25})
+    data.iloc[:20].to_parquet(tmp_path / 'part-0.parquet')
+    data.iloc[20:].to_parquet(tmp_path / 'part-1.parquet')
+    query = f"SELECT *\nFROM '{tmp_path}/*.parquet'"
+    loaded = call_callback(
+        dash_app,
+        'load_data',
+        {
+            'query_duckdb_button.n_clicks': 1,
+            'query_duckdb_text.value': query,
+            'sample_mode_checklist.value': [True],
+            'sample_size.value': 10,
+        },
+        changed=['query_duckdb_button.n_clicks'],
+    )
+    assert not loaded['load_data_error']['is_open']
+    # the rows of the query are streamed into the sample
+    sample_info = loaded['sample_info']['data']
+    assert sample_info['source'] == {'type': 'duckdb', 'query': query}
+    assert sample_info['num_rows'] == 50
+    assert sample_info['sample_size'] == 10
+    # the filters are pushed down into the query when rendering on the full data
+    rendered = call_callback(
+        dash_app,
+        'render_full_data',
+        {
+            'render_full_data_button.n_clicks': 1,
+            'sample_info.data': sample_info,
+            'filter_columns_cache.data': {'a': [10, 19], 'b': ['x']},
+            'column_types.data': loaded['column_types']['data'],
+            'original_data.data': loaded['original_data']['data'],
+        },
+        changed=['render_full_data_button.n_clicks'],
+    )
+    assert '(5 rows after filtering)' in rendered['sample_banner_text']['children']
+    code = rendered['generated_filter_code']['data']
+    assert "'WHERE \"a\" BETWEEN 10 AND 19\\n'" in code
+    assert f"FROM '{tmp_path}/*.parquet'" in code
+    local_vars = {}
+    exec(code, {}, local_vars)
+    assert local_vars['graph_data']['a'].tolist() == [10, 12, 14, 16, 18]
@@ -0,0 +1,139 @@
+"""Tests for column_statistics.py."""
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import source.library.types as t
+from source.library import column_statistics
+from source.library.profiling import dataset_fingerprint, get_profile, start_profiling
+from source.library.column_statistics import (
+    MAX_CACHED_DATASETS,
+    MAX_DROPDOWN_OPTIONS,
+    calculate_column_statistics,
+    get_cached_column_statistics,
+    get_column_statistics,
+    search_unique_values,
+)
+
+
+def test_calculate_column_statistics(mock_data1):  # noqa
+    statistics = calculate_column_statistics(mock_data1['date_string_with_missing'], t.DATE)
+    dates = pd.to_datetime(mock_data1['date_string_with_missing'])
+    assert statistics == {'has_missing': True, 'min': dates.min(), 'max': dates.max()}
+
+    statistics = calculate_column_statistics(mock_data1['floats'], t.NUMERIC)
+    assert statistics == {
+        'has_missing': False,
+        'min': mock_data1['floats'].min(),
+        'max': mock_data1['floats'].max(),
+    }
+
+    statistics = calculate_column_statistics(mock_data1['booleans_with_missing'], t.BOOLEAN)
+    assert statistics == {'has_missing': True}
+
+    series = pd.Series(['b', None, 'a', 'b'])
+    statistics = calculate_column_statistics(series, t.STRING)
+    assert statistics == {'has_missing': True, 'unique_values': ['a', 'b']}
+    statistics = calculate_column_statistics(series.astype('category'), t.CATEGORICAL)
+    assert statistics == {'has_missing': True, 'unique_values': ['a', 'b']}
+
+
+def test_get_column_statistics__cached(mock_data1, monkeypatch):  # noqa
+    monkeypatch.setattr(column_statistics, '_column_statistics', OrderedDict())
+    column_types = t.get_column_types(mock_data1)
+    calls = []
+
+    def calculate(series: pd.Series, column_type: str, profile: dict | None = None) -> dict:
+        calls.append(series.name)
+        return calculate_column_statistics(series, column_type, profile=profile)
+
+    monkeypatch.setattr(column_statistics, 'calculate_column_statistics', calculate)
+    expected = calculate_column_statistics(mock_data1['integers'], t.NUMERIC)
+    assert get_column_statistics(mock_data1, 'integers', column_types, 'abc') == expected
+    assert get_column_statistics(mock_data1, 'floats', column_types, 'abc')['min'] == 1.5
+    # adding a column to the filters doesn't recalculate the statistics of the other columns
+    assert get_column_statistics(mock_data1, 'integers', column_types, 'abc') == expected
+    assert calls == ['integers', 'floats']
+    # a different dataset (or no fingerprint) calculates the statistics
+    get_column_statistics(mock_data1, 'integers', column_types, 'xyz')
+    get_column_statistics(mock_data1, 'integers', column_types, None)
+    get_column_statistics(mock_data1, 'integers', column_types, None)
+    assert calls == ['integers', 'floats', 'integers', 'integers', 'integers']
+    assert get_cached_column_statistics('floats', 'abc')['min'] == 1.5
+    assert get_cached_column_statistics('dates', 'abc') is None
+    assert get_cached_column_statistics('floats', None) is None
+    # only the statistics of the most recently used datasets are kept
+    for index in range(MAX_CACHED_DATASETS):
+        get_column_statistics(mock_data1, 'integers', column_types, f'dataset-{index}')
+    assert get_cached_column_statistics('floats', 'abc') is None
+    assert get_cached_column_statistics('integers', 'dataset-0') is not None
+    assert len(column_statistics._column_statistics) == MAX_CACHED_DATASETS
+
+
+def test_get_column_statistics__profile(mock_data2, monkeypatch):  # noqa
+    monkeypatch.setattr(column_statistics, '_column_statistics', OrderedDict())
+    column_types = t.get_column_types(mock_data2)
+    columns = ['integers', 'integers_with_missing', 'floats', 'strings_with_missing']
+    expected = {
+        column: calculate_column_statistics(mock_data2[column], column_types[column])
+        for column in columns
+    }
+    fingerprint = 'column_statistics_' + dataset_fingerprint(mock_data2)
+    start_profiling(mock_data2, fingerprint=fingerprint)
+    profile = get_profile(fingerprint, timeout=None)
+    profiles = []
+
+    def calculate(series: pd.Series, column_type: str, profile: dict | None = None) -> dict:
+        profiles.append(profile)
+        return calculate_column_statistics(series, column_type, profile=profile)
+
+    monkeypatch.setattr(column_statistics, 'calculate_column_statistics', calculate)
+    for column in columns:
+        statistics = get_column_statistics(mock_data2, column, column_types, fingerprint)
+        assert statistics == expected[column]
+        assert type(statistics.get('min')) is type(expected[column].get('min'))
+    assert profiles == [profile[column] for column in columns]
+    # the min/max of integers aren't taken from the profile (floats) so they are exact
+    series = pd.Series([2**53 + 1, 2**62 + 1, 2**53 + 3])
+    profile = {
+        'is_numeric': True,
+        '# of Nulls': 0,
+        '# of Non-Nulls': 3,
+        'Min': float(series.min()),
+        'Max': float(series.max()),
+    }
+    statistics = calculate_column_statistics(series, t.NUMERIC, profile=profile)
+    assert statistics == {'has_missing': False, 'min': 2**53 + 1, 'max': 2**62 + 1}
+    assert type(statistics['min']) is np.int64
+
+
+def test_search_unique_values():
+    rng = np.random.default_rng(42)
+    ids = [f'Customer-{x:05d}' for x in rng.permutation(20_000)]
+    series = pd.Series([*ids, None, 'customer-00010', 'ACME-100'])
+    statistics = calculate_column_statistics(series, t.STRING)
+    assert statistics['has_missing']
+    assert 'unique_values' not in statistics
+    search_index = statistics['search_index']
+    assert len(search_index['keys']) == 20_002
+    assert search_index['keys'].dtype == object
+
+    assert search_unique_values(search_index, None, limit=3) == [
+        'ACME-100', 'Customer-00000', 'Customer-00001',
+    ]
+    # prefix matches are case-insensitive and sorted
+    assert search_unique_values(search_index, 'cUsToMeR-0001', limit=3) == [
+        'Customer-00010', 'customer-00010', 'Customer-00011',
+    ]
+    assert len(search_unique_values(search_index, 'customer-1', limit=50)) == 50
+    # prefix matches are followed by values containing the search value
+    assert search_unique_values(search_index, '100', limit=5) == [
+        'ACME-100', 'Customer-00100', 'Customer-01000', 'Customer-01001', 'Customer-01002',
+    ]
+    matches = search_unique_values(search_index, '19999', limit=50)
+    assert matches == ['Customer-19999']
+    assert search_unique_values(search_index, 'xyz') == []
+
+    # columns with few unique values are not searched server-side
+    statistics = calculate_column_statistics(series.iloc[:MAX_DROPDOWN_OPTIONS], t.STRING)
+    assert 'search_index' not in statistics
+    assert len(statistics['unique_values']) == MAX_DROPDOWN_OPTIONS
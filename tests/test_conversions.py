@@ -0,0 +1,324 @@
+"""Tests for conversions.py."""
+import warnings
+import numpy as np
+import pandas as pd
+import pytest
+import helpsk.conversions as hc
+from source.library.conversions import (
+    cohorted_adoption_rates,
+    cohorted_conversion_lags,
+    cohorted_conversion_rates,
+    count_conversions,
+    get_conversion_lags,
+    periods_to_timestamps,
+    retention_matrix,
+    timestamps_to_periods,
+    to_int64_nanoseconds,
+)
+
+
+def create_events(num_events: int, num_ids: int, num_days: int, seed: int = 42) -> pd.DataFrame:
+    """Create random events (timestamp and id) starting at 2023-01-01."""
+    rng = np.random.default_rng(seed)
+    seconds = rng.integers(0, num_days * 86_400, size=num_events)
+    return pd.DataFrame({
+        'timestamp': pd.Timestamp('2023-01-01') + pd.to_timedelta(seconds, unit='s'),
+        'id': rng.integers(0, num_ids, size=num_events).astype(str),
+    })
+
+
+@pytest.mark.parametrize('intervals', ['day', 'week', 'month'])
+def test_timestamps_to_periods(intervals):  # noqa
+    timestamps = pd.Series(pd.date_range('1969-11-15', '2024-03-15 23:00', freq='37h'))
+    periods = timestamps_to_periods(to_int64_nanoseconds(timestamps), intervals)
+    expected = timestamps.dt.to_period(intervals[0].upper()).dt.start_time
+    assert (periods_to_timestamps(periods, intervals) == expected.to_numpy()).all()
+
+
+@pytest.mark.parametrize('intervals', ['day', 'week', 'month'])
+@pytest.mark.parametrize('min_events', [1, 2, 3])
+def test_retention_matrix__matches_helpsk(intervals, min_events):  # noqa
+    events = create_events(num_events=2_000, num_ids=200, num_days=150)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        expected = hc.retention_matrix(
+            df=events,
+            timestamp='timestamp',
+            unique_id='id',
+            min_events=min_events,
+            intervals=intervals,
+            current_datetime='2023-05-01',
+        )
+    actual = retention_matrix(
+        df=events,
+        timestamp='timestamp',
+        unique_id='id',
+        min_events=min_events,
+        intervals=intervals,
+        current_datetime='2023-05-01',
+    )
+    # helpsk drops the periods in which no ids were retained; here those periods are 0%
+    assert set(expected.columns) <= set(actual.columns)
+    missing_periods = [x for x in actual.columns if x not in expected.columns]
+    assert np.nan_to_num(actual[missing_periods].to_numpy(dtype=float)).sum() == 0
+    assert (actual['cohort'] == expected['cohort']).all()
+    assert (actual['# of unique ids'] == expected['# of unique ids']).all()
+    periods = [x for x in expected.columns if x not in ('cohort', '# of unique ids')]
+    assert np.allclose(
+        actual[periods].to_numpy(dtype=float),
+        expected[periods].to_numpy(dtype=float),
+        equal_nan=True,
+    )
+
+
+def test_retention_matrix():
+    events = pd.DataFrame({
+        'timestamp': [
+            # id 1: cohort 2023-01-02 (Monday); active in weeks 0, 1 (2 events), and 3
+            '2023-01-02', '2023-01-10', '2023-01-11', '2023-01-25',
+            # id 2: cohort 2023-01-02; active in week 0 (2 events) and week 1 (1 event)
+            '2023-01-08', '2023-01-03', '2023-01-12',
+            # id 3: cohort 2023-01-09
+            '2023-01-09', '2023-01-17', '2023-01-18',
+            # future event is ignored
+            '2023-03-01',
+        ],
+        'id': [1, 1, 1, 1, 2, 2, 2, 3, 3, 3, 1],
+    })
+    retention = retention_matrix(
+        df=events,
+        timestamp='timestamp',
+        unique_id='id',
+        intervals='week',
+        current_datetime='2023-01-31',
+    )
+    assert retention.columns.tolist() == ['cohort', '# of unique ids', '0', '1', '2', '3']
+    assert retention['cohort'].tolist() == [pd.Timestamp('2023-01-02'), pd.Timestamp('2023-01-09')]
+    assert retention['# of unique ids'].tolist() == [2, 1]
+    assert retention[['0', '1', '2', '3']].to_numpy().tolist()[0] == [1, 1, 0, 0.5]
+    # week 3 for the second cohort starts on 2023-01-30; week 4 hasn't started yet
+    assert retention[['0', '1', '2']].to_numpy().tolist()[1] == [1, 1, 0]
+    assert retention['3'].iloc[1] == 0
+
+    retention = retention_matrix(
+        df=events,
+        timestamp='timestamp',
+        unique_id='id',
+        intervals='week',
+        min_events=2,
+        current_datetime='2023-01-20',
+    )
+    # only id 1 has at least 2 events in week 1 (week 0 is always retained); nobody is retained
+    # after week 1
+    assert retention.columns.tolist() == ['cohort', '# of unique ids', '0', '1']
+    assert retention[['0', '1']].to_numpy().tolist() == [[1, 0.5], [1, 1]]
+
+
+def test_retention_matrix__timezones_and_no_events():
+    events = create_events(num_events=500, num_ids=50, num_days=60)
+    expected = retention_matrix(
+        df=events,
+        timestamp='timestamp',
+        unique_id='id',
+        intervals='day',
+        current_datetime='2023-02-15',
+    )
+    events['timestamp'] = events['timestamp'].dt.tz_localize('US/Eastern')
+    actual = retention_matrix(
+        df=events,
+        timestamp='timestamp',
+        unique_id='id',
+        intervals='day',
+        current_datetime=pd.Timestamp('2023-02-15', tz='UTC'),
+    )
+    pd.testing.assert_frame_equal(actual, expected)
+
+    retention = retention_matrix(
+        df=events,
+        timestamp='timestamp',
+        unique_id='id',
+        intervals='day',
+        current_datetime='2022-01-01',
+    )
+    assert retention.columns.tolist() == ['cohort', '# of unique ids', '0']
+    assert len(retention) == 0
+
+    with pytest.raises(ValueError, match='interval must be'):
+        retention_matrix(df=events, timestamp='timestamp', unique_id='id', intervals='year')
+
+
+def create_conversions(num_records: int, seed: int = 42) -> pd.DataFrame:
+    """Create random base/conversion timestamps (40% of records don't convert) with groups."""
+    rng = np.random.default_rng(seed)
+    base = pd.Timestamp('2023-01-01') + pd.to_timedelta(
+        rng.integers(0, 120 * 86_400, size=num_records), unit='s',
+    )
+    # some conversions happen before the base timestamp, which are not counted
+    conversion = base + pd.to_timedelta(
+        rng.integers(-86_400, 20 * 86_400, size=num_records), unit='s',
+    )
+    data = pd.DataFrame({
+        'base': base,
+        'conversion': pd.Series(conversion).where(rng.random(num_records) < 0.6),
+        'group': rng.choice(['a', 'b'], size=num_records),
+    })
+    data['cohort'] = data['base'].dt.to_period('W').dt.start_time.dt.strftime('%Y-%m-%d')
+    return data
+
+
+def test_count_conversions():
+    data = pd.DataFrame({
+        'base': pd.to_datetime(['2023-01-01'] * 4 + ['2023-01-08'] * 2),
+        'conversion': pd.to_datetime([
+            '2023-01-01',  # lag of 0 is not a conversion
+            '2023-01-01 00:00:00.5',  # rounded up to 1 second
+            '2023-01-02',
+            None,
+            '2023-01-07',  # negative lag is not a conversion
+            '2023-01-09 12:00:00',
+        ], format='ISO8601'),
+        'cohort': ['2023-01-01'] * 4 + ['2023-01-08'] * 2,
+    })
+    lags = cohorted_conversion_lags(data, 'base', 'conversion', 'cohort')
+    assert lags['keys']['cohort'].tolist() == ['2023-01-01', '2023-01-08']
+    assert lags['num_records'].tolist() == [4, 2]
+    durations = np.array([0, 1, 86_399, 86_400, 10 * 86_400])
+    assert count_conversions(lags, durations).tolist() == [[0, 1, 1, 2, 2], [0, 0, 0, 0, 1]]
+
+
+@pytest.mark.parametrize('groups', [None, 'group'])
+def test_cohorted_conversion_rates__matches_helpsk(groups):  # noqa
+    data = create_conversions(num_records=3_000)
+    intervals = [(1, 'days'), (7, 'days'), (3, 'hours')]
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        expected = hc.cohorted_conversion_rates(
+            df=data,
+            base_timestamp='base',
+            conversion_timestamp='conversion',
+            cohort='cohort',
+            intervals=intervals,
+            groups=groups,
+            current_datetime='2023-05-01',
+        )
+    actual = cohorted_conversion_rates(
+        df=data,
+        base_timestamp='base',
+        conversion_timestamp='conversion',
+        cohort='cohort',
+        intervals=intervals,
+        groups=groups,
+        current_datetime='2023-05-01',
+    )
+    assert actual.columns.tolist() == expected.columns.tolist()
+    key_columns = ['cohort', groups] if groups else ['cohort']
+    assert (actual[key_columns].to_numpy() == expected[key_columns].to_numpy()).all()
+    value_columns = ['# of records', '1 days', '7 days', '3 hours']
+    assert np.allclose(
+        actual[value_columns].to_numpy(dtype=float),
+        expected[value_columns].to_numpy(dtype=float),
+        equal_nan=True,
+    )
+    # the last cohort hasn't had 7 days to convert
+    assert actual['7 days'].isna().any()
+    assert actual['7 days'].iloc[0] > 0
+
+
+@pytest.mark.parametrize('groups', [None, 'group'])
+def test_cohorted_adoption_rates__matches_helpsk(groups):  # noqa
+    data = create_conversions(num_records=3_000)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        expected = hc.cohorted_adoption_rates(
+            df=data,
+            base_timestamp='base',
+            conversion_timestamp='conversion',
+            cohort='cohort',
+            n_units=30,
+            units='days',
+            last_x_cohorts=5,
+            groups=groups,
+            current_datetime='2023-05-01',
+        )
+    actual = cohorted_adoption_rates(
+        df=data,
+        base_timestamp='base',
+        conversion_timestamp='conversion',
+        cohort='cohort',
+        n_units=30,
+        units='days',
+        last_x_cohorts=5,
+        groups=groups,
+        current_datetime='2023-05-01',
+    )
+    assert actual.columns.tolist() == expected.columns.tolist()
+    key_columns = ['cohort', 'index', groups] if groups else ['cohort', 'index']
+    expected = expected.sort_values(key_columns).reset_index(drop=True)
+    actual = actual.sort_values(key_columns).reset_index(drop=True)
+    assert (actual[key_columns].to_numpy() == expected[key_columns].to_numpy()).all()
+    assert (actual['Is Finished'] == expected['Is Finished']).all()
+    value_columns = ['# of records', 'Converted', 'Conversion Rate']
+    assert np.allclose(
+        actual[value_columns].to_numpy(dtype=float),
+        expected[value_columns].to_numpy(dtype=float),
+    )
+    assert actual['cohort'].nunique() == 5
+    assert not actual['Is Finished'].all()
+
+
+def test_get_conversion_lags__cache():
+    data = create_conversions(num_records=3_000)
+    columns = {'base_timestamp': 'base', 'conversion_timestamp': 'conversion', 'cohort': 'cohort'}
+    lags = get_conversion_lags(data, **columns, groups='group', fingerprint='abc')
+    assert get_conversion_lags(data, **columns, groups='group', fingerprint='abc') is lags
+    assert get_conversion_lags(data, **columns, fingerprint='abc') is not lags
+    assert get_conversion_lags(data, **columns, groups='group') is not lags
+    # the results are the same with the cached lags (e.g. changing the intervals or the number of
+    # cohorts doesn't recalculate the lags)
+    for groups in [None, 'group']:
+        for intervals in [[(1, 'days')], [(3, 'hours'), (7, 'days')]]:
+            expected = cohorted_conversion_rates(
+                df=data, **columns, intervals=intervals, groups=groups,
+                current_datetime='2023-05-01',
+            )
+            actual = cohorted_conversion_rates(
+                df=data, **columns, intervals=intervals, groups=groups,
+                current_datetime='2023-05-01', fingerprint='abc',
+            )
+            pd.testing.assert_frame_equal(actual, expected)
+        for last_x_cohorts in [1, 5, 100]:
+            expected = cohorted_adoption_rates(
+                df=data[data['cohort'].isin(sorted(data['cohort'].unique())[-last_x_cohorts:])],
+                **columns, n_units=10, units='days', last_x_cohorts=last_x_cohorts,
+                groups=groups, current_datetime='2023-05-01',
+            )
+            actual = cohorted_adoption_rates(
+                df=data, **columns, n_units=10, units='days', last_x_cohorts=last_x_cohorts,
+                groups=groups, current_datetime='2023-05-01', fingerprint='abc',
+            )
+            pd.testing.assert_frame_equal(actual, expected)
+    assert get_conversion_lags(data, **columns, groups='group', fingerprint='abc') is lags
+
+
+def test_cohorted_conversion_rates__same_base_and_conversion():
+    data = create_conversions(num_records=500)
+    conversions = cohorted_conversion_rates(
+        df=data,
+        base_timestamp='base',
+        conversion_timestamp='base',
+        cohort='cohort',
+        intervals=[(1, 'days')],
+        current_datetime='2023-06-01',
+    )
+    # a conversion at the base timestamp is not counted
+    assert (conversions['1 days'] == 0).all()
+    assert conversions['# of records'].sum() == 500
+
+    with pytest.raises(ValueError, match='Invalid units'):
+        cohorted_conversion_rates(
+            df=data,
+            base_timestamp='base',
+            conversion_timestamp='conversion',
+            cohort='cohort',
+            intervals=[(1, 'years')],
+        )
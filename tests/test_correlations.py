@@ -0,0 +1,125 @@
+"""Tests for correlations.py."""
+import warnings
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import pytest
+from source.library import correlations
+from source.library.correlations import (
+    correlation_matrix,
+    get_correlation_matrix,
+    top_correlated_pairs,
+)
+
+
+def create_data(num_rows: int, seed: int = 42) -> pd.DataFrame:
+    """Create correlated numeric columns with missing values, constant columns, and strings."""
+    rng = np.random.default_rng(seed)
+    x = rng.normal(size=num_rows)
+    data = pd.DataFrame({
+        'x': x,
+        'x_times_2': x * 2 + rng.normal(size=num_rows),
+        'cubed': rng.normal(size=num_rows) ** 3,
+        'x_with_missing': np.where(rng.random(num_rows) < 0.3, np.nan, x + rng.normal(size=num_rows)),  # noqa: E501
+        'mostly_missing': np.where(rng.random(num_rows) < 0.95, np.nan, rng.normal(size=num_rows)),
+        'constant': 1.0,
+        'integers': rng.integers(0, 5, size=num_rows),
+        'booleans': rng.random(num_rows) < 0.5,
+        'all_missing': np.nan,
+        'strings': 'a',
+    })
+    # constant over the rows where `x_with_missing` is non-missing, but not overall
+    data['constant_with_missing'] = np.where(data['x_with_missing'].isna(), x, 0)
+    data.loc[0:10, 'constant'] = np.nan
+    return data
+
+
+@pytest.mark.parametrize('min_periods', [1, 30, 200])
+def test_correlation_matrix__matches_pandas(min_periods):  # noqa
+    data = create_data(num_rows=2_000)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        expected = data.corr(numeric_only=True, min_periods=min_periods)
+    actual = correlation_matrix(data, min_periods=min_periods)
+    assert actual.columns.tolist() == expected.columns.tolist()
+    assert actual.index.tolist() == expected.index.tolist()
+    assert np.allclose(actual.to_numpy(), expected.to_numpy(), atol=1e-5, equal_nan=True)
+
+    # without missing values the correlations are a single matmul
+    columns = ['x', 'x_times_2', 'cubed', 'integers', 'booleans']
+    expected = data[columns].corr(min_periods=min_periods)
+    actual = correlation_matrix(data, columns=columns, min_periods=min_periods)
+    assert np.allclose(actual.to_numpy(), expected.to_numpy(), atol=1e-5)
+
+
+def test_correlation_matrix__large_mean():
+    # the spread of the columns is lost if the values are converted to float32 before centering
+    rng = np.random.default_rng(0)
+    noise = rng.normal(size=1_000)
+    data = pd.DataFrame({
+        'large_mean': 1e6 + 1e-3 * noise,
+        'correlated': noise + rng.normal(size=1_000),
+        'large_mean_with_missing': np.where(rng.random(1_000) < 0.2, np.nan, 1e6 - 1e-3 * noise),
+        'constant': 0.1,
+    })
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        expected = data.corr()
+    actual = correlation_matrix(data)
+    assert not np.isnan(actual.loc['large_mean', 'correlated'])
+    assert np.allclose(actual.to_numpy(), expected.to_numpy(), atol=1e-5, equal_nan=True)
+
+
+def test_correlation_matrix__spearman():
+    data = create_data(num_rows=2_000)
+    columns = ['x', 'x_times_2', 'cubed', 'integers']
+    expected = data[columns].corr(method='spearman')
+    actual = correlation_matrix(data, columns=columns, method='spearman')
+    assert np.allclose(actual.to_numpy(), expected.to_numpy(), atol=1e-5)
+    # with missing values the ranks are calculated per column rather than per pair
+    expected = data[['x', 'x_with_missing']].corr(method='spearman')
+    actual = correlation_matrix(data, columns=['x', 'x_with_missing'], method='spearman')
+    assert np.allclose(actual.to_numpy(), expected.to_numpy(), atol=1e-2)
+
+    with pytest.raises(ValueError, match='method must be'):
+        correlation_matrix(data, method='kendall')
+
+
+def test_get_correlation_matrix__cached(monkeypatch):  # noqa
+    monkeypatch.setattr(correlations, '_correlation_matrices', OrderedDict())
+    data = create_data(num_rows=500)
+    matrix = get_correlation_matrix(data, 'abc')
+    # the cached matrix is subset rather than recalculated
+    data['x'] = 0
+    subset = get_correlation_matrix(data, 'abc', columns=['x_times_2', 'x'])
+    assert subset.columns.tolist() == ['x_times_2', 'x']
+    pd.testing.assert_frame_equal(subset, matrix.loc[['x_times_2', 'x'], ['x_times_2', 'x']])
+    assert np.isnan(get_correlation_matrix(data, None).loc['x', 'x_times_2'])
+    spearman = get_correlation_matrix(data, 'abc', method='spearman')
+    assert spearman.loc['x_times_2', 'x_with_missing'] > 0.5
+    assert len(correlations._correlation_matrices) == 2
+    # only the most recently used matrices are kept
+    for index in range(correlations.MAX_CACHED_MATRICES):
+        get_correlation_matrix(data, f'dataset-{index}', columns=['x'])
+    assert len(correlations._correlation_matrices) == correlations.MAX_CACHED_MATRICES
+    assert ('abc', 'pearson', 1) not in correlations._correlation_matrices
+
+
+def test_top_correlated_pairs():
+    matrix = pd.DataFrame(
+        [
+            [1, -0.9, 0.1, np.nan],
+            [-0.9, 1, 0.5, 0.2],
+            [0.1, 0.5, 1, -0.3],
+            [np.nan, 0.2, -0.3, 1],
+        ],
+        index=['a', 'b', 'c', 'd'],
+        columns=['a', 'b', 'c', 'd'],
+    )
+    pairs = top_correlated_pairs(matrix, top_k=3)
+    assert pairs.to_dict('records') == [
+        {'Column 1': 'a', 'Column 2': 'b', 'Correlation': -0.9},
+        {'Column 1': 'b', 'Column 2': 'c', 'Correlation': 0.5},
+        {'Column 1': 'c', 'Column 2': 'd', 'Correlation': -0.3},
+    ]
+    assert len(top_correlated_pairs(matrix, top_k=100)) == 5
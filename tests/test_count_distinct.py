@@ -0,0 +1,67 @@
+"""Tests for count_distinct.py."""
+import numpy as np
+import pandas as pd
+import pytest
+from source.library.count_distinct import count_distinct, hyperloglog_error
+
+
+def test_count_distinct__exact(mock_data2):  # noqa
+    for group_by, column in [
+            (['strings'], 'integers_with_missing'),
+            (['strings_with_missing'], 'strings'),
+            (['categories_with_missing', 'booleans'], 'dates_with_missing'),
+            (['booleans_with_missing'], 'floats_with_missing2'),
+        ]:
+        expected = (
+            mock_data2
+            .groupby(group_by, observed=True)
+            .agg({column: 'nunique'})
+            .reset_index()
+        )
+        actual = count_distinct(mock_data2, group_by=group_by, column=column)
+        pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+
+    rng = np.random.default_rng(42)
+    data = pd.DataFrame({
+        'group': rng.choice(['a', 'b', 'c'], size=10_000),
+        'id': rng.integers(0, 2_000, size=10_000).astype(str),
+    })
+    expected = data.groupby('group').agg({'id': 'nunique'}).reset_index()
+    actual = count_distinct(data, group_by=['group'], column='id')
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+
+
+@pytest.mark.parametrize('precision', [8, 12, 14])
+def test_count_distinct__approximate(precision):  # noqa
+    rng = np.random.default_rng(42)
+    num_ids = np.array([10, 1_000, 50_000])
+    data = pd.DataFrame({
+        'group': np.repeat(['a', 'b', 'c'], num_ids * 2),
+        # each id appears twice
+        'id': np.concatenate([np.tile(rng.choice(10**12, x, replace=False), 2) for x in num_ids]),
+    })
+    actual = count_distinct(data, group_by=['group'], column='id', precision=precision)
+    assert actual['group'].tolist() == ['a', 'b', 'c']
+    # small counts are exact-ish because of the linear counting correction
+    assert abs(actual['id'].iloc[0] - 10) <= 1
+    relative_errors = np.abs(actual['id'].to_numpy() / num_ids - 1)
+    assert (relative_errors < 5 * hyperloglog_error(precision)).all()
+
+
+def test_count_distinct__approximate_missing_values(mock_data2):  # noqa
+    actual = count_distinct(
+        mock_data2,
+        group_by=['strings'],
+        column='strings_with_missing2',
+        precision=10,
+    )
+    assert actual['strings'].tolist() == ['a', 'b', 'c']
+    assert actual['strings_with_missing2'].tolist() == [1, 1, 0]
+
+    with pytest.raises(ValueError, match='precision must be'):
+        count_distinct(mock_data2, group_by=['strings'], column='integers', precision=20)
+
+
+def test_hyperloglog_error():
+    assert hyperloglog_error(12) == pytest.approx(0.01625)
+    assert hyperloglog_error(16) < hyperloglog_error(12)
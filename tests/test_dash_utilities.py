@@ -1,48 +1,117 @@
 """Tests for dash_utilities.py."""
+import io
+import json
+import math
 import pandas as pd
 import numpy as np
 import pytest
 from tests.conftest import generate_combinations
 import source.library.types as t
+from source.library.date_index import DateIndex
+from source.library import conversions, dash_utilities
 from source.library.dash_utilities import (
+    MAX_LOG_ITEMS,
+    WEBGL_POINT_THRESHOLD,
+    FigureTooLargeError,
     InvalidConfigurationError,
+    conditional_probabilities,
+    configure_logging,
     convert_to_graph_data,
+    cut_numeric,
     filter_data_from_ui_control,
+    format_bytes,
     generate_graph,
+    generate_graph_with_size_limit,
     get_category_orders,
+    get_figure_size,
     get_graph_config,
+    get_relayout_range,
+    get_zoom_date_floor,
+    get_zoom_date_range,
     log,
     log_function,
     log_variable,
     log_error,
+    page_table_data,
+    table_columns,
+    plot_retention_matrix,
+    table_filter_mask,
+    truncate_log_value,
     values_to_dropdown_options,
 )
 import plotly.graph_objs as go
 
 
-def test_log(capsys):  # noqa
+def test_log(capsys, reset_logger):  # noqa
     """Test log function."""
+    stream = io.StringIO()
+    configure_logging(level='INFO', stream=stream)
     log("test")
-    captured = capsys.readouterr()
-    assert captured.out == "test\n"
-
-def test_log_function(capsys):  # noqa
+    log("test `%s` %s", 'a', [1, 2])
+    log("100%")
+    assert stream.getvalue() == "test\ntest `a` [1, 2]\n100%\n"
+    # nothing is logged (or formatted) below the level
+    configure_logging(level='WARNING', stream=stream)
+    log("test2")
+    assert stream.getvalue() == "test\ntest `a` [1, 2]\n100%\n"
+    assert capsys.readouterr().out == ''
+
+def test_log_function(reset_logger):  # noqa
     """Test log_function function."""
+    stream = io.StringIO()
+    configure_logging(level='DEBUG', stream=stream)
+    log_function("test")
+    assert stream.getvalue() == "\nFUNCTION: `test`\n"
+    configure_logging(level='INFO', stream=stream)
     log_function("test")
-    captured = capsys.readouterr()
-    assert captured.out == "\nFUNCTION: `test`\n"
+    assert stream.getvalue() == "\nFUNCTION: `test`\n"
 
-def test_log_variable(capsys):  # noqa
+def test_log_variable(reset_logger):  # noqa
     """Test log_variable function."""
+    stream = io.StringIO()
+    configure_logging(level='DEBUG', stream=stream)
     log_variable("var", "value")
-    captured = capsys.readouterr()
-    assert captured.out == "VARIABLE: `var` = `value`\n"
+    assert stream.getvalue() == "VARIABLE: `var` = `value`\n"
+
+    class NotFormatted:
+        def __str__(self) -> str:
+            raise AssertionError("the value should not be formatted")
 
-def test_log_error(capsys):  # noqa
+    configure_logging(level='INFO', stream=stream)
+    log_variable("var", NotFormatted())
+    assert stream.getvalue() == "VARIABLE: `var` = `value`\n"
+
+def test_log_error(reset_logger):  # noqa
     """Test log_error function."""
+    stream = io.StringIO()
+    configure_logging(level='ERROR', stream=stream)
     log_error("test")
-    captured = capsys.readouterr()
-    assert captured.out == ">>>>>>>>>ERROR: `test`\n"
+    assert stream.getvalue() == ">>>>>>>>>ERROR: `test`\n"
+
+def test_configure_logging__json(reset_logger):  # noqa
+    stream = io.StringIO()
+    configure_logging(level='DEBUG', json_format=True, stream=stream)
+    log_variable("var", list(range(1_000)))
+    log_function("function")
+    log("message %s", 1)
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [record['level'] for record in records] == ['DEBUG', 'DEBUG', 'INFO']
+    assert records[0]['variable'] == 'var'
+    assert records[0]['message'] == (
+        f"VARIABLE: `var` = `{list(range(MAX_LOG_ITEMS))} ... (980 more items)`"
+    )
+    assert records[1]['function'] == 'function'
+    assert records[2]['message'] == 'message 1'
+    assert all(record['logger'] == 'explore_data' for record in records)
+
+def test_truncate_log_value():
+    assert truncate_log_value('value') == 'value'
+    assert truncate_log_value([1, 2, 3], max_items=2) == '[1, 2] ... (1 more items)'
+    assert truncate_log_value({'a': 1, 'b': 2}, max_items=1) == "{'a': 1} ... (1 more items)"
+    assert truncate_log_value(np.arange(5), max_items=3) == '[0, 1, 2] ... (2 more items)'
+    assert truncate_log_value(pd.Series([1, 2, 3]), max_items=2) == '[1, 2] ... (1 more items)'
+    assert truncate_log_value({1, 2, 3}, max_items=5) == '{1, 2, 3}'
+    assert truncate_log_value('a' * 12, max_length=10) == 'aaaaaaaaaa ... (2 more characters)'
 
 def test_values_to_dropdown_options():  # noqa
     """Test values_to_dropdown_options function."""
@@ -191,6 +260,28 @@ def test_filter_data_from_ui_control__datetimes_with_missing(capsys, mock_data2)
     assert filtered_data['floats'].tolist() == [2.2, 4.4]
     assert filtered_data['strings'].tolist() == ['b', 'a']
 
+def test_filter_data_from_ui_control__date_index(capsys, mock_data2):  # noqa
+    column_types = t.get_column_types(mock_data2)
+    filters = {
+        'dates_with_missing2': ['2023-01-01', '2023-01-04'],
+        'strings': ['a', 'b'],
+    }
+    expected = filter_data_from_ui_control(
+        filters=filters,
+        column_types=column_types,
+        data=mock_data2,
+    )
+    filtered_data, markdown_text, code = filter_data_from_ui_control(
+        filters=filters,
+        column_types=column_types,
+        data=mock_data2,
+        date_index=DateIndex(mock_data2, t.get_date_columns(column_types)),
+    )
+    pd.testing.assert_frame_equal(filtered_data, expected[0])
+    assert markdown_text == expected[1]
+    assert '`2` missing values removed' in markdown_text
+    assert code == expected[2]
+
 def test_get_graph_config__not_found_raises_value_error(graphing_configurations):  # noqa
     with pytest.raises(InvalidConfigurationError):
         get_graph_config(
@@ -1073,6 +1164,8 @@ def test_generate_graph__all_configurations(  # noqa
                         assert 'px.scatter_3d' in code
                     elif graph_type['name'] == 'retention':
                         assert 'plot_retention' in code
+                    elif graph_type['name'] == 'scatter - rasterized':
+                        assert 'plot_rasterized_scatter' in code
                     elif graph_type['name'] == 'heatmap - count distinct':
                         assert 'px.density_heatmap' in code
                     elif graph_type['name'] == 'P(Y | X)':
@@ -1186,6 +1279,8 @@ def test_generate_graph__all_configurations(  # noqa
                             assert 'px.scatter_3d' in code
                         elif graph_type['name'] == 'retention':
                             assert 'plot_retention' in code
+                        elif graph_type['name'] == 'scatter - rasterized':
+                            assert 'plot_rasterized_scatter' in code
                         elif graph_type['name'] == 'heatmap - count distinct':
                             assert 'px.density_heatmap' in code
                         elif graph_type['name'] == 'P(Y | X)':
@@ -1288,6 +1383,391 @@ def test_generate_graph__error(  # noqa
     assert code is not None
     assert 'px.histogram' in code
 
+
+@pytest.mark.parametrize('graph_type', ['bar - count distinct', 'heatmap - count distinct'])
+def test_generate_graph__count_distinct_precision(graph_type, mock_data2):  # noqa
+    column_types = t.get_column_types(mock_data2)
+    graph_kwargs = {
+        'data': mock_data2.copy(),
+        'graph_type': graph_type,
+        'x_variable': 'strings',
+        'y_variable': 'booleans' if graph_type == 'heatmap - count distinct' else 'integers',
+        'z_variable': 'categories' if graph_type == 'heatmap - count distinct' else None,
+        'color_variable': None,
+        'size_variable': None,
+        'facet_variable': None,
+        'num_facet_columns': 4,
+        'selected_category_order': None,
+        'numeric_aggregation': None,
+        'bar_mode': None,
+        'date_floor': None,
+        'cohort_conversion_rate_snapshots': None,
+        'cohort_conversion_rate_units': None,
+        'show_record_count': None,
+        'cohort_adoption_rate_range': None,
+        'cohort_adoption_rate_units': None,
+        'last_n_cohorts': None,
+        'show_unfinished_cohorts': None,
+        'opacity': None,
+        'n_bins': None,
+        'min_retention_events': None,
+        'num_retention_periods': None,
+        'log_x_axis': None,
+        'log_y_axis': None,
+        'free_x_axis': None,
+        'free_y_axis': None,
+        'show_axes_histogram': None,
+        'title': None,
+        'graph_labels': None,
+        'column_types': column_types,
+    }
+    fig, code = generate_graph(**graph_kwargs)
+    assert 'count_distinct(' in code
+    assert 'precision=None' in code
+    assert fig.layout.title.text is None
+
+    fig, code = generate_graph(**graph_kwargs, count_distinct_precision=12)
+    assert 'precision=12' in code
+    assert 'HyperLogLog, precision 12' in fig.layout.title.text
+    assert '±1.6%' in fig.layout.title.text
+
+
+def _graph_kwargs(data: pd.DataFrame, graph_type: str, **kwargs: object) -> dict:
+    """The arguments of `generate_graph` with the defaults of the app."""
+    return {
+        'data': data,
+        'graph_type': graph_type,
+        'x_variable': None,
+        'y_variable': None,
+        'z_variable': None,
+        'color_variable': None,
+        'size_variable': None,
+        'facet_variable': None,
+        'num_facet_columns': 4,
+        'selected_category_order': None,
+        'numeric_aggregation': None,
+        'bar_mode': None,
+        'date_floor': None,
+        'cohort_conversion_rate_snapshots': None,
+        'cohort_conversion_rate_units': None,
+        'show_record_count': None,
+        'cohort_adoption_rate_range': None,
+        'cohort_adoption_rate_units': None,
+        'last_n_cohorts': None,
+        'show_unfinished_cohorts': None,
+        'opacity': 0.6,
+        'n_bins': None,
+        'min_retention_events': None,
+        'num_retention_periods': None,
+        'log_x_axis': None,
+        'log_y_axis': None,
+        'free_x_axis': None,
+        'free_y_axis': None,
+        'show_axes_histogram': None,
+        'title': None,
+        'graph_labels': None,
+        'column_types': t.get_column_types(data),
+    } | kwargs
+
+
+def test_generate_graph__fingerprint_not_in_code(monkeypatch):  # noqa
+    monkeypatch.setattr(conversions, '_conversion_lags', conversions.OrderedDict())
+    rng = np.random.default_rng(42)
+    base = pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 60 * 86_400, size=500), unit='s')  # noqa: E501
+    data = pd.DataFrame({
+        'base': base,
+        'conversion': base + pd.to_timedelta(rng.integers(0, 20 * 86_400, size=500), unit='s'),
+    })
+    data['base (Cohorts)'] = data['base'].dt.to_period('W').dt.start_time.dt.strftime('%Y-%m-%d')
+    for graph_type, graph_kwargs in [
+        (
+            'cohorted conversion rates',
+            {'cohort_conversion_rate_snapshots': [1, 7], 'cohort_conversion_rate_units': 'days'},
+        ),
+        (
+            'cohorted adoption rates',
+            {
+                'cohort_adoption_rate_range': 10,
+                'cohort_adoption_rate_units': 'days',
+                'last_n_cohorts': 5,
+            },
+        ),
+    ]:
+        kwargs = _graph_kwargs(
+            data,
+            graph_type,
+            x_variable='base',
+            y_variable='conversion',
+            fingerprint='abc',
+            **graph_kwargs,
+        )
+        fig, code = generate_graph(**kwargs)
+        # the live graph caches the conversion lags of the data, but the generated code (which can
+        # be run on other data) doesn't have the fingerprint
+        assert 'fingerprint' not in code
+        assert any(key[0] == 'abc' for key in conversions._conversion_lags)
+        local_vars = {'graph_data': data.copy()}
+        exec(code, globals(), local_vars)
+        assert local_vars['fig'] == fig
+        assert generate_graph(**(kwargs | {'fingerprint': None}))[1] == code
+
+
+def test_generate_graph_with_size_limit():
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame({
+        'x': rng.normal(size=20_000),
+        'y': rng.normal(size=20_000),
+        'category': rng.choice([f'category_{i}' for i in range(50)], size=20_000),
+    })
+    kwargs = _graph_kwargs(data, 'scatter', x_variable='x', y_variable='y')
+    expected_fig, expected_code = generate_graph(**kwargs)
+    figure_size = get_figure_size(expected_fig)
+    assert figure_size > 100_000
+    # the figure is smaller than the maximum
+    for max_figure_size in [None, figure_size]:
+        fig, code, graph_data, description = generate_graph_with_size_limit(
+            max_figure_size=max_figure_size,
+            **kwargs,
+        )
+        assert fig == expected_fig
+        assert code == expected_code
+        assert graph_data is data
+        assert description == f"Figure size: {format_bytes(figure_size)}"
+    # a sample of the rows is graphed
+    fig, code, graph_data, description = generate_graph_with_size_limit(
+        max_figure_size=figure_size // 4,
+        **kwargs,
+    )
+    assert get_figure_size(fig) <= figure_size // 4
+    assert 0 < len(graph_data) < len(data) / 4
+    assert graph_data.index.is_monotonic_increasing
+    assert code.startswith(
+        f"graph_data = graph_data.sample(n={len(graph_data)}, random_state=42).sort_index()\n",
+    )
+    assert code.endswith(expected_code)
+    assert f"a random sample of {len(graph_data):,} of 20,000 rows" in description
+    # the generated code creates the same graph
+    local_vars = {'graph_data': data}
+    exec(code, globals(), local_vars)
+    assert local_vars['fig'] == fig
+    # the other graphs aggregate the rows so they can't be sampled
+    kwargs = _graph_kwargs(data, 'histogram', x_variable='x', facet_variable='category')
+    with pytest.raises(FigureTooLargeError, match=r'remove the facet variable \(`category`\)'):
+        generate_graph_with_size_limit(max_figure_size=1_000, **kwargs)
+    kwargs = _graph_kwargs(data, 'scatter', x_variable='x', y_variable='y')
+    with pytest.raises(FigureTooLargeError, match='increase MAX_FIGURE_SIZE_MB'):
+        generate_graph_with_size_limit(max_figure_size=10, **kwargs)
+
+
+
+def test_generate_graph_with_size_limit__histogram_binned():
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame({
+        'x': rng.normal(size=20_000),
+        'y': rng.normal(size=20_000),
+        'category': rng.choice(['a', 'b', 'c'], size=20_000),
+    })
+    data.loc[0:9, 'x'] = np.nan
+    kwargs = _graph_kwargs(data, 'histogram', x_variable='x', n_bins=30)
+    expected_fig, _ = generate_graph(**kwargs)
+    figure_size = get_figure_size(expected_fig)
+    # the rows are binned on the server rather than in the browser
+    fig, code, graph_data, description = generate_graph_with_size_limit(
+        max_figure_size=figure_size // 4,
+        **kwargs,
+    )
+    assert get_figure_size(fig) <= figure_size // 4
+    assert graph_data is data
+    assert 'np.histogram_bin_edges' in code
+    assert f"binned on the server; the graph of all rows is {format_bytes(figure_size)}" in description  # noqa: E501
+    counts, bin_edges = np.histogram(data['x'].dropna(), bins=30)
+    assert fig.data[0].y.tolist() == counts[counts > 0].tolist()
+    assert fig.data[0].xbins.start == bin_edges[0]
+    assert fig.data[0].xbins.size == pytest.approx(bin_edges[1] - bin_edges[0])
+    # the generated code creates the same graph
+    local_vars = {'graph_data': data}
+    exec(code, globals(), local_vars)
+    assert local_vars['fig'] == fig
+    # the y-variable is aggregated per bin and color
+    kwargs = _graph_kwargs(
+        data,
+        'histogram',
+        x_variable='x',
+        y_variable='y',
+        color_variable='category',
+        numeric_aggregation='avg',
+        n_bins=30,
+    )
+    fig, code, _, description = generate_graph_with_size_limit(
+        max_figure_size=get_figure_size(generate_graph(**kwargs)[0]) // 4,
+        **kwargs,
+    )
+    assert 'binned on the server' in description
+    assert fig.layout.yaxis.title.text == 'avg of y'
+    is_a = data['category'] == 'a'
+    bin_index = np.clip(np.searchsorted(bin_edges, data['x'], side='right') - 1, 0, 29)
+    expected = data.loc[is_a & data['x'].notna(), 'y'].groupby(bin_index[is_a & data['x'].notna()]).mean()  # noqa: E501
+    trace = next(trace for trace in fig.data if trace.name == 'a')
+    assert trace.y == pytest.approx(expected.tolist())
+    # Top N Categories is only suggested for the graphs with categorical axes
+    kwargs = _graph_kwargs(data, 'histogram', x_variable='x')
+    with pytest.raises(FigureTooLargeError) as error:
+        generate_graph_with_size_limit(max_figure_size=10, **kwargs)
+    assert 'Top N Categories' not in str(error.value)
+    kwargs = _graph_kwargs(data, 'histogram', x_variable='category')
+    with pytest.raises(FigureTooLargeError, match='Top N Categories'):
+        generate_graph_with_size_limit(max_figure_size=10, **kwargs)
+
+
+def test_generate_graph_with_size_limit__estimate(monkeypatch):  # noqa
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame({'x': rng.normal(size=20_000), 'y': rng.normal(size=20_000)})
+    kwargs = _graph_kwargs(data, 'scatter', x_variable='x', y_variable='y')
+    expected_fig, _ = generate_graph(**kwargs)
+    figure_size = get_figure_size(expected_fig)
+    monkeypatch.setattr(dash_utilities, 'SIZE_ESTIMATE_ROWS', 500)
+    num_rows_graphed = []
+
+    def generate(data: pd.DataFrame, **kwargs: object) -> tuple:
+        num_rows_graphed.append(len(data))
+        return generate_graph(data=data, **kwargs)
+
+    monkeypatch.setattr(dash_utilities, 'generate_graph', generate)
+    # the estimate is within the limit, so the figure of all of the rows is built and measured
+    fig, _, graph_data, description = generate_graph_with_size_limit(
+        max_figure_size=figure_size * 2,
+        **kwargs,
+    )
+    assert fig == expected_fig
+    assert graph_data is data
+    assert description == f"Figure size: {format_bytes(figure_size)}"
+    assert num_rows_graphed == [500, 1_000, 20_000]
+    # the figure of all of the rows is too large, so only samples are graphed
+    num_rows_graphed.clear()
+    fig, _, graph_data, description = generate_graph_with_size_limit(
+        max_figure_size=figure_size // 4,
+        **kwargs,
+    )
+    assert get_figure_size(fig) <= figure_size // 4
+    assert 0 < len(graph_data) < len(data) / 4
+    assert max(num_rows_graphed) < len(data)
+    assert "of 20,000 rows; the graph of all rows is about " in description
+    with pytest.raises(FigureTooLargeError, match='The graph is about '):
+        generate_graph_with_size_limit(max_figure_size=10, **kwargs)
+    assert max(num_rows_graphed) < len(data)
+
+
+@pytest.mark.parametrize('graph_type', ['scatter', 'line'])
+def test_generate_graph__render_mode(graph_type):  # noqa
+    rng = np.random.default_rng(0)
+    num_rows = WEBGL_POINT_THRESHOLD + 1
+    data = pd.DataFrame({
+        'x': rng.normal(size=num_rows),
+        'y': rng.normal(size=num_rows),
+        'color': rng.choice(['a', 'b', 'c'], size=num_rows),
+        'facet': rng.choice(['d', 'e'], size=num_rows),
+    })
+    # more points than the threshold; every trace (i.e. every color and facet) uses WebGL, even
+    # though each trace has fewer points than the threshold
+    kwargs = _graph_kwargs(
+        data, graph_type, x_variable='x', y_variable='y', color_variable='color',
+        facet_variable='facet',
+    )
+    fig, code = generate_graph(**kwargs)
+    assert len(fig.data) == 6
+    assert all(isinstance(trace, go.Scattergl) for trace in fig.data)
+    assert "render_mode='webgl'" in code
+    local_vars = {'graph_data': data}
+    exec(code, globals(), local_vars)
+    assert local_vars['fig'] == fig
+    # fewer points than the threshold (or no threshold)
+    for data_subset, webgl_point_threshold in [
+            (data.iloc[:-1], WEBGL_POINT_THRESHOLD),
+            (data, None),
+        ]:
+        kwargs = _graph_kwargs(
+            data_subset, graph_type, x_variable='x', y_variable='y', color_variable='color',
+            facet_variable='facet', webgl_point_threshold=webgl_point_threshold,
+        )
+        fig, code = generate_graph(**kwargs)
+        assert len(fig.data) == 6
+        assert all(isinstance(trace, go.Scatter) for trace in fig.data)
+        assert "render_mode='svg'" in code
+
+
+def test_generate_graph__scatter_rasterized():
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame({
+        'x': rng.normal(size=100_000),
+        'y': rng.normal(size=100_000),
+        'color': rng.choice(['a', 'b', 'c'], size=100_000),
+    })
+    for color_variable, n_bins in [(None, 0), ('color', 40)]:
+        kwargs = _graph_kwargs(
+            data, 'scatter - rasterized', x_variable='x', y_variable='y',
+            color_variable=color_variable, n_bins=n_bins,
+        )
+        fig, code = generate_graph(**kwargs)
+        assert isinstance(fig.data[0], go.Image)
+        assert 'plot_rasterized_scatter(' in code
+        # the size of the figure doesn't depend on the number of points
+        assert get_figure_size(fig) < 100_000
+        local_vars = {'graph_data': data}
+        exec(code, globals(), local_vars)
+        assert local_vars['fig'] == fig
+    assert [trace.name for trace in fig.data[1:]] == ['a', 'b', 'c']
+    assert fig.data[0].dx == (data['x'].max() - data['x'].min()) / 40
+
+
+def test_get_relayout_range():
+    assert get_relayout_range(None) == (False, None)
+    assert get_relayout_range({'autosize': True}) == (False, None)
+    assert get_relayout_range({'xaxis.range[0]': 1, 'xaxis.range[1]': 2}) == (True, [1, 2])
+    assert get_relayout_range({'xaxis.range[0]': 1, 'xaxis.range[1]': 2}, 'yaxis') == (False, None)
+    assert get_relayout_range({'yaxis.range': [3, 4]}, 'yaxis') == (True, [3, 4])
+    assert get_relayout_range({'xaxis.autorange': True, 'yaxis.autorange': True}) == (True, None)
+
+
+def test_get_zoom_date_range():
+    x_values = pd.Series(['2023-03-01', '2023-01-01', '2023-02-01', np.nan, '2023-01-01'])
+    # the categories of histograms are the sorted dates
+    assert get_zoom_date_range('histogram', [0.6, 1.4], x_values) == (
+        pd.Timestamp('2023-02-01'), pd.Timestamp('2023-03-01'),
+    )
+    assert get_zoom_date_range('histogram', [-0.5, 0.5], x_values) == (
+        pd.Timestamp('2023-01-01'), pd.Timestamp('2023-02-01'),
+    )
+    assert get_zoom_date_range('histogram', [0.5, 5], x_values) == (
+        pd.Timestamp('2023-02-01'), None,
+    )
+    # no categories are visible
+    assert get_zoom_date_range('histogram', [1.2, 1.8], x_values) is None
+    assert get_zoom_date_range('line', ['2023-01-15', '2023-02-15 12:00'], x_values) == (
+        pd.Timestamp('2023-01-15'), pd.Timestamp('2023-02-15 12:00'),
+    )
+
+
+def test_get_zoom_date_floor():
+    start = pd.Timestamp('2023-01-01')
+    assert get_zoom_date_floor('month', start, start + pd.Timedelta(days=1_000)) == 'month'
+    assert get_zoom_date_floor('month', start, start + pd.Timedelta(days=200)) == 'week'
+    assert get_zoom_date_floor('month', start, start + pd.Timedelta(days=60)) == 'day'
+    assert get_zoom_date_floor('month', start, start + pd.Timedelta(days=10)) == 'hour'
+    assert get_zoom_date_floor('month', start, start + pd.Timedelta(days=10), finest_date_floor='day') == 'day'  # noqa
+    assert get_zoom_date_floor('month', start, start + pd.Timedelta(seconds=5)) == 'second'
+    # never coarser than the selected date floor
+    assert get_zoom_date_floor('day', start, start + pd.Timedelta(days=1_000)) == 'day'
+    assert get_zoom_date_floor('hour', start, start + pd.Timedelta(days=1), finest_date_floor='day') == 'hour'  # noqa
+
+
+def test_format_bytes():
+    assert format_bytes(0) == '0 B'
+    assert format_bytes(999) == '999 B'
+    assert format_bytes(1_500) == '1.5 KB'
+    assert format_bytes(25_000_000) == '25.0 MB'
+    assert format_bytes(2_500_000_000) == '2.5 GB'
+
+
 @pytest.mark.parametrize('order_type,expected_output', [  # noqa
     ('category ascending', {'category_1': ['x', 'y', 'z'], 'category_2': ['x', 'y', 'z']}),
     ('category descending', {'category_1': ['z', 'y', 'x'], 'category_2': ['z', 'y', 'x']}),
@@ -1416,3 +1896,192 @@ def test_duplicates_in_selected_variables():  # noqa
             selected_category_order='unknown_order_type',
             column_types=column_types,
         )
+
+def test_plot_retention_matrix():
+    retention = pd.DataFrame({
+        'cohort': pd.to_datetime(['2023-01-02', '2023-01-09', '2023-01-16']),
+        '# of unique ids': [10, 20, 4],
+        '0': [1.0, 1.0, 1.0],
+        '1': [0.5, 0.25, np.nan],
+        '2': [0.1, np.nan, np.nan],
+    })
+    fig = plot_retention_matrix(
+        retention=retention,
+        intervals='week',
+        max_periods_to_display=10,
+        show_unfinished_cohorts=True,
+    )
+    assert isinstance(fig, go.Figure)
+    heatmap, dark_annotations, light_annotations = fig.data
+    # the last cohort is removed because it has no value for period `1`
+    assert list(heatmap.y) == ['2023-01-02', '2023-01-09']
+    assert list(heatmap.x) == ['1', '2']
+    assert np.array_equal(heatmap.z, np.array([[0.5, 0.1], [0.25, np.nan]]), equal_nan=True)
+    # customdata holds the # of unique ids and # of retained ids for each cell
+    assert np.array_equal(
+        np.asarray(heatmap.customdata),
+        np.array([[[10, 5], [10, 1]], [[20, 5], [20, np.nan]]]),
+        equal_nan=True,
+    )
+    assert 'Week %{x}' in heatmap.hovertemplate
+    # cells below half of the max retention use black text; missing cells have no annotation
+    assert dark_annotations.textfont.color == 'black'
+    assert list(dark_annotations.x) == ['2']
+    assert list(dark_annotations.y) == ['2023-01-02']
+    assert list(dark_annotations.text) == ['10.0%']
+    assert light_annotations.textfont.color == 'white'
+    assert list(light_annotations.x) == ['1', '1']
+    assert list(light_annotations.y) == ['2023-01-02', '2023-01-09']
+    assert list(light_annotations.text) == ['50.0%', '25.0%']
+    assert np.array_equal(np.asarray(light_annotations.customdata), [[10, 5, 0.5], [20, 5, 0.25]])
+
+    # no cohort with activity after the first period
+    fig = plot_retention_matrix(
+        retention=retention[['cohort', '# of unique ids', '0']],
+        intervals='week',
+        max_periods_to_display=10,
+        show_unfinished_cohorts=True,
+    )
+    assert len(fig.data) == 0
+
+
+def test_plot_retention_matrix__show_unfinished_cohorts():
+    num_cohorts = 10
+    retention = pd.DataFrame({
+        'cohort': pd.date_range('2023-01-01', periods=num_cohorts, freq='D'),
+        '# of unique ids': np.arange(1, num_cohorts + 1) * 10,
+    })
+    for period in range(num_cohorts):
+        values = np.full(num_cohorts, 0.5 / (period + 1))
+        values[num_cohorts - period:] = np.nan
+        retention[str(period)] = values
+    fig = plot_retention_matrix(
+        retention=retention.copy(),
+        intervals='day',
+        max_periods_to_display=num_cohorts,
+        show_unfinished_cohorts=False,
+    )
+    heatmap, dark_annotations, light_annotations = fig.data
+    assert len(heatmap.y) == num_cohorts - 2
+    num_annotations = len(dark_annotations.text) + len(light_annotations.text)
+    assert num_annotations == np.count_nonzero(~np.isnan(np.asarray(heatmap.z, dtype=float)))
+    # the hover text of the annotations references the retention rate stored in the customdata
+    assert '%{customdata[2]:.2%}' in dark_annotations.hovertemplate
+
+
+def test_cut_numeric():
+    series = pd.Series([1.5, np.nan, -3, 10, 2.25, 7, 10, -3], name='values')
+    for n_bins in [1, 3, 5]:
+        pd.testing.assert_series_equal(cut_numeric(series, n_bins=n_bins), pd.cut(series, bins=n_bins))  # noqa
+    constant = pd.Series([2.0, 2.0, np.nan])
+    pd.testing.assert_series_equal(cut_numeric(constant, n_bins=3), pd.cut(constant, bins=3))
+    # same error as pd.cut when all values are missing
+    with pytest.raises(ValueError):  # noqa: PT011
+        cut_numeric(pd.Series([np.nan, np.nan]), n_bins=3)
+
+
+def test_conditional_probabilities(mock_data2):  # noqa
+    data = mock_data2.copy()
+    data['floats'] = cut_numeric(data['floats'], n_bins=2)
+    probabilities = conditional_probabilities(
+        data,
+        groupby_variables=['floats'],
+        y_variable='strings_with_missing',
+        y_graph_name='P(y | x)',
+    )
+    assert probabilities.columns.tolist() == [
+        'floats', 'strings_with_missing', 'P(y | x)', '# Records',
+    ]
+    # missing values are ignored; values of y are ordered by count within each group
+    assert probabilities['floats'].astype(str).tolist() == [
+        '(1.096, 3.3]', '(1.096, 3.3]', '(3.3, 5.5]', '(3.3, 5.5]',
+    ]
+    assert probabilities['strings_with_missing'].tolist() == ['a', 'b', 'a', 'b']
+    assert probabilities['P(y | x)'].tolist() == [0.5, 0.5, 0.5, 0.5]
+    assert probabilities['# Records'].tolist() == [1, 1, 1, 1]
+
+    probabilities = conditional_probabilities(
+        data,
+        groupby_variables=['booleans', 'categories'],
+        y_variable='strings',
+        y_graph_name='P(y | x)',
+    )
+    expected = (
+        data
+        .groupby(['booleans', 'categories'], observed=True)['strings']
+        .value_counts(normalize=True)
+    )
+    actual = probabilities.set_index(['booleans', 'categories', 'strings'])['P(y | x)']
+    assert actual.sort_index().to_dict() == expected.sort_index().to_dict()
+    assert probabilities['# Records'].sum() == len(data)
+
+
+def test_table_filter_mask():
+    data = pd.DataFrame({
+        'numbers': [1, 2, 3, np.nan],
+        'strings': ['x', 'yy', 'z', None],
+        'dates': pd.to_datetime(['2023-01-01', '2023-02-01', None, '2024-01-01']),
+        'booleans': [True, False, True, False],
+    })
+    assert table_filter_mask(data, None) is None
+    assert table_filter_mask(data, '') is None
+    assert table_filter_mask(data, '{numbers} s> 1').tolist() == [False, True, True, False]
+    assert table_filter_mask(data, '{numbers} >= 2 && {numbers} ne 3').tolist() == [False, True, False, False]  # noqa: E501
+    assert table_filter_mask(data, '{numbers} = abc').tolist() == [False] * 4
+    assert table_filter_mask(data, '{strings} contains y').tolist() == [False, True, False, False]
+    assert table_filter_mask(data, '{strings} s= "z"').tolist() == [False, False, True, False]
+    assert table_filter_mask(data, '{dates} datestartswith 2023').tolist() == [True, True, False, False]  # noqa: E501
+    assert table_filter_mask(data, '{dates} > 2023-01-15').tolist() == [False, True, False, True]
+    assert table_filter_mask(data, '{booleans} = True').tolist() == [True, False, True, False]
+    # unknown columns/operators are ignored
+    assert table_filter_mask(data, '{unknown} = 1 && {numbers} ~ 1').tolist() == [True] * 4
+
+
+def test_page_table_data(mock_data2):  # noqa
+    def row_ids(records: list[dict]) -> list:
+        return [x['integers'] for x in records]
+
+    assert mock_data2['integers'].is_unique
+    records, page_count = page_table_data(mock_data2, page_current=0, page_size=2)
+    assert row_ids(records) == mock_data2['integers'].iloc[0:2].tolist()
+    assert page_count == math.ceil(len(mock_data2) / 2)
+    records, _ = page_table_data(mock_data2, page_current=1, page_size=2)
+    assert row_ids(records) == mock_data2['integers'].iloc[2:4].tolist()
+
+    sort_by = [
+        {'column_id': 'strings', 'direction': 'desc'},
+        {'column_id': 'integers', 'direction': 'asc'},
+    ]
+    records, _ = page_table_data(mock_data2, page_current=0, page_size=100, sort_by=sort_by)
+    expected = mock_data2.sort_values(['strings', 'integers'], ascending=[False, True])
+    assert row_ids(records) == expected['integers'].tolist()
+
+    records, page_count = page_table_data(
+        mock_data2,
+        page_current=0,
+        page_size=100,
+        filter_query='{strings} = a',
+    )
+    assert row_ids(records) == mock_data2.loc[mock_data2['strings'] == 'a', 'integers'].tolist()
+    assert page_count == 1
+    assert page_table_data(None, page_current=0, page_size=10) == ([], 1)
+    assert page_table_data(mock_data2.iloc[0:0], page_current=0, page_size=10) == ([], 1)
+
+
+def test_table_columns(mock_data2):  # noqa
+    # the columns are kept when the filter matches no rows
+    records, _ = page_table_data(
+        mock_data2,
+        page_current=0,
+        page_size=10,
+        filter_query='{strings} = does-not-exist',
+    )
+    assert records == []
+    columns = table_columns(mock_data2)
+    assert [x['id'] for x in columns] == mock_data2.columns.tolist()
+    assert [x['name'] for x in columns] == mock_data2.columns.tolist()
+    assert table_columns(pd.DataFrame({0: [1], 'b': [2]})) == [
+        {'name': '0', 'id': '0'},
+        {'name': 'b', 'id': 'b'},
+    ]
+    assert table_columns(None) == []
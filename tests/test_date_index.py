@@ -0,0 +1,83 @@
+"""Tests for date_index.py."""
+import numpy as np
+import pandas as pd
+from source.library.date_index import DateIndex
+
+
+def _expected_positions(data: pd.DataFrame, column: str, start: str | None, end: str | None) -> list:  # noqa
+    """Return the positions of the rows in [start, end) by comparing the date of every row."""
+    dates = pd.to_datetime(data[column], errors='coerce')
+    if dates.dt.tz is not None:
+        dates = dates.dt.tz_localize(None)
+    mask = dates.notna()
+    if start is not None:
+        mask &= dates >= pd.Timestamp(start)
+    if end is not None:
+        mask &= dates < pd.Timestamp(end)
+    return np.flatnonzero(mask.to_numpy()).tolist()
+
+
+def test_date_index(mock_data2):  # noqa
+    columns = ['dates', 'dates_with_missing', 'datetimes_with_missing2']
+    index = DateIndex(mock_data2, columns)
+    assert index.columns == columns
+    assert index.num_rows == len(mock_data2)
+    assert index.num_missing('dates') == 0
+    assert index.num_missing('dates_with_missing') == mock_data2['dates_with_missing'].isna().sum()
+    for column in columns:
+        for start, end in [
+                (None, None),
+                ('2023-01-02', '2023-01-04'),
+                ('2023-01-02', '2023-01-04 12:00:00'),
+                ('2023-01-03', None),
+                (None, '2023-01-03'),
+                ('2024-01-01', None),
+            ]:
+            expected = _expected_positions(mock_data2, column, start, end)
+            assert index.get_positions(column, start=start, end=end).tolist() == expected
+            mask = index.get_mask(column, start=start, end=end)
+            assert np.flatnonzero(mask).tolist() == expected
+
+
+def test_date_index__strings_and_time_zones():
+    rng = np.random.default_rng(42)
+    dates = pd.Series(pd.to_datetime('2023-01-01') + pd.to_timedelta(
+        rng.integers(0, 365 * 24 * 60, size=1_000), unit='min',
+    ))
+    strings = dates.dt.strftime('%Y-%m-%d %H:%M')
+    data = pd.DataFrame({
+        'strings': strings.where(rng.random(1_000) > 0.1, 'not a date'),
+        'time_zones': dates.dt.tz_localize('US/Eastern', ambiguous='NaT', nonexistent='NaT'),
+    })
+    index = DateIndex(data, ['strings', 'time_zones'])
+    assert index.num_missing('strings') == (data['strings'] == 'not a date').sum()
+    for column in ['strings', 'time_zones']:
+        for start, end in [('2023-03-12', '2023-03-13'), ('2023-06-01 12:30', '2023-11-05 01:30')]:
+            expected = _expected_positions(data, column, start, end)
+            assert len(expected) > 0
+            assert index.get_positions(column, start=start, end=end).tolist() == expected
+
+
+def test_date_index__subset(mock_data2):  # noqa
+    columns = ['dates_with_missing', 'datetimes_with_missing2']
+    index = DateIndex(mock_data2, columns)
+    subset = mock_data2[mock_data2['integers'] != 2]
+    subset_index = index.subset(subset)
+    expected_index = DateIndex(subset, columns)
+    assert subset_index.num_rows == len(subset)
+    for column in columns:
+        assert subset_index.num_missing(column) == expected_index.num_missing(column)
+        for start, end in [(None, None), ('2023-01-03', '2023-01-05')]:
+            expected = _expected_positions(subset, column, start, end)
+            assert subset_index.get_positions(column, start=start, end=end).tolist() == expected
+    # the rows can't be matched by their labels, so the index is built from scratch
+    data = pd.concat([mock_data2, mock_data2])
+    subset = data.iloc[[0, 3, 7]]
+    subset_index = DateIndex(data, columns).subset(subset)
+    for column in columns:
+        expected = _expected_positions(subset, column, None, None)
+        assert subset_index.get_positions(column).tolist() == expected
+    subset = mock_data2.iloc[[3, 1]]
+    subset_index = index.subset(subset)
+    assert subset_index.get_positions('dates_with_missing').tolist() == \
+        _expected_positions(subset, 'dates_with_missing', None, None)
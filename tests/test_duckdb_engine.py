@@ -0,0 +1,254 @@
+"""Tests for duckdb_engine.py."""
+import numpy as np
+import pandas as pd
+import pytest
+from source.library.dash_utilities import (
+    convert_to_graph_data,
+    generate_graph,
+    generate_graph_with_size_limit,
+    get_figure_size,
+)
+from source.library.duckdb_engine import (
+    create_query,
+    create_query_code,
+    filters_to_sql,
+    quote_identifier,
+    read_query,
+    read_query_chunks,
+    sql_literal,
+)
+from source.library.utilities import create_random_dataframe, filter_dataframe
+import source.library.types as t
+
+pytest.importorskip('duckdb')
+
+
+def _histogram_kwargs(data: pd.DataFrame, column_types: dict) -> dict:
+    return {
+        'data': data,
+        'graph_type': 'histogram',
+        'x_variable': None,
+        'y_variable': None,
+        'z_variable': None,
+        'color_variable': None,
+        'size_variable': None,
+        'facet_variable': None,
+        'num_facet_columns': 4,
+        'selected_category_order': None,
+        'numeric_aggregation': None,
+        'bar_mode': None,
+        'date_floor': None,
+        'cohort_conversion_rate_snapshots': None,
+        'cohort_conversion_rate_units': None,
+        'show_record_count': None,
+        'cohort_adoption_rate_range': None,
+        'cohort_adoption_rate_units': None,
+        'last_n_cohorts': None,
+        'show_unfinished_cohorts': None,
+        'opacity': None,
+        'n_bins': None,
+        'min_retention_events': None,
+        'num_retention_periods': None,
+        'log_x_axis': None,
+        'log_y_axis': None,
+        'free_x_axis': None,
+        'free_y_axis': None,
+        'show_axes_histogram': None,
+        'title': None,
+        'graph_labels': None,
+        'column_types': column_types,
+    }
+
+
+def test_sql_literal():
+    assert quote_identifier('a "b"') == '"a ""b"""'
+    assert sql_literal(True) == 'TRUE'
+    assert sql_literal(np.bool_(False)) == 'FALSE'
+    assert sql_literal(1) == '1'
+    assert sql_literal(np.float64(1.5)) == '1.5'
+    assert sql_literal(np.inf) == "CAST('inf' AS DOUBLE)"
+    assert sql_literal(-np.inf) == "CAST('-inf' AS DOUBLE)"
+    assert sql_literal("it's") == "'it''s'"
+    assert sql_literal(pd.Timestamp('2023-01-02').date()) == "DATE '2023-01-02'"
+
+
+def test_filters_to_sql(mock_data2):  # noqa
+    column_types = t.get_column_types(mock_data2)
+    assert filters_to_sql(None, column_types) == ''
+    sql = filters_to_sql(
+        {
+            'integers': (1, 3),
+            'strings': ['a', np.nan],
+            'booleans': [True],
+            'dates': ('2023-01-02', '2023-01-04'),
+        },
+        column_types,
+    )
+    assert sql == (
+        '"integers" BETWEEN 1 AND 3\n'
+        '    AND (CAST("strings" AS VARCHAR) IN (\'a\') OR CAST("strings" AS VARCHAR) IS NULL)\n'
+        '    AND "booleans" IN (TRUE)\n'
+        '    AND CAST(TRY_CAST("dates" AS TIMESTAMP) AS DATE) '
+        "BETWEEN DATE '2023-01-02' AND DATE '2023-01-04'"
+    )
+
+
+def test_filter_dataframe__duckdb(mock_data2):  # noqa
+    # the same rows (with the same dtypes and index) as filtering with pandas
+    # (with this seed, the first value of `DateHomeStrings` isn't ambiguous, so pandas can parse
+    # the dates)
+    random_data = create_random_dataframe(num_rows=2_000, sporadic_missing=True, seed=1)
+    for data, filters in [
+            (mock_data2, {'integers': (2, 4)}),
+            (mock_data2, {'floats_with_missing': (2, 5)}),
+            (mock_data2, {'strings_with_missing': ['a', np.nan]}),
+            (mock_data2, {'categories_with_missing2': ['b', None]}),
+            (mock_data2, {'booleans_with_missing': [False, np.nan]}),
+            (mock_data2, {'dates_with_missing': ('2023-01-02', '2023-01-04')}),
+            (mock_data2, {'datetimes': ('2023-01-02', '2023-01-04'), 'strings': ['a', 'b']}),
+            (random_data, {'DateStrings': ('2023-03-01', '2023-06-30')}),
+            (random_data, {'DateHomeStrings': ('2023-03-01', '2023-06-30')}),
+            (random_data, {'Booleans1': [False, np.nan], 'Integers': (10, 80)}),
+            (random_data, {'Categories': ['Category A', np.nan]}),
+        ]:
+        # some of the (randomly generated) date strings can't be parsed as dates
+        column_types = t.get_column_types(data) | {'DateHomeStrings': t.DATE}
+        expected, _ = filter_dataframe(data, filters, column_types)
+        actual, code = filter_dataframe(data, filters, column_types, engine='duckdb')
+        assert len(expected) > 0
+        pd.testing.assert_frame_equal(actual, expected)
+        # the generated code contains the conditions of the filters
+        start, end = code.index('duckdb.sql(') + len('duckdb.sql('), code.index(').fetchnumpy')
+        query = eval(f"({code[start:end]})")
+        assert f"    {filters_to_sql(filters, column_types, data)},\n" in query
+
+
+def test_filter_dataframe__duckdb_quotes_and_infinite_bounds():
+    # the values and column names come from the data, so they can't end the string of the query
+    # in the generated code
+    data = pd.DataFrame({
+        'c': ['q"""r', "a'b", 'x\\', 'c'],
+        'name"': [1.0, 2.0, np.nan, 4.0],
+        "n'": [1, 2, 3, 4],
+    })
+    column_types = t.get_column_types(data)
+    for filters, expected_rows in [
+            ({'c': ['q"""r', "a'b", 'x\\']}, [0, 1, 2]),
+            ({'c': ['"""); import os; ("""']}, []),
+            ({'name"': (2.0, np.inf)}, [1, 3]),
+            ({'name"': (-np.inf, 2.0), "n'": (1, 3)}, [0, 1]),
+            # no values are between a missing bound (like `pd.Series.between`)
+            ({'name"': (np.nan, 2.0)}, []),
+            ({"n'": (1, np.nan)}, []),
+        ]:
+        actual, _ = filter_dataframe(data, filters, column_types, engine='duckdb')
+        pd.testing.assert_frame_equal(actual, data.iloc[expected_rows])
+
+
+def test_read_query__parquet(tmp_path):  # noqa
+    data = create_random_dataframe(num_rows=5_000, sporadic_missing=True, seed=2)
+    data.iloc[:3_000].to_parquet(tmp_path / 'part-0.parquet')
+    data.iloc[3_000:].to_parquet(tmp_path / 'part-1.parquet')
+    query = f"SELECT *\nFROM '{tmp_path}/*.parquet';\n"
+    assert create_query(query) == f"SELECT *\nFROM '{tmp_path}/*.parquet'\n"
+    full_data = read_query(create_query(query))
+    assert full_data.shape == data.shape
+    # the rows are streamed in chunks (e.g. into the sample in fast exploration mode)
+    chunks = list(read_query_chunks(create_query(query), chunk_size=1_000))
+    assert len(chunks) > 1
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), full_data)
+
+    # the filters are pushed down into the query; the same rows as filtering the full data
+    column_types = t.get_column_types(full_data)
+    filters = {
+        'Integers': (10, 80),
+        # the missing values read by DuckDB are None (like the values of the filter controls)
+        'Categories': ['Category A', None],
+        'DateStrings': ('2023-03-01', '2023-06-30'),
+    }
+    sql = create_query(query, filters, column_types, full_data)
+    assert sql.endswith(f"WHERE {filters_to_sql(filters, column_types, full_data)}\n")
+    expected, _ = filter_dataframe(full_data, filters, column_types)
+    assert len(expected) > 0
+    filtered_data = read_query(sql)
+    pd.testing.assert_frame_equal(filtered_data, expected.reset_index(drop=True))
+    # the generated code contains the query
+    code = create_query_code(query, filters, column_types, full_data)
+    local_vars = {}
+    exec(code, {}, local_vars)
+    pd.testing.assert_frame_equal(local_vars['graph_data'], filtered_data)
+
+    # the columns are known even if no rows match
+    chunks = list(read_query_chunks(
+        create_query(query, {'Integers': (1_000, 2_000)}, column_types),
+        chunk_size=1_000,
+    ))
+    assert len(chunks) == 1
+    assert chunks[0].columns.tolist() == data.columns.tolist()
+    assert len(chunks[0]) == 0
+
+
+@pytest.mark.parametrize('numeric_aggregation', [None, 'sum', 'avg', 'min', 'max'])
+def test_generate_graph__histogram_duckdb(numeric_aggregation, credit_data):  # noqa
+    column_types = t.get_column_types(credit_data)
+    graph_data, _, _ = convert_to_graph_data(
+        data=credit_data,
+        column_types=column_types,
+        selected_variables=['purpose', 'default', 'amount'],
+        top_n_categories=None,
+        exclude_from_top_n_transformation=None,
+        create_cohorts_from=None,
+        date_floor=None,
+    )
+    for y_variable in [None, 'amount']:
+        kwargs = _histogram_kwargs(graph_data, column_types) | {
+            'x_variable': 'purpose',
+            'y_variable': y_variable,
+            'color_variable': 'default',
+            'numeric_aggregation': numeric_aggregation,
+        }
+        fig, code = generate_graph(**kwargs, engine='duckdb')
+        assert 'GROUP BY "purpose", "default"' in code
+        # one (aggregated) row per x/color value, which plotly sums
+        actual = {
+            (trace.name, x): y
+            for trace in fig.data
+            for x, y in zip(trace.x, trace.y, strict=True)
+        }
+        assert all(trace.histfunc == 'sum' for trace in fig.data)
+        grouped = graph_data.groupby(['default', 'purpose'])
+        if y_variable is None:
+            expected = grouped.size()
+            assert fig.layout.yaxis.title.text == 'count'
+        else:
+            expected = grouped['amount'].agg(
+                {'avg': 'mean'}.get(numeric_aggregation, numeric_aggregation or 'sum'),
+            )
+            assert fig.layout.yaxis.title.text == f"{numeric_aggregation or 'sum'} of amount"
+        assert actual.keys() == expected.to_dict().keys()
+        for key, value in expected.items():
+            assert actual[key] == pytest.approx(value)
+
+        # the pandas engine passes the rows to plotly
+        fig, code = generate_graph(**kwargs)
+        assert 'duckdb' not in code
+        assert sum(len(trace.x) for trace in fig.data) == len(graph_data)
+
+
+def test_generate_graph_with_size_limit__histogram_duckdb(credit_data):  # noqa
+    # histograms that are too large are aggregated with DuckDB rather than in the browser
+    column_types = t.get_column_types(credit_data)
+    kwargs = _histogram_kwargs(credit_data, column_types) | {
+        'x_variable': 'purpose',
+        'color_variable': 'default',
+    }
+    fig, code = generate_graph(**kwargs)
+    figure_size = get_figure_size(fig)
+    fig, code, graph_data, description = generate_graph_with_size_limit(
+        max_figure_size=figure_size // 2,
+        **kwargs,
+    )
+    assert get_figure_size(fig) <= figure_size // 2
+    assert 'duckdb.sql' in code
+    assert graph_data is credit_data
+    assert 'aggregated with DuckDB' in description
@@ -0,0 +1,156 @@
+"""Tests for metrics.py."""
+import inspect
+import sys
+import pandas as pd
+import pytest
+from source.library import metrics
+from source.library.metrics import (
+    MAX_PROFILE_REPORTS,
+    MAX_RECORDS,
+    get_metrics,
+    get_profile_report,
+    get_records,
+    profile_when,
+    record_payload_size,
+    record_timing,
+    reset_metrics,
+    timed,
+)
+
+
+@timed
+def _filter(data: pd.DataFrame, num_rows: int) -> pd.DataFrame:
+    return data.head(num_rows)
+
+
+@timed
+def _callback(data: pd.DataFrame) -> tuple:
+    return 'value', _filter(data, num_rows=2)
+
+
+@timed
+def _fail() -> None:
+    raise ValueError("error")
+
+
+@profile_when('profile')
+def _render(data: pd.DataFrame, profile: bool = False) -> pd.DataFrame:  # noqa: ARG001
+    return data.describe()
+
+
+def _render_session(profile: bool, session_id: str | None) -> int:  # noqa: ARG001
+    return sum(range(1_000))
+
+
+def test_timed():
+    reset_metrics()
+    data = pd.DataFrame({'a': range(10)})
+    assert _filter(data, 3).equals(data.head(3))
+    assert _filter(num_rows=4, data=data).equals(data.head(4))
+    records = get_records('_filter')
+    assert [(x['rows_in'], x['rows_out']) for x in records] == [(10, 3), (10, 4)]
+    assert all(x['seconds'] >= 0 and x['error'] is None for x in records)
+    # the signature is unchanged (e.g. so that dash_extensions can inspect the callbacks)
+    assert inspect.signature(_filter) == inspect.signature(_filter.__wrapped__)
+    assert _filter.__name__ == '_filter'
+    with pytest.raises(ValueError):  # noqa: PT011
+        _fail()
+    assert get_records('_fail')[0]['error'] == 'ValueError'
+
+
+def test_record_payload_size():
+    reset_metrics()
+    _callback(pd.DataFrame({'a': range(10)}))
+    # the size of the response is added to the outermost call (i.e. the callback)
+    record_payload_size(1_000)
+    record_payload_size(2_000)  # no call since the last response
+    assert get_records('_callback')[0]['payload_bytes'] == 1_000
+    assert get_records('_callback')[0]['rows_out'] == 2
+    assert get_records('_filter')[0]['payload_bytes'] is None
+    assert [x['name'] for x in get_records()] == ['_filter', '_callback']
+
+
+def test_get_metrics():
+    reset_metrics()
+    for seconds in range(1, 101):
+        record_timing('slow', seconds=seconds, rows_in=10)
+    record_timing('fast', seconds=0.5, error='ValueError')
+    for _ in range(MAX_RECORDS + 1):
+        record_timing('many', seconds=0.1)
+    metrics = get_metrics(num_recent=5)
+    assert [x['name'] for x in metrics['summary']] == ['slow', 'fast', 'many']
+    slow = metrics['summary'][0]
+    assert slow['calls'] == 100
+    assert slow['errors'] == 0
+    assert slow['p50_seconds'] == pytest.approx(50.5)
+    assert slow['p90_seconds'] == pytest.approx(90.1)
+    assert slow['max_seconds'] == 100
+    assert slow['mean_rows_in'] == 10
+    assert slow['mean_rows_out'] is None
+    assert metrics['summary'][1]['errors'] == 1
+    # only the most recent calls are kept
+    assert metrics['summary'][2]['calls'] == MAX_RECORDS
+    assert len(metrics['recent']) == 5
+    assert all(x['name'] == 'many' for x in metrics['recent'])
+    reset_metrics()
+    assert get_metrics() == {'summary': [], 'recent': []}
+
+
+def test_profile_when(monkeypatch):  # noqa
+    data = pd.DataFrame({'a': range(10)})
+    assert inspect.signature(_render) == inspect.signature(_render.__wrapped__)
+    previous_report = get_profile_report()
+    assert _render(data).equals(data.describe())
+    assert get_profile_report() is previous_report
+    # profiled with cProfile if pyinstrument isn't installed
+    with monkeypatch.context() as patch:
+        patch.setitem(sys.modules, 'pyinstrument', None)
+        assert _render(data, True).equals(data.describe())
+    report = get_profile_report()
+    assert report['name'] == '_render'
+    assert report['filename'].endswith('.txt')
+    assert 'describe' in report['content']
+    assert report['seconds'] > 0
+
+
+def test_profile_when__pyinstrument():
+    pytest.importorskip('pyinstrument')
+    data = pd.DataFrame({'a': range(10)})
+    assert _render(data, profile=True).equals(data.describe())
+    report = get_profile_report()
+    assert report['name'] == '_render'
+    assert report['filename'].endswith('.html')
+    assert report['content'].startswith('<!DOCTYPE html>')
+
+
+def test_profile_when__sessions(monkeypatch, tmp_path):  # noqa
+    monkeypatch.setattr(metrics, '_profile_reports', metrics.OrderedDict())
+    render = profile_when('profile', key_argument='session_id', report_directory=str(tmp_path))(
+        _render_session,
+    )
+    assert render(profile=True, session_id='a') == sum(range(1_000))
+    report_a = get_profile_report('a')
+    assert report_a['name'] == '_render_session'
+    # the reports of the other sessions aren't returned or replaced
+    assert get_profile_report('b') is None
+    render(profile=False, session_id='b')
+    assert get_profile_report('b') is None
+    render(profile=True, session_id='b')
+    assert get_profile_report('b')['id'] != report_a['id']
+    assert get_profile_report('a') is report_a
+    # the reports are read from the directory if they aren't in memory (e.g. another process)
+    metrics._profile_reports.clear()
+    assert get_profile_report('a') is None
+    assert get_profile_report('a', str(tmp_path)) == report_a
+    # the keys that aren't alphanumeric aren't used as file names
+    render(profile=True, session_id='../c')
+    assert get_profile_report('../c')['name'] == '_render_session'
+    assert get_profile_report('../c', str(tmp_path)) is not None
+    metrics._profile_reports.clear()
+    assert get_profile_report('../c', str(tmp_path)) is None
+    # only the most recent reports are kept
+    for index in range(MAX_PROFILE_REPORTS + 2):
+        render(profile=True, session_id=f'session{index}')
+    assert len(metrics._profile_reports) == MAX_PROFILE_REPORTS
+    assert get_profile_report('session0') is None
+    assert len(list(tmp_path.iterdir())) == MAX_PROFILE_REPORTS
@@ -0,0 +1,114 @@
+"""Tests for polars_engine.py."""
+import warnings
+import numpy as np
+import pandas as pd
+import pytest
+import helpsk.pandas as hp
+from source.library.dash_utilities import convert_to_graph_data
+from source.library.utilities import create_random_dataframe, filter_dataframe
+import source.library.types as t
+
+pytest.importorskip('polars')
+from source.library.polars_engine import PolarsDataPrep, top_n_categories  # noqa: E402
+
+
+def test_top_n_categories():
+    rng = np.random.default_rng(0)
+    values = pd.Series(rng.choice([f'value_{i}' for i in range(30)], size=10_000), dtype=object)
+    categorical = pd.Series(pd.Categorical(values, categories=[*sorted(set(values)), 'unused']))
+    for series in [values, categorical]:
+        for top_n in [1, 5, 29, 30, 40]:
+            expected = pd.Series(hp.top_n_categories(series, top_n=top_n, other_category='other'))
+            actual = top_n_categories(series, top_n=top_n, other_category='other')
+            pd.testing.assert_series_equal(actual, expected)
+        # the top values are the most frequent values in the rows
+        rows = rng.random(len(series)) < 0.5
+        expected = pd.Series(hp.top_n_categories(series[rows], top_n=5, other_category='other'))
+        actual = top_n_categories(series, top_n=5, other_category='other', rows=rows)
+        pd.testing.assert_series_equal(actual[rows].reset_index(drop=True), expected)
+
+
+def test_filter_dataframe__polars(mock_data2):  # noqa
+    # the same rows (with the same dtypes and index) and code as filtering with pandas
+    # (with this seed, the first value of `DateHomeStrings` isn't ambiguous, so pandas can parse
+    # the dates)
+    random_data = create_random_dataframe(num_rows=2_000, sporadic_missing=True, seed=1)
+    for data, filters in [
+            (mock_data2, {'integers': (2, 4)}),
+            (mock_data2, {'floats_with_missing': (2, 5)}),
+            (mock_data2, {'strings_with_missing': ['a', np.nan]}),
+            (mock_data2, {'categories_with_missing2': ['b', None]}),
+            (mock_data2, {'booleans_with_missing': [False, np.nan]}),
+            (mock_data2, {'dates_with_missing': ('2023-01-02', '2023-01-04')}),
+            (mock_data2, {'datetimes': ('2023-01-02', '2023-01-04'), 'strings': ['a', 'b']}),
+            (random_data, {'DateStrings': ('2023-03-01', '2023-06-30')}),
+            (random_data, {'DateHomeStrings': ('2023-03-01', '2023-06-30')}),
+            (random_data, {'Booleans1': [False, np.nan], 'Integers': (10, 80)}),
+            (random_data, {'Categories': ['Category A', np.nan]}),
+        ]:
+        # some of the (randomly generated) date strings can't be parsed as dates
+        column_types = t.get_column_types(data) | {'DateHomeStrings': t.DATE}
+        expected, expected_code = filter_dataframe(data, filters, column_types)
+        actual, code = filter_dataframe(data, filters, column_types, engine='polars')
+        assert len(expected) > 0
+        pd.testing.assert_frame_equal(actual, expected)
+        assert code == expected_code
+
+
+@pytest.mark.parametrize('date_floor', [
+    None, 'year', 'quarter', 'month', 'week', 'day', 'hour', 'minute', 'second',
+])
+def test_convert_to_graph_data__polars(date_floor, mock_data2, credit_data):  # noqa
+    # the same data, markdown, and code as converting with pandas
+    random_datasets = []
+    # with seed 0, the format of `DateHomeStrings` is inferred as day first or month first
+    # depending on the rows that remain after removing missing values
+    for seed in [0, 3]:
+        random_data = create_random_dataframe(num_rows=2_000, sporadic_missing=True, seed=seed)
+        random_data.loc[::3, 'Integers'] = np.nan
+        random_datasets.append(random_data)
+    for data, top_n, exclude, create_cohorts_from in [
+            (mock_data2, None, None, None),
+            (mock_data2, 2, None, None),
+            (mock_data2, 1, ['strings'], None),
+            (mock_data2, 2, None, ('datetimes_with_missing', 'datetimes_with_missing2')),
+            *[(random_data, None, None, None) for random_data in random_datasets],
+            *[(random_data, 3, None, None) for random_data in random_datasets],
+            (random_datasets[0], 5, ['Categories'], None),
+            (credit_data, 3, None, None),
+        ]:
+        column_types = t.get_column_types(data)
+        kwargs = {
+            'data': data,
+            'column_types': column_types,
+            'selected_variables': data.columns.tolist(),
+            'top_n_categories': top_n,
+            'exclude_from_top_n_transformation': exclude,
+            'create_cohorts_from': create_cohorts_from,
+            'date_floor': date_floor,
+        }
+        if create_cohorts_from and not date_floor:
+            continue
+        expected_data, expected_markdown, expected_code = convert_to_graph_data(**kwargs)
+        actual_data, markdown, code = convert_to_graph_data(**kwargs, engine='polars')
+        assert len(expected_data) > 0
+        pd.testing.assert_frame_equal(actual_data, expected_data)
+        assert markdown == expected_markdown
+        assert code == expected_code
+
+
+def test_polars_data_prep__result():
+    data = pd.DataFrame({
+        'booleans': np.array([True, None, False, True], dtype=object),
+        'numbers': [1.0, np.nan, 2.0, 3.0],
+    })
+    prep = PolarsDataPrep(data.copy())
+    prep.remove_missing('numbers')
+    prep.fill_missing('booleans', 'missing')
+    # the dtypes of the remaining rows are inferred without a SettingWithCopyWarning
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        result = prep.result()
+    assert result.index.tolist() == [0, 2, 3]
+    assert result['booleans'].dtype == bool
+    assert result['booleans'].tolist() == [True, False, True]
@@ -0,0 +1,173 @@
+"""Tests for profiling.py."""
+import time
+import warnings
+import numpy as np
+import pandas as pd
+import pytest
+import helpsk.pandas as hp
+from source.library import profiling
+from source.library.profiling import (
+    dataset_fingerprint,
+    get_profile,
+    get_shared_dataset,
+    is_profiling,
+    load_profile,
+    map_columns,
+    non_numeric_summary,
+    numeric_summary,
+    profile_dataset,
+    save_profile,
+    share_dataset,
+    start_profiling,
+)
+from source.library.utilities import create_random_dataframe
+
+
+def test_profile_dataset__matches_helpsk(mock_data2):  # noqa
+    random_data = create_random_dataframe(num_rows=2_000, sporadic_missing=True)
+    for data in [mock_data2, random_data]:
+        profile = profile_dataset(data)
+        assert list(profile) == data.columns.tolist()
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            expected_numeric = hp.numeric_summary(data, return_style=False)
+            expected_non_numeric = hp.non_numeric_summary(data, return_style=False)
+        pd.testing.assert_frame_equal(numeric_summary(profile), expected_numeric)
+        pd.testing.assert_frame_equal(non_numeric_summary(profile), expected_non_numeric)
+
+
+def test_profile_dataset__edge_cases():
+    data = pd.DataFrame({
+        'all_missing': [np.nan, np.nan, np.nan],
+        'constant': [1.0, 1.0, 1.0],
+        'strings': ['a' * 40, 'b', None],
+    })
+    profile = profile_dataset(data)
+    assert profile['all_missing']['# of Nulls'] == 3
+    assert np.isnan(profile['all_missing']['Mean'])
+    assert profile['constant']['St Dev.'] == 0
+    assert profile['constant']['Skewness'] == 0
+    assert profile['constant']['50%'] == 1
+    assert profile['strings']['Most Freq. Value'] == 'a' * 30 + '[...]'
+    assert profile['strings']['# of Unique'] == 2
+    assert numeric_summary({'strings': profile['strings']}) is None
+    assert non_numeric_summary({'constant': profile['constant']}) is None
+
+
+def test_map_columns__parallel(mock_data2, monkeypatch):  # noqa
+    monkeypatch.setattr(profiling, 'PARALLEL_MIN_CELLS', 0)
+    data = mock_data2.copy()
+    # columns that can't be shared via Arrow are processed in-process
+    data['mixed_types'] = [1, 'a', None] * (len(data) // 3) + [1] * (len(data) % 3)
+    data['nullable_integers'] = pd.array(range(len(data)), dtype='Int64')
+    expected_results, expected_seconds = map_columns(profiling.profile_column, data)
+    results, seconds = map_columns(profiling.profile_column, data, max_workers=2)
+    assert list(results) == data.columns.tolist()
+    assert list(seconds) == data.columns.tolist()
+    assert all(x >= 0 for x in seconds.values())
+    assert expected_seconds.keys() == seconds.keys()
+    pd.testing.assert_frame_equal(numeric_summary(results), numeric_summary(expected_results))
+    pd.testing.assert_frame_equal(
+        non_numeric_summary(results),
+        non_numeric_summary(expected_results),
+    )
+    assert all('seconds' in x for x in profile_dataset(data, max_workers=2).values())
+
+
+def test_share_dataset(mock_data2, monkeypatch):  # noqa
+    monkeypatch.setattr(profiling, 'PARALLEL_MIN_CELLS', 0)
+    assert profiling._mp_context.get_start_method() in {'forkserver', 'spawn'}
+    assert share_dataset(mock_data2, 'shared', max_workers=1) is None
+    shared_dataset = share_dataset(mock_data2, 'shared', max_workers=2)
+    assert share_dataset(mock_data2, 'shared', max_workers=2) is shared_dataset
+    assert get_shared_dataset('shared') is shared_dataset
+    assert get_shared_dataset('other') is None
+    expected, _ = map_columns(profiling.profile_column, mock_data2)
+    # the shared copy is used by each call (rather than copying the data again)
+    monkeypatch.setattr(profiling, '_to_shared_memory', None)
+    for _ in range(2):
+        results, _ = map_columns(
+            profiling.profile_column,
+            mock_data2,
+            max_workers=2,
+            shared_dataset=shared_dataset,
+        )
+        pd.testing.assert_frame_equal(numeric_summary(results), numeric_summary(expected))
+    monkeypatch.undo()
+    monkeypatch.setattr(profiling, 'PARALLEL_MIN_CELLS', 0)
+    # sharing another dataset closes the shared copy of the previous dataset; a closed copy isn't
+    # used
+    other = share_dataset(mock_data2.copy(), 'other', max_workers=2)
+    assert get_shared_dataset('shared') is None
+    assert shared_dataset.shared_memory is None
+    assert not shared_dataset.acquire()
+    results, _ = map_columns(
+        profiling.profile_column,
+        mock_data2,
+        max_workers=2,
+        shared_dataset=shared_dataset,
+    )
+    pd.testing.assert_frame_equal(numeric_summary(results), numeric_summary(expected))
+    other.close()
+    assert other.shared_memory is None
+
+
+def test_dataset_fingerprint(mock_data2):  # noqa
+    fingerprint = dataset_fingerprint(mock_data2)
+    assert fingerprint == dataset_fingerprint(mock_data2.copy())
+    changed = mock_data2.copy()
+    changed.loc[0, 'strings'] = 'z'
+    assert fingerprint != dataset_fingerprint(changed)
+    assert fingerprint != dataset_fingerprint(mock_data2.rename(columns={'strings': 'other'}))
+    assert fingerprint != dataset_fingerprint(mock_data2.iloc[::-1])
+
+
+def test_start_profiling__persists_profile(mock_data2, tmp_path):  # noqa
+    fingerprint = dataset_fingerprint(mock_data2)
+    assert load_profile(fingerprint, tmp_path) is None
+    future = start_profiling(mock_data2, fingerprint=fingerprint, cache_directory=tmp_path)
+    assert start_profiling(mock_data2, fingerprint=fingerprint) is future
+    profile = get_profile(fingerprint, timeout=None)
+    pd.testing.assert_frame_equal(
+        numeric_summary(profile),
+        numeric_summary(profile_dataset(mock_data2)),
+    )
+    pd.testing.assert_frame_equal(
+        non_numeric_summary(load_profile(fingerprint, tmp_path)),
+        non_numeric_summary(profile),
+    )
+    assert get_profile('unknown fingerprint') is None
+
+    # a persisted profile is loaded rather than recomputed
+    save_profile({'column': {'is_numeric': False}}, 'persisted', tmp_path)
+    start_profiling(mock_data2, fingerprint='persisted', cache_directory=tmp_path)
+    start = time.time()
+    assert get_profile('persisted', timeout=None) == {'column': {'is_numeric': False}}
+    assert time.time() - start < 1
+
+
+def test_start_profiling__failure(mock_data2, tmp_path):  # noqa
+    # the cache directory can't be created (it's a file)
+    cache_directory = tmp_path / 'file'
+    cache_directory.write_text('')
+    future = start_profiling(mock_data2, fingerprint='failure', cache_directory=cache_directory)
+    future.exception()
+    assert not is_profiling('failure')
+    with pytest.raises(OSError):  # noqa: PT011
+        get_profile('failure')
+    # the failed profile is removed, so the error isn't raised again and profiling is retried
+    assert get_profile('failure') is None
+    retried = start_profiling(mock_data2, fingerprint='failure', cache_directory=tmp_path)
+    assert retried is not future
+    assert get_profile('failure', timeout=None) is not None
+
+
+def test_start_profiling__max_profiles(mock_data2):  # noqa
+    futures = [
+        start_profiling(mock_data2, fingerprint=f'max_profiles_{index}')
+        for index in range(profiling.MAX_PROFILES + 1)
+    ]
+    assert len(profiling._profiles) == profiling.MAX_PROFILES
+    assert 'max_profiles_0' not in profiling._profiles
+    last = f'max_profiles_{profiling.MAX_PROFILES}'
+    assert get_profile(last, timeout=None) is futures[-1].result()
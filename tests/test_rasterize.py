@@ -0,0 +1,153 @@
+"""Tests for rasterize.py."""
+import base64
+import struct
+import zlib
+import numpy as np
+import pandas as pd
+import plotly.graph_objs as go
+from source.library.rasterize import (
+    RASTER_RESOLUTION,
+    encode_png,
+    get_categories,
+    get_extent,
+    plot_rasterized_scatter,
+    rasterize,
+    rasterize_image,
+    shade,
+)
+
+
+def _decode_png(png: bytes) -> np.ndarray:
+    """Decode a PNG created by `encode_png` (RGBA, no filters) to a (height, width, 4) array."""
+    assert png.startswith(b'\x89PNG\r\n\x1a\n')
+    position = 8
+    chunks = {}
+    while position < len(png):
+        length, = struct.unpack('>I', png[position:position + 4])
+        chunk_type = png[position + 4:position + 8]
+        data = png[position + 8:position + 8 + length]
+        crc, = struct.unpack('>I', png[position + 8 + length:position + 12 + length])
+        assert crc == zlib.crc32(chunk_type + data)
+        chunks[chunk_type] = data
+        position += 12 + length
+    width, height, bit_depth, color_type = struct.unpack('>IIBB', chunks[b'IHDR'][:10])
+    assert (bit_depth, color_type) == (8, 6)
+    scanlines = np.frombuffer(zlib.decompress(chunks[b'IDAT']), dtype=np.uint8)
+    scanlines = scanlines.reshape(height, width * 4 + 1)
+    assert (scanlines[:, 0] == 0).all()
+    return scanlines[:, 1:].reshape(height, width, 4)
+
+
+def test_get_extent():
+    assert get_extent(np.array([3, 1, np.nan, 2])) == (1, 3)
+    assert get_extent(pd.Series([2.0, 2.0])) == (1.5, 2.5)
+    assert get_extent(np.array([np.nan])) == (0, 1)
+
+
+def test_get_categories():
+    series = pd.Series(['b', 'a', None, 'c', 'a'], name='color')
+    assert get_categories(series) == ['a', 'b', 'c']
+    assert get_categories(series, category_orders={'color': ['c', 'a']}) == ['c', 'a', 'b']
+    assert get_categories(series, category_orders={'other': ['c', 'a']}) == ['a', 'b', 'c']
+    series = pd.Series(pd.Categorical(['b', 'a'], categories=['z', 'b', 'a']), name='color')
+    assert get_categories(series) == ['b', 'a']
+
+
+def test_rasterize():
+    rng = np.random.default_rng(42)
+    x = rng.normal(size=10_000)
+    y = rng.normal(size=10_000)
+    x[:10] = np.nan
+    x_range, y_range = (-2, 2), (-1, 3)
+    counts = rasterize(x, y, x_range=x_range, y_range=y_range, resolution=20)
+    expected, _, _ = np.histogram2d(y[10:], x[10:], bins=20, range=[y_range, x_range])
+    assert counts.shape == (1, 20, 20)
+    assert (counts[0] == expected).all()
+    # the first y bin is the bottom of the grid
+    counts = rasterize([0.5], [0.1], x_range=(0, 1), y_range=(0, 1), resolution=2)
+    assert counts[0].tolist() == [[0, 1], [0, 0]]
+    # one grid per category; negative codes are ignored
+    codes = rng.integers(-1, 3, size=10_000)
+    counts = rasterize(
+        x, y,
+        x_range=x_range,
+        y_range=y_range,
+        resolution=20,
+        category_codes=codes,
+        num_categories=3,
+    )
+    assert counts.shape == (3, 20, 20)
+    for code in range(3):
+        mask = (codes == code) & ~np.isnan(x)
+        expected, _, _ = np.histogram2d(y[mask], x[mask], bins=20, range=[y_range, x_range])
+        assert (counts[code] == expected).all()
+
+
+def test_shade():
+    counts = np.array([[[0, 1], [9, 99]]])
+    rgba = shade(counts)
+    assert rgba.shape == (2, 2, 4)
+    assert rgba.dtype == np.uint8
+    # empty cells are transparent and the opacity increases with the count
+    assert rgba[0, 0, 3] == 0
+    assert 0 < rgba[0, 1, 3] < rgba[1, 0, 3] < rgba[1, 1, 3] == 255
+    # the colors are the mix of the colors of the categories
+    counts = np.array([[[1, 0]], [[1, 2]]])
+    rgba = shade(counts, colors=['rgb(255, 0, 0)', 'rgb(0, 0, 255)'])
+    assert rgba[0, 0, :3].tolist() == [128, 0, 128]
+    assert rgba[0, 1, :3].tolist() == [0, 0, 255]
+
+
+def test_encode_png():
+    rgba = np.random.default_rng(42).integers(0, 256, size=(3, 5, 4), dtype=np.uint8)
+    assert (_decode_png(encode_png(rgba)) == rgba).all()
+
+
+def test_rasterize_image():
+    data = pd.DataFrame({'x': [0.0, 1.0, 1.0], 'y': [0.0, 0.0, 1.0], 'color': ['a', 'b', 'b']})
+    image, max_count = rasterize_image(
+        data, 'x', 'y', x_range=(0, 1), y_range=(0, 1), color='color', resolution=2,
+    )
+    assert max_count == 1
+    assert image['dx'] == image['dy'] == 0.5
+    assert image['x0'] == image['y0'] == 0.25
+    assert image['source'].startswith('data:image/png;base64,')
+    rgba = _decode_png(base64.b64decode(image['source'].split(',')[1]))
+    assert rgba.shape == (2, 2, 4)
+    # the first row of the image is the bottom of the grid
+    assert rgba[:, :, 3].tolist() == [[255, 255], [0, 255]]
+    # zooming in only rasterizes the visible points
+    image, max_count = rasterize_image(data, 'x', 'y', x_range=(0.5, 1), y_range=(0, 0.5))
+    assert max_count == 1
+    assert image['dx'] == 0.5 / RASTER_RESOLUTION
+
+
+def test_plot_rasterized_scatter():
+    rng = np.random.default_rng(42)
+    data = pd.DataFrame({
+        'x': rng.normal(size=100_000),
+        'y': rng.normal(size=100_000),
+        'color': rng.choice(['a', 'b', 'c'], size=100_000),
+    })
+    fig = plot_rasterized_scatter(data, 'x', 'y', resolution=50, title='Title')
+    assert isinstance(fig.data[0], go.Image)
+    assert fig.data[0].dx == (data['x'].max() - data['x'].min()) / 50
+    # the color bar of the number of points per cell
+    assert fig.data[1].marker.showscale
+    assert list(fig.layout.xaxis.range) == [data['x'].min(), data['x'].max()]
+    assert list(fig.layout.yaxis.range) == [data['y'].min(), data['y'].max()]
+    assert fig.layout.title.text == 'Title'
+    # the size of the figure doesn't depend on the number of points
+    assert len(fig.to_json()) < 50_000
+    fig = plot_rasterized_scatter(
+        data, 'x', 'y',
+        color='color',
+        x_range=(0, 1),
+        y_range=(-1, 1),
+        category_orders={'color': ['c', 'b', 'a']},
+        labels={'color': 'Color'},
+    )
+    assert isinstance(fig.data[0], go.Image)
+    assert [trace.name for trace in fig.data[1:]] == ['c', 'b', 'a']
+    assert fig.layout.legend.title.text == 'Color'
+    assert list(fig.layout.xaxis.range) == [0, 1]
@@ -0,0 +1,84 @@
+"""Tests for sampling.py."""
+import numpy as np
+import pandas as pd
+import pytest
+from source.library.sampling import iterate_chunks, reservoir_sample, stratum_sample_sizes
+
+
+@pytest.fixture
+def data() -> pd.DataFrame:
+    # a different seed than the sampling seed so the random keys are independent of the data
+    rng = np.random.default_rng(0)
+    num_rows = 20_000
+    return pd.DataFrame({
+        'id': np.arange(num_rows),
+        'group': rng.choice(['a', 'b', 'c', None], size=num_rows, p=[0.9, 0.09, 0.005, 0.005]),
+        'value': rng.normal(size=num_rows),
+    })
+
+
+def test_iterate_chunks(data):  # noqa
+    chunks = list(iterate_chunks(data, chunk_size=3_000))
+    assert [len(x) for x in chunks] == [3_000] * 6 + [2_000]
+    pd.testing.assert_frame_equal(pd.concat(chunks), data)
+    assert list(iterate_chunks(data.iloc[0:0], chunk_size=10)) == []
+
+
+def test_reservoir_sample__uniform(data):  # noqa
+    sample, num_rows = reservoir_sample(iterate_chunks(data, 1_000), sample_size=2_000)
+    assert num_rows == len(data)
+    assert len(sample) == 2_000
+    assert sample.columns.tolist() == data.columns.tolist()
+    assert sample.index.tolist() == list(range(2_000))
+    # the rows are unchanged and in their original order
+    assert sample['id'].is_unique
+    assert sample['id'].is_monotonic_increasing
+    pd.testing.assert_frame_equal(sample, data.iloc[sample['id']].reset_index(drop=True))
+    # the sample is (approximately) uniform
+    assert abs(sample['id'].mean() - data['id'].mean()) < 0.05 * len(data)
+    assert abs((sample['group'] == 'a').mean() - 0.9) < 0.03
+
+    # the sample doesn't depend on the chunk size and is reproducible with the seed
+    same_sample, _ = reservoir_sample(iterate_chunks(data, 7_000), sample_size=2_000)
+    pd.testing.assert_frame_equal(sample, same_sample)
+    other_sample, _ = reservoir_sample(iterate_chunks(data, 1_000), sample_size=2_000, seed=1)
+    assert not sample['id'].equals(other_sample['id'])
+
+    # sample size larger than the data
+    sample, num_rows = reservoir_sample(iterate_chunks(data.iloc[:50], 7), sample_size=100)
+    assert num_rows == 50
+    pd.testing.assert_frame_equal(sample, data.iloc[:50])
+
+
+def test_reservoir_sample__stratified(data):  # noqa
+    sample, num_rows = reservoir_sample(
+        iterate_chunks(data, 1_000),
+        sample_size=2_000,
+        stratify_by='group',
+        min_rows_per_stratum=50,
+    )
+    assert num_rows == len(data)
+    assert sample['id'].is_unique
+    assert sample['id'].is_monotonic_increasing
+    pd.testing.assert_frame_equal(sample, data.iloc[sample['id']].reset_index(drop=True))
+    stratum_sizes = data['group'].value_counts(dropna=False)
+    expected = stratum_sample_sizes(stratum_sizes.to_numpy(), 2_000, 50)
+    assert sample['group'].value_counts(dropna=False).to_dict() == dict(
+        zip(stratum_sizes.index, expected),
+    )
+    # rare strata (including missing values) have at least `min_rows_per_stratum` rows
+    assert (sample['group'] == 'c').sum() == 50
+    assert sample['group'].isna().sum() == 50
+    with pytest.raises(ValueError, match='`unknown`'):
+        reservoir_sample(iterate_chunks(data, 1_000), sample_size=10, stratify_by='unknown')
+
+
+def test_reservoir_sample__empty():
+    sample, num_rows = reservoir_sample([], sample_size=10)
+    assert num_rows == 0
+    assert sample.empty
+
+
+def test_stratum_sample_sizes():
+    sizes = stratum_sample_sizes(np.array([9_000, 900, 90, 10]), 1_000, 20)
+    assert sizes.tolist() == [900, 90, 20, 10]
@@ -0,0 +1,107 @@
+"""Tests for synthetic_data.py."""
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from source.library.synthetic_data import (
+    COLUMN_KINDS,
+    create_synthetic_dataframe,
+    format_dates,
+    synthetic_arrow_schema,
+    write_synthetic_parquet,
+)
+import source.library.types as t
+
+
+def test_format_dates():
+    days = np.array([3, 0, 3, 31])
+    assert format_dates(days, '%Y-%m-%d').tolist() == [
+        '2020-01-04', '2020-01-01', '2020-01-04', '2020-02-01',
+    ]
+    assert format_dates(days, '%d/%m/%Y', start_date=np.datetime64('2023-01-01')).tolist() == [
+        '04/01/2023', '01/01/2023', '04/01/2023', '01/02/2023',
+    ]
+
+
+def test_create_synthetic_dataframe():
+    data = create_synthetic_dataframe(num_rows=10_000, num_columns=10, cardinality=50, seed=1)
+    assert data.shape == (10_000, 10)
+    assert data.columns.tolist() == [
+        *[f'{kind}_1' for kind in COLUMN_KINDS], 'integer_2', 'float_2',
+    ]
+    assert data.dtypes.astype(str).tolist() == [
+        'float64', 'float64', 'datetime64[ns]', 'datetime64[ns]', 'object', 'object', 'category',
+        'object', 'float64', 'float64',
+    ]
+    missing_rates = data.isna().mean()
+    assert ((missing_rates > 0.04) & (missing_rates < 0.06)).all()
+    assert data['string_1'].nunique() <= 50
+    assert len(data['categorical_1'].cat.categories) == 50
+    # a few values are common and most values are rare
+    counts = data['string_1'].value_counts()
+    assert counts.iloc[0] > 10 * counts.iloc[-1]
+    assert (data['datetime_1'].dt.floor('D') != data['datetime_1']).any()
+    dates = data['date_1'].dropna()
+    assert (dates.dt.floor('D') == dates).all()
+    assert set(data['boolean_1'].dropna()) == {True, False}
+    column_types = t.get_column_types(data)
+    assert column_types['integer_1'] == t.NUMERIC
+    assert column_types['date_1'] == t.DATE
+    assert column_types['date_string_1'] == t.DATE
+    assert column_types['string_1'] == t.STRING
+    assert column_types['categorical_1'] == t.CATEGORICAL
+    assert column_types['boolean_1'] == t.BOOLEAN
+    # the same seed creates the same data
+    pd.testing.assert_frame_equal(
+        data,
+        create_synthetic_dataframe(num_rows=10_000, num_columns=10, cardinality=50, seed=1),
+    )
+    assert not data.equals(
+        create_synthetic_dataframe(num_rows=10_000, num_columns=10, cardinality=50, seed=2),
+    )
+
+
+def test_create_synthetic_dataframe__no_missing():
+    data = create_synthetic_dataframe(num_rows=1_000, missing_rate=0, seed=1)
+    assert data.notna().all().all()
+    assert data['integer_1'].dtype == np.int64
+    assert data['boolean_1'].dtype == bool
+    with pytest.raises(AssertionError):
+        create_synthetic_dataframe(num_rows=1_000, missing_rate=1)
+
+
+def test_write_synthetic_parquet(tmp_path):  # noqa
+    path = tmp_path / 'data.parquet'
+    write_synthetic_parquet(path, num_rows=2_500, chunk_size=1_000, seed=1, cardinality=20)
+    parquet_file = pq.ParquetFile(path)
+    assert parquet_file.metadata.num_rows == 2_500
+    assert parquet_file.metadata.num_row_groups == 3
+    data = pd.read_parquet(path)
+    assert data.dtypes.astype(str).tolist() == [
+        'float64', 'float64', 'datetime64[ns]', 'datetime64[ns]', 'object', 'object', 'category',
+        'object',
+    ]
+    assert data['string_1'].nunique() <= 20
+    # the same seed (and chunk size) creates the same file
+    other_path = tmp_path / 'other.parquet'
+    write_synthetic_parquet(other_path, num_rows=2_500, chunk_size=1_000, seed=1, cardinality=20)
+    pd.testing.assert_frame_equal(pd.read_parquet(other_path), data)
+    # a chunk with only missing values has the same schema as the other chunks
+    write_synthetic_parquet(path, num_rows=1_001, chunk_size=1_000, seed=1, missing_rate=0.999)
+    assert len(pd.read_parquet(path)) == 1_001
+    write_synthetic_parquet(path, num_rows=0, seed=1)
+    assert len(pd.read_parquet(path)) == 0
+    # the schema is built from the column types, so a small first chunk where the string columns
+    # are all missing doesn't determine the types
+    write_synthetic_parquet(path, num_rows=50, chunk_size=2, seed=0, missing_rate=0.9)
+    assert len(pd.read_parquet(path)) == 50
+    schema = synthetic_arrow_schema(missing_rate=0.9)
+    assert schema.field('string_1').type == pa.string()
+    assert pq.read_schema(path).field('string_1').type == pa.string()
+    assert pq.read_schema(path).names == schema.names
+    write_synthetic_parquet(path, num_rows=10, seed=0, num_columns=9, missing_rate=0)
+    assert pd.read_parquet(path).dtypes.astype(str).tolist() == [
+        'int64', 'float64', 'datetime64[ns]', 'datetime64[ns]', 'object', 'object', 'category',
+        'bool', 'int64',
+    ]
@@ -1,6 +1,7 @@
 """Tests for types.py."""
 import numpy as np
 import pandas as pd
+from source.library import profiling
 import source.library.types as t
 
 
@@ -231,3 +232,11 @@ def test_create_type_dict(mock_data1):  # noqa
     assert not t.is_boolean(column='dates_with_missing', column_types=column_types)
     assert not t.is_discrete(column='dates_with_missing', column_types=column_types)
     assert t.is_continuous(column='dates_with_missing', column_types=column_types)
+
+
+def test_get_column_types__parallel(mock_data1, mock_data2, monkeypatch):  # noqa
+    monkeypatch.setattr(profiling, 'PARALLEL_MIN_CELLS', 0)
+    for data in [mock_data1, mock_data2]:
+        expected = t.get_column_types(data)
+        assert t.get_column_types(data, max_workers=2) == expected
+        assert expected == {x: t.get_column_type(data[x]) for x in data.columns}
@@ -7,10 +7,12 @@ from datetime import date, datetime
 
 import yaml
 import source.library.types as t
+from source.library.date_index import DateIndex
 from source.library.utilities import (
     build_tools_from_graph_configs,
     dataframe_columns_to_datetime,
     filter_dataframe,
+    filter_date_range,
     to_date,
     create_random_dataframe,
     to_date_string,
@@ -1807,9 +1809,104 @@ def test_filter_dataframe_multiple_filters(mock_data2):  # noqa
     assert filtered_df['categories_with_missing'].tolist() == ['a', np.nan]
     assert filtered_df['categories_with_missing2'].tolist() == [np.nan, np.nan]
 
+def test_filter_date_range(mock_data2):  # noqa
+    for column in ['datetimes_with_missing', 'dates_with_missing2']:
+        filtered_df, code = filter_date_range(
+            mock_data2, column, start='2023-01-02', end='2023-01-04 12:00:00',
+        )
+        assert filtered_df['integers'].tolist() == [2, 4]
+        local_vars = {'graph_data': mock_data2}
+        exec(code, globals(), local_vars)
+        pd.testing.assert_frame_equal(local_vars['graph_data'], filtered_df)
+    # no upper bound
+    data = mock_data2.copy()
+    data['date_strings'] = data['dates_with_missing'].dt.strftime('%Y-%m-%d')
+    filtered_df, code = filter_date_range(data, 'date_strings', start=datetime(2023, 1, 2))
+    assert filtered_df['integers'].tolist() == [2, 4, 5]
+    local_vars = {'graph_data': data}
+    exec(code, globals(), local_vars)
+    pd.testing.assert_frame_equal(local_vars['graph_data'], filtered_df)
+    # the same rows with the date index
+    date_index = DateIndex(data, ['datetimes_with_missing', 'date_strings'])
+    for column, start, end in [
+            ('datetimes_with_missing', '2023-01-02', '2023-01-04 12:00:00'),
+            ('date_strings', datetime(2023, 1, 2), None),
+        ]:
+        expected, expected_code = filter_date_range(data, column, start=start, end=end)
+        actual, code = filter_date_range(data, column, start=start, end=end, date_index=date_index)
+        pd.testing.assert_frame_equal(actual, expected)
+        assert code == expected_code
+
+
+def test_filter_dataframe__date_index(mock_data2):  # noqa
+    # the same rows (and code) as comparing the dates of every row
+    random_data = create_random_dataframe(num_rows=2_000, sporadic_missing=True, seed=1)
+    for data, filters in [
+            (mock_data2, {'dates_with_missing': ('2023-01-02', '2023-01-04')}),
+            (mock_data2, {'datetimes': ('2023-01-02', '2023-01-04'), 'strings': ['a', 'b']}),
+            (mock_data2, {'datetimes_with_missing2': ('2023-01-01', '2023-01-04'), 'integers': (3, 5)}),  # noqa
+            (random_data, {'DateStrings': ('2023-03-01', '2023-06-30')}),
+            (random_data, {'Dates': ('2023-03-01', '2023-06-30'), 'DateTimes': ('2023-01-01', '2023-12-31')}),  # noqa
+            (random_data, {'DateTimes': ('2023-03-01', '2023-06-30'), 'Integers': (10, 80)}),
+        ]:
+        column_types = t.get_column_types(data)
+        date_index = DateIndex(data, t.get_date_columns(column_types))
+        for engine in ['pandas', 'polars']:
+            expected, expected_code = filter_dataframe(data, filters, column_types, engine=engine)
+            actual, code = filter_dataframe(
+                data, filters, column_types, engine=engine, date_index=date_index,
+            )
+            assert len(expected) > 0
+            pd.testing.assert_frame_equal(actual, expected)
+            assert code == expected_code
+    # the index isn't used if it isn't the index of the data
+    subset = mock_data2.iloc[1:]
+    filters = {'dates': ('2023-01-01', '2023-01-03')}
+    column_types = t.get_column_types(mock_data2)
+    actual, _ = filter_dataframe(
+        subset, filters, column_types, date_index=DateIndex(mock_data2, ['dates']),
+    )
+    assert actual['integers'].tolist() == [2, 3]
+
+
+def test_filter_dataframe__date_format_after_other_filters():
+    # the format of the dates is inferred from the whole column (day first), not from the first
+    # row that matches the (leading) filter on `s`, which is ambiguous
+    data = pd.DataFrame({
+        's': ['a', 'b', 'b', 'b'],
+        'd': ['13/01/2023', '05/03/2023', '06/03/2023', '03/05/2023'],
+    })
+    filters = {'s': ['b'], 'd': ('2023-03-01', '2023-03-31')}
+    column_types = t.get_column_types(data)
+    date_index = DateIndex(data, ['d'])
+    for engine in ['pandas', 'polars']:
+        for index in [None, date_index]:
+            actual, code = filter_dataframe(
+                data, filters, column_types, engine=engine, date_index=index,
+            )
+            assert actual.index.tolist() == [1, 2]
+            local_vars = {'data': data}
+            exec(code, globals(), local_vars)
+            pd.testing.assert_frame_equal(local_vars['graph_data'], actual)
+
+
 def test_create_random_dataframe():  # noqa
     assert len(create_random_dataframe(500, sporadic_missing=False)) == 500
     assert len(create_random_dataframe(500, sporadic_missing=True)) == 500
+    data = create_random_dataframe(500, sporadic_missing=True, seed=1)
+    pd.testing.assert_frame_equal(
+        data,
+        create_random_dataframe(500, sporadic_missing=True, seed=1),
+    )
+    assert data.drop(columns='Booleans').isna().sum().tolist() == [50] * 10
+    assert data['Booleans'].dtype == bool
+    assert data['Integers'].dtype == float
+    assert create_random_dataframe(500, seed=1)['Integers'].dtype == np.int64
+    assert (data['DateStrings'].isna() | pd.to_datetime(data['DateStrings']).notna()).all()
+    missing_booleans1 = data['Booleans1'][data['Booleans1'].isna()]
+    missing_booleans2 = data['Booleans2'][data['Booleans2'].isna()]
+    assert all(x is not None and np.isnan(x) for x in missing_booleans1)
+    assert all(x is None for x in missing_booleans2)
 
 def test_build_tools_from_graph_configs__credit(graphing_configurations: dict, credit_data: pd.DataFrame):  # noqa
     """